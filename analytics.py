@@ -1,66 +1,83 @@
 from datetime import date, timedelta, datetime
-from tabulate import tabulate
-from db_connect import create_connection
+from db_connect import STREAM_BATCH_SIZE, create_connection, pooled_connection
+from records import AgingTotals, CustomerAging, CustomerRevenue, DailyRevenue, PeriodTotals
+from render import print_table, write_report
+import balances
+import columnar
+import rollup
 
-def sales_by_day(limit_days=7):
-    """Outputs per-day sales totals and revenue for the given number of recent days."""
+def get_sales_by_day(limit_days=7):
     """
-    Show total revenue per day for the last N days (including today).
+    Revenue per day for the last N days (including today), as DailyRevenue records.
+    Returns None on invalid input or a database error.
     """
     if not isinstance(limit_days, int) or limit_days <= 0:
         print("limit_days must be a positive integer")
-        return
+        return None
     conn = None
     try:
+        since = date.today() - timedelta(days=limit_days - 1)
+        if columnar.enabled():
+            return DailyRevenue.from_rows(columnar.get_store().daily_revenue(since))
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            since = date.today() - timedelta(days=limit_days - 1)
-            cursor.execute("""
-                SELECT DATE(sale_date) as day, IFNULL(SUM(total),0) as revenue
-                FROM sales
-                WHERE sale_date >= %s
-                GROUP BY DATE(sale_date)
-                ORDER BY day DESC
-            """, (since,))
-            rows = cursor.fetchall()
-            if rows:
-                print(tabulate(rows, headers=["Day", "Revenue"], tablefmt="grid"))
-            else:
-                print("No sales found in the selected period.")
+            return DailyRevenue.from_rows(rollup.daily_revenue(cursor, since))
     except Exception as e:
         print(f"Error in sales_by_day: {e}")
     finally:
         if conn:
             conn.close()
 
-def revenue_period(start_date_str, end_date_str):
+def iter_sales_by_day(limit_days=7, batch_size=STREAM_BATCH_SIZE):
+    """
+    Generator form of get_sales_by_day(): DailyRevenue records newest first, read from an
+    unbuffered cursor as they are needed. Database errors are raised to the consumer.
+    """
+    since = date.today() - timedelta(days=limit_days - 1)
+    if columnar.enabled():
+        yield from DailyRevenue.from_rows(columnar.get_store().daily_revenue(since))
+        return
+    with pooled_connection() as conn:
+        covered = rollup.coverage_start(conn.cursor())
+        for row in rollup.iter_daily_revenue(conn.cursor(buffered=False), covered, since, batch_size=batch_size):
+            yield DailyRevenue(*row)
+
+def sales_by_day(limit_days=7, fmt="table", out=None):
+    """
+    Streams per-day revenue for the given number of recent days to `out` (default stdout)
+    as a fixed-width table, CSV or NDJSON. Returns the number of days written (None on error).
+    """
+    if not isinstance(limit_days, int) or limit_days <= 0:
+        print("limit_days must be a positive integer")
+        return None
+    try:
+        return write_report(iter_sales_by_day(limit_days), DailyRevenue, fmt, out,
+                            empty_message="No sales found in the selected period.", floatfmt=".2f")
+    except Exception as e:
+        print(f"Error in sales_by_day: {e}")
+        return None
+
+def get_revenue_period(start_date_str, end_date_str):
     """
-    Show totals for a date range [start, end] inclusive.
-    Dates must be in YYYY-MM-DD format.
+    Totals for a date range [start, end] inclusive, as a PeriodTotals record.
+    Dates are YYYY-MM-DD strings (or date objects). Returns None on invalid input or error.
     """
     conn = None
     try:
         # Validate and convert
-        start_dt = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-        end_dt = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        start_dt = start_date_str if isinstance(start_date_str, date) else datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        end_dt = end_date_str if isinstance(end_date_str, date) else datetime.strptime(end_date_str, "%Y-%m-%d").date()
         if start_dt > end_dt:
             print("start_date cannot be after end_date")
-            return
+            return None
 
+        if columnar.enabled():
+            return PeriodTotals(*columnar.get_store().period_totals(start_dt, end_dt))
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT 
-                    IFNULL(SUM(total),0) as total_revenue,
-                    IFNULL(SUM(amount_paid),0) as total_paid,
-                    IFNULL(SUM(amount_due),0) as total_due
-                FROM sales
-                WHERE sale_date BETWEEN %s AND %s
-            """, (start_dt, end_dt))
-            row = cursor.fetchone()
-            print(tabulate([row], headers=["Revenue", "Paid", "Due"], tablefmt="grid"))
+            return PeriodTotals(*rollup.period_totals(cursor, start_dt, end_dt))
     except ValueError:
         print("Dates must be in YYYY-MM-DD format")
     except Exception as e:
@@ -69,35 +86,99 @@ def revenue_period(start_date_str, end_date_str):
         if conn:
             conn.close()
 
-def top_customers(limit=5):
-    """Lists the top N customers by total revenue."""
+def revenue_period(start_date_str, end_date_str):
+    """Show totals for a date range [start, end] inclusive (YYYY-MM-DD)."""
+    totals = get_revenue_period(start_date_str, end_date_str)
+    if totals is not None:
+        print_table([totals], PeriodTotals)
+    return totals
+
+def get_top_customers(limit=5):
+    """The top N customers by total revenue, as CustomerRevenue records (None on invalid input or error)."""
     if not isinstance(limit, int) or limit <= 0:
         print("limit must be a positive integer")
-        return
+        return None
     conn = None
     try:
+        if columnar.enabled():
+            return CustomerRevenue.from_rows(columnar.get_store().top_customers(limit=limit))
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT c.customer_name, IFNULL(SUM(s.total),0) as revenue
-                FROM sales s
-                JOIN customers c ON s.customer_id = c.customer_id
-                GROUP BY c.customer_name
-                ORDER BY revenue DESC
-                LIMIT %s
-            """, (limit,))
-            rows = cursor.fetchall()
-            if rows:
-                print(tabulate(rows, headers=["Customer", "Revenue"], tablefmt="grid"))
-            else:
-                print("No customer sales data available.")
+            return CustomerRevenue.from_rows(rollup.top_customers(cursor, limit=limit))
     except Exception as e:
         print(f"Error in top_customers: {e}")
     finally:
         if conn:
             conn.close()
 
+def top_customers(limit=5):
+    """Lists the top N customers by total revenue."""
+    rows = get_top_customers(limit)
+    if rows is not None:
+        print_table(rows, CustomerRevenue, empty_message="No customer sales data available.")
+    return rows
+
+def _aging_date(as_of):
+    if as_of is None or isinstance(as_of, date):
+        return as_of
+    return datetime.strptime(as_of, "%Y-%m-%d").date()
+
+
+def get_receivables_aging(as_of=None, limit=None, order="total"):
+    """
+    Open dues per customer bucketed by days since the sale (0-30, 31-60, 61-90, 90+) as
+    of `as_of` (date or YYYY-MM-DD, default today), as CustomerAging records.
+    order="total" lists the largest balances first, "oldest" the largest 90+ amounts.
+    Read from the receivables_daily table kept by the sales and payments writers, so the
+    cost grows with the number of open (customer, day) dues, not with the sales table.
+    Returns None on invalid input or error.
+    """
+    if limit is not None and (not isinstance(limit, int) or limit <= 0):
+        print("limit must be a positive integer")
+        return None
+    conn = None
+    try:
+        as_of = _aging_date(as_of)
+        conn = create_connection()
+        if conn:
+            return CustomerAging.from_rows(balances.aging(conn.cursor(), as_of, limit, order))
+    except ValueError as e:
+        print(f"Invalid aging request: {e}")
+    except Exception as e:
+        print(f"Error in receivables_aging: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_aging_totals(as_of=None):
+    """The aging buckets summed over all customers as an AgingTotals record (None on error)."""
+    conn = None
+    try:
+        as_of = _aging_date(as_of)
+        conn = create_connection()
+        if conn:
+            return AgingTotals(*balances.aging_totals(conn.cursor(), as_of))
+    except ValueError as e:
+        print(f"Invalid aging request: {e}")
+    except Exception as e:
+        print(f"Error in aging_totals: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def receivables_aging(as_of=None, limit=None, order="total"):
+    """Prints the aging totals and the per-customer aging report."""
+    totals = get_aging_totals(as_of)
+    rows = get_receivables_aging(as_of, limit, order)
+    if totals is not None:
+        print_table([totals], AgingTotals, floatfmt=".2f")
+    if rows is not None:
+        print_table(rows, CustomerAging, empty_message="No outstanding dues.", floatfmt=".2f")
+    return rows
+
 if __name__ == "__main__":
     # Quick demo runs (comment/uncomment as needed)
     sales_by_day(7)
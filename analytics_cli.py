@@ -1,12 +1,43 @@
 import argparse
-from analytics import sales_by_day, revenue_period, top_customers
+from datetime import datetime
+from tabulate import tabulate
+from analytics import sales_by_day, revenue_period, top_customers, receivables_aging
+from balances import AGING_ORDERS
+from queries import PROFILE_ORDERS, print_profile
+from render import STREAM_FORMATS
+from rollup import rebuild_rollup, rollup_status
+from sales_crud import export_sales, list_sales
+import columnar
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+def slice_sales(args):
+    """Prints one measure grouped by one dimension over the filtered sales (columnar engine)."""
+    try:
+        rows = columnar.get_store().group(
+            args.by, args.measure, limit=args.limit,
+            start=parse_date(args.start), end=parse_date(args.end),
+            item_id=args.item_id, customer_id=args.customer_id, payment_method=args.payment_method,
+        )
+    except Exception as e:
+        print(f"Error in slice: {e}")
+        return
+    if rows:
+        print(tabulate(rows, headers=[args.by, args.measure], tablefmt="grid"))
+    else:
+        print("No sales match the filters.")
 
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=columnar.ENGINES, help="Answer from SQL (default) or the columnar store")
+    parser.add_argument("--profile", nargs="?", const="total", choices=PROFILE_ORDERS,
+                        help="Print the top queries afterwards, by total time (default), calls, p95 or max")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     p1 = sub.add_parser("daily")
     p1.add_argument("--days", type=int, default=7)
+    p1.add_argument("--format", choices=STREAM_FORMATS, default="table")
 
     p2 = sub.add_parser("period")
     p2.add_argument("--start", required=True)
@@ -15,13 +46,56 @@ def main():
     p3 = sub.add_parser("top")
     p3.add_argument("--limit", type=int, default=5)
 
+    p4 = sub.add_parser("rollup-rebuild", help="Backfill/rebuild the daily sales rollup")
+    p4.add_argument("--since", help="YYYY-MM-DD (default: first sale)")
+
+    sub.add_parser("rollup-status")
+
+    p6 = sub.add_parser("slice", help="Group sales by a dimension with filters (columnar store)")
+    p6.add_argument("--by", choices=columnar.DIMENSIONS, default="day")
+    p6.add_argument("--measure", choices=columnar.MEASURES, default="total")
+    p6.add_argument("--start", help="YYYY-MM-DD")
+    p6.add_argument("--end", help="YYYY-MM-DD")
+    p6.add_argument("--item-id", type=int, action="append")
+    p6.add_argument("--customer-id", type=int, action="append")
+    p6.add_argument("--payment-method", action="append")
+    p6.add_argument("--limit", type=int)
+
+    p7 = sub.add_parser("aging", help="Receivables aging by customer (0-30/31-60/61-90/90+ days)")
+    p7.add_argument("--as-of", help="YYYY-MM-DD (default: today)")
+    p7.add_argument("--limit", type=int)
+    p7.add_argument("--order", choices=AGING_ORDERS, default="total",
+                    help="total: largest balances first; oldest: largest 90+ amounts first")
+
+    p8 = sub.add_parser("sales", help="Stream every sale, newest first")
+    p8.add_argument("--format", choices=STREAM_FORMATS, default="table")
+    p8.add_argument("--output", help="Write to this file instead of stdout")
+
     args = parser.parse_args()
+    if args.engine:
+        columnar.set_engine(args.engine)
     if args.cmd == "daily":
-        sales_by_day(args.days)
+        sales_by_day(args.days, args.format)
     elif args.cmd == "period":
         revenue_period(args.start, args.end)
     elif args.cmd == "top":
         top_customers(args.limit)
+    elif args.cmd == "rollup-rebuild":
+        since = datetime.strptime(args.since, "%Y-%m-%d").date() if args.since else None
+        rebuild_rollup(since)
+    elif args.cmd == "rollup-status":
+        rollup_status()
+    elif args.cmd == "slice":
+        slice_sales(args)
+    elif args.cmd == "aging":
+        receivables_aging(args.as_of, args.limit, args.order)
+    elif args.cmd == "sales":
+        if args.output:
+            export_sales(args.output, args.format)
+        else:
+            list_sales(args.format)
+    if args.profile:
+        print_profile(order=args.profile)
 
 if __name__ == "__main__":
     main()
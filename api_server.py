@@ -0,0 +1,359 @@
+"""
+HTTP/JSON API over the CRUD, sales and analytics functions (FastAPI on async_crud).
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8000 --workers 4
+
+Catalogue reads (customers, suppliers, materials) carry a weak ETag built from the
+table's row count and last updated_at, which the database keeps for every writer
+(other workers, the CLI, Streamlit, imports). A client that sends If-None-Match gets
+an empty 304 until the table changes. The JSON bodies of those reads are kept in the
+query cache under their ETag, so a repeated GET costs one small version query.
+"""
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+import async_crud
+import balances
+import payments
+import search_index
+from async_db import async_pool_stats, close_async_pool
+from customers_crud import validate_customer
+from suppliers_crud import validate_supplier
+from materials_crud import validate_material
+from sales_crud import validate_sale
+from pagination import DEFAULT_PAGE_SIZE, decode_token
+from query_cache import cache_stats, cached_async
+from queries import PROFILE_ORDERS, slow_queries, top_queries
+from render import to_dicts
+
+MAX_PAGE_SIZE = 500
+
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        await asyncio.to_thread(search_index.build_indexes)
+    except Exception as e:
+        print(f"Search indexes will be built on first use: {e}")
+    yield
+    await close_async_pool()
+
+
+app = FastAPI(title="Building Material Management API", lifespan=lifespan)
+
+
+class PartyIn(BaseModel):
+    name: str
+    phone: str
+    address: Optional[str] = None
+
+
+class PartyUpdate(BaseModel):
+    name: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+
+
+class MaterialIn(BaseModel):
+    item_name: str
+    price_per_unit: float
+    unit_type: str = "quintal"
+    quantity: int
+    supplier_id: Optional[int] = None
+
+
+class MaterialUpdate(BaseModel):
+    price: Optional[float] = None
+    quantity: Optional[int] = None
+
+
+class SaleIn(BaseModel):
+    customer_id: int
+    item_id: int
+    quantity: int
+    total: float
+    payment_method: str = "Cash"
+    amount_paid: Optional[float] = None
+    amount_due: Optional[float] = None
+    payment_status: str = "Pending"
+
+
+class PaymentIn(BaseModel):
+    amount: float
+    payment_method: str = "Cash"
+    payment_date: Optional[date] = None
+
+
+async def table_etag(*tables):
+    """Changes whenever a row of the tables is inserted, updated or deleted, by any process."""
+    versions = result_or_503(await async_crud.table_versions(tables))
+    digest = hashlib.blake2b(repr(versions).encode(), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+async def conditional_json(request, tables, key, load):
+    """
+    304 if the client's If-None-Match is still current, otherwise the JSON body built
+    by the coroutine function `load` (cached under `key` and the ETag).
+    """
+    etag = await table_etag(*tables)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    async def body():
+        return jsonable_encoder(await load())
+
+    return JSONResponse(await cached_async(f"{key}:{etag}", tables, body), headers=headers)
+
+
+def check_page_size(page_size):
+    if not 0 < page_size <= MAX_PAGE_SIZE:
+        raise HTTPException(400, f"page_size must be between 1 and {MAX_PAGE_SIZE}.")
+
+
+def check_token(token):
+    # A bad token is the client's mistake; the page functions report it like a database error.
+    if token:
+        try:
+            decode_token(token)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+
+def check_valid(error):
+    if error:
+        raise HTTPException(422, error)
+
+
+@app.exception_handler(async_crud.RowInUseError)
+async def row_in_use(request, exc):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+
+def check_found(ok, what):
+    if not ok:
+        raise HTTPException(404, f"{what} not found or nothing to change.")
+
+
+def paged(result):
+    rows, next_token = result_or_503(result)
+    return {"items": to_dicts(rows), "next_token": next_token}
+
+
+def catalogue_routes(table, fetch_page, search):
+    """GET /<table> (keyset pages) and GET /<table>/search for one catalogue table."""
+
+    @app.get(f"/{table}", name=f"list_{table}")
+    async def list_rows(request: Request, token: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        check_page_size(page_size)
+        check_token(token)
+
+        async def load():
+            return paged(await fetch_page(token, page_size))
+
+        return await conditional_json(request, [table], f"api:{table}:page:{token}:{page_size}", load)
+
+    @app.get(f"/{table}/search", name=f"search_{table}")
+    async def search_rows(request: Request, q: str, limit: int = search_index.DEFAULT_LIMIT):
+        check_page_size(limit)
+
+        async def load():
+            return {"items": to_dicts(await search(q, limit))}
+
+        return await conditional_json(request, [table], f"api:{table}:search:{q.lower()}:{limit}", load)
+
+
+catalogue_routes("customers", async_crud.list_customers_page, async_crud.search_customer)
+catalogue_routes("suppliers", async_crud.list_suppliers_page, async_crud.search_supplier)
+catalogue_routes("materials", async_crud.list_materials_page, async_crud.search_material)
+
+
+# Customers
+
+@app.post("/customers", status_code=201)
+async def create_customer(body: PartyIn):
+    check_valid(validate_customer(body.name, body.phone))
+    customer_id = await async_crud.add_customer(body.name, body.phone, body.address)
+    if customer_id is None:
+        raise HTTPException(500, "Customer could not be saved.")
+    return {"customer_id": customer_id}
+
+
+@app.patch("/customers/{customer_id}")
+async def update_customer(customer_id: int, body: PartyUpdate):
+    check_found(await async_crud.update_customer(customer_id, body.name, body.phone, body.address), "Customer")
+    return {"customer_id": customer_id}
+
+
+@app.delete("/customers/{customer_id}", status_code=204)
+async def delete_customer(customer_id: int):
+    check_found(await async_crud.delete_customer(customer_id), "Customer")
+
+
+# Suppliers
+
+@app.post("/suppliers", status_code=201)
+async def create_supplier(body: PartyIn):
+    check_valid(validate_supplier(body.name, body.phone))
+    supplier_id = await async_crud.add_supplier(body.name, body.phone, body.address)
+    if supplier_id is None:
+        raise HTTPException(500, "Supplier could not be saved.")
+    return {"supplier_id": supplier_id}
+
+
+@app.patch("/suppliers/{supplier_id}")
+async def update_supplier(supplier_id: int, body: PartyUpdate):
+    check_found(await async_crud.update_supplier(supplier_id, body.name, body.phone, body.address), "Supplier")
+    return {"supplier_id": supplier_id}
+
+
+@app.delete("/suppliers/{supplier_id}", status_code=204)
+async def delete_supplier(supplier_id: int):
+    check_found(await async_crud.delete_supplier(supplier_id), "Supplier")
+
+
+# Materials
+
+@app.post("/materials", status_code=201)
+async def create_material(body: MaterialIn):
+    check_valid(validate_material(body.item_name, body.price_per_unit, body.quantity))
+    material_id = await async_crud.add_material(
+        body.item_name, body.price_per_unit, body.unit_type, body.quantity, body.supplier_id
+    )
+    if material_id is None:
+        raise HTTPException(500, "Material could not be saved.")
+    return {"id": material_id}
+
+
+@app.patch("/materials/{material_id}")
+async def update_material(material_id: int, body: MaterialUpdate):
+    check_found(await async_crud.update_material(material_id, body.price, body.quantity), "Material")
+    return {"id": material_id}
+
+
+@app.delete("/materials/{material_id}", status_code=204)
+async def delete_material(material_id: int):
+    check_found(await async_crud.delete_material(material_id), "Material")
+
+
+# Sales
+
+@app.get("/sales")
+async def list_sales(token: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+    check_page_size(page_size)
+    check_token(token)
+    return paged(await async_crud.list_sales_page(token, page_size))
+
+
+@app.post("/sales", status_code=201)
+async def create_sale(body: SaleIn):
+    *_, error = validate_sale(body.customer_id, body.item_id, body.quantity, body.total,
+                              body.amount_paid, body.amount_due)
+    check_valid(error)
+    order_no = await async_crud.add_sale(
+        body.customer_id, body.item_id, body.quantity, body.total,
+        body.payment_method, body.amount_paid, body.amount_due, body.payment_status,
+    )
+    if order_no is None:
+        raise HTTPException(409, "Sale rejected: unknown material or not enough stock.")
+    return {"order_no": order_no}
+
+
+@app.post("/sales/{order_no}/payments", status_code=201)
+async def create_payment(order_no: int, body: PaymentIn):
+    payment = (order_no, body.amount, body.payment_method, body.payment_date)
+    check_valid(payments.validate_payment(payment)[1])
+    # The ledger write (lock, insert, sale/rollup/balance deltas) is the sync payments
+    # module; it runs on a worker thread with its own pooled connection.
+    result = await asyncio.to_thread(payments.record_payments, [payment], label="create_payment")
+    if not result["inserted"]:
+        if not result["errors"]:
+            raise HTTPException(503, "Database unavailable.")
+        message = result["errors"][0][1]
+        raise HTTPException(404 if "not found" in message else 409, message)
+    return {"order_no": order_no, "amount": body.amount}
+
+
+@app.get("/balances")
+async def list_balances(limit: int = 10):
+    return to_dicts(result_or_503(await async_crud.top_debtors(limit)))
+
+
+@app.get("/customers/{customer_id}/balance")
+async def customer_balance(customer_id: int):
+    return result_or_503(await async_crud.customer_balance(customer_id)).as_dict()
+
+
+# Analytics
+
+def since_days(days):
+    return date.today() - timedelta(days=days - 1) if days and days > 0 else None
+
+
+def result_or_503(result):
+    if result is None:
+        raise HTTPException(503, "Database unavailable.")
+    return result
+
+
+@app.get("/analytics/daily")
+async def daily_revenue(days: int = 7):
+    return to_dicts(result_or_503(await async_crud.daily_revenue(since_days(days))))
+
+
+@app.get("/analytics/period")
+async def period_totals(start: date, end: date):
+    if start > end:
+        raise HTTPException(400, "start cannot be after end.")
+    totals = result_or_503(await async_crud.period_totals(start, end))
+    return {"start": start, "end": end, **totals.as_dict()}
+
+
+@app.get("/analytics/top-customers")
+async def top_customers(limit: int = 5, days: int = 0):
+    return to_dicts(result_or_503(await async_crud.top_customers(since_days(days), limit=limit)))
+
+
+@app.get("/analytics/top-items")
+async def top_items(limit: int = 5, days: int = 0):
+    return to_dicts(result_or_503(await async_crud.top_items(since_days(days), limit=limit)))
+
+
+@app.get("/analytics/aging")
+async def receivables_aging(limit: Optional[int] = None, order: str = "total", as_of: Optional[date] = None):
+    if order not in balances.AGING_ORDERS:
+        raise HTTPException(400, f"order must be one of {', '.join(balances.AGING_ORDERS)}.")
+    totals, rows = await asyncio.gather(async_crud.aging_totals(as_of),
+                                        async_crud.receivables_aging(as_of, limit, order))
+    return {"totals": result_or_503(totals).as_dict(), "customers": to_dicts(result_or_503(rows))}
+
+
+@app.get("/dashboard")
+async def dashboard(threshold: int = 20, days: int = 0):
+    async def load():
+        return result_or_503(await async_crud.get_dashboard(threshold, days)).as_dict()
+
+    return await cached_async(f"api:dashboard:{threshold}:{days}",
+                              ["customers", "suppliers", "materials", "sales"], load)
+
+
+@app.get("/health")
+async def health():
+    return {"pool": async_pool_stats(), "cache": cache_stats()}
+
+
+@app.get("/health/queries")
+async def query_profile(limit: int = 20, order: str = "total"):
+    """Top queries of this process (threads driver; aiomysql connections are not instrumented)."""
+    if order not in PROFILE_ORDERS:
+        raise HTTPException(400, f"order must be one of {', '.join(PROFILE_ORDERS)}.")
+    return {"queries": to_dicts(top_queries(limit, order)), "slow": slow_queries()}
@@ -0,0 +1,549 @@
+"""
+Async (asyncio) versions of the CRUD, sales and analytics functions.
+
+Same validation, SQL, cache invalidation and search-index upkeep as the synchronous
+modules, but on the aiomysql pool from async_db, so one event loop can serve many
+requests at once. Functions return data instead of printing it; errors are printed
+and reported as None / [] like in the sync layer. Deleting a row that other rows still
+reference raises RowInUseError, so callers can tell it from a missing row.
+
+    import asyncio, async_crud
+    rows, token = asyncio.run(async_crud.list_customers_page())
+"""
+import asyncio
+from datetime import date, timedelta
+from async_db import async_connection
+from customers_crud import CUSTOMERS_PAGE_SQL, PHONE_PATTERN, validate_customer
+from suppliers_crud import SUPPLIERS_PAGE_SQL, validate_supplier
+from materials_crud import MATERIALS_PAGE_SQL, STOCK_FOR_UPDATE_SQL, validate_material
+from sales_crud import SALE_INSERT_SQL, STOCK_DECREMENT_SQL, sales_page_key, sales_page_query, validate_sale
+from dashboard import COUNTS_SQL, DashboardSummary
+from db_connect import MAX_TX_RETRIES, is_foreign_key_violation, is_retryable
+from pagination import DEFAULT_PAGE_SIZE, decode_token, page_result
+from query_cache import invalidate
+from records import (AgingTotals, Customer, CustomerAging, CustomerBalance, CustomerRevenue, DailyRevenue,
+                     ItemSales, Material, PeriodTotals, Sale, Supplier)
+import balances
+import rollup
+import search_index
+import stock_alerts
+import stock_journal
+
+# (row count, last write) of a catalogue table; updated_at is kept by the database (migration 0013).
+TABLE_VERSION_SQL = "SELECT %s, COUNT(*), MAX(updated_at) FROM {table}"
+CATALOGUE_TABLES = ("customers", "suppliers", "materials")
+
+
+class RowInUseError(Exception):
+    """The row can't be deleted: sales, orders or other rows still reference it."""
+
+
+async def _fetchall(sql, params=()):
+    async with async_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+
+async def _write(sql, params, tables):
+    """Runs one statement in its own transaction; returns (lastrowid, rowcount)."""
+    async with async_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            await conn.commit()
+            invalidate(*tables)
+            return cursor.lastrowid, cursor.rowcount
+
+
+async def table_versions(tables):
+    """
+    [(table, row count, last updated_at), ...] of catalogue tables, read from the
+    database so writes from every process show; None on error.
+    """
+    try:
+        if not set(tables) <= set(CATALOGUE_TABLES):
+            raise ValueError(f"no version for {sorted(set(tables) - set(CATALOGUE_TABLES))}")
+        sql = " UNION ALL ".join(TABLE_VERSION_SQL.format(table=table) for table in tables)
+        return [tuple(row) for row in await _fetchall(sql, tuple(tables))]
+    except Exception as e:
+        print(f"Database error during table_versions: {e}")
+        return None
+
+
+async def _journal(cursor, movements):
+    """stock_journal.record_movements() on an async cursor."""
+    rows = stock_journal.movement_rows(movements)
+    if rows:
+        await cursor.executemany(stock_journal.MOVEMENT_INSERT_SQL, rows)
+
+
+async def _page(label, record_type, sql, token, page_size):
+    try:
+        after = decode_token(token)[0] if token else 0
+        rows = await _fetchall(sql, (after, page_size + 1))
+        return page_result(record_type.from_rows(rows), page_size, key=lambda row: [row[0]])
+    except Exception as e:
+        print(f"Database error during {label}: {e}")
+        return None
+
+
+async def _search(label, record_type, table, columns, name, limit):
+    try:
+        if search_index.uses_index():
+            index = search_index.ready_index(table)
+            if index is None:
+                # First search (or after a bulk insert): build the index off the event loop.
+                index = await asyncio.to_thread(search_index.get_index, table)
+            matches = index.search(name, limit)
+        else:
+            matches = await asyncio.to_thread(search_index.search, table, name, limit)
+        if not matches:
+            return []
+        sql, params = search_index.ranked_rows_query(table, columns, matches)
+        return record_type.from_rows(search_index.in_rank_order(await _fetchall(sql, params), matches))
+    except Exception as e:
+        print(f"Database error during {label}: {e}")
+        return []
+
+
+async def _update(label, table, id_col, row_id, fields):
+    """Sets the non-None `fields` on one row; returns True if the row exists and was written."""
+    fields = {column: value for column, value in fields.items() if value is not None}
+    if not fields:
+        return False
+    try:
+        sql = f"UPDATE {table} SET " + ", ".join(f"{column}=%s" for column in fields) + f" WHERE {id_col}=%s"
+        async with async_connection() as conn:
+            async with conn.cursor() as cursor:
+                # Not rowcount: MySQL counts changed rows, so an unchanged row would look missing.
+                await cursor.execute(f"SELECT 1 FROM {table} WHERE {id_col}=%s", (row_id,))
+                if await cursor.fetchone() is None:
+                    await conn.rollback()
+                    return False
+                await cursor.execute(sql, tuple(fields.values()) + (row_id,))
+                await conn.commit()
+        invalidate(table)
+        return True
+    except Exception as e:
+        print(f"Database error during {label}: {e}")
+        return False
+
+
+async def _delete(label, table, id_col, row_id):
+    try:
+        _, deleted = await _write(f"DELETE FROM {table} WHERE {id_col}=%s", (row_id,), (table,))
+        search_index.remove_row(table, row_id)
+        return deleted > 0
+    except Exception as e:
+        if is_foreign_key_violation(e):
+            raise RowInUseError(f"{table} {row_id} is still referenced by other records.") from e
+        print(f"Database error during {label}: {e}")
+        return False
+
+
+# Customers
+
+async def add_customer(name, phone, address):
+    """Returns the new customer_id, or None if the customer was rejected."""
+    error = validate_customer(name, phone)
+    if error:
+        print(f"Error: {error}")
+        return None
+    try:
+        customer_id, _ = await _write(
+            "INSERT INTO customers (customer_name, phone, address) VALUES (%s, %s, %s)",
+            (name, phone, address), ("customers",)
+        )
+        search_index.index_row("customers", customer_id, name)
+        return customer_id
+    except Exception as e:
+        print(f"Database error during add_customer: {e}")
+        return None
+
+
+async def list_customers_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    return await _page("list_customers_page", Customer, CUSTOMERS_PAGE_SQL, token, page_size)
+
+
+async def search_customer(name, limit=search_index.DEFAULT_LIMIT):
+    return await _search("search_customer", Customer, "customers", "customer_id, customer_name, phone, address", name, limit)
+
+
+async def update_customer(customer_id, name=None, phone=None, address=None):
+    if phone is not None and not PHONE_PATTERN.match(phone):
+        print("Error: Phone number must be exactly 10 digits.")
+        return False
+    if name is not None and not name.strip():
+        print("Error: Customer name cannot be empty.")
+        return False
+    updated = await _update("update_customer", "customers", "customer_id", customer_id,
+                            {"customer_name": name, "phone": phone, "address": address})
+    if updated and name:
+        search_index.index_row("customers", customer_id, name)
+    return updated
+
+
+async def delete_customer(customer_id):
+    return await _delete("delete_customer", "customers", "customer_id", customer_id)
+
+
+# Suppliers
+
+async def add_supplier(name, phone, address):
+    """Returns the new supplier_id, or None if the supplier was rejected."""
+    error = validate_supplier(name, phone)
+    if error:
+        print(f"Error: {error}")
+        return None
+    try:
+        supplier_id, _ = await _write(
+            "INSERT INTO suppliers (supplier_name, phone, address) VALUES (%s, %s, %s)",
+            (name, phone, address), ("suppliers",)
+        )
+        search_index.index_row("suppliers", supplier_id, name)
+        return supplier_id
+    except Exception as e:
+        print(f"Database error during add_supplier: {e}")
+        return None
+
+
+async def list_suppliers_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    return await _page("list_suppliers_page", Supplier, SUPPLIERS_PAGE_SQL, token, page_size)
+
+
+async def search_supplier(name, limit=search_index.DEFAULT_LIMIT):
+    return await _search("search_supplier", Supplier, "suppliers", "supplier_id, supplier_name, phone, address", name, limit)
+
+
+async def update_supplier(supplier_id, name=None, phone=None, address=None):
+    if phone is not None and not PHONE_PATTERN.match(phone):
+        print("Error: Phone number must be exactly 10 digits.")
+        return False
+    if name is not None and not name.strip():
+        print("Error: Supplier name cannot be empty.")
+        return False
+    updated = await _update("update_supplier", "suppliers", "supplier_id", supplier_id,
+                            {"supplier_name": name, "phone": phone, "address": address})
+    if updated and name:
+        search_index.index_row("suppliers", supplier_id, name)
+    return updated
+
+
+async def delete_supplier(supplier_id):
+    return await _delete("delete_supplier", "suppliers", "supplier_id", supplier_id)
+
+
+# Materials
+
+async def add_material(item_name, price_per_unit, unit_type, quantity, supplier_id):
+    """Returns the new material id, or None if the material was rejected."""
+    error = validate_material(item_name, price_per_unit, quantity)
+    if error:
+        print(f"Error: {error}")
+        return None
+    try:
+        async with async_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    """INSERT INTO materials (item_name, price_per_unit, unit_type, quantity_in_stock, supplier_id)
+                       VALUES (%s, %s, %s, %s, %s)""",
+                    (item_name, price_per_unit, unit_type, quantity, supplier_id)
+                )
+                material_id = cursor.lastrowid
+                await _journal(cursor, [(material_id, quantity, "opening")])
+                await conn.commit()
+        invalidate("materials")
+        search_index.index_row("materials", material_id, item_name)
+        return material_id
+    except Exception as e:
+        print(f"Database error during add_material: {e}")
+        return None
+
+
+async def list_materials_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    return await _page("list_materials_page", Material, MATERIALS_PAGE_SQL, token, page_size)
+
+
+async def search_material(name, limit=search_index.DEFAULT_LIMIT):
+    return await _search("search_material", Material, "materials",
+                         "id, item_name, price_per_unit, unit_type, quantity_in_stock", name, limit)
+
+
+async def update_material(id, price=None, quantity=None):
+    if quantity is None:
+        return await _update("update_material", "materials", "id", id, {"price_per_unit": price})
+    fields = {"price_per_unit": price, "quantity_in_stock": quantity}
+    fields = {column: value for column, value in fields.items() if value is not None}
+    try:
+        async with async_connection() as conn:
+            async with conn.cursor() as cursor:
+                # The old quantity tells stock_alerts whether the threshold was crossed.
+                await cursor.execute(STOCK_FOR_UPDATE_SQL, (id,))
+                result = await cursor.fetchone()
+                if result is None:
+                    await conn.rollback()
+                    return False
+                await cursor.execute("UPDATE materials SET " + ", ".join(f"{column}=%s" for column in fields)
+                                     + " WHERE id=%s", tuple(fields.values()) + (id,))
+                await _journal(cursor, [(id, quantity - result[0], "adjustment")])
+                await conn.commit()
+        invalidate("materials")
+        stock_alerts.stock_changed(id, result[0], quantity)
+        return True
+    except Exception as e:
+        print(f"Database error during update_material: {e}")
+        return False
+
+
+async def delete_material(id):
+    try:
+        async with async_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(STOCK_FOR_UPDATE_SQL, (id,))
+                result = await cursor.fetchone()
+                await cursor.execute("DELETE FROM materials WHERE id=%s", (id,))
+                deleted = cursor.rowcount
+                if result:
+                    await _journal(cursor, [(id, -result[0], "delete")])
+                await conn.commit()
+        invalidate("materials")
+        search_index.remove_row("materials", id)
+        return deleted > 0
+    except Exception as e:
+        if is_foreign_key_violation(e):
+            raise RowInUseError(f"materials {id} is still referenced by other records.") from e
+        print(f"Database error during delete_material: {e}")
+        return False
+
+
+# Sales
+
+async def add_sale(customer_id, item_id, quantity, total, payment_method="Cash", amount_paid=None, amount_due=None, payment_status="Pending"):
+    """
+    Async sales_crud.add_sale: locks the material row, checks and decrements stock,
+    inserts the sale and updates the rollup in one transaction, retrying deadlocks.
+    Returns the new order_no, or None if the sale was rejected.
+    """
+    amount_paid, amount_due, error = validate_sale(customer_id, item_id, quantity, total, amount_paid, amount_due)
+    if error:
+        print(f"Error: {error}")
+        return None
+
+    for attempt in range(1, MAX_TX_RETRIES + 1):
+        try:
+            async with async_connection() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(STOCK_FOR_UPDATE_SQL, (item_id,))
+                    result = await cursor.fetchone()
+                    if not result:
+                        await conn.rollback()
+                        print(f"Error: Material with ID {item_id} not found.")
+                        return None
+                    current_stock = result[0]
+                    if current_stock < quantity:
+                        await conn.rollback()
+                        print(f"Error: Not enough stock. Only {current_stock} units available.")
+                        return None
+                    await cursor.execute(STOCK_DECREMENT_SQL, (quantity, item_id))
+                    sale = (customer_id, item_id, quantity, date.today(), total,
+                            payment_method, amount_paid, amount_due, payment_status)
+                    await cursor.execute(SALE_INSERT_SQL, sale)
+                    order_no = cursor.lastrowid
+                    await cursor.executemany(rollup.ROLLUP_UPSERT_SQL, rollup.rollup_rows([sale]))
+                    for sql, rows in balances.balance_statements(balances.sale_deltas([sale])):
+                        await cursor.executemany(sql, rows)
+                    await _journal(cursor, [(item_id, -quantity, "sale", order_no)])
+                    await conn.commit()
+            break
+        except Exception as e:
+            if is_retryable(e) and attempt < MAX_TX_RETRIES:
+                await asyncio.sleep(0.05 * attempt)
+                continue
+            print(f"Database error during add_sale: {e}")
+            return None
+
+    # The sale is committed: nothing below may roll it back, retry it or report it as failed.
+    try:
+        invalidate("sales", "materials", "customer_balances")
+        stock_alerts.stock_changed(item_id, current_stock, current_stock - quantity)
+    except Exception as e:
+        print(f"Warning: sale {order_no} was recorded, but updating caches/alerts failed: {e}")
+    return order_no
+
+
+async def list_sales_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    try:
+        sql, params = sales_page_query(token, page_size)
+        return page_result(Sale.from_rows(await _fetchall(sql, params)), page_size, key=sales_page_key)
+    except Exception as e:
+        print(f"Database error during list_sales_page: {e}")
+        return None
+
+
+async def top_debtors(limit=10):
+    """Customers with the largest outstanding balance as CustomerBalance records (None on error)."""
+    try:
+        return CustomerBalance.from_rows(await _fetchall(balances.DEBTORS_SQL, (limit,)))
+    except Exception as e:
+        print(f"Database error during top_debtors: {e}")
+        return None
+
+
+async def customer_balance(customer_id):
+    """The customer's CustomerBalance (zero when nothing is due), or None on error."""
+    try:
+        rows = await _fetchall(balances.CUSTOMER_BALANCE_SQL, (customer_id,))
+        return CustomerBalance(*rows[0]) if rows else CustomerBalance(customer_id, None, 0, 0)
+    except Exception as e:
+        print(f"Database error during customer_balance: {e}")
+        return None
+
+
+# Analytics (answered from the daily rollup, see rollup.py)
+
+async def _range_parts(cursor, queries, start, end):
+    await cursor.execute(rollup.COVERAGE_SQL)
+    row = await cursor.fetchone()
+    return rollup.range_queries(row[0] if row else None, queries, start, end)
+
+
+async def _daily_revenue(cursor, start=None, end=None):
+    rows = []
+    for sql, params in await _range_parts(cursor, rollup.DAILY_REVENUE_SQL, start, end):
+        await cursor.execute(sql, params)
+        rows += await cursor.fetchall()
+    return rows     # each part is ordered newest first and the rollup part comes first
+
+
+async def _period_totals(cursor, start=None, end=None):
+    parts = []
+    for sql, params in await _range_parts(cursor, rollup.PERIOD_TOTALS_SQL, start, end):
+        await cursor.execute(sql, params)
+        parts.append(await cursor.fetchone())
+    return rollup.add_totals(parts)
+
+
+async def _ranked(cursor, queries, start=None, end=None, limit=5):
+    parts = await _range_parts(cursor, queries, start, end)
+    if len(parts) == 1:
+        sql, params = parts[0]
+        await cursor.execute(sql + " ORDER BY 2 DESC LIMIT %s", params + (limit,))
+        return list(await cursor.fetchall())
+    results = []
+    for sql, params in parts:
+        await cursor.execute(sql, params)
+        results.append(await cursor.fetchall())
+    return rollup.merge_ranked(results, limit)
+
+
+async def _top_items(cursor, start=None, end=None, limit=5):
+    return await _ranked(cursor, rollup.TOP_ITEMS_SQL, start, end, limit)
+
+
+async def _top_customers(cursor, start=None, end=None, limit=5):
+    return await _ranked(cursor, rollup.TOP_CUSTOMERS_SQL, start, end, limit)
+
+
+async def _total_unpaid(cursor):
+    await cursor.execute(balances.TOTAL_UNPAID_SQL)
+    return tuple(await cursor.fetchone())
+
+
+async def _aging_totals(cursor, as_of=None):
+    await cursor.execute(*balances.aging_totals_query(as_of))
+    return tuple(await cursor.fetchone())
+
+
+async def receivables_aging(as_of=None, limit=None, order="total"):
+    """Async analytics.get_receivables_aging: CustomerAging records, or None on error."""
+    try:
+        return CustomerAging.from_rows(await _fetchall(*balances.aging_query(as_of, limit, order)))
+    except Exception as e:
+        print(f"Error in receivables_aging: {e}")
+        return None
+
+
+async def aging_totals(as_of=None):
+    """Async analytics.get_aging_totals: an AgingTotals record, or None on error."""
+    totals = await _analytics("aging_totals", _aging_totals, as_of)
+    return None if totals is None else AgingTotals(*totals)
+
+
+async def _query_counts(cursor, low_stock_threshold):
+    await cursor.execute(COUNTS_SQL, (low_stock_threshold,))
+    return await cursor.fetchone()
+
+
+async def _on_own_connection(query, *args, **kwargs):
+    async with async_connection() as conn:
+        async with conn.cursor() as cursor:
+            return await query(cursor, *args, **kwargs)
+
+
+async def _analytics(label, query, *args, **kwargs):
+    try:
+        return await _on_own_connection(query, *args, **kwargs)
+    except Exception as e:
+        print(f"Error in {label}: {e}")
+        return None
+
+
+def _records(record_type, rows):
+    return None if rows is None else record_type.from_rows(rows)
+
+
+async def daily_revenue(start=None, end=None):
+    """DailyRevenue records newest first, or None on error."""
+    return _records(DailyRevenue, await _analytics("daily_revenue", _daily_revenue, start, end))
+
+
+async def period_totals(start=None, end=None):
+    """PeriodTotals (revenue, paid, due) over [start, end], or None on error."""
+    totals = await _analytics("period_totals", _period_totals, start, end)
+    return None if totals is None else PeriodTotals(*totals)
+
+
+async def top_items(start=None, end=None, limit=5):
+    return _records(ItemSales, await _analytics("top_items", _top_items, start, end, limit=limit))
+
+
+async def top_customers(start=None, end=None, limit=5):
+    return _records(CustomerRevenue, await _analytics("top_customers", _top_customers, start, end, limit=limit))
+
+
+async def get_dashboard(low_stock_threshold=20, last_n_days=0):
+    """
+    Async dashboard.get_dashboard: the dashboard queries run concurrently on
+    separate pooled connections. Returns a DashboardSummary, or None on error.
+    """
+    since = date.today() - timedelta(days=last_n_days) if last_n_days and last_n_days > 0 else None
+    queries = [
+        _on_own_connection(_query_counts, low_stock_threshold),
+        _on_own_connection(_period_totals, since),
+        _on_own_connection(_top_items, since),
+        _on_own_connection(_aging_totals),
+    ]
+    if since is None:
+        queries.append(_on_own_connection(_total_unpaid))
+    try:
+        counts, totals, items, aging, *unpaid = await asyncio.gather(*queries)
+    except Exception as e:
+        print(f"Error generating dashboard: {e}")
+        return None
+
+    customers, suppliers, materials, low_stock_count = counts
+    total_revenue, _, total_unpaid = totals
+    if unpaid:
+        total_unpaid = unpaid[0][0]
+    return DashboardSummary(
+        customers=customers,
+        suppliers=suppliers,
+        materials=materials,
+        total_revenue=total_revenue,
+        total_unpaid=total_unpaid,
+        low_stock_count=low_stock_count,
+        low_stock_threshold=low_stock_threshold,
+        last_n_days=last_n_days,
+        top_items=ItemSales.from_rows(items),
+        aging=AgingTotals(*aging),
+    )
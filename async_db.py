@@ -0,0 +1,168 @@
+"""
+asyncio connection pool for async_crud.
+
+Two drivers:
+- "aiomysql": native async MySQL with the same db_config as the synchronous pool in
+  db_connect, but its own set of connections, so async code never blocks on MySQL I/O;
+- "threads": connections from db_connect's synchronous pool, each call run in a worker
+  thread. Works with whatever db_connect connects to, without aiomysql.
+The default "auto" picks aiomysql when it is installed and the backend is MySQL.
+
+    async with async_connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT COUNT(*) FROM customers")
+
+The aiomysql pool belongs to the event loop that opened it, so every loop gets its own
+(repeated asyncio.run() calls each build one). Call close_async_pool() before the event
+loop shuts down; the pool of a loop that ended without it is dropped with the loop.
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+import db_connect
+from db_connect import db_config, get_pool, pool_stats
+
+try:
+    import aiomysql
+except ImportError:     # optional: only needed by the async layer
+    aiomysql = None
+
+# Async pool settings (change before the first async_connection(), or call
+# close_async_pool() and the next call builds a new pool with the new values).
+async_pool_config = {
+    "driver": "auto",           # "aiomysql", "threads" or "auto"
+    "minsize": 1,               # connections opened up front
+    "maxsize": 20,              # max connections open at once
+    "pool_recycle": 3600,       # reconnect connections older than this (seconds)
+}
+
+# event loop -> its aiomysql pool / the lock that guards creating it
+_pools = weakref.WeakKeyDictionary()
+_pool_locks = weakref.WeakKeyDictionary()
+
+
+def async_driver():
+    driver = async_pool_config["driver"]
+    if driver == "auto":
+        return "aiomysql" if aiomysql is not None and db_connect.db_backend == "mysql" else "threads"
+    return driver
+
+
+def _loop_pool():
+    try:
+        return _pools.get(asyncio.get_running_loop())
+    except RuntimeError:        # no running loop
+        return None
+
+
+async def get_async_pool():
+    """The running event loop's aiomysql pool, created on first use."""
+    if aiomysql is None:
+        raise RuntimeError("The aiomysql driver needs aiomysql: pip install aiomysql")
+    loop = asyncio.get_running_loop()
+    if loop not in _pools:
+        lock = _pool_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            if loop not in _pools:
+                settings = {k: v for k, v in async_pool_config.items() if k != "driver"}
+                _pools[loop] = await aiomysql.create_pool(
+                    host=db_config["host"],
+                    port=db_config.get("port", 3306),
+                    user=db_config["user"],
+                    password=db_config["password"],
+                    db=db_config["database"],
+                    autocommit=False,
+                    **settings,
+                )
+    return _pools[loop]
+
+
+async def close_async_pool():
+    """Closes the running event loop's pool; the next async_connection() opens a new one."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+def async_pool_stats():
+    if async_driver() == "threads":
+        return dict(pool_stats(), driver="threads")
+    pool = _loop_pool()
+    if pool is None:
+        return {"driver": "aiomysql", "size": 0, "free": 0, "maxsize": async_pool_config["maxsize"]}
+    return {"driver": "aiomysql", "size": pool.size, "free": pool.freesize, "maxsize": pool.maxsize}
+
+
+class ThreadedCursor:
+    """Async facade over a DB-API cursor; every call runs in a worker thread."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def execute(self, sql, params=()):
+        await asyncio.to_thread(self._cursor.execute, sql, params)
+
+    async def executemany(self, sql, rows):
+        await asyncio.to_thread(self._cursor.executemany, sql, rows)
+
+    async def fetchone(self):
+        return self._cursor.fetchone()      # rows are already buffered client-side
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+
+class ThreadedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return ThreadedCursor(self._conn.cursor(buffered=True))
+
+    async def commit(self):
+        await asyncio.to_thread(self._conn.commit)
+
+    async def rollback(self):
+        await asyncio.to_thread(self._conn.rollback)
+
+
+@asynccontextmanager
+async def async_connection():
+    """
+    A pooled connection for the duration of the block.
+    An open transaction is rolled back if the block raises.
+    """
+    if async_driver() == "threads":
+        raw = await asyncio.to_thread(get_pool().acquire)
+        conn = ThreadedConnection(raw)
+        try:
+            yield conn
+        except BaseException:
+            await conn.rollback()
+            raise
+        finally:
+            raw.close()
+        return
+
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        try:
+            yield conn
+        except BaseException:
+            await conn.rollback()
+            raise
@@ -0,0 +1,338 @@
+from datetime import date, timedelta
+from db_connect import create_connection
+from queries import register
+from query_cache import invalidate
+from records import CustomerBalance
+
+# customer_balances holds the unpaid amount and the number of unpaid sales of every
+# customer; balance_totals holds the same sums over all customers, striped over
+# TOTAL_SLOTS rows by customer_id so concurrent writers rarely touch the same row.
+# receivables_daily holds the unpaid amount per customer and sale day, which is what
+# the aging report buckets; rows are deleted once settled, so it only holds open dues.
+# Every writer that creates a sale with an amount due (add_sale, add_sales_bulk,
+# place_order) or pays one off (payments.py) applies its delta in the same
+# transaction, so "total unpaid", "who owes us" and aging never scan the sales table.
+
+TOTAL_SLOTS = 16
+
+# Aging buckets as (label, first day, last day) of days outstanding; None = open ended.
+AGING_BUCKETS = (("0-30", 0, 30), ("31-60", 31, 60), ("61-90", 61, 90), ("90+", 91, None))
+# compact_receivables() folds dues older than the last bucket boundary into one row per
+# customer on this day, which every as-of date ages into the open-ended bucket.
+OLD_DUES_DAY = date(1970, 1, 1)
+SETTLED = 0.005
+
+BALANCE_UPSERT_SQL = register("balances.upsert", """
+    INSERT INTO customer_balances (customer_id, outstanding, open_sales)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        outstanding = outstanding + VALUES(outstanding),
+        open_sales = open_sales + VALUES(open_sales)
+""")
+TOTALS_UPSERT_SQL = register("balances.totals_upsert", """
+    INSERT INTO balance_totals (slot, outstanding, open_sales)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        outstanding = outstanding + VALUES(outstanding),
+        open_sales = open_sales + VALUES(open_sales)
+""")
+RECEIVABLES_UPSERT_SQL = register("balances.receivables_upsert", """
+    INSERT INTO receivables_daily (customer_id, day, outstanding)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE outstanding = outstanding + VALUES(outstanding)
+""")
+RECEIVABLES_SETTLED_SQL = register("balances.receivables_settled", f"""
+    DELETE FROM receivables_daily
+    WHERE customer_id = %s AND day = %s AND outstanding > -{SETTLED} AND outstanding < {SETTLED}
+""")
+TOTAL_UNPAID_SQL = register("balances.total_unpaid",
+                            "SELECT IFNULL(SUM(outstanding),0), IFNULL(SUM(open_sales),0) FROM balance_totals")
+CUSTOMER_BALANCE_SQL = register("balances.customer", """
+    SELECT b.customer_id, c.customer_name, b.outstanding, b.open_sales
+    FROM customer_balances b LEFT JOIN customers c ON b.customer_id = c.customer_id
+    WHERE b.customer_id = %s
+""")
+DEBTORS_SQL = register("balances.debtors", """
+    SELECT b.customer_id, c.customer_name, b.outstanding, b.open_sales
+    FROM customer_balances b LEFT JOIN customers c ON b.customer_id = c.customer_id
+    WHERE b.outstanding > 0
+    ORDER BY b.outstanding DESC
+    LIMIT %s
+""")
+AGING_ORDERS = ("total", "oldest")
+
+
+def balance_rows(deltas):
+    """
+    Turns (customer_id, sale_date, outstanding_delta, open_sales_delta) deltas into
+    (BALANCE_UPSERT_SQL rows, TOTALS_UPSERT_SQL rows, RECEIVABLES_UPSERT_SQL rows),
+    summed per key and sorted so concurrent writers lock balance rows in the same order.
+    Zero deltas are dropped, so fully paid sales don't touch the balances at all.
+    """
+    customers, slots, days = {}, {}, {}
+    for customer_id, sale_date, outstanding, open_sales in deltas:
+        if not outstanding and not open_sales:
+            continue
+        customer_id = customer_id or 0
+        for totals, key in ((customers, customer_id), (slots, customer_id % TOTAL_SLOTS)):
+            t = totals.setdefault(key, [0, 0])
+            t[0] += outstanding
+            t[1] += open_sales
+        days[(customer_id, sale_date)] = days.get((customer_id, sale_date), 0) + outstanding
+    return ([(key, round(t[0], 2), t[1]) for key, t in sorted(customers.items())],
+            [(key, round(t[0], 2), t[1]) for key, t in sorted(slots.items())],
+            [key + (round(amount, 2),) for key, amount in sorted(days.items()) if round(amount, 2)])
+
+
+def balance_statements(deltas):
+    """
+    [(sql, rows), ...] to executemany for the deltas (see balance_rows), ending with the
+    deletion of receivables_daily rows that payments settled. Shared with async_crud.
+    """
+    customer_rows, total_rows, day_rows = balance_rows(deltas)
+    statements = []
+    if customer_rows:
+        statements += [(BALANCE_UPSERT_SQL, customer_rows), (TOTALS_UPSERT_SQL, total_rows)]
+    if day_rows:
+        statements.append((RECEIVABLES_UPSERT_SQL, day_rows))
+        settled = [(customer_id, day) for customer_id, day, amount in day_rows if amount < 0]
+        if settled:
+            statements.append((RECEIVABLES_SETTLED_SQL, settled))
+    return statements
+
+
+def sale_deltas(sales):
+    """Balance deltas of new sales, given as sales_crud.SALE_INSERT_SQL value tuples."""
+    return [(sale[0], sale[3], float(sale[7] or 0), 1 if sale[7] and sale[7] > 0 else 0) for sale in sales]
+
+
+def apply_deltas(cursor, deltas):
+    """Applies (customer_id, sale_date, outstanding_delta, open_sales_delta) deltas inside the caller's transaction."""
+    for sql, rows in balance_statements(deltas):
+        cursor.executemany(sql, rows)
+
+
+def record_sales(cursor, sales):
+    """Adds the amounts due of new sales to the balances (see rollup.record_sales)."""
+    apply_deltas(cursor, sale_deltas(sales))
+
+
+def total_unpaid(cursor):
+    """(outstanding, open_sales) over all customers: a read of TOTAL_SLOTS rows."""
+    cursor.execute(TOTAL_UNPAID_SQL)
+    return tuple(cursor.fetchone())
+
+
+def customer_balance(cursor, customer_id):
+    """(customer_id, customer_name, outstanding, open_sales), or None if the customer owes nothing."""
+    cursor.execute(CUSTOMER_BALANCE_SQL, (customer_id,))
+    return cursor.fetchone()
+
+
+def top_debtors(cursor, limit=10):
+    """[(customer_id, customer_name, outstanding, open_sales), ...] largest balance first."""
+    cursor.execute(DEBTORS_SQL, (limit,))
+    return cursor.fetchall()
+
+
+def _bucket_columns(as_of):
+    """One SUM(CASE ...) column per AGING_BUCKETS entry over receivables_daily r, with its params."""
+    columns, params = [], []
+    for _, first, last in AGING_BUCKETS:
+        conditions = []
+        if first > 0:               # the first bucket also takes sales dated after as_of
+            conditions.append("r.day <= %s")
+            params.append(as_of - timedelta(days=first))
+        if last is not None:
+            conditions.append("r.day >= %s")
+            params.append(as_of - timedelta(days=last))
+        columns.append(f"IFNULL(SUM(CASE WHEN {' AND '.join(conditions)} THEN r.outstanding ELSE 0 END),0)")
+    return columns, params
+
+
+def aging_query(as_of=None, limit=None, order="total", customer_id=None):
+    """(sql, params) for aging(); shared with async_crud."""
+    if order not in AGING_ORDERS:
+        raise ValueError(f"Unknown aging order {order!r}; expected one of {AGING_ORDERS}")
+    columns, params = _bucket_columns(as_of or date.today())
+    where = ""
+    if customer_id is not None:
+        where = "WHERE r.customer_id = %s"
+        params.append(customer_id)
+    total_col = 3 + len(columns)
+    sort = f"{total_col} DESC" if order == "total" else f"{total_col - 1} DESC, {total_col} DESC"
+    sql = f"""
+        SELECT r.customer_id, c.customer_name, {", ".join(columns)}, SUM(r.outstanding)
+        FROM receivables_daily r LEFT JOIN customers c ON r.customer_id = c.customer_id
+        {where}
+        GROUP BY r.customer_id, c.customer_name
+        HAVING SUM(r.outstanding) > {SETTLED}
+        ORDER BY {sort}, r.customer_id
+    """
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, tuple(params)
+
+
+def aging(cursor, as_of=None, limit=None, order="total", customer_id=None):
+    """
+    [(customer_id, customer_name, <one amount per AGING_BUCKETS entry>, total), ...] of
+    the customers with open dues, aged by sale day as of `as_of` (default today).
+    order="total" puts the largest balances first, "oldest" the largest 90+ amounts.
+    """
+    cursor.execute(*aging_query(as_of, limit, order, customer_id))
+    return cursor.fetchall()
+
+
+def aging_totals_query(as_of=None):
+    columns, params = _bucket_columns(as_of or date.today())
+    return f"SELECT {', '.join(columns)}, IFNULL(SUM(r.outstanding),0) FROM receivables_daily r", tuple(params)
+
+
+def aging_totals(cursor, as_of=None):
+    """(<one amount per AGING_BUCKETS entry>, total) over all customers as of `as_of`."""
+    cursor.execute(*aging_totals_query(as_of))
+    return tuple(cursor.fetchone())
+
+
+def compact_receivables(cursor, as_of=None):
+    """
+    Folds the receivables_daily rows old enough to be in the open-ended bucket as of
+    `as_of` (default today) into one OLD_DUES_DAY row per customer, inside the caller's
+    transaction. The rows are locked first, so concurrent compactions don't double count.
+    Payments to a folded sale later land on its own day as a negative row, which still
+    sums into the same bucket. Returns the number of rows folded.
+    """
+    cutoff = (as_of or date.today()) - timedelta(days=AGING_BUCKETS[-1][1])
+    cursor.execute(
+        "SELECT customer_id, outstanding FROM receivables_daily WHERE day > %s AND day <= %s FOR UPDATE",
+        (OLD_DUES_DAY, cutoff)
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+    folded = {}
+    for customer_id, outstanding in rows:
+        folded[customer_id] = folded.get(customer_id, 0) + float(outstanding)
+    cursor.execute("DELETE FROM receivables_daily WHERE day > %s AND day <= %s", (OLD_DUES_DAY, cutoff))
+    day_rows = [(customer_id, OLD_DUES_DAY, round(amount, 2)) for customer_id, amount in sorted(folded.items())]
+    cursor.executemany(RECEIVABLES_UPSERT_SQL, day_rows)
+    cursor.executemany(RECEIVABLES_SETTLED_SQL, [(customer_id, day) for customer_id, day, _ in day_rows])
+    return len(rows)
+
+
+def compact_daily():
+    """
+    Runs compact_receivables() for today on its own connection. Scheduled once a day
+    (`python payments.py compact-aging` from cron); the aging readers never write.
+    Returns the number of rows folded.
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            folded = compact_receivables(conn.cursor(), date.today())
+            conn.commit()
+            return folded
+    except Exception as e:
+        print(f"Error in compact_receivables: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return 0
+
+
+def get_total_unpaid():
+    """Total amount due over all sales (None on error)."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            return total_unpaid(conn.cursor())[0]
+    except Exception as e:
+        print(f"Error in get_total_unpaid: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_customer_balance(customer_id):
+    """The customer's CustomerBalance (zero when nothing is due), or None on error."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            row = customer_balance(conn.cursor(), customer_id)
+            return CustomerBalance(*row) if row else CustomerBalance(customer_id, None, 0, 0)
+    except Exception as e:
+        print(f"Error in get_customer_balance: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_top_debtors(limit=10):
+    """The customers who owe the most, as CustomerBalance records (None on error)."""
+    if not isinstance(limit, int) or limit <= 0:
+        print("limit must be a positive integer")
+        return None
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            return CustomerBalance.from_rows(top_debtors(conn.cursor(), limit))
+    except Exception as e:
+        print(f"Error in get_top_debtors: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def rebuild_balances():
+    """
+    Recomputes customer_balances, balance_totals and receivables_daily from the sales
+    table in one transaction (after a restore, or to check for drift). Returns the total outstanding.
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM customer_balances")
+            cursor.execute("DELETE FROM balance_totals")
+            cursor.execute("""
+                INSERT INTO customer_balances (customer_id, outstanding, open_sales)
+                SELECT IFNULL(customer_id, 0), SUM(amount_due), COUNT(*)
+                FROM sales
+                WHERE amount_due > 0
+                GROUP BY IFNULL(customer_id, 0)
+            """)
+            cursor.execute(f"""
+                INSERT INTO balance_totals (slot, outstanding, open_sales)
+                SELECT customer_id % {TOTAL_SLOTS}, SUM(outstanding), SUM(open_sales)
+                FROM customer_balances
+                GROUP BY customer_id % {TOTAL_SLOTS}
+            """)
+            cursor.execute("DELETE FROM receivables_daily")
+            cursor.execute("""
+                INSERT INTO receivables_daily (customer_id, day, outstanding)
+                SELECT IFNULL(customer_id, 0), sale_date, SUM(amount_due)
+                FROM sales
+                WHERE amount_due > 0
+                GROUP BY IFNULL(customer_id, 0), sale_date
+            """)
+            outstanding, open_sales = total_unpaid(cursor)
+            conn.commit()
+            invalidate("customer_balances")
+            print(f"Balances rebuilt: {outstanding} outstanding over {open_sales} unpaid sales.")
+            return outstanding
+    except Exception as e:
+        print(f"Error in rebuild_balances: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
@@ -0,0 +1,107 @@
+"""
+Concurrency benchmark for sales_crud.add_sale.
+
+N sellers hammer one material at the same time. Afterwards the script asserts that
+stock never went negative and that stock + sold units still add up, then prints throughput.
+
+    python bench_concurrent_sales.py --sellers 20 --sales-per-seller 10 --stock 150
+"""
+import argparse
+import threading
+import time
+
+from db_connect import configure_pool, create_connection, pool_stats
+from sales_crud import add_sale
+
+BENCH_ITEM = "__bench_concurrent_item__"
+BENCH_CUSTOMER = "__bench_concurrent_customer__"
+
+
+def setup(stock):
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO customers (customer_name, phone, address) VALUES (%s, %s, %s)",
+            (BENCH_CUSTOMER, "0000000000", "bench")
+        )
+        customer_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO materials (item_name, price_per_unit, unit_type, quantity_in_stock) VALUES (%s, %s, %s, %s)",
+            (BENCH_ITEM, 1.0, "piece", stock)
+        )
+        item_id = cursor.lastrowid
+        conn.commit()
+        return customer_id, item_id
+    finally:
+        conn.close()
+
+
+def teardown(customer_id, item_id):
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT quantity_in_stock FROM materials WHERE id=%s", (item_id,))
+        final_stock = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*), IFNULL(SUM(quantity),0) FROM sales WHERE item_id=%s", (item_id,))
+        sale_rows, sold_units = cursor.fetchone()
+        cursor.execute("DELETE FROM sales WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM stock_movements WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM stock_snapshot_items WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM materials WHERE id=%s", (item_id,))
+        cursor.execute("DELETE FROM customers WHERE customer_id=%s", (customer_id,))
+        conn.commit()
+        return final_stock, sale_rows, int(sold_units)
+    finally:
+        conn.close()
+
+
+def run(sellers, sales_per_seller, stock):
+    configure_pool(pool_size=sellers + 1)
+    customer_id, item_id = setup(stock)
+    successes = []
+    lock = threading.Lock()
+    start_gate = threading.Barrier(sellers)
+
+    def seller():
+        start_gate.wait()
+        done = 0
+        for _ in range(sales_per_seller):
+            if add_sale(customer_id, item_id, 1, 1.0) is not None:
+                done += 1
+        with lock:
+            successes.append(done)
+
+    threads = [threading.Thread(target=seller) for _ in range(sellers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    final_stock, sale_rows, sold_units = teardown(customer_id, item_id)
+    sold = sum(successes)
+    attempts = sellers * sales_per_seller
+
+    assert final_stock >= 0, f"stock went negative: {final_stock}"
+    assert sold == sale_rows == sold_units, f"{sold} successful calls but {sale_rows} sale rows"
+    assert final_stock + sold_units == stock, f"{final_stock} left + {sold_units} sold != {stock}"
+    assert sold == min(stock, attempts), f"expected {min(stock, attempts)} sales, got {sold}"
+
+    print(f"\n{sellers} sellers x {sales_per_seller} attempts on one item (stock {stock})")
+    print(f"sold {sold}, rejected {attempts - sold}, final stock {final_stock}: OK")
+    print(f"{attempts / elapsed:.0f} add_sale calls/s, {sold / elapsed:.0f} sales/s in {elapsed:.2f}s")
+    print(f"pool: {pool_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--sales-per-seller", type=int, default=10)
+    parser.add_argument("--stock", type=int, default=150)
+    args = parser.parse_args()
+    run(args.sellers, args.sales_per_seller, args.stock)
+
+if __name__ == "__main__":
+    main()
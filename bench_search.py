@@ -0,0 +1,117 @@
+"""
+Search benchmark: LIKE '%name%' against the trigram index (and optionally FULLTEXT).
+
+Seeds N synthetic materials, runs the same queries through each path and prints the
+average latency per query. The seeded rows are removed afterwards.
+
+    python bench_search.py --rows 50000 --queries 200 --fulltext
+"""
+import argparse
+import random
+import time
+
+from bulk_ops import chunked
+from db_connect import create_connection
+import search_index
+
+BENCH_PREFIX = "__bench_search__"
+WORDS = ["Cement", "Sand", "Brick", "Steel", "Rod", "Tile", "Marble", "Granite", "Gravel",
+         "Pipe", "Paint", "Putty", "Plywood", "Glass", "Wire", "Beam", "Slab", "Block"]
+BRANDS = ["Apex", "Shree", "Tata", "Jindal", "Kajaria", "Asian", "Birla", "Ambuja", "Astral", "Supreme"]
+SIZES = ["6mm", "8mm", "10mm", "12mm", "20kg", "25kg", "50kg", "1L", "4L", "20L", "2x2", "4x8"]
+
+
+def make_names(rows, rng):
+    return [f"{BENCH_PREFIX} {rng.choice(BRANDS)} {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(SIZES)}"
+            for _ in range(rows)]
+
+
+def make_queries(count, rng):
+    """Half exact fragments, half with one letter dropped (typos)."""
+    queries = []
+    for n in range(count):
+        word = rng.choice(WORDS).lower()
+        if n % 2:
+            cut = rng.randrange(1, len(word) - 1)
+            word = word[:cut] + word[cut + 1:]
+        queries.append(word)
+    return queries
+
+
+def seed(names):
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        for chunk in chunked(names, 5000):
+            cursor.executemany(
+                "INSERT INTO materials (item_name, price_per_unit, unit_type, quantity_in_stock) VALUES (%s, 1, 'piece', 1)",
+                [(name,) for name in chunk]
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def cleanup():
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM materials WHERE item_name LIKE %s", (f"{BENCH_PREFIX}%",))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def like_search(cursor, query):
+    cursor.execute("SELECT id, item_name FROM materials WHERE item_name LIKE %s LIMIT %s",
+                   (f"%{query}%", search_index.DEFAULT_LIMIT))
+    return cursor.fetchall()
+
+
+def timed(label, queries, search):
+    hits = 0
+    started = time.perf_counter()
+    for query in queries:
+        hits += 1 if search(query) else 0
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {elapsed / len(queries) * 1000:8.3f} ms/query   {hits}/{len(queries)} queries matched")
+
+
+def run(rows, queries_count, fulltext):
+    rng = random.Random(7)
+    queries = make_queries(queries_count, rng)
+    seed(make_names(rows, rng))
+    try:
+        started = time.perf_counter()
+        search_index.refresh_index("materials")
+        print(f"\nTrigram index over {len(search_index.get_index('materials'))} materials built in "
+              f"{time.perf_counter() - started:.2f}s")
+
+        conn = create_connection()
+        try:
+            cursor = conn.cursor()
+            timed("LIKE", queries, lambda q: like_search(cursor, q))
+        finally:
+            conn.close()
+        timed("trigram", queries, lambda q: search_index.search("materials", q))
+        if fulltext:
+            search_index.set_backend("fulltext")
+            try:
+                timed("fulltext", queries, lambda q: search_index.search("materials", q))
+            finally:
+                search_index.set_backend("trigram")
+    finally:
+        cleanup()
+        search_index.mark_stale("materials")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--fulltext", action="store_true", help="Also time the MySQL FULLTEXT backend (needs migration 0005)")
+    args = parser.parse_args()
+    run(args.rows, args.queries, args.fulltext)
+
+if __name__ == "__main__":
+    main()
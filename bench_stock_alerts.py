@@ -0,0 +1,131 @@
+"""
+Latency benchmark for stock_alerts: from add_sale() being called to the alert arriving
+at a channel.
+
+Each round restocks a bench item to just above its threshold and sells one unit, which
+crosses the threshold. A CallbackChannel timestamps the alert, so the latency covers the
+sale transaction, the hand-off to the alert thread, the threshold and cool-down checks,
+the alert log insert and delivery. Add --channel to deliver through a real channel as well
+(e.g. --channel file:/tmp/alerts.jsonl or --channel webhook:http://localhost:9000/hook).
+
+    python bench_stock_alerts.py --rounds 500
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import threading
+import time
+
+import stock_alerts
+from db_connect import create_connection
+from sales_crud import add_sale
+
+BENCH_ITEM = "__bench_alert_item__"
+BENCH_CUSTOMER = "__bench_alert_customer__"
+THRESHOLD = 10
+
+
+def setup():
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO customers (customer_name, phone, address) VALUES (%s, %s, %s)",
+            (BENCH_CUSTOMER, "0000000000", "bench")
+        )
+        customer_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO materials (item_name, price_per_unit, unit_type, quantity_in_stock) VALUES (%s, %s, %s, %s)",
+            (BENCH_ITEM, 1.0, "piece", THRESHOLD + 1)
+        )
+        item_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    stock_alerts.set_threshold(item_id, THRESHOLD, cooldown=0)
+    return customer_id, item_id
+
+
+def restock(item_id):
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE materials SET quantity_in_stock = %s WHERE id = %s", (THRESHOLD + 1, item_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def teardown(customer_id, item_id):
+    conn = create_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM stock_alerts WHERE item_id=%s", (item_id,))
+        logged = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM stock_alerts WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM stock_thresholds WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM sales WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM stock_movements WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM stock_snapshot_items WHERE item_id=%s", (item_id,))
+        cursor.execute("DELETE FROM materials WHERE id=%s", (item_id,))
+        cursor.execute("DELETE FROM customers WHERE customer_id=%s", (customer_id,))
+        conn.commit()
+        return logged
+    finally:
+        conn.close()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run(rounds, channel_spec=None):
+    received = threading.Event()
+    arrivals = []
+
+    def on_alert(alert):
+        arrivals.append(time.perf_counter())
+        received.set()
+
+    channels = [stock_alerts.CallbackChannel(on_alert)]
+    if channel_spec:
+        channels.insert(0, stock_alerts.channel_from_spec(channel_spec))
+    stock_alerts.set_channels(channels)
+    customer_id, item_id = setup()
+
+    sale_ms, alert_ms, missed = [], [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(rounds):
+            restock(item_id)
+            received.clear()
+            started = time.perf_counter()
+            add_sale(customer_id, item_id, 1, 1.0, amount_paid=1.0, amount_due=0.0, payment_status="Paid")
+            sale_ms.append((time.perf_counter() - started) * 1000)
+            if not received.wait(5):
+                missed += 1
+                continue
+            alert_ms.append((arrivals[-1] - started) * 1000)
+
+    logged = teardown(customer_id, item_id)
+    assert missed == 0, f"{missed} of {rounds} crossings raised no alert"
+    assert logged == rounds, f"{rounds} crossings but {logged} alerts logged"
+
+    print(f"\n{rounds} threshold crossings on one item (threshold {THRESHOLD})")
+    print(f"{'':>24}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for label, values in (("add_sale returned (ms)", sale_ms), ("alert delivered (ms)", alert_ms)):
+        print(f"{label:>24}" + "".join(f"{v:>9.2f}" for v in (
+            statistics.median(values), percentile(values, 95), percentile(values, 99), max(values))))
+    print(f"engine: {stock_alerts.get_engine().stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--channel", help="Also deliver through this channel (stock_alerts spec)")
+    args = parser.parse_args()
+    run(args.rounds, args.channel)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Benchmark suite for the hot paths, on a deterministic synthetic shop (synthetic_data.py).
+
+Loads a shop of the chosen scale into an empty database, times every benchmark in
+BENCHMARKS and prints p50/p95/p99 per benchmark. "Queries/Call" is the number of SQL
+statements one call runs (from queries.py), which catches an N+1 before it shows up
+as latency. --json writes the results together with the commit, the backend and the
+data set. --compare checks the run against an earlier file. It exits with status 1
+when a p50 got slower by more than --tolerance (and by at least --min-delta-ms).
+
+    python bench_suite.py --scale small --json bench.json                 # embedded SQLite, in memory
+    python bench_suite.py --scale shop --sqlite-path shop.db --json new.json --compare bench.json
+    BMM_DB_NAME=bench python bench_suite.py --backend mysql --scale shop    # an empty MySQL database
+    python bench_suite.py --sqlite-path shop.db --reuse --only add_sale,list_sales
+
+Read benchmarks run before the write benchmarks, so every version reads the same data.
+With --reuse the data already in the database is used as it is.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import db_connect
+import migrate
+import queries
+import stock_alerts
+import synthetic_data
+from analytics import get_aging_totals, get_receivables_aging, get_revenue_period, get_sales_by_day, get_top_customers
+from customers_crud import find_customers, list_customers_page
+from dashboard import show_dashboard
+from forecast import get_reorder_points
+from materials_crud import find_materials, get_low_stock, list_materials_page
+from orders import place_order
+from records import BenchmarkResult
+from render import print_table
+from sales_crud import add_sale, add_sales_bulk, list_sales_page
+from stock_journal import get_movements, get_stock_at
+
+DEFAULT_ROUNDS = 50
+WARMUP_ROUNDS = 3
+MAX_SECONDS = 20            # per benchmark; fewer rounds are run when it takes longer
+DEFAULT_TOLERANCE = 0.25    # a p50 more than 25% above the baseline is a regression ...
+DEFAULT_MIN_DELTA_MS = 0.5  # ... if it also grew by this much (sub-millisecond paths are noisy)
+DEEP_PAGE = 20
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def shop_context():
+    """Id ranges and the last sale day of whatever data is in the database."""
+    conn = db_connect.create_connection()
+    if not conn:
+        raise RuntimeError("No database connection available.")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT (SELECT MIN(customer_id) FROM customers), (SELECT MAX(customer_id) FROM customers), "
+                       "(SELECT MIN(id) FROM materials), (SELECT MAX(id) FROM materials), "
+                       "(SELECT MAX(sale_date) FROM sales), (SELECT COUNT(*) FROM sales)")
+        first_customer, last_customer, first_item, last_item, last_day, sales = cursor.fetchone()
+    finally:
+        conn.close()
+    if first_customer is None or first_item is None:
+        raise RuntimeError("The database has no customers or materials to benchmark against.")
+    return {
+        "customers": (first_customer, last_customer),
+        "items": (first_item, last_item),
+        "end": last_day or date.today(),
+        "sales": sales,
+    }
+
+
+# Each factory gets the shop context and a seeded Random and returns the call to time.
+
+def bench_add_sale(ctx, rng):
+    def run():
+        add_sale(rng.randint(*ctx["customers"]), rng.randint(*ctx["items"]), 1, 10.0,
+                 amount_paid=10.0, amount_due=0.0, payment_status="Paid")
+    return run
+
+
+def bench_add_sales_bulk(ctx, rng):
+    def run():
+        rows = [(rng.randint(*ctx["customers"]), rng.randint(*ctx["items"]), 1, 10.0) for _ in range(100)]
+        add_sales_bulk(rows)
+    return run
+
+
+def bench_place_order(ctx, rng):
+    def run():
+        items = rng.sample(range(ctx["items"][0], ctx["items"][1] + 1), min(5, ctx["items"][1] - ctx["items"][0] + 1))
+        place_order(rng.randint(*ctx["customers"]), [(item, 1, 10.0) for item in items])
+    return run
+
+
+def bench_list_sales_deep(ctx, rng):
+    token = None
+    for _ in range(DEEP_PAGE):
+        _, next_token = list_sales_page(token, 50)
+        token = next_token or token
+    return lambda: list_sales_page(token, 50)
+
+
+def bench_revenue_period(ctx, rng):
+    end = ctx["end"]
+    return lambda: get_revenue_period(end - timedelta(days=364), end)
+
+
+def bench_stock_at(ctx, rng):
+    as_of = ctx["end"] - timedelta(days=30)
+    return lambda: get_stock_at(as_of)
+
+
+def bench_movements(ctx, rng):
+    return lambda: get_movements(rng.randint(*ctx["items"]), 50)
+
+
+def bench_show_dashboard(days):
+    def factory(ctx, rng):
+        return lambda: show_dashboard(20, days)
+    return factory
+
+
+# (name, factory, writes)
+BENCHMARKS = [
+    ("list_sales", lambda ctx, rng: lambda: list_sales_page(None, 50), False),
+    ("list_sales_deep", bench_list_sales_deep, False),
+    ("list_materials", lambda ctx, rng: lambda: list_materials_page(None, 50), False),
+    ("list_customers", lambda ctx, rng: lambda: list_customers_page(None, 50), False),
+    ("sales_by_day", lambda ctx, rng: lambda: get_sales_by_day(30), False),
+    ("revenue_period", bench_revenue_period, False),
+    ("top_customers", lambda ctx, rng: lambda: get_top_customers(10), False),
+    ("receivables_aging", lambda ctx, rng: lambda: get_receivables_aging(limit=20), False),
+    ("aging_totals", lambda ctx, rng: get_aging_totals, False),
+    ("show_dashboard", bench_show_dashboard(0), False),
+    ("show_dashboard_30d", bench_show_dashboard(30), False),
+    ("find_materials", lambda ctx, rng: lambda: find_materials(rng.choice(("cement", "steel rod", "tile"))), False),
+    ("find_materials_typo", lambda ctx, rng: lambda: find_materials(rng.choice(("cemnt", "brik", "plywod"))), False),
+    ("find_customers", lambda ctx, rng: lambda: find_customers(rng.choice(("kumar", "sharma traders", "priya"))), False),
+    ("low_stock", lambda ctx, rng: lambda: get_low_stock(100), False),
+    ("reorder_points", lambda ctx, rng: get_reorder_points, False),
+    ("stock_at", bench_stock_at, False),
+    ("stock_history", bench_movements, False),
+    ("add_sale", bench_add_sale, True),
+    ("place_order", bench_place_order, True),
+    ("add_sales_bulk_100", bench_add_sales_bulk, True),
+]
+
+
+def run_benchmark(name, factory, ctx, rounds, seed):
+    """Times `rounds` calls (after WARMUP_ROUNDS untimed ones) and returns the summary dict."""
+    rng = random.Random(f"{seed}:{name}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        call = factory(ctx, rng)
+        for _ in range(WARMUP_ROUNDS):
+            call()
+        queries.reset_query_stats()
+        samples = []
+        deadline = time.perf_counter() + MAX_SECONDS
+        for _ in range(rounds):
+            started = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started) * 1000)
+            if time.perf_counter() > deadline:
+                break
+    statements = sum(s["calls"] for s in queries.query_stats().values())
+    return {
+        "rounds": len(samples),
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "queries_per_call": round(statements / len(samples), 2),
+    }
+
+
+def git_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    BenchmarkResult records of `results` against `baseline` (both {name: summary}) and the
+    names whose p50 grew by more than `tolerance` and by at least `min_delta_ms`.
+    """
+    rows, regressions = [], []
+    for name, r in results.items():
+        base = baseline.get(name, {}).get("p50_ms")
+        change = None
+        if base:
+            change = r["p50_ms"] / base - 1
+            if change > tolerance and r["p50_ms"] - base >= min_delta_ms:
+                regressions.append(name)
+        rows.append(BenchmarkResult(name, r["rounds"], r["p50_ms"], r["p95_ms"], r["p99_ms"], r["max_ms"],
+                                    r["queries_per_call"], base,
+                                    None if change is None else f"{change:+.0%}"))
+    return rows, regressions
+
+
+def prepare_database(args):
+    """Points db_connect at the chosen backend, migrates it and loads the shop unless --reuse."""
+    if args.backend == "sqlite":
+        db_connect.configure_backend("sqlite", path=args.sqlite_path)
+    else:
+        db_connect.configure_backend("mysql")
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate.migrate()
+    if args.reuse:
+        return None
+    ctx_probe = None
+    with contextlib.suppress(RuntimeError):
+        ctx_probe = shop_context()
+    if ctx_probe and ctx_probe["sales"]:
+        raise SystemExit("The database already has sales; use an empty one or pass --reuse.")
+    sizes = dict(synthetic_data.SCALES[args.scale])
+    shop = synthetic_data.generate(end=args.end, seed=args.seed, **sizes)
+    loaded = synthetic_data.load(shop)
+    print(f"Loaded {loaded}")
+    return dict(sizes, seed=args.seed, start=shop["start"].isoformat(), end=shop["end"].isoformat(),
+                load_seconds=loaded["load_seconds"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=db_connect.BACKENDS, default="sqlite")
+    parser.add_argument("--sqlite-path", default=":memory:", help="SQLite database file (default: in memory)")
+    parser.add_argument("--scale", choices=synthetic_data.SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=synthetic_data.DEFAULT_SEED)
+    parser.add_argument("--end", type=date.fromisoformat, default=None,
+                        help="Last sale day of the generated shop (default: today)")
+    parser.add_argument("--reuse", action="store_true", help="Benchmark the data already in the database")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--only", help="Comma-separated benchmark names (or prefixes)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    args = parser.parse_args()
+
+    stock_alerts.set_channels([])
+    dataset = prepare_database(args)
+    ctx = shop_context()
+    selected = BENCHMARKS
+    if args.only:
+        wanted = [w.strip() for w in args.only.split(",") if w.strip()]
+        selected = [b for b in BENCHMARKS if any(b[0].startswith(w) for w in wanted)]
+
+    results = {}
+    for name, factory, _ in sorted(selected, key=lambda b: b[2]):     # reads first
+        results[name] = run_benchmark(name, factory, ctx, args.rounds, args.seed)
+        print(f"{name:<22} p50 {results[name]['p50_ms']:>9.3f} ms", file=sys.stderr)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    rows, regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    print_table(rows, BenchmarkResult, floatfmt=".3f")
+
+    if args.json:
+        report = {
+            "version": git_version(),
+            "run_at": datetime.now().isoformat(timespec="seconds"),
+            "backend": db_connect.db_backend,
+            "sqlite_version": sqlite3.sqlite_version if db_connect.db_backend == "sqlite" else None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "dataset": dataset or {"reused": True, "sales": ctx["sales"]},
+            "rounds": args.rounds,
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+    if regressions:
+        print(f"Slower than {args.compare} by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
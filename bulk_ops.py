@@ -0,0 +1,101 @@
+from itertools import islice
+from db_connect import create_connection
+from query_cache import invalidate
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def chunked(iterable, size):
+    """Yields lists of up to `size` items without materialising the whole iterable."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_chunk(chunk, validate, start):
+    """
+    One validation pass over a chunk.
+    validate(row) returns (values, error); rows with an error are collected with their
+    input index instead of being written.
+    """
+    good, errors = [], []
+    for offset, row in enumerate(chunk):
+        try:
+            values, error = validate(row)
+        except Exception as e:       # one bad row is reported, never stops the import
+            values, error = None, f"Malformed row: {e!r}"
+        if error:
+            errors.append((start + offset, error))
+        else:
+            good.append((start + offset, values))
+    return good, errors
+
+
+def insert_many(sql):
+    """Returns a writer for run_chunked() that inserts every row of a chunk with one executemany."""
+    def write(cursor, good):
+        cursor.executemany(sql, [values for _, values in good])
+        return []
+    return write
+
+
+def run_chunked(label, rows, validate, write, chunk_size=DEFAULT_CHUNK_SIZE, tables=(), count="inserted"):
+    """
+    Validates and writes `rows` in chunks, one transaction per chunk.
+
+    write(cursor, good) writes the validated (index, values) pairs and returns a list of
+    (index, error) for rows it rejected itself. If a chunk fails as a whole (e.g. a
+    foreign key violation in one row) it is rolled back and retried row by row so only
+    the offending rows are reported.
+
+    `tables` are invalidated in the query cache once anything was written.
+
+    Returns {count: n, "errors": [(index, message), ...]}, count naming what the writer
+    does ("inserted" by default).
+    """
+    result = {count: 0, "errors": []}
+    conn = None
+    try:
+        conn = create_connection()
+        if not conn:
+            result["errors"].append((None, "No database connection."))
+            return result
+        cursor = conn.cursor()
+        start = 0
+        for chunk in chunked(rows, chunk_size):
+            good, errors = validate_chunk(chunk, validate, start)
+            result["errors"].extend(errors)
+            start += len(chunk)
+            if not good:
+                continue
+            try:
+                rejected = write(cursor, good)
+                conn.commit()
+                result[count] += len(good) - len(rejected)
+                result["errors"].extend(rejected)
+            except Exception:
+                conn.rollback()
+                for index, values in good:
+                    try:
+                        rejected = write(cursor, [(index, values)])
+                        conn.commit()
+                        result[count] += 1 - len(rejected)
+                        result["errors"].extend(rejected)
+                    except Exception as e:
+                        conn.rollback()
+                        result["errors"].append((index, str(e)))
+    except Exception as e:
+        print(f"Database error during {label}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+        if result[count] and tables:
+            invalidate(*tables)
+
+    print(f"{label}: {result[count]} rows {count}, {len(result['errors'])} rejected.")
+    return result
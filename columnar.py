@@ -0,0 +1,433 @@
+"""
+Optional in-memory columnar analytics engine over the sales fact table.
+
+The sales rows (day, item, customer, quantity, money columns, payment method) are
+loaded once into NumPy arrays and kept current by tailing order_no: a refresh asks
+for MAX(order_no) and fetches only the rows added since the last one. Sales commit out
+of order_no order, so order_nos missing below the newest loaded one are remembered as
+gaps and fetched again by later refreshes until their sale commits (or GAP_TIMEOUT
+passes: a rolled-back sale never arrives). Item and
+customer names are kept as small lookup tables. Questions are answered with boolean
+masks and np.bincount group-bys, without a database round trip.
+
+    import columnar
+    columnar.set_engine("columnar")     # analytics/popular_items use it (or BMM_ANALYTICS_ENGINE=columnar)
+
+    store = columnar.get_store()
+    store.daily_revenue(start=date(2025, 1, 1), payment_method="UPI")
+    store.group("customer", "amount_due", item_id=[1, 2])
+    store.frame(customer_id=7)          # pandas DataFrame of the matching sales
+
+Tailing only sees new sales. Writers that change existing sales rows call
+mark_dirty(order_nos) (payments: the next query re-reads the paid/due amounts of those
+rows) or mark_stale() (the next query reloads everything); edits from other processes
+are picked up by the periodic full reload (reload_after seconds).
+"""
+import os
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+from db_connect import create_connection
+from query_cache import cache
+
+ENGINES = ("sql", "columnar")
+MEASURES = ("total", "quantity", "amount_paid", "amount_due", "count")
+DIMENSIONS = ("day", "item", "customer", "payment_method")
+
+MAX_ORDER_SQL = "SELECT MAX(order_no) FROM sales"
+SALES_TAIL_SQL = """
+    SELECT order_no, sale_date, item_id, customer_id, quantity, total, amount_paid, amount_due, payment_method
+    FROM sales WHERE order_no > %s ORDER BY order_no
+"""
+ITEM_NAMES_SQL = "SELECT id, item_name FROM materials"
+CUSTOMER_NAMES_SQL = "SELECT customer_id, customer_name FROM customers"
+SALES_AMOUNTS_SQL = "SELECT order_no, amount_paid, amount_due FROM sales WHERE order_no IN ({placeholders})"
+SALES_GAPS_SQL = """
+    SELECT order_no, sale_date, item_id, customer_id, quantity, total, amount_paid, amount_due, payment_method
+    FROM sales WHERE order_no IN ({placeholders}) ORDER BY order_no
+"""
+
+FETCH_BATCH = 50000
+DIRTY_BATCH = 1000
+GAP_WINDOW = 20000          # order_nos below the newest loaded one watched for late commits
+GAP_TIMEOUT = 1800.0        # seconds before a missing order_no is taken as rolled back
+_INT_COLUMNS = ("order_no", "day", "item_id", "customer_id", "quantity", "payment")
+_FLOAT_COLUMNS = ("total", "amount_paid", "amount_due")
+
+_engine = os.environ.get("BMM_ANALYTICS_ENGINE", "sql")
+_store = None
+_store_lock = threading.Lock()
+
+
+class NameTable:
+    """id -> name lookup as an array, with equal names sharing one code (SQL GROUP BY name semantics)."""
+
+    def __init__(self, rows=()):
+        self.names = {row_id: name for row_id, name in rows}
+        self.labels = sorted(set(self.names.values()))
+        label_codes = {label: code for code, label in enumerate(self.labels)}
+        size = max(self.names, default=0) + 2
+        self.codes = np.full(size, -1, dtype=np.int32)        # slot 0 is "no id" (NULL / -1)
+        for row_id, name in self.names.items():
+            self.codes[row_id + 1] = label_codes[name]
+
+    def lookup(self, ids):
+        """Name code for each id; -1 for NULL or unknown ids (dropped like an inner JOIN would)."""
+        ids = np.where((ids < 0) | (ids >= len(self.codes) - 1), -1, ids)
+        return self.codes[ids + 1]
+
+    def knows(self, ids):
+        known = ids[ids >= 0]
+        return bool(np.all(np.isin(known, np.fromiter(self.names, dtype=np.int64, count=len(self.names)))))
+
+
+class SalesColumns:
+    """
+    The sales table as growable column arrays.
+    Every query calls refresh() to pick up new rows; queries see a consistent prefix.
+    With live=False the store holds only the rows given to append() and never reads the database.
+    """
+
+    def __init__(self, max_lag=1.0, reload_after=900.0, live=True):
+        self.max_lag = max_lag              # seconds a query may serve without checking for new sales
+        self.reload_after = reload_after    # seconds between full reloads (edits by other processes)
+        self.live = live
+        self._lock = threading.RLock()
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._reset()
+
+    def _reset(self):
+        self._cols = {name: np.empty(0, dtype=np.int64) for name in _INT_COLUMNS}
+        self._cols.update({name: np.empty(0, dtype=np.float64) for name in _FLOAT_COLUMNS})
+        self._n = 0
+        self.payment_methods = []
+        self._payment_codes = {}
+        self.items = NameTable()
+        self.customers = NameTable()
+        self._last_order_no = 0
+        self._gaps = {}                     # missing order_no -> monotonic time first missed
+        self._stale = False
+        self._loaded_at = time.monotonic()
+        self._refreshed_at = None
+        self._versions = None
+
+    def __len__(self):
+        return self._n
+
+    # Loading
+
+    def _payment_code(self, method):
+        code = self._payment_codes.get(method)
+        if code is None:
+            code = self._payment_codes[method] = len(self.payment_methods)
+            self.payment_methods.append(method)
+        return code
+
+    def append(self, rows):
+        """
+        Appends sales rows (order_no, sale_date, item_id, customer_id, quantity, total,
+        amount_paid, amount_due, payment_method) in order_no order. Rows below the loaded
+        tail (late commits) are merged into place in new arrays, so the views a running
+        query holds never change under it.
+        """
+        if not rows:
+            return
+        order_no, days, items, customers, qty, total, paid, due, methods = zip(*rows)
+        batch = {
+            "order_no": np.array(order_no, dtype=np.int64),
+            "day": np.fromiter((d.toordinal() for d in days), dtype=np.int64, count=len(rows)),
+            "item_id": np.array([-1 if v is None else v for v in items], dtype=np.int64),
+            "customer_id": np.array([-1 if v is None else v for v in customers], dtype=np.int64),
+            "quantity": np.array([v or 0 for v in qty], dtype=np.int64),
+            "payment": np.array([self._payment_code(m) for m in methods], dtype=np.int64),
+            "total": np.array([v or 0 for v in total], dtype=np.float64),
+            "amount_paid": np.array([v or 0 for v in paid], dtype=np.float64),
+            "amount_due": np.array([v or 0 for v in due], dtype=np.float64),
+        }
+        n, size = self._n, self._n + len(rows)
+        late = n > 0 and batch["order_no"][0] <= self._cols["order_no"][n - 1]
+        if late or size > len(self._cols["order_no"]):
+            capacity = max(size, 2 * len(self._cols["order_no"]), 1024)
+            for name, column in self._cols.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:n] = column[:n]
+                self._cols[name] = grown
+        for name, values in batch.items():
+            self._cols[name][n:size] = values
+        if late:
+            start = int(np.searchsorted(self._cols["order_no"][:n], batch["order_no"][0]))
+            order = np.argsort(self._cols["order_no"][start:size], kind="stable")
+            for column in self._cols.values():
+                column[start:size] = column[start:size][order]
+        self._n = size
+        self._last_order_no = max(self._last_order_no, int(order_no[-1]))
+
+    def _track_gaps(self, before, now):
+        """Remembers the order_nos missing between `before` and the newest loaded one (within GAP_WINDOW)."""
+        low = max(before, self._last_order_no - GAP_WINDOW)
+        if self._last_order_no - low <= 0:
+            return
+        loaded = self._cols["order_no"][:self._n]
+        tail = loaded[int(np.searchsorted(loaded, low, side="right")):]
+        if len(tail) < self._last_order_no - low:
+            missing = np.setdiff1d(np.arange(low + 1, self._last_order_no + 1), tail, assume_unique=True)
+            for order_no in missing.tolist():
+                self._gaps.setdefault(order_no, now)
+
+    def _fill_gaps(self, cursor, now):
+        """
+        Loads the gap sales that have committed since and forgets gaps older than
+        GAP_TIMEOUT. Returns the lowest order_no loaded, or None.
+        """
+        self._gaps = {order_no: seen for order_no, seen in self._gaps.items() if now - seen < GAP_TIMEOUT}
+        gaps, lowest = sorted(self._gaps), None
+        for start in range(0, len(gaps), DIRTY_BATCH):
+            batch = gaps[start:start + DIRTY_BATCH]
+            cursor.execute(SALES_GAPS_SQL.format(placeholders=", ".join(["%s"] * len(batch))), tuple(batch))
+            rows = cursor.fetchall()
+            if rows:
+                self.append(rows)
+                lowest = rows[0][0] if lowest is None else lowest
+                for row in rows:
+                    del self._gaps[row[0]]
+        return lowest
+
+    def set_names(self, items, customers):
+        """(id, name) rows of materials and customers."""
+        self.items = NameTable(items)
+        self.customers = NameTable(customers)
+
+    def mark_stale(self):
+        self._stale = True
+
+    def mark_dirty(self, order_nos):
+        """Sales whose amount_paid / amount_due changed: re-read on the next refresh."""
+        with self._dirty_lock:
+            self._dirty.update(order_nos)
+
+    def _take_dirty(self):
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        return sorted(dirty)
+
+    def update_amounts(self, rows):
+        """Overwrites amount_paid / amount_due of loaded sales from (order_no, paid, due) rows."""
+        loaded = self._cols["order_no"][:self._n]
+        for order_no, paid, due in rows:
+            slot = int(np.searchsorted(loaded, order_no))     # order_no is ascending
+            if slot < self._n and loaded[slot] == order_no:
+                self._cols["amount_paid"][slot] = float(paid or 0)
+                self._cols["amount_due"][slot] = float(due or 0)
+
+    def refresh(self, force=False):
+        """
+        Brings the arrays up to date with the database: tails new order_nos, re-reads
+        the amounts of mark_dirty() sales, reloads everything after mark_stale(), a truncate,
+        or reload_after seconds, and reloads the name tables when materials/customers
+        were written. Returns True if it checked.
+        """
+        if not self.live:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            versions = tuple(cache.version(t) for t in ("sales", "materials", "customers"))
+            if (not force and not self._stale and not self._dirty and self._refreshed_at is not None
+                    and versions == self._versions and now - self._refreshed_at < self.max_lag):
+                return False
+            conn = create_connection()
+            if not conn:
+                raise RuntimeError("No database connection available.")
+            try:
+                cursor = conn.cursor()
+                dirty = self._take_dirty()
+                if self._stale or now - self._loaded_at > self.reload_after:
+                    self._reset()
+                cursor.execute(MAX_ORDER_SQL)
+                newest = cursor.fetchone()[0] or 0
+                if newest < self._last_order_no:
+                    self._reset()           # table truncated or rows deleted
+                first_new = self._n
+                before = self._last_order_no
+                dirty = [n for n in dirty if n <= self._last_order_no]     # newer rows come with the tail
+                for start in range(0, len(dirty), DIRTY_BATCH):
+                    batch = dirty[start:start + DIRTY_BATCH]
+                    cursor.execute(SALES_AMOUNTS_SQL.format(placeholders=", ".join(["%s"] * len(batch))),
+                                   tuple(batch))
+                    self.update_amounts(cursor.fetchall())
+                if newest > self._last_order_no:
+                    cursor.execute(SALES_TAIL_SQL, (self._last_order_no,))
+                    while True:
+                        rows = cursor.fetchmany(FETCH_BATCH)
+                        if not rows:
+                            break
+                        self.append(rows)
+                filled = self._fill_gaps(cursor, now)
+                if filled is not None:
+                    first_new = min(first_new, int(np.searchsorted(self._cols["order_no"][:self._n], filled)))
+                self._track_gaps(before, now)
+                names_changed = self._versions is None or versions[1:] != self._versions[1:]
+                cols = self.columns()
+                if (names_changed or not self.items.knows(cols["item_id"][first_new:])
+                        or not self.customers.knows(cols["customer_id"][first_new:])):
+                    cursor.execute(ITEM_NAMES_SQL)
+                    items = cursor.fetchall()
+                    cursor.execute(CUSTOMER_NAMES_SQL)
+                    self.set_names(items, cursor.fetchall())
+                conn.commit()       # end the read snapshot before the connection goes back to the pool
+            finally:
+                conn.close()
+            self._versions = versions
+            self._refreshed_at = now
+            return True
+
+    # Queries
+
+    def columns(self):
+        """Views of the loaded rows, one array per column."""
+        with self._lock:
+            n = self._n
+            return {name: column[:n] for name, column in self._cols.items()}
+
+    def mask(self, cols, start=None, end=None, item_id=None, customer_id=None, payment_method=None):
+        """Boolean row mask for the filters; item_id, customer_id and payment_method take one value or a list."""
+        keep = np.ones(len(cols["order_no"]), dtype=bool)
+        if start is not None:
+            keep &= cols["day"] >= start.toordinal()
+        if end is not None:
+            keep &= cols["day"] <= end.toordinal()
+        if item_id is not None:
+            keep &= np.isin(cols["item_id"], np.atleast_1d(item_id))
+        if customer_id is not None:
+            keep &= np.isin(cols["customer_id"], np.atleast_1d(customer_id))
+        if payment_method is not None:
+            codes = [self._payment_codes.get(m, -2) for m in np.atleast_1d(payment_method)]
+            keep &= np.isin(cols["payment"], codes)
+        return keep
+
+    def _keys(self, cols, dimension):
+        if dimension == "day":
+            return cols["day"], None
+        if dimension == "item":
+            return self.items.lookup(cols["item_id"]), self.items.labels
+        if dimension == "customer":
+            return self.customers.lookup(cols["customer_id"]), self.customers.labels
+        if dimension == "payment_method":
+            return cols["payment"], self.payment_methods
+        raise ValueError(f"Unknown dimension {dimension!r}; expected one of {DIMENSIONS}")
+
+    def group(self, dimension, measure="total", limit=None, **filters):
+        """
+        [(key, value), ...] summed per dimension value over the filtered sales, largest first.
+        dimension: day, item, customer or payment_method; measure: total, quantity,
+        amount_paid, amount_due or count. Filters as in mask().
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure!r}; expected one of {MEASURES}")
+        self.refresh()
+        cols = self.columns()
+        keep = self.mask(cols, **filters)
+        keys, labels = self._keys(cols, dimension)
+        keep &= keys >= 0
+        keys = keys[keep]
+        if not len(keys):
+            return []
+        offset = int(keys.min())
+        weights = None if measure == "count" else cols[measure][keep]
+        sums = np.bincount(keys - offset, weights=weights)
+        present = np.nonzero(np.bincount(keys - offset))[0]
+        order = present[np.argsort(-sums[present], kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        as_int = measure in ("quantity", "count")
+        result = []
+        for slot in order:
+            key = int(slot) + offset
+            label = date.fromordinal(key) if labels is None else labels[key]
+            value = int(sums[slot]) if as_int else round(float(sums[slot]), 2)
+            result.append((label, value))
+        return result
+
+    def daily_revenue(self, start=None, end=None, **filters):
+        """[(day, revenue), ...] newest first (as rollup.daily_revenue)."""
+        return sorted(self.group("day", "total", start=start, end=end, **filters), reverse=True)
+
+    def period_totals(self, start=None, end=None, **filters):
+        """(revenue, amount_paid, amount_due) summed over [start, end] (as rollup.period_totals)."""
+        self.refresh()
+        cols = self.columns()
+        keep = self.mask(cols, start=start, end=end, **filters)
+        return tuple(round(float(cols[name][keep].sum()), 2) for name in ("total", "amount_paid", "amount_due"))
+
+    def top_items(self, start=None, end=None, limit=5, **filters):
+        """[(item_name, total_sold), ...] by quantity (as rollup.top_items)."""
+        return self.group("item", "quantity", limit=limit, start=start, end=end, **filters)
+
+    def top_customers(self, start=None, end=None, limit=5, **filters):
+        """[(customer_name, revenue), ...] by revenue (as rollup.top_customers)."""
+        return self.group("customer", "total", limit=limit, start=start, end=end, **filters)
+
+    def frame(self, **filters):
+        """pandas DataFrame of the matching sales, with item and customer names."""
+        import pandas as pd
+        self.refresh()
+        cols = self.columns()
+        keep = self.mask(cols, **filters)
+        item_codes = self.items.lookup(cols["item_id"][keep])
+        customer_codes = self.customers.lookup(cols["customer_id"][keep])
+        item_labels = np.array(self.items.labels + [None], dtype=object)
+        customer_labels = np.array(self.customers.labels + [None], dtype=object)
+        methods = np.array(self.payment_methods + [None], dtype=object)
+        return pd.DataFrame({
+            "order_no": cols["order_no"][keep],
+            "sale_date": [date.fromordinal(int(d)) for d in cols["day"][keep]],
+            "item_id": cols["item_id"][keep],
+            "item_name": item_labels[item_codes],
+            "customer_id": cols["customer_id"][keep],
+            "customer_name": customer_labels[customer_codes],
+            "quantity": cols["quantity"][keep],
+            "total": cols["total"][keep],
+            "amount_paid": cols["amount_paid"][keep],
+            "amount_due": cols["amount_due"][keep],
+            "payment_method": methods[cols["payment"][keep]],
+        })
+
+    def memory_bytes(self):
+        return sum(column[:self._n].nbytes for column in self._cols.values())
+
+
+def get_store():
+    """The shared SalesColumns (loaded on first use)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SalesColumns()
+    return _store
+
+
+def mark_stale():
+    """Called by writers that change existing sales rows: the next query reloads the arrays."""
+    if _store is not None:
+        _store.mark_stale()
+
+
+def mark_dirty(order_nos):
+    """Called by writers that change the paid/due amounts of existing sales (payments.py)."""
+    if _store is not None and order_nos:
+        _store.mark_dirty(order_nos)
+
+
+def set_engine(name):
+    global _engine
+    if name not in ENGINES:
+        raise ValueError(f"Unknown analytics engine: {name} (expected one of {', '.join(ENGINES)})")
+    _engine = name
+
+
+def enabled():
+    """True when analytics should be answered by the columnar store instead of SQL."""
+    return _engine == "columnar"
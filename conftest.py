@@ -0,0 +1,28 @@
+import os
+import shutil
+import tempfile
+
+import db_connect
+import migrate
+
+# Stock alerts are switched on per test (stock_alerts.AlertEngine with a CallbackChannel).
+os.environ.setdefault("BMM_ALERT_CHANNELS", "")
+
+_tmpdir = None
+
+
+def pytest_configure(config):
+    # The suite runs on a throwaway SQLite file (WAL mode, default isolation, like a shop's
+    # database) unless BMM_DB_BACKEND=mysql points it at a MySQL server (which must
+    # already have the schema).
+    global _tmpdir
+    if os.environ.get("BMM_DB_BACKEND", "sqlite") == "sqlite":
+        _tmpdir = tempfile.mkdtemp(prefix="bmm-tests-")
+        db_connect.configure_backend("sqlite", path=os.path.join(_tmpdir, "test.db"))
+        migrate.migrate()
+
+
+def pytest_unconfigure(config):
+    if _tmpdir:
+        db_connect.get_pool().close_all()
+        shutil.rmtree(_tmpdir, ignore_errors=True)
@@ -1,23 +1,47 @@
 from db_connect import create_connection
+from queries import register
+from query_cache import invalidate
+from bulk_ops import DEFAULT_CHUNK_SIZE, insert_many, run_chunked
+from pagination import DEFAULT_PAGE_SIZE, decode_token, page_result
+from records import Customer
+from render import print_pages, print_table
+import search_index
 import re
 
+PHONE_PATTERN = re.compile(r"^\d{10}$")
+CUSTOMERS_PAGE_SQL = register("customers.page", (
+    "SELECT customer_id, customer_name, phone, address FROM customers "
+    "WHERE customer_id > %s ORDER BY customer_id LIMIT %s"
+))
+CUSTOMER_INSERT_SQL = register(
+    "customers.insert", "INSERT INTO customers (customer_name, phone, address) VALUES (%s, %s, %s)"
+)
+CUSTOMER_DELETE_SQL = register("customers.delete", "DELETE FROM customers WHERE customer_id=%s")
+
+
+def validate_customer(name, phone):
+    """Returns an error message for an invalid name/phone, or None if both are fine."""
+    if not name or not name.strip():
+        return "Customer name cannot be empty."
+    if not isinstance(phone, str) or not PHONE_PATTERN.match(phone):
+        return "Phone number must be exactly 10 digits."
+    return None
+
+
 def add_customer(name, phone, address):
-    if not name.strip():
-        print("Error: Customer name cannot be empty.")
-        return
-    if not re.match(r"^\d{10}$", phone):
-        print("Error: Phone number must be exactly 10 digits.")
+    error = validate_customer(name, phone)
+    if error:
+        print(f"Error: {error}")
         return
     conn = None
     try:
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO customers (customer_name, phone, address) VALUES (%s, %s, %s)",
-                (name, phone, address)
-            )
+            cursor.execute(CUSTOMER_INSERT_SQL, (name, phone, address))
             conn.commit()
+            invalidate("customers")
+            search_index.index_row("customers", cursor.lastrowid, name)
             print(f"Customer added: {name}")
     except Exception as e:
         print(f"Database error during add_customer: {e}")
@@ -28,26 +52,61 @@ def add_customer(name, phone, address):
             conn.close()
 
 
-def list_customers():
+def list_customers_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of customers ordered by customer_id, as (Customer records, next_token).
+    Pass next_token back to get the following page; it is None on the last page.
+    Returns None on a database error (not an empty last page).
+    """
     conn = None
     try:
+        after = decode_token(token)[0] if token else 0
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT customer_id, customer_name, phone, address FROM customers")
-            rows = cursor.fetchall()
-            print("ID | Name       | Phone       | Address")
-            print("--------------------------------------------")
-            for row in rows:
-                print(row)
+            cursor.execute(CUSTOMERS_PAGE_SQL, (after, page_size + 1))
+            return page_result(Customer.from_rows(cursor.fetchall()), page_size,
+                               key=lambda row: [row.customer_id])
     except Exception as e:
-        print(f"Database error during list_customers: {e}")
+        print(f"Database error during list_customers_page: {e}")
     finally:
         if conn:
             conn.close()
+    return None
+
+def list_customers(page_size=DEFAULT_PAGE_SIZE):
+    """Prints all customers, one page-sized table at a time."""
+    print_pages(list_customers_page, Customer, page_size)
+
+def add_customers_bulk(customers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Inserts many customers using executemany, one transaction per chunk.
+    Each row is (name, phone, address) or a dict with those keys.
+    Returns {"inserted": n, "errors": [(row_index, message), ...]}.
+    """
+    def validate(row):
+        if isinstance(row, dict):
+            name, phone, address = row["name"], row["phone"], row.get("address")
+        else:
+            name, phone, address = row
+        error = validate_customer(name, phone)
+        return (name, phone, address), error
+
+    result = run_chunked(
+        "add_customers_bulk",
+        customers,
+        validate,
+        insert_many(CUSTOMER_INSERT_SQL),
+        chunk_size,
+        tables=("customers",),
+    )
+    if result["inserted"]:
+        search_index.mark_stale("customers")
+    return result
+
 
 def update_customer(customer_id, name=None, phone=None, address=None):
-    if phone is not None and not re.match(r"^\d{10}$", phone):
+    if phone is not None and not PHONE_PATTERN.match(phone):
         print("Error: Phone number must be exactly 10 digits.")
         return
     if name is not None and not name.strip():
@@ -77,6 +136,9 @@ def update_customer(customer_id, name=None, phone=None, address=None):
             values.append(customer_id)
             cursor.execute(query, tuple(values))
             conn.commit()
+            invalidate("customers")
+            if name:
+                search_index.index_row("customers", customer_id, name)
             print(f"Customer {customer_id} updated.")
     except Exception as e:
         print(f"Database error during update_customer: {e}")
@@ -92,8 +154,10 @@ def delete_customer(customer_id):
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM customers WHERE customer_id=%s", (customer_id,))
+            cursor.execute(CUSTOMER_DELETE_SQL, (customer_id,))
             conn.commit()
+            invalidate("customers")
+            search_index.remove_row("customers", customer_id)
             print(f"Customer {customer_id} deleted.")
     except Exception as e:
         print(f"Database error during delete_customer: {e}")
@@ -103,23 +167,29 @@ def delete_customer(customer_id):
         if conn:
             conn.close()
 
-def search_customer(name):
+def find_customers(name, limit=search_index.DEFAULT_LIMIT):
+    """Customers whose name matches `name`, best match first (typos tolerated), as Customer records."""
     conn = None
     try:
+        matches = search_index.search("customers", name, limit)
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT customer_id, customer_name, phone, address FROM customers WHERE customer_name LIKE %s", (f"%{name}%",))
-            rows = cursor.fetchall()
-            print("ID | Name       | Phone       | Address")
-            print("--------------------------------------------")
-            for row in rows:
-                print(row)
+            return Customer.from_rows(
+                search_index.fetch_ranked(cursor, "customers", "customer_id, customer_name, phone, address", matches)
+            )
     except Exception as e:
-        print(f"Database error during search_customer: {e}")
+        print(f"Database error during find_customers: {e}")
     finally:
         if conn:
             conn.close()
+    return []
+
+def search_customer(name, limit=search_index.DEFAULT_LIMIT):
+    """Prints and returns the customers found by find_customers()."""
+    rows = find_customers(name, limit)
+    print_table(rows, Customer, empty_message=f"No customers found matching: {name}")
+    return rows
 
 if __name__ == "__main__":
     add_customer("Amit Kumar", "9991122334", "Delhi")
@@ -1,93 +1,163 @@
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from db_connect import create_connection
+from queries import print_profile, register
 from tabulate import tabulate
 from datetime import date, timedelta
+from records import AgingTotals, ItemSales
+from render import print_table, to_dicts
+import balances
+import rollup
 
-from datetime import date, timedelta
+# All entity counts and the low-stock count in a single round trip.
+COUNTS_SQL = register("dashboard.counts", """
+    SELECT
+        (SELECT COUNT(*) FROM customers),
+        (SELECT COUNT(*) FROM suppliers),
+        (SELECT COUNT(*) FROM materials),
+        (SELECT COUNT(*) FROM materials WHERE quantity_in_stock <= %s)
+""")
 
-def show_dashboard(low_stock_threshold=20, last_n_days=0):
-    """Prints a summary dashboard with counts, revenue, unpaid, low stock, and top items."""
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="dashboard")
+    return _executor
+
+
+class DashboardSummary:
+    """Dashboard metrics as data, shared by the CLI, the Streamlit app and any API."""
+
+    __slots__ = ("customers", "suppliers", "materials", "total_revenue", "total_unpaid",
+                 "low_stock_count", "low_stock_threshold", "last_n_days", "top_items", "aging")
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def as_dict(self):
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values["top_items"] = to_dicts(self.top_items or [])
+        values["aging"] = self.aging.as_dict() if self.aging else None
+        return values
+
+    def __repr__(self):
+        return f"DashboardSummary({self.as_dict()})"
+
+
+def _query_counts(cursor, low_stock_threshold):
+    cursor.execute(COUNTS_SQL, (low_stock_threshold,))
+    return cursor.fetchone()
+
+
+def _on_own_connection(query, *args):
+    conn = create_connection()
+    if not conn:
+        raise RuntimeError("No database connection available.")
+    try:
+        return query(conn.cursor(), *args)
+    finally:
+        conn.close()
+
+
+def get_dashboard(low_stock_threshold=20, last_n_days=0, parallel=True):
+    """
+    Computes the dashboard metrics and returns a DashboardSummary (None on error).
+
+    Independent queries: entity/low-stock counts (one combined SELECT), revenue/unpaid
+    totals and top items (both from the daily rollup), today's receivables aging
+    buckets and, for all time, the unpaid total (both from balances.py). With parallel=True they run at the
+    same time on separate pooled connections, so the refresh takes as long as the
+    slowest query rather than the sum of all of them.
+    """
+    since = date.today() - timedelta(days=last_n_days) if last_n_days and last_n_days > 0 else None
+    tasks = [
+        (_query_counts, (low_stock_threshold,)),
+        (rollup.period_totals, (since,)),
+        (rollup.top_items, (since,)),
+        (balances.aging_totals, ()),
+    ]
+    if since is None:
+        tasks.append((balances.total_unpaid, ()))
     conn = None
     try:
-        conn = create_connection()
-        if conn:
+        if parallel:
+            futures = [_get_executor().submit(_on_own_connection, query, *args) for query, args in tasks]
+            counts, totals, top_items, aging, *unpaid = [f.result() for f in futures]
+        else:
+            conn = create_connection()
+            if not conn:
+                return None
             cursor = conn.cursor()
-
-            # Total counts
-            cursor.execute("SELECT COUNT(*) FROM customers")
-            customer_count = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM suppliers")
-            supplier_count = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM materials")
-            material_count = cursor.fetchone()[0]
-
-            # Compute filter date if needed
-            if last_n_days and last_n_days > 0:
-                since = date.today() - timedelta(days=last_n_days)
-                cursor.execute("SELECT IFNULL(SUM(total),0) FROM sales WHERE sale_date >= %s", (since,))
-                total_revenue = cursor.fetchone()[0]
-                cursor.execute("SELECT IFNULL(SUM(amount_due),0) FROM sales WHERE amount_due > 0 AND sale_date >= %s", (since,))
-                unpaid_amount = cursor.fetchone()[0]
-            else:
-                cursor.execute("SELECT IFNULL(SUM(total),0) FROM sales")
-                total_revenue = cursor.fetchone()[0]
-                cursor.execute("SELECT IFNULL(SUM(amount_due),0) FROM sales WHERE amount_due > 0")
-                unpaid_amount = cursor.fetchone()[0]
-
-            # Low stock count
-            cursor.execute("SELECT COUNT(*) FROM materials WHERE quantity_in_stock <= %s", (low_stock_threshold,))
-            low_stock_count = cursor.fetchone()[0]
-
-            # Top-selling items (apply same date filter if provided)
-            if last_n_days and last_n_days > 0:
-                cursor.execute("""
-                    SELECT m.item_name, SUM(s.quantity) as total_sold
-                    FROM sales s JOIN materials m ON s.item_id = m.id
-                    WHERE s.sale_date >= %s
-                    GROUP BY m.item_name
-                    ORDER BY total_sold DESC
-                    LIMIT 5
-                """, (since,))
-            else:
-                cursor.execute("""
-                    SELECT m.item_name, SUM(s.quantity) as total_sold
-                    FROM sales s JOIN materials m ON s.item_id = m.id
-                    GROUP BY m.item_name
-                    ORDER BY total_sold DESC
-                    LIMIT 5
-                """)
-            popular_items = cursor.fetchall()
-
-            print("\n===== Business Dashboard Summary =====")
-            print(tabulate([
-                ["Customers", customer_count],
-                ["Suppliers", supplier_count],
-                ["Materials", material_count],
-                ["Total Revenue", total_revenue],
-                ["Total Unpaid", unpaid_amount],
-                [f"Low Stock Items (≤{low_stock_threshold})", low_stock_count]
-            ], headers=["Metric", "Value"], tablefmt="grid"))
-            print("\nTop 5 Selling Items:")
-            if popular_items:
-                print(tabulate(popular_items, headers=["Item", "Total Sold"], tablefmt="grid"))
-            else:
-                print("No sales data available.")
+            counts, totals, top_items, aging, *unpaid = [query(cursor, *args) for query, args in tasks]
     except Exception as e:
         print(f"Error generating dashboard: {e}")
+        return None
     finally:
         if conn:
             conn.close()
 
+    customers, suppliers, materials, low_stock_count = counts
+    total_revenue, _, total_unpaid = totals
+    if unpaid:
+        total_unpaid = unpaid[0][0]
+    return DashboardSummary(
+        customers=customers,
+        suppliers=suppliers,
+        materials=materials,
+        total_revenue=total_revenue,
+        total_unpaid=total_unpaid,
+        low_stock_count=low_stock_count,
+        low_stock_threshold=low_stock_threshold,
+        last_n_days=last_n_days,
+        top_items=ItemSales.from_rows(top_items),
+        aging=AgingTotals(*aging),
+    )
+
+
+def render_dashboard(summary):
+    """Prints a DashboardSummary as tables."""
+    print("\n===== Business Dashboard Summary =====")
+    print(tabulate([
+        ["Customers", summary.customers],
+        ["Suppliers", summary.suppliers],
+        ["Materials", summary.materials],
+        ["Total Revenue", summary.total_revenue],
+        ["Total Unpaid", summary.total_unpaid],
+        [f"Low Stock Items (≤{summary.low_stock_threshold})", summary.low_stock_count]
+    ], headers=["Metric", "Value"], tablefmt="grid"))
+    print("\nTop 5 Selling Items:")
+    print_table(summary.top_items, ItemSales, empty_message="No sales data available.")
+    if summary.aging:
+        print("\nReceivables Aging (days outstanding):")
+        print_table([summary.aging], AgingTotals, floatfmt=".2f")
+
+
+def show_dashboard(low_stock_threshold=20, last_n_days=0):
+    """Prints a summary dashboard with counts, revenue, unpaid, low stock, and top items."""
+    summary = get_dashboard(low_stock_threshold, last_n_days)
+    if summary:
+        render_dashboard(summary)
+    return summary
+
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--threshold", type=int, default=20, help="Low stock threshold")
     parser.add_argument("--days", type=int, default=0, help="Limit sales totals to last N days (0 = all time)")
+    parser.add_argument("--profile", action="store_true", help="Print the slowest queries afterwards")
     args = parser.parse_args()
 
     show_dashboard(low_stock_threshold=args.threshold, last_n_days=args.days)
+    if args.profile:
+        print_profile()
 
 if __name__ == "__main__":
     main()
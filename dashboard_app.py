@@ -1,18 +1,102 @@
 import streamlit as st
-import pandas as pd
-from db_connect import create_connection
-from customers_crud import add_customer, list_customers
-from suppliers_crud import add_supplier, list_suppliers
-from materials_crud import add_material, show_low_stock
-from sales_crud import add_sale, list_sales
+from customers_crud import add_customer, list_customers_page
+from suppliers_crud import add_supplier, list_suppliers_page
+from materials_crud import add_material, get_low_stock, list_materials_page
+from sales_crud import add_sale, list_sales_page
+from analytics import get_aging_totals, get_receivables_aging, get_sales_by_day, get_top_customers
+from balances import AGING_ORDERS
+from dashboard import get_dashboard
+from query_cache import cached, cache_stats
+from records import (AgingTotals, Customer, CustomerAging, CustomerRevenue, DailyRevenue, ItemSales, LowStockItem,
+                     Material, Sale, Supplier)
+from render import to_dataframe
+
+def paged_table(name, fetch_page, record_type, tables=None):
+    """
+    Shows one keyset page of a table with Previous/Next buttons.
+    The tokens of the pages seen so far are kept in the session so Previous works;
+    each page is cached per token, and writers invalidate it like any other read.
+    """
+    page_size = st.selectbox("Rows per page", (25, 50, 100, 250), index=1, key=f"{name}:size")
+    tokens = st.session_state.setdefault(f"{name}:tokens", [None])
+    if st.session_state.get(f"{name}:size_seen") != page_size:
+        tokens[:] = [None]
+        st.session_state[f"{name}:size_seen"] = page_size
+    token = tokens[-1]
+    page = cached(f"{name}:page:{token}:{page_size}", tables or [name], lambda: fetch_page(token, page_size))
+    if page is None:
+        st.error("Could not load this page from the database.")
+        return
+    rows, next_token = page
+    st.write(to_dataframe(rows, record_type))
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    info_col.caption(f"Page {len(tokens)}")
+    if prev_col.button("Previous", key=f"{name}:prev", disabled=len(tokens) == 1):
+        tokens.pop()
+        st.rerun()
+    if next_col.button("Next", key=f"{name}:next", disabled=next_token is None):
+        tokens.append(next_token)
+        st.rerun()
+
 
 st.title("Building Material Management Dashboard")
 
 menu = st.sidebar.selectbox(
     "Choose Action",
-    ("Add Customer", "Add Supplier", "Add Material", "Make Sale", "Show Customers", "Show Suppliers", "Show Materials", "Show Low Stock", "Show Sales")
+    ("Dashboard", "Sales Analytics", "Receivables Aging", "Add Customer", "Add Supplier", "Add Material", "Make Sale", "Show Customers", "Show Suppliers", "Show Materials", "Show Low Stock", "Show Sales")
 )
 
+if menu == "Dashboard":
+    threshold = st.number_input("Low stock threshold", min_value=1, value=20, step=1)
+    days = st.number_input("Last N days (0 = all time)", min_value=0, value=0, step=1)
+    summary = cached(
+        f"dashboard:{int(threshold)}:{int(days)}",
+        ["customers", "suppliers", "materials", "sales"],
+        lambda: get_dashboard(int(threshold), int(days)),
+    )
+    if summary:
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Customers", summary.customers)
+        c2.metric("Suppliers", summary.suppliers)
+        c3.metric("Materials", summary.materials)
+        c1.metric("Total Revenue", f"{summary.total_revenue:,.2f}")
+        c2.metric("Total Unpaid", f"{summary.total_unpaid:,.2f}")
+        c3.metric(f"Low Stock (≤{summary.low_stock_threshold})", summary.low_stock_count)
+        st.subheader("Top 5 Selling Items")
+        st.table(to_dataframe(summary.top_items, ItemSales))
+        st.subheader("Receivables Aging")
+        st.table(to_dataframe([summary.aging], AgingTotals))
+    else:
+        st.error("Could not load the dashboard.")
+
+if menu == "Sales Analytics":
+    days = st.number_input("Last N days", min_value=1, value=30, step=1)
+    daily = cached(f"analytics:daily:{int(days)}", ["sales"], lambda: get_sales_by_day(int(days)))
+    top = cached("analytics:top_customers:5", ["sales", "customers"], lambda: get_top_customers(5))
+    if daily is None or top is None:
+        st.error("Could not load the analytics.")
+    else:
+        st.subheader("Revenue per day")
+        st.bar_chart(to_dataframe(daily, DailyRevenue, titles=False).set_index("day"))
+        st.subheader("Top 5 Customers")
+        st.table(to_dataframe(top, CustomerRevenue))
+
+if menu == "Receivables Aging":
+    order = st.radio("Sort by", AGING_ORDERS, horizontal=True,
+                     format_func=lambda o: "Largest balance" if o == "total" else "Oldest dues (90+)")
+    limit = st.number_input("Customers (0 = all)", min_value=0, value=100, step=50)
+    tables = ["sales", "customers", "customer_balances"]
+    totals = cached("aging:totals", tables, get_aging_totals)
+    rows = cached(f"aging:{order}:{int(limit)}", tables,
+                  lambda: get_receivables_aging(limit=int(limit) or None, order=order))
+    if totals is None or rows is None:
+        st.error("Could not load the aging report.")
+    else:
+        cols = st.columns(len(AgingTotals.HEADERS))
+        for col, title, value in zip(cols, AgingTotals.HEADERS, totals):
+            col.metric(title, f"{value:,.2f}")
+        st.dataframe(to_dataframe(rows, CustomerAging), use_container_width=True)
+
 if menu == "Add Customer":
     name = st.text_input("Customer name")
     phone = st.text_input("Phone")
@@ -49,30 +133,29 @@ if menu == "Make Sale":
         st.success("Sale recorded!")
 
 if menu == "Show Customers":
-    conn = create_connection()
-    df = pd.read_sql("SELECT * FROM customers", conn)
-    st.write(df)
-    conn.close()
+    paged_table("customers", list_customers_page, Customer)
 
 if menu == "Show Suppliers":
     st.write("All suppliers:")
-    list_suppliers()
+    paged_table("suppliers", list_suppliers_page, Supplier)
 
 if menu == "Show Materials":
-    import pandas as pd
-    from db_connect import create_connection
-    conn = create_connection()
-    df = pd.read_sql("SELECT * FROM materials", conn)
-    st.write(df)
-    conn.close()
+    paged_table("materials", list_materials_page, Material)
 
 if menu == "Show Low Stock":
     threshold = st.number_input("Stock threshold", min_value=1, step=1)
     if st.button("Show Low Stock"):
-        st.write(show_low_stock(threshold))
+        st.write(to_dataframe(get_low_stock(threshold), LowStockItem))
 
 if menu == "Show Sales":
     st.write("All sales:")
-    list_sales()
+    paged_table("sales", list_sales_page, Sale, ["sales", "customers", "materials"])
+
+stats = cache_stats()
+st.sidebar.markdown("**Query cache**")
+st.sidebar.caption(
+    f"hits {stats['hits']} · misses {stats['misses']} · "
+    f"hit rate {stats['hit_rate']:.0%} · entries {stats['entries']}"
+)
     
     
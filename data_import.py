@@ -0,0 +1,349 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime, date
+
+from bulk_ops import chunked
+from db_connect import create_connection
+from materials_crud import add_materials_bulk, update_prices_bulk
+from sales_crud import add_sales_bulk
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+# ---------- parse ----------
+
+def read_rows(path, skip=0):
+    """
+    Streams (row_number, row_dict) from a CSV or Parquet file, row_number starting at 1.
+    Rows up to `skip` are read past without being yielded (used when resuming).
+    """
+    if path.lower().endswith(".parquet"):
+        yield from _read_parquet(path, skip)
+        return
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            if row_number > skip:
+                yield row_number, row
+
+
+def _read_parquet(path, skip):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet files need pyarrow: pip install pyarrow")
+    row_number = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=DEFAULT_BATCH_SIZE):
+        if row_number + batch.num_rows <= skip:
+            row_number += batch.num_rows
+            continue
+        for row in batch.to_pylist():
+            row_number += 1
+            if row_number > skip:
+                yield row_number, row
+
+
+# ---------- foreign-key lookup ----------
+
+class LookupIndex:
+    """
+    In-memory name -> id map for one table (names compared case-insensitively).
+    load() reads the table once; refresh() only picks up rows with a higher id,
+    e.g. materials inserted earlier in the same import.
+    """
+
+    def __init__(self, table, id_column, name_column):
+        self.table = table
+        self.id_column = id_column
+        self.name_column = name_column
+        self._ids = {}
+        self._max_id = 0
+
+    def load(self):
+        self._ids = {}
+        self._max_id = 0
+        self.refresh()
+        return self
+
+    def refresh(self):
+        conn = create_connection()
+        if not conn:
+            raise RuntimeError(f"Could not load {self.table} lookup: no database connection")
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {self.id_column}, {self.name_column} FROM {self.table} "
+                f"WHERE {self.id_column} > %s ORDER BY {self.id_column}",
+                (self._max_id,)
+            )
+            for row_id, name in cursor:
+                self._ids.setdefault(_key(name), row_id)
+                self._max_id = row_id
+        finally:
+            conn.close()
+
+    def get(self, name):
+        return self._ids.get(_key(name))
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def _key(name):
+    return str(name).strip().lower() if name is not None else ""
+
+
+# ---------- validate + map ----------
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_int(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return int(float(value)) if "." in value else int(value)
+    return int(value)
+
+
+def _to_float(value):
+    return None if _blank(value) else float(value)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+
+def _resolve(row, id_field, name_field, index, label):
+    if not _blank(row.get(id_field)):
+        return _to_int(row[id_field])
+    if _blank(row.get(name_field)):
+        return None
+    found = index.get(row[name_field])
+    if found is None:
+        raise LookupError(f"Unknown {label} '{row[name_field]}'")
+    return found
+
+
+def map_catalogue_rows(rows, suppliers, rejects):
+    """Converts price-list rows to add_materials_bulk dicts, resolving supplier names."""
+    for row_number, row in rows:
+        try:
+            yield row_number, {
+                "item_name": str(row["item_name"]).strip(),
+                "price_per_unit": float(row["price_per_unit"]),
+                "unit_type": row.get("unit_type") or "quintal",
+                "quantity": 0 if _blank(row.get("quantity")) else _to_int(row["quantity"]),
+                "supplier_id": _resolve(row, "supplier_id", "supplier_name", suppliers, "supplier"),
+            }
+        except (KeyError, ValueError, TypeError, LookupError) as e:
+            rejects.add(row_number, row, _message(e))
+
+
+def map_sales_rows(rows, customers, materials, rejects):
+    """Converts ledger rows to add_sales_bulk dicts, resolving customer and item names."""
+    for row_number, row in rows:
+        try:
+            customer_id = _resolve(row, "customer_id", "customer_name", customers, "customer")
+            item_id = _resolve(row, "item_id", "item_name", materials, "item")
+            yield row_number, {
+                "customer_id": customer_id,
+                "item_id": item_id,
+                "quantity": _to_int(row["quantity"]),
+                "total": float(row["total"]),
+                "payment_method": row.get("payment_method") or "Cash",
+                "amount_paid": _to_float(row.get("amount_paid")),
+                "amount_due": _to_float(row.get("amount_due")),
+                "payment_status": row.get("payment_status") or "Pending",
+                "sale_date": None if _blank(row.get("sale_date")) else _to_date(row["sale_date"]),
+            }
+        except (KeyError, ValueError, TypeError, LookupError) as e:
+            rejects.add(row_number, row, _message(e))
+
+
+def _message(e):
+    return f"Missing column {e}" if isinstance(e, KeyError) else str(e)
+
+
+# ---------- checkpoints and rejects ----------
+
+class Checkpoint:
+    """
+    Remembers how many source rows of a file have been committed, in <file>.checkpoint.json,
+    and how long the reject log was at that point. The file's size and mtime are stored
+    too, so a changed file is never resumed.
+    """
+
+    def __init__(self, path):
+        self.path = path + ".checkpoint.json"
+        stat = os.stat(path)
+        self._signature = {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def load(self):
+        """(rows_done, reject log size in bytes) of the last run, (0, None) if there is none to resume."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0, None
+        if state.get("size") != self._signature["size"] or state.get("mtime") != self._signature["mtime"]:
+            return 0, None
+        return state.get("rows_done", 0), state.get("rejects_size")
+
+    def save(self, rows_done, rejects_size):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dict(self._signature, rows_done=rows_done, rejects_size=rejects_size), f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RejectLog:
+    """
+    Streams rejected rows to <file>.rejects.csv instead of holding them in memory.
+    When resuming (append=True), `keep` is the size checkpointed with the last committed
+    batch: rows logged after it are cut off, since the resumed run reads them again.
+    """
+
+    def __init__(self, path, append=False, keep=None):
+        self.path = path + ".rejects.csv"
+        self.count = 0
+        self._file = open(self.path, "a" if append else "w", newline="", encoding="utf-8")
+        if append and keep is not None and keep < self._file.tell():
+            self._file.truncate(keep)
+        self._writer = csv.writer(self._file)
+        if self._file.tell() == 0:
+            self._writer.writerow(["row_number", "error", "row"])
+
+    def add(self, row_number, row, error):
+        self.count += 1
+        self._writer.writerow([row_number, error, json.dumps(row, default=str)])
+
+    def size(self):
+        """Flushes the log and returns its size in bytes (for the checkpoint)."""
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+# ---------- pipeline ----------
+
+def _write_catalogue_batch(batch, materials):
+    updates, inserts = [], {}
+    for row_number, values in batch:
+        material_id = materials.get(values["item_name"])
+        if material_id is None:
+            # item_name isn't unique in the table: a name repeated in the batch is added once, the last row wins.
+            inserts.pop(_key(values["item_name"]), None)
+            inserts[_key(values["item_name"])] = (row_number, values)
+        else:
+            updates.append((row_number, (material_id, values["price_per_unit"])))
+    inserts = list(inserts.values())
+    errors = []
+    written = 0
+    if updates:
+        result = update_prices_bulk([values for _, values in updates], chunk_size=len(updates))
+        written += result["updated"]
+        errors += _batch_errors(result, updates)
+    if inserts:
+        result = add_materials_bulk([values for _, values in inserts], chunk_size=len(inserts))
+        written += result["inserted"]
+        errors += _batch_errors(result, inserts)
+        materials.refresh()
+    return written, errors
+
+
+def _batch_errors(result, batch):
+    errors = []
+    for index, message in result["errors"]:
+        if index is None:
+            raise RuntimeError(message)
+        errors.append((batch[index][0], batch[index][1], message))
+    return errors
+
+
+def _track(rows, progress):
+    for row_number, row in rows:
+        progress["last_row"] = row_number
+        yield row_number, row
+
+
+def import_file(kind, path, batch_size=DEFAULT_BATCH_SIZE, resume=True, update_stock=False):
+    """
+    Streams a catalogue (supplier price list) or sales ledger file into the database.
+
+    kind: "catalogue" or "sales". Rows are parsed lazily, mapped through in-memory
+    name -> id lookups, and written batch_size rows at a time, so memory does not grow
+    with the file. After every batch the number of finished rows is checkpointed;
+    re-running the same command resumes after the last committed batch.
+    Catalogue rows for an existing item name update its price instead of adding a duplicate.
+    Sales are loaded as history (stock untouched) unless update_stock=True.
+
+    Returns a dict with rows_read, written, rejected, seconds and rows_per_sec.
+    """
+    if kind not in ("catalogue", "sales"):
+        raise ValueError("kind must be 'catalogue' or 'sales'")
+
+    checkpoint = Checkpoint(path)
+    skip, rejects_size = checkpoint.load() if resume else (0, None)
+    if skip:
+        print(f"Resuming {path} after row {skip}.")
+    rejects = RejectLog(path, append=bool(skip), keep=rejects_size)
+
+    progress = {"last_row": skip}
+    rows = _track(read_rows(path, skip), progress)
+    materials = LookupIndex("materials", "id", "item_name").load()
+    if kind == "catalogue":
+        suppliers = LookupIndex("suppliers", "supplier_id", "supplier_name").load()
+        mapped = map_catalogue_rows(rows, suppliers, rejects)
+    else:
+        customers = LookupIndex("customers", "customer_id", "customer_name").load()
+        mapped = map_sales_rows(rows, customers, materials, rejects)
+
+    started = time.perf_counter()
+    rows_done = skip
+    written = 0
+    try:
+        for batch in chunked(mapped, batch_size):
+            if kind == "catalogue":
+                batch_written, errors = _write_catalogue_batch(batch, materials)
+            else:
+                result = add_sales_bulk([values for _, values in batch], chunk_size=len(batch),
+                                        update_stock=update_stock)
+                batch_written, errors = result["inserted"], _batch_errors(result, batch)
+            for row_number, values, message in errors:
+                rejects.add(row_number, values, message)
+            written += batch_written
+            rows_done = batch[-1][0]
+            checkpoint.save(rows_done, rejects.size())
+            elapsed = time.perf_counter() - started
+            print(f"{rows_done} rows processed, {written} written, "
+                  f"{(rows_done - skip) / elapsed if elapsed else 0:.0f} rows/s")
+        checkpoint.clear()
+    finally:
+        rejects.close()
+
+    elapsed = time.perf_counter() - started
+    rows_read = progress["last_row"] - skip
+    stats = {
+        "rows_read": rows_read,
+        "written": written,
+        "rejected": rejects.count,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows_read / elapsed) if elapsed else rows_read,
+    }
+    print(f"Import finished: {stats['written']} written, {stats['rejected']} rejected "
+          f"in {stats['seconds']}s ({stats['rows_per_sec']} rows/s).")
+    if rejects.count:
+        print(f"Rejected rows saved to {rejects.path}")
+    return stats
@@ -1,24 +1,382 @@
-import mysql.connector
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 
-# Update these with your actual username and password
+from queries import InstrumentedCursor
+
+# Storage backend: "mysql" (server) or "sqlite" (embedded file, see sqlite_backend.py).
+# Set BMM_DB_BACKEND, or call configure_backend() before the first connection.
+BACKENDS = ("mysql", "sqlite")
+db_backend = os.environ.get("BMM_DB_BACKEND", "mysql")
+
+# MySQL settings; the BMM_DB_* environment variables override the defaults.
 db_config = {
-    "host": "localhost",
-    "user": "root",
-    "password": "@Sank371322",  
-    "database": "building_materials"
+    "host": os.environ.get("BMM_DB_HOST", "localhost"),
+    "user": os.environ.get("BMM_DB_USER", "root"),
+    "password": os.environ.get("BMM_DB_PASSWORD", "@Sank371322"),
+    "database": os.environ.get("BMM_DB_NAME", "building_materials"),
+}
+
+# SQLite settings: path of the database file, or ":memory:" for a per-process
+# in-memory database (single-threaded scripts, see sqlite_backend).
+sqlite_config = {
+    "path": os.environ.get("BMM_SQLITE_PATH", "building_materials.db"),
 }
 
+# Connection pool settings (change before the first create_connection() call,
+# or call configure_pool() to rebuild the pool with new values).
+pool_config = {
+    "pool_size": 5,             # max connections open at once
+    "checkout_timeout": 10,     # seconds to wait for a free connection
+    "ping_after": 30,           # ping connections idle longer than this (seconds) on checkout
+    "prepared_per_connection": 128,     # prepared statements kept open per connection (MySQL)
+}
+
+# MySQL error numbers worth retrying a whole transaction for:
+# 1213 = deadlock found, 1205 = lock wait timeout exceeded.
+RETRYABLE_ERRNOS = (1213, 1205)
+# SQLite result codes likewise: 5 = SQLITE_BUSY, 6 = SQLITE_LOCKED.
+RETRYABLE_SQLITE_CODES = (5, 6)
+MAX_TX_RETRIES = 3
+# 1451 = cannot delete or update a parent row; SQLite's SQLITE_CONSTRAINT_FOREIGNKEY = 787.
+FOREIGN_KEY_ERRNOS = (1451,)
+FOREIGN_KEY_SQLITE_CODE = 787
+STREAM_BATCH_SIZE = 1000   # rows per fetchmany() in iter_rows
+
+
+def is_retryable(err):
+    """True if `err` is a deadlock/lock-timeout after which the transaction can simply be re-run."""
+    errno = getattr(err, "errno", None)
+    if errno is None and getattr(err, "args", None):
+        errno = err.args[0]     # PyMySQL/aiomysql errors carry the number as the first arg
+    if errno in RETRYABLE_ERRNOS:
+        return True
+    code = getattr(err, "sqlite_errorcode", None)       # sqlite3 errors (Python 3.11+)
+    return code is not None and (code & 0xFF) in RETRYABLE_SQLITE_CODES
+
+
+def is_foreign_key_violation(err):
+    """True if `err` says the row is still referenced by a foreign key."""
+    errno = getattr(err, "errno", None)
+    if errno is None and getattr(err, "args", None):
+        errno = err.args[0]
+    return errno in FOREIGN_KEY_ERRNOS or getattr(err, "sqlite_errorcode", None) == FOREIGN_KEY_SQLITE_CODE
+
+
+def backend_connect():
+    """Opens a new raw connection to the configured backend (the pool's default connect)."""
+    if db_backend == "sqlite":
+        import sqlite_backend
+        return sqlite_backend.connect(**sqlite_config)
+    import mysql.connector
+    return mysql.connector.connect(**db_config)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within checkout_timeout."""
+
+
+class ConnectionReturnedError(Exception):
+    """Raised when a PooledConnection is used after close()."""
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a backend connection checked out of the pool.
+    close() hands the connection back to the pool instead of dropping it.
+    cursor() returns an InstrumentedCursor (see queries.py) that times every statement
+    and runs registered ones as prepared statements on MySQL; everything else
+    (commit, rollback, ...) goes to the real connection.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def cursor(self, *args, **kwargs):
+        if self._raw is None:
+            raise ConnectionReturnedError("Connection already returned to the pool")
+        raw = self._raw
+        prepare = None
+        # Prepared cursors buffer their rows, so an explicitly unbuffered (streaming) cursor skips them.
+        if db_backend == "mysql" and kwargs.get("buffered") is not False:
+            prepare = lambda sql: self._pool.prepared_cursor(raw, sql)  # noqa: E731
+        return InstrumentedCursor(raw.cursor(*args, **kwargs), prepare, kwargs.get("dictionary", False))
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise ConnectionReturnedError("Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of database connections (MySQL or SQLite, see backend_connect).
+
+    - Connections are opened lazily, up to pool_size.
+    - Checkout waits up to checkout_timeout seconds for a free slot.
+    - Connections idle longer than ping_after seconds are pinged on checkout
+      and reconnected if the server dropped them.
+    - On release any open transaction is rolled back, so the next caller never
+      inherits uncommitted work or a stale REPEATABLE READ snapshot.
+    - Prepared cursors of registered queries live as long as their connection, up to
+      prepared_per_connection of them (the oldest is closed first).
+    """
+
+    def __init__(self, pool_size=5, checkout_timeout=10, ping_after=30, connect=None,
+                 prepared_per_connection=128):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self._connect = connect or backend_connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.prepared_per_connection = prepared_per_connection
+        self._prepared = {}     # id(raw connection) -> {sql: prepared cursor}
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "reconnects": 0,
+            "discarded": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+            "prepared": 0,
+        }
+
+    def _open(self):
+        raw = self._connect()
+        with self._lock:
+            self._stats["created"] += 1
+        print("Connected to database!")
+        return raw
+
+    def prepared_cursor(self, raw, sql):
+        """The prepared cursor for `sql` on connection `raw`, prepared on first use."""
+        statements = self._prepared.setdefault(id(raw), {})
+        cursor = statements.get(sql)
+        if cursor is None:
+            if len(statements) >= self.prepared_per_connection:
+                self._close_cursor(statements.pop(next(iter(statements))))
+            cursor = statements[sql] = raw.cursor(prepared=True)
+            with self._lock:
+                self._stats["prepared"] += 1
+        return cursor
+
+    @staticmethod
+    def _close_cursor(cursor):
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+    def _forget(self, raw):
+        """Drops the prepared cursors of a connection that is being closed."""
+        for cursor in self._prepared.pop(id(raw), {}).values():
+            self._close_cursor(cursor)
+
+    def _health_check(self, raw, idle_for):
+        if idle_for < self.ping_after:
+            return raw
+        try:
+            raw.ping(reconnect=False)
+            return raw
+        except Exception:
+            pass
+        self._forget(raw)
+        try:
+            raw.close()
+        except Exception:
+            pass
+        raw = self._connect()
+        with self._lock:
+            self._stats["reconnects"] += 1
+        return raw
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(
+                f"No free connection after {self.checkout_timeout}s (pool_size={self.pool_size})"
+            )
+        try:
+            try:
+                raw, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                raw = self._open()
+            else:
+                raw = self._health_check(raw, time.monotonic() - released_at)
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        try:
+            if getattr(raw, "unread_result", False):
+                raw.consume_results()       # MySQL runs nothing else on the connection until they're read
+            if raw.in_transaction:
+                raw.rollback()
+            self._idle.put((raw, time.monotonic()))
+        except Exception:
+            # Broken or stuck connection (e.g. unread results): drop it, a new one
+            # is opened on a later checkout.
+            with self._lock:
+                self._stats["discarded"] += 1
+            self._forget(raw)
+            try:
+                raw.close()
+            except Exception:
+                pass
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+        stats["idle"] = self._idle.qsize()
+        stats["pool_size"] = self.pool_size
+        stats["wait_avg"] = stats["wait_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                raw, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._forget(raw)
+            try:
+                raw.close()
+            except Exception:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**pool_config)
+    return _pool
+
+
+def configure_pool(**settings):
+    """Update pool_config and replace the pool. Idle connections of the old pool are closed."""
+    global _pool
+    pool_config.update(settings)
+    with _pool_lock:
+        old, _pool = _pool, None
+    if old is not None:
+        old.close_all()
+
+
+def configure_backend(backend, **settings):
+    """
+    Switches the storage backend ("mysql" or "sqlite") and replaces the pool.
+    `settings` update db_config (mysql) or sqlite_config (sqlite), e.g.
+    configure_backend("sqlite", path=":memory:").
+    """
+    global db_backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+    db_backend = backend
+    (sqlite_config if backend == "sqlite" else db_config).update(settings)
+    configure_pool()
+
+
+def pool_stats():
+    """Returns checkout/wait/reconnect counters for the shared pool."""
+    return get_pool().stats()
+
+
 def create_connection():
+    """Checks a connection out of the shared pool. Call close() to hand it back."""
     try:
-        conn = mysql.connector.connect(**db_config)
-        print("Connected to database!")
-        return conn
-    except mysql.connector.Error as err:
+        return get_pool().acquire()
+    except Exception as err:    # driver errors of either backend, PoolTimeoutError
         print(f"Error: {err}")
         return None
 
+
+@contextmanager
+def pooled_connection():
+    """
+    Context-manager form of create_connection():
+
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            ...
+            conn.commit()
+
+    Uncommitted work is rolled back when the block exits.
+    """
+    conn = get_pool().acquire()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def iter_rows(sql, params=(), batch_size=STREAM_BATCH_SIZE):
+    """
+    Yields the rows of one query as they arrive, reading batch_size rows at a time from
+    an unbuffered cursor (mysql.connector streams them off the socket, SQLite steps its
+    statement), so a result of any size is never held in memory at once. The generator
+    keeps its own pooled connection until it is exhausted or closed; rows a consumer
+    that stops early (e.g. `| head`) leaves unread are discarded before it goes back.
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            if getattr(conn, "unread_result", False):
+                conn.consume_results()
+            cursor.close()
+
+
 if __name__ == "__main__":
     # Just for testing the connection
     connection = create_connection()
     if connection:
         connection.close()
+        print(pool_stats())
@@ -0,0 +1,418 @@
+"""
+Demand forecasts, reorder points and suggested order quantities per material.
+
+Daily demand is the quantity sold per item and day. Two estimators:
+
+- "ewma" (default): exponentially smoothed daily demand and squared demand, kept per
+  item in demand_forecasts. Each run folds in only the sales recorded since the last
+  one (order_no watermark in forecast_state), so only items with new sales are touched;
+  days without sales are applied in closed form when the forecast is read. Sales commit
+  out of order_no order, so order_nos missing below the watermark are kept in
+  forecast_gaps and folded in by a later run once their sale has committed.
+- "sma": moving average over the last `window` days, from the daily rollup.
+
+For every material, with its supplier's lead time L (suppliers.lead_time_days, else the
+average lead time of its received purchase orders, else DEFAULT_LEAD_TIME):
+
+    reorder point  = mean * L + z * sd * sqrt(L)        (z from the service level)
+    order quantity = reorder point + mean * cover_days - in stock, once stock <= reorder point
+
+All items are computed together with NumPy, in one pass over the forecast rows.
+
+    python forecast.py suggest                        # what to order now
+    python forecast.py points --method sma --window 28
+    python forecast.py lead-time 2 10                 # supplier 2 delivers in 10 days
+    python forecast.py sync-thresholds                # stock alerts fire at the reorder point
+"""
+import argparse
+import math
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+import rollup
+from db_connect import create_connection
+from query_cache import invalidate
+from records import ReorderPoint
+from render import print_table
+from suppliers_crud import set_lead_time
+
+METHODS = ("ewma", "sma")
+DEFAULT_ALPHA = 0.1             # smoothing factor: weight of the latest day
+DEFAULT_WINDOW = 28             # days, for "sma"
+DEFAULT_LEAD_TIME = 7           # days, for suppliers without lead_time_days
+DEFAULT_SERVICE_LEVEL = 0.95    # chance of not running out during the lead time
+DEFAULT_COVER_DAYS = 30         # an order should last this many days beyond the reorder point
+GAP_WINDOW = 20000              # order_nos below the newest checked for uncommitted sales (> a bulk chunk)
+GAP_TIMEOUT = timedelta(minutes=30)     # a gap still open after this was a rolled-back or deleted sale
+
+STATE_SQL = "SELECT last_order_no, alpha FROM forecast_state WHERE id = 1 FOR UPDATE"
+STATE_UPSERT_SQL = """
+    INSERT INTO forecast_state (id, last_order_no, alpha) VALUES (1, %s, %s)
+    ON DUPLICATE KEY UPDATE last_order_no = VALUES(last_order_no), alpha = VALUES(alpha)
+"""
+MAX_ORDER_SQL = "SELECT MAX(order_no) FROM sales"
+ORDER_NOS_SQL = "SELECT order_no FROM sales WHERE order_no > %s AND order_no <= %s"
+GAPS_SQL = "SELECT order_no, seen_at FROM forecast_gaps"
+GAP_INSERT_SQL = "INSERT INTO forecast_gaps (order_no, seen_at) VALUES (%s, %s)"
+GAP_DELETE_SQL = "DELETE FROM forecast_gaps WHERE order_no = %s"
+# {new} selects the sales not folded in yet: above the watermark, or filled gaps below it.
+FIRST_NEW_DAY_SQL = "SELECT MIN(sale_date) FROM sales WHERE order_no <= %s AND ({new})"
+# Day totals of every (item, day) that received new sales, with the new part separately:
+# the squared demand of a day can only be corrected knowing the whole day.
+CHANGED_DAYS_SQL = """
+    SELECT item_id, sale_date, SUM(quantity), SUM(CASE WHEN {new} THEN quantity ELSE 0 END)
+    FROM sales
+    WHERE sale_date >= %s AND order_no <= %s
+    GROUP BY item_id, sale_date
+    HAVING SUM(CASE WHEN {new} THEN 1 ELSE 0 END) > 0
+"""
+FORECASTS_SQL = "SELECT item_id, first_day, through_day, level, level_sq FROM demand_forecasts"
+FORECAST_UPSERT_SQL = """
+    INSERT INTO demand_forecasts (item_id, first_day, through_day, level, level_sq)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        first_day = VALUES(first_day), through_day = VALUES(through_day),
+        level = VALUES(level), level_sq = VALUES(level_sq)
+"""
+# Lead time: the supplier's lead_time_days, else the average observed on its purchase orders.
+MATERIALS_SQL = """
+    SELECT m.id, m.item_name, s.supplier_name,
+           COALESCE(s.lead_time_days,
+                    CASE WHEN st.lead_orders > 0 THEN ROUND(1.0 * st.lead_days_total / st.lead_orders) END),
+           m.quantity_in_stock
+    FROM materials m
+    LEFT JOIN suppliers s ON m.supplier_id = s.supplier_id
+    LEFT JOIN supplier_stats st ON m.supplier_id = st.supplier_id
+    ORDER BY m.id
+"""
+# ((rollup sql, date column), (raw sales sql, date column)) for rollup.range_queries.
+DAILY_DEMAND_SQL = (
+    ("SELECT day, item_id, SUM(quantity) FROM sales_daily_rollup {where} GROUP BY day, item_id", "day"),
+    ("SELECT sale_date, item_id, SUM(quantity) FROM sales {where} GROUP BY sale_date, item_id", "sale_date"),
+)
+THRESHOLD_UPSERT_SQL = """
+    INSERT INTO stock_thresholds (item_id, threshold, cooldown_seconds)
+    VALUES (%s, %s, NULL)
+    ON DUPLICATE KEY UPDATE threshold = VALUES(threshold)
+"""
+
+
+def _day(value):
+    return datetime.strptime(value[:10], "%Y-%m-%d").date() if isinstance(value, str) else value
+
+
+def _ordinals(values):
+    return np.fromiter((_day(v).toordinal() for v in values), dtype=np.int64, count=len(values))
+
+
+def _moment(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _track_gaps(cursor, last_order_no, newest, now):
+    """
+    Updates forecast_gaps and returns the gap order_nos whose sale has committed since.
+    Gaps open longer than GAP_TIMEOUT are dropped; new gaps in (last_order_no, newest]
+    (at most GAP_WINDOW below newest) are added.
+    """
+    cursor.execute(GAPS_SQL)
+    gaps = {order_no: _moment(seen_at) for order_no, seen_at in cursor.fetchall()}
+    filled = []
+    if gaps:
+        placeholders = ", ".join(["%s"] * len(gaps))
+        cursor.execute(f"SELECT order_no FROM sales WHERE order_no IN ({placeholders})", tuple(sorted(gaps)))
+        filled = sorted(row[0] for row in cursor.fetchall())
+        expired = [order_no for order_no, seen_at in gaps.items()
+                   if order_no not in filled and now - seen_at > GAP_TIMEOUT]
+        if filled or expired:
+            cursor.executemany(GAP_DELETE_SQL, [(order_no,) for order_no in filled + expired])
+    low = max(last_order_no, newest - GAP_WINDOW)
+    if newest > low:
+        cursor.execute(ORDER_NOS_SQL, (low, newest))
+        present = {row[0] for row in cursor.fetchall()}
+        if len(present) < newest - low:
+            cursor.executemany(GAP_INSERT_SQL, [(order_no, now) for order_no in range(low + 1, newest + 1)
+                                                if order_no not in present])
+    return filled
+
+
+def update_forecasts(cursor, alpha=DEFAULT_ALPHA, today=None):
+    """
+    Folds the sales recorded since the last run into demand_forecasts (all of them on
+    the first run, or when alpha changed), including sales below the watermark that
+    were still uncommitted last time. The caller commits. Returns the number of items
+    updated.
+    """
+    today = (today or date.today()).toordinal()
+    cursor.execute(STATE_SQL)
+    state = cursor.fetchone()
+    last_order_no = state[0] if state else 0
+    if state and not math.isclose(float(state[1]), alpha):
+        cursor.execute("DELETE FROM demand_forecasts")
+        cursor.execute("DELETE FROM forecast_gaps")
+        last_order_no = 0
+    cursor.execute(MAX_ORDER_SQL)
+    newest = max(cursor.fetchone()[0] or 0, last_order_no)
+    filled = _track_gaps(cursor, last_order_no, newest, datetime.now().replace(microsecond=0))
+    if newest <= last_order_no and not filled:
+        if not state:
+            cursor.execute(STATE_UPSERT_SQL, (newest, alpha))
+        return 0
+
+    new = "order_no > %s"
+    new_params = (last_order_no,) + tuple(filled)
+    if filled:
+        new += f" OR order_no IN ({', '.join(['%s'] * len(filled))})"
+    cursor.execute(FIRST_NEW_DAY_SQL.format(new=new), (newest,) + new_params)
+    first_new_day = _day(cursor.fetchone()[0])
+    cursor.execute(CHANGED_DAYS_SQL.format(new=new), new_params + (first_new_day, newest) + new_params)
+    rows = cursor.fetchall()
+    updated = 0
+    if rows:
+        item_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        days = _ordinals([row[1] for row in rows])
+        full = np.array([float(row[2]) for row in rows])
+        new = np.array([float(row[3]) for row in rows])
+        items, inverse = np.unique(item_ids, return_inverse=True)
+
+        through = max(today, int(days.max()))
+        decay = 1.0 - alpha
+        weights = alpha * decay ** (through - days)
+        level = np.bincount(inverse, weights=weights * new, minlength=len(items))
+        # The day's square goes from (full - new)^2 to full^2.
+        level_sq = np.bincount(inverse, weights=weights * (full * full - (full - new) ** 2), minlength=len(items))
+        first = np.full(len(items), through, dtype=np.int64)
+        np.minimum.at(first, inverse, days)
+
+        cursor.execute(FORECASTS_SQL)
+        known = {row[0]: row[1:] for row in cursor.fetchall()}
+        for i, item_id in enumerate(items.tolist()):
+            if item_id in known:
+                old_first, old_through, old_level, old_sq = known[item_id]
+                carry = decay ** max(through - _day(old_through).toordinal(), 0)
+                level[i] += float(old_level) * carry
+                level_sq[i] += float(old_sq) * carry
+                first[i] = min(first[i], _day(old_first).toordinal())
+        through_day = date.fromordinal(through)
+        cursor.executemany(FORECAST_UPSERT_SQL, [
+            (item_id, date.fromordinal(int(first[i])), through_day, float(level[i]), float(level_sq[i]))
+            for i, item_id in enumerate(items.tolist())
+        ])
+        updated = len(items)
+    cursor.execute(STATE_UPSERT_SQL, (newest, alpha))
+    return updated
+
+
+def ewma_demand(cursor, item_ids, alpha=DEFAULT_ALPHA, as_of=None):
+    """(mean, sd) of daily demand for each of `item_ids` (arrays), from demand_forecasts as of `as_of`."""
+    as_of = (as_of or date.today()).toordinal()
+    index = {item_id: i for i, item_id in enumerate(item_ids)}
+    cursor.execute(FORECASTS_SQL)
+    rows = [row for row in cursor.fetchall() if row[0] in index]
+    mean = np.zeros(len(item_ids))
+    sd = np.zeros(len(item_ids))
+    if not rows:
+        return mean, sd
+    positions = np.array([index[row[0]] for row in rows])
+    first = _ordinals([row[1] for row in rows])
+    through = _ordinals([row[2] for row in rows])
+    level = np.array([float(row[3]) for row in rows])
+    level_sq = np.array([float(row[4]) for row in rows])
+
+    decay = 1.0 - alpha
+    carry = decay ** np.maximum(as_of - through, 0)
+    # Bias correction for items with a short history (the smoothing started at zero).
+    observed = 1.0 - decay ** np.maximum(np.maximum(as_of, through) - first + 1, 1)
+    mean[positions] = level * carry / observed
+    sd[positions] = np.sqrt(np.maximum(level_sq * carry / observed - mean[positions] ** 2, 0.0))
+    return mean, sd
+
+
+def sma_demand(cursor, item_ids, window=DEFAULT_WINDOW, as_of=None):
+    """(mean, sd) of daily demand over the `window` days up to `as_of` (days without sales count as 0)."""
+    as_of = as_of or date.today()
+    start = date.fromordinal(as_of.toordinal() - window + 1)
+    index = {item_id: i for i, item_id in enumerate(item_ids)}
+    rows = []
+    for sql, params in rollup.range_queries(rollup.coverage_start(cursor), DAILY_DEMAND_SQL, start, as_of):
+        cursor.execute(sql, params)
+        rows += [row for row in cursor.fetchall() if row[1] in index]
+    if not rows:
+        return np.zeros(len(item_ids)), np.zeros(len(item_ids))
+    positions = np.array([index[row[1]] for row in rows])
+    quantity = np.array([float(row[2]) for row in rows])
+    total = np.bincount(positions, weights=quantity, minlength=len(item_ids))
+    total_sq = np.bincount(positions, weights=quantity * quantity, minlength=len(item_ids))
+    mean = total / window
+    return mean, np.sqrt(np.maximum(total_sq / window - mean ** 2, 0.0))
+
+
+def reorder_points(cursor, method="ewma", window=DEFAULT_WINDOW, alpha=DEFAULT_ALPHA,
+                   service_level=DEFAULT_SERVICE_LEVEL, cover_days=DEFAULT_COVER_DAYS, as_of=None):
+    """ReorderPoint records for every material (ewma expects update_forecasts() to have run)."""
+    cursor.execute(MATERIALS_SQL)
+    materials = cursor.fetchall()
+    if not materials:
+        return []
+    item_ids = [row[0] for row in materials]
+    if method == "sma":
+        mean, sd = sma_demand(cursor, item_ids, window, as_of)
+    else:
+        mean, sd = ewma_demand(cursor, item_ids, alpha, as_of)
+
+    lead = np.array([max(float(row[3]), 1.0) if row[3] is not None else DEFAULT_LEAD_TIME for row in materials])
+    stock = np.array([row[4] or 0 for row in materials], dtype=float)
+    z = NormalDist().inv_cdf(service_level)
+    points = np.ceil(mean * lead + z * sd * np.sqrt(lead))
+    order = np.where(stock <= points, np.ceil(np.maximum(points + mean * cover_days - stock, 0.0)), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(mean > 0, stock / mean, np.inf)
+
+    return [
+        ReorderPoint(item_id, item_name, supplier_name, int(lead[i]), int(stock[i]),
+                     round(float(mean[i]), 2), round(float(sd[i]), 2), int(points[i]), int(order[i]),
+                     None if math.isinf(days_left[i]) else round(float(days_left[i]), 1))
+        for i, (item_id, item_name, supplier_name, _, _) in enumerate(materials)
+    ]
+
+
+def refresh_forecasts(alpha=DEFAULT_ALPHA, rebuild=False):
+    """Brings demand_forecasts up to date (from scratch with rebuild=True). Returns the items updated, None on error."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            if rebuild:
+                cursor.execute("DELETE FROM demand_forecasts")
+                cursor.execute("DELETE FROM forecast_state")
+                cursor.execute("DELETE FROM forecast_gaps")
+            updated = update_forecasts(cursor, alpha)
+            conn.commit()
+            return updated
+    except Exception as e:
+        print(f"Error in refresh_forecasts: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_reorder_points(method="ewma", window=DEFAULT_WINDOW, alpha=DEFAULT_ALPHA,
+                       service_level=DEFAULT_SERVICE_LEVEL, cover_days=DEFAULT_COVER_DAYS, as_of=None):
+    """Reorder point and suggested order quantity of every material, as ReorderPoint records (None on error)."""
+    if method not in METHODS:
+        print(f"method must be one of {', '.join(METHODS)}")
+        return None
+    if not 0 < alpha < 1 or not 0 < service_level < 1 or window <= 0:
+        print("alpha and service_level must be between 0 and 1, window positive")
+        return None
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            if method == "ewma":
+                update_forecasts(cursor, alpha)
+                conn.commit()
+            return reorder_points(cursor, method, window, alpha, service_level, cover_days, as_of)
+    except Exception as e:
+        print(f"Error in get_reorder_points: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_reorder_suggestions(**options):
+    """The materials at or below their reorder point, fewest days of stock first (None on error)."""
+    points = get_reorder_points(**options)
+    if points is None:
+        return None
+    due = [row for row in points if row.order_quantity > 0]
+    return sorted(due, key=lambda row: (row.days_left is None, row.days_left or 0, row.item_name))
+
+
+def show_reorder_suggestions(**options):
+    """Prints and returns get_reorder_suggestions(); the forecast counterpart of show_low_stock()."""
+    rows = get_reorder_suggestions(**options)
+    if rows is not None:
+        print_table(rows, ReorderPoint, empty_message="Nothing needs reordering.")
+    return rows
+
+
+def sync_alert_thresholds(**options):
+    """
+    Sets every material's stock_alerts threshold to its reorder point, so alerts fire
+    when it is time to order. Returns the number of thresholds written (None on error).
+    """
+    points = get_reorder_points(**options)
+    if points is None:
+        return None
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.executemany(THRESHOLD_UPSERT_SQL, [(row.item_id, row.reorder_point) for row in points])
+            conn.commit()
+            invalidate("stock_thresholds")
+            print(f"Alert thresholds set to the reorder point for {len(points)} materials.")
+            return len(points)
+    except Exception as e:
+        print(f"Error in sync_alert_thresholds: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    def add_options(p):
+        p.add_argument("--method", choices=METHODS, default="ewma")
+        p.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Days, for --method sma")
+        p.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="Smoothing factor, for --method ewma")
+        p.add_argument("--service-level", type=float, default=DEFAULT_SERVICE_LEVEL)
+        p.add_argument("--cover-days", type=int, default=DEFAULT_COVER_DAYS)
+
+    add_options(sub.add_parser("suggest", help="Materials to reorder now"))
+    add_options(sub.add_parser("points", help="Reorder point of every material"))
+    add_options(sub.add_parser("sync-thresholds", help="Use the reorder points as stock alert thresholds"))
+
+    p1 = sub.add_parser("refresh", help="Fold new sales into the stored forecasts")
+    p1.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    p1.add_argument("--rebuild", action="store_true", help="Recompute from all sales")
+
+    p2 = sub.add_parser("lead-time", help="Set a supplier's lead time in days")
+    p2.add_argument("supplier_id", type=int)
+    p2.add_argument("days", type=int)
+
+    args = parser.parse_args()
+    if args.cmd in ("suggest", "points", "sync-thresholds"):
+        options = dict(method=args.method, window=args.window, alpha=args.alpha,
+                       service_level=args.service_level, cover_days=args.cover_days)
+        if args.cmd == "suggest":
+            show_reorder_suggestions(**options)
+        elif args.cmd == "points":
+            rows = get_reorder_points(**options)
+            if rows is not None:
+                print_table(rows, ReorderPoint, empty_message="No materials.")
+        else:
+            sync_alert_thresholds(**options)
+    elif args.cmd == "refresh":
+        updated = refresh_forecasts(args.alpha, args.rebuild)
+        if updated is not None:
+            print(f"Forecasts updated for {updated} materials.")
+    elif args.cmd == "lead-time":
+        set_lead_time(args.supplier_id, args.days)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import argparse
+from data_import import DEFAULT_BATCH_SIZE, import_file
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream CSV/Parquet files into the database.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p1 = sub.add_parser("catalogue", help="Supplier price list -> materials")
+    p1.add_argument("path")
+
+    p2 = sub.add_parser("sales", help="Historical sales ledger -> sales")
+    p2.add_argument("path")
+    p2.add_argument("--update-stock", action="store_true", help="Also decrement current stock")
+
+    for p in (p1, p2):
+        p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        p.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+
+    args = parser.parse_args()
+    import_file(
+        args.cmd,
+        args.path,
+        batch_size=args.batch_size,
+        resume=not args.restart,
+        update_stock=getattr(args, "update_stock", False),
+    )
+
+if __name__ == "__main__":
+    main()
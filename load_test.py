@@ -0,0 +1,187 @@
+"""
+Load test for api_server.py.
+
+N client threads, each with its own keep-alive connection, send a weighted mix of
+requests for a fixed time. Catalogue reads revalidate with If-None-Match like a real
+client would. Prints throughput, latency percentiles and status codes per endpoint.
+
+    python load_test.py --serve --clients 50 --duration 30
+    python load_test.py --url http://shop-server:8000 --clients 100 --json results.json
+
+--serve starts `uvicorn api_server:app` locally against whatever db_connect points at
+and stops it afterwards. --writes adds POST /sales (item 1 sold to customer 1, so only
+use it on a test database).
+"""
+import argparse
+import http.client
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+SEARCH_TERMS = ["cement", "sand", "brick", "steel", "rod", "tile", "cemnt", "brik", "pipe", "paint"]
+
+# (name, weight, method, path factory)
+READ_MIX = [
+    ("GET /materials", 30, "GET", lambda rng: "/materials?page_size=50"),
+    ("GET /customers", 10, "GET", lambda rng: "/customers?page_size=50"),
+    ("GET /materials/search", 25, "GET", lambda rng: f"/materials/search?q={rng.choice(SEARCH_TERMS)}"),
+    ("GET /dashboard", 15, "GET", lambda rng: "/dashboard"),
+    ("GET /analytics/daily", 10, "GET", lambda rng: "/analytics/daily?days=30"),
+    ("GET /sales", 10, "GET", lambda rng: "/sales?page_size=20"),
+]
+WRITE_MIX = [
+    ("POST /sales", 5, "POST", lambda rng: "/sales"),
+]
+SALE_BODY = json.dumps({"customer_id": 1, "item_id": 1, "quantity": 1, "total": 1.0})
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Client(threading.Thread):
+    def __init__(self, host, port, mix, deadline, seed):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.mix = mix
+        self.weights = [weight for _, weight, _, _ in mix]
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.etags = {}
+        self.samples = {}       # name -> [latency seconds]
+        self.statuses = {}      # (name, status) -> count
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while time.perf_counter() < self.deadline:
+            name, _, method, make_path = self.rng.choices(self.mix, self.weights)[0]
+            path = make_path(self.rng)
+            headers, body = {}, None
+            if method == "POST":
+                headers["Content-Type"] = "application/json"
+                body = SALE_BODY
+            elif path in self.etags:
+                headers["If-None-Match"] = self.etags[path]
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader("ETag"):
+                    self.etags[path] = response.getheader("ETag")
+            except (OSError, http.client.HTTPException):
+                status = "error"
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.samples.setdefault(name, []).append(time.perf_counter() - started)
+            self.statuses[(name, status)] = self.statuses.get((name, status), 0) + 1
+        conn.close()
+
+
+def wait_until_up(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def run(url, clients, duration, writes=False, warmup=2.0):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    mix = READ_MIX + (WRITE_MIX if writes else [])
+
+    if warmup:
+        warm = Client(host, port, mix, time.perf_counter() + warmup, seed=-1)
+        warm.start()
+        warm.join()
+
+    deadline = time.perf_counter() + duration
+    threads = [Client(host, port, mix, deadline, seed=n) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    results = {"url": url, "clients": clients, "duration": round(elapsed, 2), "endpoints": {}}
+    total = 0
+    for name, *_ in mix:
+        latencies = sorted(x for t in threads for x in t.samples.get(name, []))
+        statuses = {}
+        for t in threads:
+            for (endpoint, status), count in t.statuses.items():
+                if endpoint == name:
+                    statuses[str(status)] = statuses.get(str(status), 0) + count
+        total += len(latencies)
+        results["endpoints"][name] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "statuses": statuses,
+        }
+    results["requests"] = total
+    results["rps"] = round(total / elapsed, 1)
+    return results
+
+
+def print_results(results):
+    print(f"\n{results['clients']} clients for {results['duration']}s against {results['url']}")
+    print(f"{'endpoint':<24}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for name, r in results["endpoints"].items():
+        print(f"{name:<24}{r['requests']:>9}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  {r['statuses']}")
+    print(f"{'total':<24}{results['requests']:>9}{results['rps']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--writes", action="store_true", help="Include POST /sales (test databases only)")
+    parser.add_argument("--serve", action="store_true", help="Start uvicorn api_server:app for the run")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers with --serve")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.serve:
+        parts = urlsplit(args.url)
+        server = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "api_server:app", "--host", parts.hostname,
+            "--port", str(parts.port or 80), "--workers", str(args.workers), "--log-level", "warning",
+        ])
+        if not wait_until_up(parts.hostname, parts.port or 80):
+            server.terminate()
+            raise SystemExit("API server did not start.")
+    try:
+        results = run(args.url, args.clients, args.duration, args.writes)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
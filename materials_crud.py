@@ -1,22 +1,63 @@
-import csv
-from db_connect import create_connection
-from tabulate import tabulate
+from db_connect import create_connection, iter_rows
+from queries import register
+from query_cache import invalidate
+from bulk_ops import DEFAULT_CHUNK_SIZE, insert_many, run_chunked
+from pagination import DEFAULT_PAGE_SIZE, decode_token, page_result
+from records import LowStockItem, Material, StockAlert
+from render import print_pages, print_table, to_dicts, write_csv
+import search_index
+import stock_alerts
+import stock_journal
 from datetime import datetime
+from itertools import chain
+
+MATERIALS_PAGE_SQL = register("materials.page", (
+    "SELECT id, item_name, price_per_unit, unit_type, quantity_in_stock FROM materials "
+    "WHERE id > %s ORDER BY id LIMIT %s"
+))
+LOW_STOCK_SQL = register("materials.low_stock", (
+    "SELECT item_name, quantity_in_stock, unit_type, supplier_id FROM materials "
+    "WHERE quantity_in_stock <= %s ORDER BY quantity_in_stock, item_name"
+))
+MATERIAL_INSERT_SQL = register("materials.insert", """
+    INSERT INTO materials (item_name, price_per_unit, unit_type, quantity_in_stock, supplier_id)
+    VALUES (%s, %s, %s, %s, %s)
+""")
+# Locks the material row for the rest of the transaction (shared with sales_crud).
+STOCK_FOR_UPDATE_SQL = register("materials.stock_for_update",
+                                "SELECT quantity_in_stock FROM materials WHERE id = %s FOR UPDATE")
+SET_PRICE_SQL = register("materials.set_price", "UPDATE materials SET price_per_unit=%s WHERE id=%s")
+SET_STOCK_SQL = register("materials.set_stock", "UPDATE materials SET quantity_in_stock=%s WHERE id=%s")
+MATERIAL_DELETE_SQL = register("materials.delete", "DELETE FROM materials WHERE id=%s")
+
+def validate_material(item_name, price_per_unit, quantity):
+    """Returns an error message for an invalid name/price/quantity, or None if all are fine."""
+    if not item_name or not str(item_name).strip():
+        return "Material name cannot be empty."
+    if price_per_unit is None or price_per_unit < 0:
+        return "Price cannot be negative or None."
+    if not isinstance(quantity, int) or quantity < 0:
+        return "Quantity must be a non-negative integer."
+    return None
 
 
 def add_material(item_name, price_per_unit, unit_type, quantity, supplier_id):
+    error = validate_material(item_name, price_per_unit, quantity)
+    if error:
+        print(f"Error: {error}")
+        return
     conn = None
     try:
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            sql = """
-                INSERT INTO materials (item_name, price_per_unit, unit_type, quantity_in_stock, supplier_id)
-                VALUES (%s, %s, %s, %s, %s)
-            """
             values = (item_name, price_per_unit, unit_type, quantity, supplier_id)
-            cursor.execute(sql, values)
+            cursor.execute(MATERIAL_INSERT_SQL, values)
+            material_id = cursor.lastrowid
+            stock_journal.record_movements(cursor, [(material_id, quantity, "opening")])
             conn.commit()
+            invalidate("materials")
+            search_index.index_row("materials", material_id, item_name)
             print(f"Material {item_name} added with supplier ID {supplier_id}!")
     except Exception as e:
         print(f"Database error during add_material: {e}")
@@ -26,44 +67,103 @@ def add_material(item_name, price_per_unit, unit_type, quantity, supplier_id):
         if conn:
             conn.close()
 
-def list_materials():
+def add_materials_bulk(materials, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Inserts many materials using executemany, one transaction per chunk, and journals
+    their opening stock. Each row is (item_name, price_per_unit, unit_type, quantity,
+    supplier_id) or a dict with those keys.
+    Returns {"inserted": n, "errors": [(row_index, message), ...]}.
+    """
+    def validate(row):
+        if isinstance(row, dict):
+            values = (row["item_name"], row["price_per_unit"], row.get("unit_type", "quintal"),
+                      row["quantity"], row.get("supplier_id"))
+        else:
+            values = tuple(row)
+        item_name, price_per_unit, _, quantity, _ = values
+        return values, validate_material(item_name, price_per_unit, quantity)
+
+    insert = insert_many(MATERIAL_INSERT_SQL)
+
+    def write(cursor, good):
+        rejected = insert(cursor, good)
+        # One multi-row INSERT gets consecutive ids starting at lastrowid.
+        stock_journal.record_openings(cursor, cursor.lastrowid, [values[3] for _, values in good])
+        return rejected
+
+    result = run_chunked("add_materials_bulk", materials, validate, write, chunk_size, tables=("materials",))
+    if result["inserted"]:
+        search_index.mark_stale("materials")
+    return result
+
+def update_prices_bulk(prices, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Updates many prices with executemany, one transaction per chunk.
+    Each row is (id, price_per_unit). Returns {"updated": n, "errors": [(index, message), ...]}.
+    """
+    def validate(row):
+        material_id, price = row
+        error = "Price cannot be negative or None." if price is None or price < 0 else None
+        return (price, material_id), error
+
+    return run_chunked(
+        "update_prices_bulk",
+        prices,
+        validate,
+        insert_many(SET_PRICE_SQL),
+        chunk_size,
+        tables=("materials",),
+        count="updated",
+    )
+
+def list_materials_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of materials ordered by id, as (Material records, next_token).
+    Pass next_token back to get the following page; it is None on the last page.
+    Returns None on a database error (not an empty last page).
+    """
     conn = None
     try:
+        after = decode_token(token)[0] if token else 0
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, item_name, price_per_unit, unit_type, quantity_in_stock FROM materials")
-            rows = cursor.fetchall()
-            print("ID | Name                 | Price   | Unit    | Quantity")
-            print("---|----------------------|---------|---------|---------")
-            for row in rows:
-                print(f"{row[0]:<3}| {row[1]:<20} | {row[2]:<7} | {row[3]:<7} | {row[4]}")
+            cursor.execute(MATERIALS_PAGE_SQL, (after, page_size + 1))
+            return page_result(Material.from_rows(cursor.fetchall()), page_size, key=lambda row: [row.id])
     except Exception as e:
-        print(f"Database error during list_materials: {e}")
+        print(f"Database error during list_materials_page: {e}")
     finally:
         if conn:
             conn.close()
+    return None
+
+def list_materials(page_size=DEFAULT_PAGE_SIZE):
+    """Prints all materials, one page-sized table at a time."""
+    print_pages(list_materials_page, Material, page_size)
 
-def search_material(name):
+def find_materials(name, limit=search_index.DEFAULT_LIMIT):
+    """Materials whose name matches `name`, best match first (typos tolerated), as Material records."""
     conn = None
     try:
+        matches = search_index.search("materials", name, limit)
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id, item_name, price_per_unit, unit_type, quantity_in_stock FROM materials WHERE item_name LIKE %s",
-                (f"%{name}%",)
-            )
-            rows = cursor.fetchall()
-            if rows:
-                print(tabulate(rows, headers=["ID", "Name", "Price", "Unit", "Quantity"], tablefmt="grid"))
-            else:
-                print(f"No materials found matching: {name}")
+            return Material.from_rows(search_index.fetch_ranked(
+                cursor, "materials", "id, item_name, price_per_unit, unit_type, quantity_in_stock", matches
+            ))
     except Exception as e:
-        print(f"Database error during search_material: {e}")
+        print(f"Database error during find_materials: {e}")
     finally:
         if conn:
             conn.close()
+    return []
+
+def search_material(name, limit=search_index.DEFAULT_LIMIT):
+    """Prints and returns the materials found by find_materials()."""
+    rows = find_materials(name, limit)
+    print_table(rows, Material, empty_message=f"No materials found matching: {name}")
+    return rows
 
 def update_material(id, price=None, quantity=None):
     conn = None
@@ -72,10 +172,18 @@ def update_material(id, price=None, quantity=None):
         if conn:
             cursor = conn.cursor()
             if price is not None:
-                cursor.execute("UPDATE materials SET price_per_unit=%s WHERE id=%s", (price, id))
+                cursor.execute(SET_PRICE_SQL, (price, id))
+            before = None
             if quantity is not None:
-                cursor.execute("UPDATE materials SET quantity_in_stock=%s WHERE id=%s", (quantity, id))
+                cursor.execute(STOCK_FOR_UPDATE_SQL, (id,))
+                result = cursor.fetchone()
+                before = result[0] if result else None
+                cursor.execute(SET_STOCK_SQL, (quantity, id))
+                if before is not None:
+                    stock_journal.record_movements(cursor, [(id, quantity - before, "adjustment")])
             conn.commit()
+            invalidate("materials")
+            stock_alerts.stock_changed(id, before, quantity)
             print(f"Material ID {id} updated!")
     except Exception as e:
         print(f"Database error during update_material: {e}")
@@ -91,8 +199,14 @@ def delete_material(id):
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM materials WHERE id=%s", (id,))
+            cursor.execute(STOCK_FOR_UPDATE_SQL, (id,))
+            result = cursor.fetchone()
+            cursor.execute(MATERIAL_DELETE_SQL, (id,))
+            if result:
+                stock_journal.record_movements(cursor, [(id, -result[0], "delete")])
             conn.commit()
+            invalidate("materials")
+            search_index.remove_row("materials", id)
             print(f"Material ID {id} deleted!")
     except Exception as e:
         print(f"Database error during delete_material: {e}")
@@ -102,109 +216,83 @@ def delete_material(id):
         if conn:
             conn.close()
 
-def show_low_stock(threshold=20):
+def get_low_stock(threshold=20):
+    """Materials with quantity_in_stock <= threshold, lowest stock first, as LowStockItem records ([] on error)."""
     conn = None
     try:
         conn = create_connection()
         if conn:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(
-                "SELECT item_name, quantity_in_stock FROM materials WHERE quantity_in_stock <= %s",
-                (threshold,)
-            )
-            rows = cursor.fetchall()
-            if rows:
-                print("Low Stock Alert!")
-                for item in rows:
-                    print(f"{item['item_name']}: {item['quantity_in_stock']} units left")
-                return rows  # Always return a list (may be empty)
-            else:
-                print("All stocks are sufficient.")
-                return []
+            cursor = conn.cursor()
+            cursor.execute(LOW_STOCK_SQL, (threshold,))
+            return LowStockItem.from_rows(cursor.fetchall())
     except Exception as e:
-        print(f"Database error during show_low_stock: {e}")
-        return []
+        print(f"Database error during get_low_stock: {e}")
     finally:
         if conn:
             conn.close()
+    return []
+
+def iter_low_stock(threshold=20):
+    """Like get_low_stock(), but a generator reading the rows as they are needed (errors are raised)."""
+    for row in iter_rows(LOW_STOCK_SQL, (threshold,)):
+        yield LowStockItem(*row)
+
+def show_low_stock(threshold=20):
+    """Prints the low-stock items and returns them as dicts (always a list, may be empty)."""
+    rows = get_low_stock(threshold)
+    if rows:
+        print("Low Stock Alert!")
+        for item in rows:
+            print(f"{item.item_name}: {item.quantity_in_stock} units left")
+    else:
+        print("All stocks are sufficient.")
+    return to_dicts(rows)
 
 
 def export_low_stock_csv(path=None, threshold=20):
-    """Exports low stock materials (below threshold) to a CSV file."""
     """
-    Export low stock materials to a CSV.
+    Exports materials at or below `threshold` to a CSV file and returns its path.
     Columns: item_name, quantity_in_stock, unit_type, supplier_id
+    The rows are streamed from the database into the file (see iter_low_stock).
     """
-    conn = None
     try:
+        rows = iter_low_stock(threshold)
+        first = next(rows, None)
+        if first is None:
+            print(f"No items at or below threshold {threshold}. CSV not created.")
+            return None
         if path is None:
             stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             path = f"low_stock_{threshold}_{stamp}.csv"
-
-        conn = create_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT item_name, quantity_in_stock, unit_type, supplier_id
-                FROM materials
-                WHERE quantity_in_stock <= %s
-                ORDER BY quantity_in_stock ASC, item_name ASC
-            """, (threshold,))
-            rows = cursor.fetchall()
-
-            if not rows:
-                print(f"No items at or below threshold {threshold}. CSV not created.")
-                return None
-
-            with open(path, mode="w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["item_name", "quantity_in_stock", "unit_type", "supplier_id"])
-                writer.writerows(rows)
-
-            print(f"Low stock report saved to {path}")
-            return path
+        write_csv(path, chain([first], rows), LowStockItem)
+        print(f"Low stock report saved to {path}")
+        return path
     except Exception as e:
         print(f"Error during export_low_stock_csv: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 def notify_low_stock(threshold=20, channel="stdout"):
     """
-    Notification stub. For now, prints to stdout.
-    Extend later to email/Slack/SMS by implementing those channels.
+    Sends every item at or below `threshold` through an alert channel: a stock_alerts
+    spec ("stdout", "file:<path>", "webhook:<url>", "smtp[:host[:port]]") or a Channel.
+    This is the on-demand digest; alerts as stock drops are raised by stock_alerts.
+    Returns the number of items sent.
     """
-    conn = None
+    rows = get_low_stock(threshold)
+    if not rows:
+        print(f"No low-stock items at or below {threshold}.")
+        return 0
     try:
-        conn = create_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT item_name, quantity_in_stock
-                FROM materials
-                WHERE quantity_in_stock <= %s
-                ORDER BY quantity_in_stock ASC, item_name ASC
-            """, (threshold,))
-            rows = cursor.fetchall()
-
-            if not rows:
-                print(f"No low-stock items at or below {threshold}.")
-                return
-
-            if channel == "stdout":
-                print(f"Low-stock items (≤{threshold}):")
-                for name, qty in rows:
-                    print(f"- {name}: {qty} units remaining")
-            else:
-                # Placeholder for future channels (e.g., 'email', 'slack')
-                print(f"[{channel}] Notification channel not configured yet.")
+        if isinstance(channel, str):
+            channel = stock_alerts.channel_from_spec(channel)
+        raised_at = datetime.now().replace(microsecond=0)
+        for item in rows:
+            channel.send(StockAlert(None, item.item_name, item.quantity_in_stock, threshold,
+                                    item.supplier_id, raised_at))
+        return len(rows)
     except Exception as e:
         print(f"Error during notify_low_stock: {e}")
-    finally:
-        if conn:
-            conn.close()
-
+        return 0
 
 if __name__ == "__main__":
     materials = [
@@ -219,8 +307,7 @@ if __name__ == "__main__":
         ("Paint (20L)", 2100.00, "tin", 40, 3),
         ("Tiles (Box of 10)", 650.00, "box", 300, 1),
     ]
-    for m in materials:
-        add_material(*m)
+    add_materials_bulk(materials)
     
     list_materials()
     
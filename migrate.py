@@ -0,0 +1,175 @@
+"""
+Versioned schema migrations.
+
+Migrations are the numbered .sql files in migrations/<backend>/ (0001_initial_schema.sql,
+...), one directory per db_connect backend with the same versions in each.
+Applied versions are recorded in the schema_migrations table, so each file runs once.
+
+    python migrate.py                 # apply all pending migrations
+    python migrate.py status          # list applied / pending migrations
+    python migrate.py baseline 0001   # mark 0001 as applied without running it
+                                      # (for databases created with the old schema.sql)
+
+0001 is the only migration a schema.sql database cannot run (its ALTER TABLEs would add
+the customer_id/supplier_id columns twice). Every revision of schema.sql created all of
+0001, but only later ones had 0002's rollup tables, so baseline at 0001 and let 0002
+(CREATE TABLE IF NOT EXISTS) run: it creates the tables where they are missing.
+"""
+import argparse
+import os
+import re
+
+import db_connect
+from db_connect import create_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def migrations_dir(backend=None):
+    return os.path.join(MIGRATIONS_DIR, backend or db_connect.db_backend)
+
+
+def list_migrations(backend=None):
+    """[(version, name, path), ...] for the backend (default: the configured one), sorted by version."""
+    directory = migrations_dir(backend)
+    found = []
+    for filename in sorted(os.listdir(directory)):
+        match = re.match(r"^(\d{4})_(.+)\.sql$", filename)
+        if match:
+            found.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    return found
+
+
+def split_statements(sql):
+    """
+    Splits a migration file on ';' after dropping -- and /* */ comments. A CREATE TRIGGER
+    runs up to its END, keeping the ';'s of its BEGIN ... END body.
+    """
+    sql = re.sub(r"/\*.*?\*/", "", sql, flags=re.S)
+    sql = "\n".join(line for line in sql.splitlines() if not line.strip().startswith("--"))
+    statements, trigger = [], []
+    for part in sql.split(";"):
+        if trigger or re.match(r"\s*CREATE\s+TRIGGER\b", part, re.I):
+            trigger.append(part)
+            if re.search(r"\bEND\s*$", part, re.I):
+                statements.append(";".join(trigger).strip())
+                trigger = []
+        elif part.strip():
+            statements.append(part.strip())
+    return statements
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(16) PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(target=None):
+    """
+    Applies pending migrations in order, up to `target` (default: all).
+    DDL is committed as it runs, so a migration that fails halfway is not recorded;
+    fix the file (or the database) and run again.
+    Returns the list of versions applied.
+    """
+    conn = None
+    done = []
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            applied = applied_versions(cursor)
+            for version, name, path in list_migrations():
+                if version in applied or (target and version > target):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    statements = split_statements(f.read())
+                for stmt in statements:
+                    cursor.execute(stmt)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                conn.commit()
+                done.append(version)
+                print(f"Applied {version}_{name} ({len(statements)} statements)")
+            if not done:
+                print("Schema is up to date.")
+    except Exception as e:
+        print(f"Migration failed after {done or 'no migrations'}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return done
+
+
+def baseline(version):
+    """Marks every migration up to `version` as applied without running it."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            applied = applied_versions(cursor)
+            for v, name, _ in list_migrations():
+                if v <= version and v not in applied:
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (v, name))
+                    print(f"Marked {v}_{name} as applied")
+            conn.commit()
+    except Exception as e:
+        print(f"Error during baseline: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def status():
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            applied = applied_versions(cursor)
+            conn.commit()
+            for version, name, _ in list_migrations():
+                print(f"[{'x' if version in applied else ' '}] {version}_{name}")
+    except Exception as e:
+        print(f"Error reading migration status: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd")
+
+    p1 = sub.add_parser("up", help="Apply pending migrations (default)")
+    p1.add_argument("--target", help="Stop after this version")
+
+    sub.add_parser("status")
+
+    p3 = sub.add_parser("baseline")
+    p3.add_argument("version")
+
+    args = parser.parse_args()
+    if args.cmd == "status":
+        status()
+    elif args.cmd == "baseline":
+        baseline(args.version)
+    else:
+        migrate(getattr(args, "target", None))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+-- Daily sales rollup used by analytics and the dashboard (see rollup.py).
+
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    day DATE NOT NULL,
+    item_id INT NOT NULL,
+    customer_id INT NOT NULL DEFAULT 0,
+    sale_count INT NOT NULL DEFAULT 0,
+    quantity INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    amount_paid DECIMAL(14,2) NOT NULL DEFAULT 0,
+    amount_due DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, item_id, customer_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id TINYINT PRIMARY KEY,
+    covered_from DATE NOT NULL
+);
@@ -0,0 +1,5 @@
+-- FULLTEXT indexes for the optional "fulltext" search backend (search_index.set_backend("fulltext")).
+-- The ngram parser indexes character bigrams, so partial words match as well.
+CREATE FULLTEXT INDEX ft_materials_item_name ON materials (item_name) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ft_customers_name ON customers (customer_name) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ft_suppliers_name ON suppliers (supplier_name) WITH PARSER ngram;
@@ -0,0 +1,34 @@
+-- Payments ledger and outstanding balances (see payments.py and balances.py).
+
+-- Payments of one sale, in the order they were recorded.
+CREATE INDEX idx_payments_order ON payments (order_no, payment_id);
+
+-- Unpaid amount and number of unpaid sales per customer (customer_id 0 = sales without one).
+CREATE TABLE IF NOT EXISTS customer_balances (
+    customer_id INT PRIMARY KEY,
+    outstanding DECIMAL(14,2) NOT NULL DEFAULT 0,
+    open_sales INT NOT NULL DEFAULT 0
+);
+
+-- "Who owes us": largest balances first.
+CREATE INDEX idx_balances_outstanding ON customer_balances (outstanding, customer_id);
+
+-- The same totals over all customers, striped over 16 slots (customer_id % 16) so that
+-- concurrent writers for different customers don't queue on a single row.
+CREATE TABLE IF NOT EXISTS balance_totals (
+    slot TINYINT PRIMARY KEY,
+    outstanding DECIMAL(14,2) NOT NULL DEFAULT 0,
+    open_sales INT NOT NULL DEFAULT 0
+);
+
+-- Backfill from the sales recorded so far.
+INSERT INTO customer_balances (customer_id, outstanding, open_sales)
+SELECT IFNULL(customer_id, 0), SUM(amount_due), COUNT(*)
+FROM sales
+WHERE amount_due > 0
+GROUP BY IFNULL(customer_id, 0);
+
+INSERT INTO balance_totals (slot, outstanding, open_sales)
+SELECT customer_id % 16, SUM(outstanding), SUM(open_sales)
+FROM customer_balances
+GROUP BY customer_id % 16;
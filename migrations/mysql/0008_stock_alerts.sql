@@ -0,0 +1,21 @@
+-- Low-stock alerts (see stock_alerts.py).
+
+-- Per-item alert threshold; items without a row use DEFAULT_THRESHOLD.
+-- cooldown_seconds NULL = DEFAULT_COOLDOWN.
+CREATE TABLE IF NOT EXISTS stock_thresholds (
+    item_id INT PRIMARY KEY,
+    threshold INT NOT NULL,
+    cooldown_seconds INT NULL
+);
+
+-- Every alert raised, for the cool-down across processes and `stock_alerts.py recent`.
+CREATE TABLE IF NOT EXISTS stock_alerts (
+    alert_id INT AUTO_INCREMENT PRIMARY KEY,
+    item_id INT NOT NULL,
+    quantity INT NOT NULL,
+    threshold INT NOT NULL,
+    raised_at DATETIME NOT NULL
+);
+
+-- Last alert of one item (cool-down check).
+CREATE INDEX idx_stock_alerts_item ON stock_alerts (item_id, raised_at);
@@ -0,0 +1,25 @@
+-- Demand forecasts and reorder points (see forecast.py).
+
+-- Days from placing an order with the supplier to the goods arriving; NULL = DEFAULT_LEAD_TIME.
+ALTER TABLE suppliers ADD COLUMN lead_time_days INT NULL;
+
+-- Demand per item and day from a date on (the days forecast.py folds in), covering.
+CREATE INDEX idx_sales_date_item ON sales (sale_date, item_id, quantity);
+
+-- Exponentially smoothed daily demand per material, as of through_day. level and
+-- level_sq are the smoothed quantity and squared quantity (before bias correction);
+-- first_day is the first day with a sale. Only items with new sales are updated.
+CREATE TABLE IF NOT EXISTS demand_forecasts (
+    item_id INT PRIMARY KEY,
+    first_day DATE NOT NULL,
+    through_day DATE NOT NULL,
+    level DOUBLE NOT NULL DEFAULT 0,
+    level_sq DOUBLE NOT NULL DEFAULT 0
+);
+
+-- Sales up to last_order_no are folded into demand_forecasts, with smoothing factor alpha.
+CREATE TABLE IF NOT EXISTS forecast_state (
+    id INT PRIMARY KEY,
+    last_order_no INT NOT NULL DEFAULT 0,
+    alpha DOUBLE NOT NULL
+);
@@ -0,0 +1,14 @@
+-- Time of the last write to each catalogue row, kept by MySQL itself, so writes from any
+-- process (API, CLI, Streamlit, imports) count. The HTTP API builds its ETags from
+-- COUNT(*) and MAX(updated_at) of the table (see api_server.table_etag).
+ALTER TABLE customers
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE suppliers
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE materials
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+-- MAX(updated_at) from the end of an index.
+CREATE INDEX idx_customers_updated_at ON customers (updated_at);
+CREATE INDEX idx_suppliers_updated_at ON suppliers (updated_at);
+CREATE INDEX idx_materials_updated_at ON materials (updated_at);
@@ -0,0 +1,55 @@
+-- Baseline schema, SQLite edition of mysql/0001_initial_schema.sql.
+-- Same tables and column order; the columns MySQL adds with ALTER TABLE are declared
+-- inline (SQLite cannot add foreign keys later). Money columns are REAL.
+
+CREATE TABLE IF NOT EXISTS suppliers (
+    supplier_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    supplier_name VARCHAR(50) NOT NULL,
+    phone VARCHAR(15),
+    address VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS materials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_name VARCHAR(50) NOT NULL,
+    price_per_unit REAL NOT NULL,
+    unit_type VARCHAR(20) DEFAULT 'quintal',
+    quantity_in_stock INTEGER DEFAULT 0,
+    supplier_id INTEGER REFERENCES suppliers(supplier_id)
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_name VARCHAR(50) NOT NULL,
+    phone VARCHAR(15),
+    address VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS sales (
+    order_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_name VARCHAR(50),
+    item_id INTEGER REFERENCES materials(id),
+    quantity INTEGER,
+    sale_date DATE,
+    total REAL,
+    payment_method VARCHAR(20) DEFAULT 'Cash',
+    amount_paid REAL DEFAULT 0,
+    amount_due REAL DEFAULT 0,
+    payment_status VARCHAR(20) DEFAULT 'Pending',
+    customer_id INTEGER REFERENCES customers(customer_id)
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(30) UNIQUE,
+    password VARCHAR(100),
+    role VARCHAR(20) DEFAULT 'staff'
+);
+
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_no INTEGER REFERENCES sales(order_no),
+    payment_date DATE,
+    payment_method VARCHAR(20),
+    paid_amount REAL
+);
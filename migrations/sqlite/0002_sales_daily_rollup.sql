@@ -0,0 +1,18 @@
+-- Daily sales rollup used by analytics and the dashboard (see rollup.py).
+
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    day DATE NOT NULL,
+    item_id INTEGER NOT NULL,
+    customer_id INTEGER NOT NULL DEFAULT 0,
+    sale_count INTEGER NOT NULL DEFAULT 0,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue REAL NOT NULL DEFAULT 0,
+    amount_paid REAL NOT NULL DEFAULT 0,
+    amount_due REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, item_id, customer_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    id INTEGER PRIMARY KEY,
+    covered_from DATE NOT NULL
+);
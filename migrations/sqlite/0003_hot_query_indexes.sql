@@ -0,0 +1,24 @@
+-- Secondary indexes for the hot read paths.
+
+-- sales_by_day / revenue_period / dashboard date filters on the raw sales table:
+-- range on sale_date, covering the summed columns so no row lookups are needed.
+CREATE INDEX idx_sales_date_totals ON sales (sale_date, total, amount_paid, amount_due);
+
+-- "Total unpaid" / who owes us: amount_due > 0.
+CREATE INDEX idx_sales_amount_due ON sales (amount_due, customer_id, sale_date);
+
+-- top_customers / popular_items joins, covering the aggregated column.
+CREATE INDEX idx_sales_customer_total ON sales (customer_id, total);
+CREATE INDEX idx_sales_item_quantity ON sales (item_id, quantity);
+
+-- Low-stock checks: quantity_in_stock <= threshold.
+CREATE INDEX idx_materials_stock ON materials (quantity_in_stock, item_name);
+
+-- Name searches (prefix LIKE 'Cem%' uses these; '%cem%' still scans, see search_material).
+CREATE INDEX idx_materials_item_name ON materials (item_name);
+CREATE INDEX idx_customers_name ON customers (customer_name);
+CREATE INDEX idx_suppliers_name ON suppliers (supplier_name);
+
+-- Rollup reads by item or customer across all days.
+CREATE INDEX idx_rollup_item ON sales_daily_rollup (item_id, quantity);
+CREATE INDEX idx_rollup_customer ON sales_daily_rollup (customer_id, revenue);
@@ -0,0 +1,2 @@
+-- Keyset pagination of sales (list_sales_page): ORDER BY sale_date DESC, order_no DESC.
+CREATE INDEX idx_sales_date_order ON sales (sale_date, order_no);
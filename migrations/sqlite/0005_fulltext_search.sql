@@ -0,0 +1,3 @@
+-- MySQL FULLTEXT indexes have no SQLite counterpart here: on SQLite name search
+-- always uses the in-process trigram index (search_index.py). Kept as a no-op so
+-- both backends share the same migration versions.
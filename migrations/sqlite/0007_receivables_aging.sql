@@ -0,0 +1,20 @@
+-- Open dues per customer and sale day, for the receivables aging report (see balances.py).
+-- Settled rows are deleted, and dues older than the 90+ boundary are folded into one
+-- 1970-01-01 row per customer, so the table stays proportional to recent open dues.
+
+CREATE TABLE IF NOT EXISTS receivables_daily (
+    customer_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    outstanding REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (customer_id, day)
+);
+
+-- Folding by day range (compact_receivables).
+CREATE INDEX idx_receivables_day ON receivables_daily (day);
+
+-- Backfill from the sales recorded so far.
+INSERT INTO receivables_daily (customer_id, day, outstanding)
+SELECT IFNULL(customer_id, 0), sale_date, SUM(amount_due)
+FROM sales
+WHERE amount_due > 0
+GROUP BY IFNULL(customer_id, 0), sale_date;
@@ -0,0 +1,38 @@
+-- Stock movement journal and inventory snapshots (see stock_journal.py).
+
+-- Append-only: every change to materials.quantity_in_stock, written in the same
+-- transaction as the change. reason is opening, sale, receipt, adjustment or delete;
+-- ref_no is the order_no of a sale (or the purchase order of a receipt).
+CREATE TABLE IF NOT EXISTS stock_movements (
+    movement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    moved_at DATETIME NOT NULL,
+    quantity_change INTEGER NOT NULL,
+    reason VARCHAR(16) NOT NULL,
+    ref_no INTEGER NULL
+);
+
+-- History of one item, newest first.
+CREATE INDEX idx_movements_item ON stock_movements (item_id, movement_id);
+
+-- Stock of every item as of last_movement_id; a point-in-time query starts from the
+-- latest snapshot before it and replays the movements after.
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taken_at DATETIME NOT NULL,
+    last_movement_id INTEGER NOT NULL
+);
+
+CREATE INDEX idx_snapshots_taken ON stock_snapshots (taken_at, snapshot_id);
+
+CREATE TABLE IF NOT EXISTS stock_snapshot_items (
+    snapshot_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, item_id)
+);
+
+-- Opening balance of the materials recorded so far.
+INSERT INTO stock_movements (item_id, moved_at, quantity_change, reason)
+SELECT id, datetime('now', 'localtime'), quantity_in_stock, 'opening'
+FROM materials;
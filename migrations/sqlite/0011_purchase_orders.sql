@@ -0,0 +1,37 @@
+-- Purchase orders, goods receipts and supplier statistics (see purchase_orders.py).
+
+-- status: Open, Partial (some goods received), Received (all), Closed (closed short).
+CREATE TABLE IF NOT EXISTS purchase_orders (
+    po_no INTEGER PRIMARY KEY AUTOINCREMENT,
+    supplier_id INTEGER NOT NULL,
+    ordered_on DATE NOT NULL,
+    expected_on DATE NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'Open',
+    last_received_on DATE NULL,
+    FOREIGN KEY (supplier_id) REFERENCES suppliers(supplier_id)
+);
+
+-- Open orders of a supplier.
+CREATE INDEX idx_po_supplier_status ON purchase_orders (supplier_id, status, po_no);
+CREATE INDEX idx_po_status ON purchase_orders (status, po_no);
+
+CREATE TABLE IF NOT EXISTS purchase_order_lines (
+    po_no INTEGER NOT NULL,
+    line_no INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    quantity_ordered INTEGER NOT NULL,
+    quantity_received INTEGER NOT NULL DEFAULT 0,
+    unit_price REAL NULL,
+    PRIMARY KEY (po_no, line_no)
+);
+
+-- Running totals per supplier, updated when one of its orders is received in full or closed.
+CREATE TABLE IF NOT EXISTS supplier_stats (
+    supplier_id INTEGER PRIMARY KEY,
+    orders_closed INTEGER NOT NULL DEFAULT 0,
+    orders_complete INTEGER NOT NULL DEFAULT 0,
+    lead_orders INTEGER NOT NULL DEFAULT 0,
+    lead_days_total INTEGER NOT NULL DEFAULT 0,
+    quantity_ordered INTEGER NOT NULL DEFAULT 0,
+    quantity_received INTEGER NOT NULL DEFAULT 0
+);
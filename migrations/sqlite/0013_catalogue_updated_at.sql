@@ -0,0 +1,40 @@
+-- Time of the last write to each catalogue row, kept by triggers, so writes from any
+-- process (API, CLI, Streamlit, imports) count. The HTTP API builds its ETags from
+-- COUNT(*) and MAX(updated_at) of the table (see api_server.table_etag).
+-- SQLite can't add a column defaulting to the current time, hence the INSERT triggers.
+
+ALTER TABLE customers ADD COLUMN updated_at TIMESTAMP NULL;
+UPDATE customers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now');
+CREATE INDEX idx_customers_updated_at ON customers (updated_at);
+CREATE TRIGGER customers_inserted AFTER INSERT ON customers FOR EACH ROW
+BEGIN
+    UPDATE customers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE customer_id = NEW.customer_id;
+END;
+CREATE TRIGGER customers_updated AFTER UPDATE ON customers FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE customers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE customer_id = NEW.customer_id;
+END;
+
+ALTER TABLE suppliers ADD COLUMN updated_at TIMESTAMP NULL;
+UPDATE suppliers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now');
+CREATE INDEX idx_suppliers_updated_at ON suppliers (updated_at);
+CREATE TRIGGER suppliers_inserted AFTER INSERT ON suppliers FOR EACH ROW
+BEGIN
+    UPDATE suppliers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE supplier_id = NEW.supplier_id;
+END;
+CREATE TRIGGER suppliers_updated AFTER UPDATE ON suppliers FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE suppliers SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE supplier_id = NEW.supplier_id;
+END;
+
+ALTER TABLE materials ADD COLUMN updated_at TIMESTAMP NULL;
+UPDATE materials SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now');
+CREATE INDEX idx_materials_updated_at ON materials (updated_at);
+CREATE TRIGGER materials_inserted AFTER INSERT ON materials FOR EACH ROW
+BEGIN
+    UPDATE materials SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+END;
+CREATE TRIGGER materials_updated AFTER UPDATE ON materials FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+BEGIN
+    UPDATE materials SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+END;
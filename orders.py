@@ -0,0 +1,144 @@
+import time
+from datetime import date
+from db_connect import MAX_TX_RETRIES, create_connection, is_retryable
+from query_cache import invalidate
+from sales_crud import SALE_INSERT_SQL, validate_sale
+import balances
+import payments
+import rollup
+import stock_alerts
+import stock_journal
+
+
+def _order_lines(customer_id, lines):
+    """Validates every line; returns ([(item_id, quantity, total), ...], error)."""
+    if not lines:
+        return [], "An order needs at least one line."
+    parsed = []
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, dict):
+            item_id, quantity, total = line["item_id"], line["quantity"], line["total"]
+        else:
+            item_id, quantity, total = line
+        _, _, error = validate_sale(customer_id, item_id, quantity, total)
+        if error:
+            return [], f"Line {number}: {error}"
+        parsed.append((item_id, quantity, total))
+    return parsed, None
+
+
+def _split_payment(lines, amount_paid):
+    """Allocates the amount paid for the whole order to its lines, first line first."""
+    remaining = amount_paid
+    split = []
+    for _, _, total in lines:
+        paid = min(total, remaining)
+        remaining -= paid
+        split.append((paid, total - paid))
+    return split
+
+
+def place_order(customer_id, lines, payment_method="Cash", amount_paid=None, payment_status=None):
+    """
+    Sells several items to one customer in a single transaction.
+
+    lines: iterable of (item_id, quantity, total) or dicts with those keys.
+    amount_paid covers the whole order (default: everything) and is applied to the
+    lines in order. Without an explicit payment_status each line gets Paid/Partial/Pending.
+
+    All stock rows of the order are locked with one SELECT ... FOR UPDATE in id order,
+    so two overlapping orders always lock in the same order and cannot deadlock each
+    other. If any line is short of stock nothing is written. Stock is decremented with
+    one executemany, the sales rows are inserted with another, and the transaction is
+    committed once.
+
+    Returns the list of new order_nos (one per line), or None if the order was rejected.
+    """
+    lines, error = _order_lines(customer_id, list(lines))
+    if error:
+        print(f"Error: {error}")
+        return None
+    order_total = sum(total for _, _, total in lines)
+    if amount_paid is None:
+        amount_paid = order_total
+    if amount_paid < 0 or amount_paid > order_total:
+        print("Error: Amount paid must be between 0 and the order total.")
+        return None
+
+    needed = {}
+    for item_id, quantity, _ in lines:
+        needed[item_id] = needed.get(item_id, 0) + quantity
+    item_ids = sorted(needed)
+    today = date.today()
+    rows = []
+    for (item_id, quantity, total), (paid, due) in zip(lines, _split_payment(lines, amount_paid)):
+        rows.append((customer_id, item_id, quantity, today, total, payment_method,
+                     paid, due, payment_status or payments.payment_status(paid, due)))
+
+    for attempt in range(1, MAX_TX_RETRIES + 1):
+        conn = None
+        try:
+            conn = create_connection()
+            if not conn:
+                return None
+            cursor = conn.cursor()
+            placeholders = ", ".join(["%s"] * len(item_ids))
+            cursor.execute(
+                f"SELECT id, quantity_in_stock FROM materials WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE",
+                tuple(item_ids)
+            )
+            stock = dict(cursor.fetchall())
+            for item_id in item_ids:
+                if item_id not in stock:
+                    print(f"Error: Material with ID {item_id} not found.")
+                    return None
+                if stock[item_id] < needed[item_id]:
+                    print(f"Error: Not enough stock for item {item_id}. Only {stock[item_id]} units available.")
+                    return None
+
+            cursor.executemany(
+                "UPDATE materials SET quantity_in_stock = quantity_in_stock - %s WHERE id = %s",
+                [(needed[item_id], item_id) for item_id in item_ids]
+            )
+            cursor.executemany(SALE_INSERT_SQL, rows)
+            # One multi-row INSERT gets consecutive auto-increment values.
+            first_order_no = cursor.lastrowid
+            rollup.record_sales(cursor, rows)
+            balances.record_sales(cursor, rows)
+            stock_journal.record_movements(cursor, [(row[1], -row[2], "sale", first_order_no + i)
+                                                    for i, row in enumerate(rows)])
+            conn.commit()
+            break
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            if is_retryable(e) and attempt < MAX_TX_RETRIES:
+                time.sleep(0.05 * attempt)
+                continue
+            print(f"Database error during place_order: {e}")
+            print("Transaction rolled back due to error.")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    # The order is committed: nothing below may roll it back, retry it or report it as failed.
+    order_nos = list(range(first_order_no, first_order_no + len(rows)))
+    try:
+        invalidate("sales", "materials", "customer_balances")
+        stock_alerts.stock_changes((item_id, stock[item_id], stock[item_id] - needed[item_id])
+                                   for item_id in item_ids)
+    except Exception as e:
+        print(f"Warning: order {order_nos} was recorded, but updating caches/alerts failed: {e}")
+    print(f"Order recorded for customer ID {customer_id}: {len(rows)} lines, total {order_total}.")
+    return order_nos
+
+
+if __name__ == "__main__":
+    # Site delivery: cement, steel rods and bricks in one order, half paid up front
+    place_order(
+        customer_id=1,
+        lines=[(1, 20, 7800.0), (2, 2, 9200.0), (4, 1000, 9000.0)],
+        payment_method="Cash",
+        amount_paid=13000.0,
+    )
@@ -0,0 +1,61 @@
+"""
+Keyset pagination helpers.
+
+A page is fetched with "WHERE key > last key seen ORDER BY key LIMIT n" instead of
+OFFSET, so page 1000 costs the same as page 1. The last key of a page is handed to
+the caller as an opaque string token; passing it back returns the next page.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_token(values):
+    """Turns the key values of the last row on a page into an opaque URL-safe token."""
+    payload = [{"d": v.isoformat()} if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Inverse of encode_token(); raises ValueError for a malformed token."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError(f"Invalid page token: {token!r}")
+    return [date.fromisoformat(v["d"]) if isinstance(v, dict) else v for v in payload]
+
+
+def page_result(rows, page_size, key):
+    """
+    Trims a page fetched with LIMIT page_size + 1 and builds the next token
+    from key(last_row) if there was an extra row. Returns (rows, next_token).
+    """
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_token(key(rows[-1]))
+    return rows, None
+
+
+class PageFetchError(RuntimeError):
+    """A page of a keyset listing could not be read."""
+
+
+def iter_pages(fetch_page, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yields one page (list of rows) at a time until fetch_page(token, page_size) runs out.
+    fetch_page returns None when a page can't be read; that raises PageFetchError rather
+    than passing for the last page.
+    """
+    token = None
+    while True:
+        page = fetch_page(token, page_size)
+        if page is None:
+            raise PageFetchError("A page could not be read; the listing is incomplete.")
+        rows, token = page
+        if rows:
+            yield rows
+        if not token:
+            return
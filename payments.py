@@ -0,0 +1,200 @@
+"""
+Payments ledger: part-payments against recorded sales.
+
+Every payment is a row in `payments`. Recording it updates, in the same transaction,
+the sale's amount_paid / amount_due / payment_status, the daily rollup and the
+customer balances (balances.py), so the dashboard, analytics and "who owes us"
+stay consistent without rescanning sales.
+
+    python payments.py pay 1042 500 --method UPI
+    python payments.py import payments.csv        # order_no,amount[,payment_method,payment_date]
+    python payments.py history 1042
+    python payments.py balances --limit 10
+"""
+import argparse
+from datetime import date, datetime
+
+import balances
+import columnar
+import rollup
+from bulk_ops import DEFAULT_CHUNK_SIZE, run_chunked
+from db_connect import create_connection
+from records import CustomerBalance, Payment
+from render import print_table
+
+PAYMENT_INSERT_SQL = """
+    INSERT INTO payments (order_no, payment_date, payment_method, paid_amount)
+    VALUES (%s, %s, %s, %s)
+"""
+PAYMENT_FIELDS = ("order_no", "amount", "payment_method", "payment_date")
+SALE_UPDATE_SQL = "UPDATE sales SET amount_paid = %s, amount_due = %s, payment_status = %s WHERE order_no = %s"
+PAYMENTS_OF_SALE_SQL = """
+    SELECT payment_id, order_no, payment_date, payment_method, paid_amount
+    FROM payments WHERE order_no = %s ORDER BY payment_id
+"""
+
+# Amounts are compared to the cent: a payment may settle a due of 100.004 with 100.00.
+CENT = 0.005
+
+
+def payment_status(paid, due):
+    if due <= CENT:
+        return "Paid"
+    return "Partial" if paid > 0 else "Pending"
+
+
+def validate_payment(row):
+    """
+    Parses one payment: (order_no, amount[, payment_method[, payment_date]]) or a dict
+    with those keys; payment_date may be a date or YYYY-MM-DD. Returns (values, error).
+    """
+    fields = dict(payment_method=None, payment_date=None)
+    fields.update(row if isinstance(row, dict) else zip(PAYMENT_FIELDS, row))
+    order_no, amount, day = fields["order_no"], fields["amount"], fields["payment_date"]
+    if isinstance(order_no, str) and order_no.strip().isdigit():
+        order_no = int(order_no)
+    if not isinstance(order_no, int) or order_no <= 0:
+        return None, "Invalid order number."
+    amount = round(float(amount), 2)
+    if amount <= 0:
+        return None, "Payment amount must be positive."
+    if isinstance(day, str):
+        day = datetime.strptime(day, "%Y-%m-%d").date() if day.strip() else None
+    return (order_no, amount, fields["payment_method"] or "Cash", day or date.today()), None
+
+
+def _write_payments(touched):
+    def write(cursor, good):
+        order_nos = sorted({values[0] for _, values in good})
+        touched.update(order_nos)
+        placeholders = ", ".join(["%s"] * len(order_nos))
+        cursor.execute(
+            f"""SELECT order_no, sale_date, item_id, customer_id, amount_paid, amount_due
+                FROM sales WHERE order_no IN ({placeholders}) ORDER BY order_no FOR UPDATE""",
+            tuple(order_nos)
+        )
+        sales = {row[0]: [row[1], row[2], row[3], float(row[4] or 0), float(row[5] or 0)]
+                 for row in cursor.fetchall()}
+
+        rejected, inserts, rollup_payments, deltas = [], [], [], []
+        for index, (order_no, amount, method, day) in good:
+            sale = sales.get(order_no)
+            if sale is None:
+                rejected.append((index, f"Sale {order_no} not found."))
+                continue
+            sale_date, item_id, customer_id, paid, due = sale
+            if amount > due + CENT:
+                rejected.append((index, f"Payment of {amount} exceeds the amount due on sale {order_no} ({due})."))
+                continue
+            paid, due = round(paid + amount, 2), round(due - amount, 2)
+            if due <= CENT:
+                due = 0.0
+            sale[3], sale[4] = paid, due
+            inserts.append((order_no, day, method, amount))
+            rollup_payments.append((sale_date, item_id, customer_id, amount))
+            deltas.append((customer_id, sale_date, -amount, -1 if due == 0 else 0))
+
+        if inserts:
+            cursor.executemany(PAYMENT_INSERT_SQL, inserts)
+            paid_sales = sorted({order_no for order_no, *_ in inserts})
+            cursor.executemany(SALE_UPDATE_SQL, [
+                (sales[n][3], sales[n][4], payment_status(sales[n][3], sales[n][4]), n) for n in paid_sales
+            ])
+            rollup.record_payments(cursor, rollup_payments)
+            balances.apply_deltas(cursor, deltas)
+        return rejected
+    return write
+
+
+def record_payments(payments, chunk_size=DEFAULT_CHUNK_SIZE, label="record_payments"):
+    """
+    Records many payments, one transaction per chunk.
+
+    Each row is (order_no, amount[, payment_method[, payment_date]]) or a dict with
+    those keys. The chunk's sales rows are locked in order_no order; payments that
+    exceed what is still due (including several payments to one sale in the same
+    chunk) or name an unknown sale are rejected. The payment inserts and the sales
+    updates each go out as one executemany, followed by the rollup and balance deltas.
+
+    Returns {"inserted": n, "errors": [(row_index, message), ...]}.
+    """
+    touched = set()
+    result = run_chunked(label, payments, validate_payment, _write_payments(touched), chunk_size,
+                         tables=("sales", "payments", "customer_balances"))
+    columnar.mark_dirty(touched)
+    return result
+
+
+def record_payment(order_no, amount, payment_method="Cash", payment_date=None):
+    """Records one payment against a sale. Returns True if it was recorded."""
+    result = record_payments([(order_no, amount, payment_method, payment_date)], label="record_payment")
+    for _, message in result["errors"]:
+        print(f"Error: {message}")
+    return result["inserted"] == 1
+
+
+def list_payments(order_no):
+    """The payments of one sale, oldest first, as Payment records ([] on error)."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(PAYMENTS_OF_SALE_SQL, (order_no,))
+            return Payment.from_rows(cursor.fetchall())
+    except Exception as e:
+        print(f"Database error during list_payments: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return []
+
+
+def import_payments(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Records the payments of a CSV/Parquet file (order_no, amount[, payment_method, payment_date])."""
+    from data_import import read_rows
+    return record_payments((row for _, row in read_rows(path)), chunk_size, label="import_payments")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p1 = sub.add_parser("pay", help="Record one payment against a sale")
+    p1.add_argument("order_no", type=int)
+    p1.add_argument("amount", type=float)
+    p1.add_argument("--method", default="Cash")
+    p1.add_argument("--date", help="YYYY-MM-DD (default: today)")
+
+    p2 = sub.add_parser("import", help="Record a file of payments in batches")
+    p2.add_argument("path")
+    p2.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    p3 = sub.add_parser("history", help="Payments of one sale")
+    p3.add_argument("order_no", type=int)
+
+    p4 = sub.add_parser("balances", help="Customers with the largest outstanding balance")
+    p4.add_argument("--limit", type=int, default=10)
+
+    sub.add_parser("rebuild-balances", help="Recompute the balances from the sales table")
+    sub.add_parser("compact-aging", help="Fold dues older than 90 days into one row per customer (run daily)")
+
+    args = parser.parse_args()
+    if args.cmd == "pay":
+        record_payment(args.order_no, args.amount, args.method, args.date)
+    elif args.cmd == "import":
+        import_payments(args.path, args.chunk_size)
+    elif args.cmd == "history":
+        print_table(list_payments(args.order_no), Payment, empty_message="No payments recorded.")
+    elif args.cmd == "balances":
+        rows = balances.get_top_debtors(args.limit)
+        if rows is not None:
+            print(f"Total unpaid: {balances.get_total_unpaid()}")
+            print_table(rows, CustomerBalance, empty_message="Nobody owes anything.")
+    elif args.cmd == "rebuild-balances":
+        balances.rebuild_balances()
+    elif args.cmd == "compact-aging":
+        print(f"Folded {balances.compact_daily()} receivables rows.")
+
+if __name__ == "__main__":
+    main()
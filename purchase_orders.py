@@ -0,0 +1,462 @@
+"""
+Purchase orders and goods receipts.
+
+A purchase order lists materials ordered from one supplier; every line must be a
+material of that supplier (materials.supplier_id) or one without a supplier. Receiving
+a delivery books all its lines in one transaction: the materials rows are locked in id
+order, the stock increments and the line updates each go out as one executemany, and
+every line is journaled as a receipt (stock_journal) with the po_no as reference.
+
+When an order is received in full or closed short, its supplier's running totals in
+supplier_stats are updated (orders, lead days, units ordered and received), so lead
+time and fill rate per supplier never rescan the order history.
+
+    python purchase_orders.py create 2 3:500 7:120:45.5       # supplier 2, item:quantity[:unit price]
+    python purchase_orders.py receive 14                      # everything still outstanding
+    python purchase_orders.py receive 14 --lines 3:200        # a partial delivery
+    python purchase_orders.py close 14                        # the rest is not coming
+    python purchase_orders.py open
+    python purchase_orders.py stats
+"""
+import argparse
+from datetime import date
+
+import stock_alerts
+import stock_journal
+from db_connect import create_connection
+from query_cache import invalidate
+from records import PurchaseOrder, PurchaseOrderLine, SupplierStats
+from render import print_table
+
+STATUSES = ("Open", "Partial", "Received", "Closed")
+OPEN_STATUSES = ("Open", "Partial")
+
+PO_INSERT_SQL = """
+    INSERT INTO purchase_orders (supplier_id, ordered_on, expected_on, status)
+    VALUES (%s, %s, %s, 'Open')
+"""
+LINE_INSERT_SQL = """
+    INSERT INTO purchase_order_lines (po_no, line_no, item_id, quantity_ordered, unit_price)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+PO_LOCK_SQL = "SELECT supplier_id, ordered_on, status FROM purchase_orders WHERE po_no = %s FOR UPDATE"
+LINES_SQL = """
+    SELECT line_no, item_id, quantity_ordered, quantity_received
+    FROM purchase_order_lines WHERE po_no = %s ORDER BY line_no
+"""
+LINE_RECEIVED_SQL = """
+    UPDATE purchase_order_lines SET quantity_received = quantity_received + %s
+    WHERE po_no = %s AND line_no = %s
+"""
+STOCK_INCREMENT_SQL = "UPDATE materials SET quantity_in_stock = quantity_in_stock + %s WHERE id = %s"
+PO_STATUS_SQL = "UPDATE purchase_orders SET status = %s, last_received_on = %s WHERE po_no = %s"
+STATS_UPSERT_SQL = """
+    INSERT INTO supplier_stats
+        (supplier_id, orders_closed, orders_complete, lead_orders, lead_days_total, quantity_ordered, quantity_received)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        orders_closed = orders_closed + VALUES(orders_closed),
+        orders_complete = orders_complete + VALUES(orders_complete),
+        lead_orders = lead_orders + VALUES(lead_orders),
+        lead_days_total = lead_days_total + VALUES(lead_days_total),
+        quantity_ordered = quantity_ordered + VALUES(quantity_ordered),
+        quantity_received = quantity_received + VALUES(quantity_received)
+"""
+STATS_SQL = """
+    SELECT st.supplier_id, s.supplier_name, st.orders_closed,
+           CASE WHEN st.lead_orders > 0 THEN ROUND(1.0 * st.lead_days_total / st.lead_orders, 1) END,
+           CASE WHEN st.quantity_ordered > 0 THEN ROUND(1.0 * st.quantity_received / st.quantity_ordered, 3) END,
+           CASE WHEN st.orders_closed > 0 THEN ROUND(1.0 * st.orders_complete / st.orders_closed, 3) END
+    FROM supplier_stats st LEFT JOIN suppliers s ON st.supplier_id = s.supplier_id
+    ORDER BY st.supplier_id
+"""
+ORDERS_SQL = """
+    SELECT p.po_no, p.supplier_id, s.supplier_name, p.ordered_on, p.expected_on, p.status, p.last_received_on
+    FROM purchase_orders p LEFT JOIN suppliers s ON p.supplier_id = s.supplier_id
+"""
+ORDER_LINES_SQL = """
+    SELECT l.line_no, l.item_id, m.item_name, l.quantity_ordered, l.quantity_received, l.unit_price
+    FROM purchase_order_lines l LEFT JOIN materials m ON l.item_id = m.id
+    WHERE l.po_no = %s ORDER BY l.line_no
+"""
+
+
+def _date(value):
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+
+def _parse_lines(lines, fields):
+    """(item_id, quantity[, unit_price]) tuples or dicts -> list of tuples; raises ValueError."""
+    parsed = []
+    for line in lines:
+        values = [line.get(f) for f in fields] if isinstance(line, dict) else list(line) + [None] * len(fields)
+        item_id, quantity = values[0], values[1]
+        if not isinstance(item_id, int) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f"Invalid line {line!r}: item id and a positive integer quantity are required.")
+        parsed.append(tuple(values[:len(fields)]))
+    if not parsed:
+        raise ValueError("A purchase order needs at least one line.")
+    return parsed
+
+
+def create_purchase_order(supplier_id, lines, expected_on=None, ordered_on=None):
+    """
+    Creates an open purchase order. Each line is (item_id, quantity[, unit_price]) or a
+    dict with those keys. Returns the po_no, or None if the order was rejected.
+    """
+    try:
+        lines = _parse_lines(lines, ("item_id", "quantity", "unit_price"))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT supplier_id FROM suppliers WHERE supplier_id = %s", (supplier_id,))
+            if cursor.fetchone() is None:
+                print(f"Error: Supplier with ID {supplier_id} not found.")
+                return None
+            item_ids = sorted({item_id for item_id, _, _ in lines})
+            placeholders = ", ".join(["%s"] * len(item_ids))
+            cursor.execute(f"SELECT id, supplier_id FROM materials WHERE id IN ({placeholders})", tuple(item_ids))
+            suppliers = dict(cursor.fetchall())
+            for item_id in item_ids:
+                if item_id not in suppliers:
+                    print(f"Error: Material with ID {item_id} not found.")
+                    return None
+                if suppliers[item_id] not in (None, supplier_id):
+                    print(f"Error: Material {item_id} is supplied by supplier {suppliers[item_id]}, not {supplier_id}.")
+                    return None
+
+            cursor.execute(PO_INSERT_SQL, (supplier_id, ordered_on or date.today(), expected_on))
+            po_no = cursor.lastrowid
+            cursor.executemany(LINE_INSERT_SQL, [
+                (po_no, line_no, item_id, quantity, unit_price)
+                for line_no, (item_id, quantity, unit_price) in enumerate(lines, start=1)
+            ])
+            conn.commit()
+            invalidate("purchase_orders")
+            print(f"Purchase order {po_no} created for supplier {supplier_id}: {len(lines)} lines.")
+            return po_no
+    except Exception as e:
+        print(f"Database error during create_purchase_order: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return None
+
+
+def _allocate(order_lines, received):
+    """
+    Spreads received (item_id, quantity) over the order's outstanding lines, first line
+    first. Returns [(line_no, item_id, quantity), ...]; raises ValueError on over-delivery.
+    """
+    outstanding = {line_no: [item_id, ordered - got] for line_no, item_id, ordered, got in order_lines}
+    booked = []
+    for item_id, quantity in received:
+        for line_no, line in outstanding.items():
+            if quantity == 0:
+                break
+            if line[0] == item_id and line[1] > 0:
+                take = min(quantity, line[1])
+                line[1] -= take
+                quantity -= take
+                booked.append((line_no, item_id, take))
+        if quantity:
+            raise ValueError(f"{quantity} more units of item {item_id} than are outstanding on this order.")
+    return booked
+
+
+def _stats_delta(supplier_id, ordered_on, closed_on, order_lines, booked, complete):
+    ordered = sum(line[2] for line in order_lines)
+    received = sum(line[3] for line in order_lines) + sum(quantity for _, _, quantity in booked)
+    lead = (closed_on - ordered_on).days if received else 0
+    return (supplier_id, 1, 1 if complete else 0, 1 if received else 0, lead, ordered, received)
+
+
+def receive_goods(po_no, lines=None, received_on=None):
+    """
+    Books a delivery against a purchase order in one transaction. `lines` are
+    (item_id, quantity) pairs (or dicts); None receives everything still outstanding.
+    Returns the number of units received, or None if the delivery was rejected.
+    """
+    try:
+        received = None if lines is None else _parse_lines(lines, ("item_id", "quantity"))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+    received_on = received_on or date.today()
+    conn = None
+    committed = False
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(PO_LOCK_SQL, (po_no,))
+            order = cursor.fetchone()
+            if order is None:
+                print(f"Error: Purchase order {po_no} not found.")
+                return None
+            supplier_id, ordered_on, status = order
+            if status not in OPEN_STATUSES:
+                print(f"Error: Purchase order {po_no} is {status}.")
+                return None
+            cursor.execute(LINES_SQL, (po_no,))
+            order_lines = cursor.fetchall()
+            if received is None:
+                received = [(item_id, ordered - got) for _, item_id, ordered, got in order_lines if ordered > got]
+            try:
+                booked = _allocate(order_lines, received)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return None
+            if not booked:
+                print(f"Nothing outstanding on purchase order {po_no}.")
+                return 0
+
+            per_item = {}
+            for _, item_id, quantity in booked:
+                per_item[item_id] = per_item.get(item_id, 0) + quantity
+            item_ids = sorted(per_item)
+            placeholders = ", ".join(["%s"] * len(item_ids))
+            cursor.execute(
+                f"SELECT id, quantity_in_stock FROM materials WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE",
+                tuple(item_ids)
+            )
+            stock_before = dict(cursor.fetchall())
+            missing = set(item_ids) - set(stock_before)
+            if missing:
+                print(f"Error: Material(s) {sorted(missing)} no longer exist.")
+                conn.rollback()
+                return None
+            cursor.executemany(STOCK_INCREMENT_SQL, [(per_item[item_id], item_id) for item_id in item_ids])
+            cursor.executemany(LINE_RECEIVED_SQL, [(quantity, po_no, line_no) for line_no, _, quantity in booked])
+            stock_journal.record_movements(cursor, [(item_id, per_item[item_id], "receipt", po_no)
+                                                    for item_id in item_ids])
+
+            outstanding = sum(ordered - got for _, _, ordered, got in order_lines) - sum(q for _, _, q in booked)
+            complete = outstanding == 0
+            cursor.execute(PO_STATUS_SQL, ("Received" if complete else "Partial", received_on, po_no))
+            if complete:
+                cursor.execute(STATS_UPSERT_SQL, _stats_delta(supplier_id, _date(ordered_on), received_on,
+                                                              order_lines, booked, True))
+            conn.commit()
+            committed = True
+    except Exception as e:
+        print(f"Database error during receive_goods: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    if not committed:
+        return None
+
+    # The delivery is booked: nothing below may roll it back or report it as failed.
+    try:
+        invalidate("materials", "purchase_orders")
+        stock_alerts.stock_changes((item_id, stock_before[item_id], stock_before[item_id] + per_item[item_id])
+                                   for item_id in item_ids)
+    except Exception as e:
+        print(f"Warning: delivery on purchase order {po_no} was booked, but updating caches/alerts failed: {e}")
+    units = sum(per_item.values())
+    print(f"Purchase order {po_no}: {units} units received over {len(booked)} lines"
+          f"{'' if complete else f', {outstanding} still outstanding'}.")
+    return units
+
+
+def close_purchase_order(po_no, closed_on=None):
+    """Closes an order whose remaining lines will not be delivered; it counts against the fill rate."""
+    conn = None
+    committed = False
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(PO_LOCK_SQL, (po_no,))
+            order = cursor.fetchone()
+            if order is None:
+                print(f"Error: Purchase order {po_no} not found.")
+                return False
+            supplier_id, ordered_on, status = order
+            if status not in OPEN_STATUSES:
+                print(f"Error: Purchase order {po_no} is {status}.")
+                return False
+            cursor.execute(LINES_SQL, (po_no,))
+            order_lines = cursor.fetchall()
+            cursor.execute("SELECT last_received_on FROM purchase_orders WHERE po_no = %s", (po_no,))
+            last_received = cursor.fetchone()[0]
+            cursor.execute("UPDATE purchase_orders SET status = 'Closed' WHERE po_no = %s", (po_no,))
+            cursor.execute(STATS_UPSERT_SQL, _stats_delta(
+                supplier_id, _date(ordered_on), _date(last_received) or closed_on or date.today(),
+                order_lines, [], False))
+            conn.commit()
+            committed = True
+    except Exception as e:
+        print(f"Database error during close_purchase_order: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    if not committed:
+        return False
+
+    try:
+        invalidate("purchase_orders")
+    except Exception as e:
+        print(f"Warning: purchase order {po_no} was closed, but updating caches failed: {e}")
+    print(f"Purchase order {po_no} closed.")
+    return True
+
+
+def list_purchase_orders(status=None, supplier_id=None, limit=50):
+    """Latest purchase orders first, optionally by status/supplier, as PurchaseOrder records ([] on error)."""
+    clauses, params = [], []
+    if status:
+        statuses = (status,) if isinstance(status, str) else tuple(status)
+        clauses.append(f"p.status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+    if supplier_id is not None:
+        clauses.append("p.supplier_id = %s")
+        params.append(supplier_id)
+    sql = ORDERS_SQL + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY p.po_no DESC LIMIT %s"
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, tuple(params) + (limit,))
+            return PurchaseOrder.from_rows(cursor.fetchall())
+    except Exception as e:
+        print(f"Database error during list_purchase_orders: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return []
+
+
+def get_order_lines(po_no):
+    """The lines of one purchase order as PurchaseOrderLine records ([] on error)."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(ORDER_LINES_SQL, (po_no,))
+            return PurchaseOrderLine.from_rows(cursor.fetchall())
+    except Exception as e:
+        print(f"Database error during get_order_lines: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return []
+
+
+def get_supplier_stats():
+    """Average lead days, unit fill rate and complete-order rate per supplier, as SupplierStats records."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(STATS_SQL)
+            return SupplierStats.from_rows(cursor.fetchall())
+    except Exception as e:
+        print(f"Database error during get_supplier_stats: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return []
+
+
+def rebuild_supplier_stats():
+    """Recomputes supplier_stats from the received and closed orders (to check for drift). Returns the suppliers."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM supplier_stats")
+            cursor.execute("""
+                SELECT p.supplier_id, p.ordered_on, p.last_received_on, p.status,
+                       SUM(l.quantity_ordered), SUM(l.quantity_received)
+                FROM purchase_orders p JOIN purchase_order_lines l ON p.po_no = l.po_no
+                WHERE p.status IN ('Received', 'Closed')
+                GROUP BY p.po_no, p.supplier_id, p.ordered_on, p.last_received_on, p.status
+            """)
+            totals = {}
+            for supplier_id, ordered_on, last_received, status, ordered, received in cursor.fetchall():
+                row = totals.setdefault(supplier_id, [0, 0, 0, 0, 0, 0])
+                row[0] += 1
+                row[1] += status == "Received"
+                if received and last_received:
+                    row[2] += 1
+                    row[3] += (_date(last_received) - _date(ordered_on)).days
+                row[4] += int(ordered)
+                row[5] += int(received)
+            cursor.executemany(STATS_UPSERT_SQL, [(supplier_id, *row) for supplier_id, row in sorted(totals.items())])
+            conn.commit()
+            print(f"Supplier statistics rebuilt for {len(totals)} suppliers.")
+            return len(totals)
+    except Exception as e:
+        print(f"Database error during rebuild_supplier_stats: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def _line_arg(text):
+    return tuple(float(v) if i == 2 else int(v) for i, v in enumerate(text.split(":")))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p1 = sub.add_parser("create", help="New purchase order")
+    p1.add_argument("supplier_id", type=int)
+    p1.add_argument("lines", nargs="+", type=_line_arg, help="item_id:quantity[:unit_price]")
+    p1.add_argument("--expected", type=date.fromisoformat, help="Expected delivery date (YYYY-MM-DD)")
+
+    p2 = sub.add_parser("receive", help="Book a delivery")
+    p2.add_argument("po_no", type=int)
+    p2.add_argument("--lines", nargs="+", type=_line_arg, help="item_id:quantity (default: everything outstanding)")
+
+    p3 = sub.add_parser("close", help="Close an order short")
+    p3.add_argument("po_no", type=int)
+
+    p4 = sub.add_parser("show", help="Lines of one order")
+    p4.add_argument("po_no", type=int)
+
+    p5 = sub.add_parser("open", help="Open and partially received orders")
+    p5.add_argument("--supplier", type=int)
+
+    sub.add_parser("stats", help="Lead time and fill rate per supplier")
+    sub.add_parser("rebuild-stats", help="Recompute the supplier statistics from the orders")
+
+    args = parser.parse_args()
+    if args.cmd == "create":
+        create_purchase_order(args.supplier_id, args.lines, args.expected)
+    elif args.cmd == "receive":
+        receive_goods(args.po_no, args.lines)
+    elif args.cmd == "close":
+        close_purchase_order(args.po_no)
+    elif args.cmd == "show":
+        print_table(get_order_lines(args.po_no), PurchaseOrderLine, empty_message="No such order.")
+    elif args.cmd == "open":
+        print_table(list_purchase_orders(OPEN_STATUSES, args.supplier), PurchaseOrder,
+                    empty_message="No open purchase orders.")
+    elif args.cmd == "stats":
+        print_table(get_supplier_stats(), SupplierStats, empty_message="No orders received yet.")
+    elif args.cmd == "rebuild-stats":
+        rebuild_supplier_stats()
+
+if __name__ == "__main__":
+    main()
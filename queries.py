@@ -0,0 +1,331 @@
+"""
+Named query registry and per-query instrumentation.
+
+Modules register their statements once, at import time, and keep using the
+returned SQL string as before:
+
+    from queries import register
+    LOW_STOCK_SQL = register("materials.low_stock", "SELECT ... WHERE quantity_in_stock <= %s")
+
+Every cursor handed out by db_connect's pool is an InstrumentedCursor. It times each
+execute()/executemany() and files the time, the row count and errors under the
+query's registered name. Unregistered SQL is filed under its normalised text.
+
+On MySQL a registered statement runs as a server-side prepared statement. The pool keeps
+one prepared cursor per statement on each connection, so the server parses it once per
+connection instead of once per call. executemany() stays on the plain cursor, because
+mysql.connector folds a multi-row INSERT into one statement there. On SQLite, sqlite3
+already keeps a per-connection cache of compiled statements (see sqlite_backend), so
+registered statements are parsed once per connection without extra work.
+
+Calls slower than SLOW_QUERY_MS are kept in slow_queries(). When BMM_SLOW_QUERY_LOG
+is set they are also appended to that file as JSON lines.
+
+    python queries.py            # registered statements
+"""
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+from records import QueryProfile
+
+# Upper bounds (ms) of the latency histogram buckets; a last bucket takes everything slower.
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SLOW_QUERY_MS = float(os.environ.get("BMM_SLOW_QUERY_MS", 200))
+SLOW_QUERY_LOG = os.environ.get("BMM_SLOW_QUERY_LOG")
+SLOW_LOG_SIZE = 100
+PROFILE_ORDERS = ("total", "calls", "p95", "max")
+PROFILE_QUERY_WIDTH = 70     # characters of unregistered SQL shown by print_profile()
+
+_statements = {}        # name -> sql
+_names = {}             # sql -> name
+_registry_lock = threading.Lock()
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def register(name, sql):
+    """Registers `sql` under `name` and returns `sql`. Re-registering the same pair is a no-op."""
+    with _registry_lock:
+        known = _statements.get(name)
+        if known is not None and known != sql:
+            raise ValueError(f"Query {name!r} is already registered with different SQL")
+        _statements[name] = sql
+        _names[sql] = name
+    return sql
+
+
+def statement(name):
+    """The SQL registered under `name` (KeyError if there is none)."""
+    return _statements[name]
+
+
+def statements():
+    """{name: sql} of every registered query."""
+    with _registry_lock:
+        return dict(_statements)
+
+
+def name_of(sql):
+    """Registered name of `sql`, or None."""
+    return _names.get(sql)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Key for unregistered SQL: whitespace collapsed and IN (%s, %s, ...) lists folded into one."""
+    return _SPACES.sub(" ", _IN_LIST.sub("(%s, ...)", sql)).strip()
+
+
+def query_key(sql):
+    return _names.get(sql) or fingerprint(sql)
+
+
+class QueryStats:
+    """Call count, rows, errors and a latency histogram per query, plus the slow query log."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_QUERY_LOG, bounds=HISTOGRAM_BOUNDS_MS):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.bounds = tuple(bounds)
+        self._entries = {}      # key -> [calls, rows, errors, total_ms, max_ms, buckets]
+        self._slow = deque(maxlen=SLOW_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds, rows=0, error=False):
+        ms = seconds * 1000
+        bucket = bisect_left(self.bounds, ms)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [0, 0, 0, 0.0, 0.0, [0] * (len(self.bounds) + 1)]
+            entry[0] += 1
+            entry[1] += rows
+            entry[2] += error
+            entry[3] += ms
+            entry[4] = max(entry[4], ms)
+            entry[5][bucket] += 1
+        if ms >= self.slow_ms:
+            self._log_slow(key, ms, rows, error)
+
+    def _log_slow(self, key, ms, rows, error):
+        event = {"at": datetime.now().isoformat(timespec="milliseconds"), "query": key,
+                 "ms": round(ms, 3), "rows": rows, "error": bool(error)}
+        with self._lock:
+            self._slow.append(event)
+        if self.slow_log:
+            try:
+                with open(self.slow_log, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event) + "\n")
+            except OSError as e:
+                print(f"Error writing slow query log: {e}")
+
+    def percentile(self, buckets, p):
+        """Upper bound (ms) of the bucket holding the p-th percentile call; None past the last bound."""
+        target = sum(buckets) * p / 100
+        seen = 0
+        for bound, count in zip(self.bounds + (None,), buckets):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return None
+
+    def stats(self):
+        """{query: {calls, rows, errors, total_ms, avg_ms, max_ms, p50_ms, p95_ms, p99_ms, histogram}}."""
+        with self._lock:
+            entries = {key: (calls, rows, errors, total, top, list(buckets))
+                       for key, (calls, rows, errors, total, top, buckets) in self._entries.items()}
+        result = {}
+        for key, (calls, rows, errors, total, top, buckets) in entries.items():
+            result[key] = {
+                "calls": calls,
+                "rows": rows,
+                "errors": errors,
+                "total_ms": total,
+                "avg_ms": total / calls,
+                "max_ms": top,
+                "p50_ms": self.percentile(buckets, 50) or top,
+                "p95_ms": self.percentile(buckets, 95) or top,
+                "p99_ms": self.percentile(buckets, 99) or top,
+                "histogram": dict(zip([str(b) for b in self.bounds] + ["+Inf"], buckets)),
+            }
+        return result
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._slow.clear()
+
+
+query_stats_collector = QueryStats()
+
+
+class InstrumentedCursor:
+    """
+    Wraps a driver cursor and records every execute()/executemany() in query_stats_collector.
+    `prepare(sql)` (MySQL only) returns the connection's prepared cursor for a registered
+    statement; its rows are buffered here, so the prepared cursor is free for the next call.
+    """
+
+    def __init__(self, cursor, prepare=None, dictionary=False):
+        self._cursor = cursor
+        self._prepare = prepare
+        self._dictionary = dictionary
+        self._rows = None
+        self._pos = 0
+        self._meta = None       # (description, rowcount, lastrowid) of the last prepared execute
+
+    def execute(self, sql, params=()):
+        name = _names.get(sql)
+        key = name or fingerprint(sql)
+        start = time.perf_counter()
+        try:
+            if name is not None and self._prepare is not None:
+                rows = self._execute_prepared(sql, params)
+            else:
+                self._rows, self._meta = None, None
+                self._cursor.execute(sql, params)
+                rows = max(self._cursor.rowcount, 0)
+        except Exception:
+            query_stats_collector.record(key, time.perf_counter() - start, error=True)
+            raise
+        query_stats_collector.record(key, time.perf_counter() - start, rows)
+
+    def _execute_prepared(self, sql, params):
+        prepared = self._prepare(sql)
+        prepared.execute(sql, params)
+        description = prepared.description
+        rows = []
+        if description:
+            rows = prepared.fetchall()
+            if self._dictionary:
+                names = [d[0] for d in description]
+                rows = [dict(zip(names, row)) for row in rows]
+        self._rows, self._pos = rows, 0
+        self._meta = (description, len(rows) if description else prepared.rowcount, prepared.lastrowid)
+        return max(self._meta[1], 0)
+
+    def executemany(self, sql, seq_of_params):
+        key = query_key(sql)
+        self._rows, self._meta = None, None
+        start = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        except Exception:
+            query_stats_collector.record(key, time.perf_counter() - start, error=True)
+            raise
+        query_stats_collector.record(key, time.perf_counter() - start, max(self._cursor.rowcount, 0))
+
+    @property
+    def description(self):
+        return self._meta[0] if self._meta else self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._meta[1] if self._meta else self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._meta[2] if self._meta else self._cursor.lastrowid
+
+    def fetchone(self):
+        if self._rows is None:
+            return self._cursor.fetchone()
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self, size=1):
+        if self._rows is None:
+            return self._cursor.fetchmany(size)
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        if self._rows is None:
+            return self._cursor.fetchall()
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def query_stats():
+    """Per-query counters and latency percentiles (see QueryStats.stats)."""
+    return query_stats_collector.stats()
+
+
+def slow_queries():
+    """The last SLOW_LOG_SIZE calls slower than SLOW_QUERY_MS, oldest first."""
+    return query_stats_collector.slow_queries()
+
+
+def reset_query_stats():
+    query_stats_collector.reset()
+
+
+def set_slow_query_threshold(ms, log_path=None):
+    """Changes the slow query threshold (and the JSON lines log file, if given)."""
+    query_stats_collector.slow_ms = ms
+    if log_path is not None:
+        query_stats_collector.slow_log = log_path or None
+
+
+def top_queries(limit=10, order="total"):
+    """The `limit` most expensive queries as QueryProfile records, by total time, calls, p95 or max."""
+    if order not in PROFILE_ORDERS:
+        raise ValueError(f"order must be one of {PROFILE_ORDERS}")
+    field = {"total": "total_ms", "calls": "calls", "p95": "p95_ms", "max": "max_ms"}[order]
+    stats = query_stats()
+    ranked = sorted(stats.items(), key=lambda item: item[1][field], reverse=True)[:limit]
+    return [QueryProfile(key, s["calls"], s["rows"], s["errors"], round(s["total_ms"], 2),
+                         round(s["avg_ms"], 3), s["p95_ms"], round(s["max_ms"], 2))
+            for key, s in ranked]
+
+
+def print_profile(limit=10, order="total"):
+    """Prints the top queries of this process (the --profile output of the CLIs)."""
+    from render import print_table
+    rows = top_queries(limit, order)
+    shown = [QueryProfile(r.query[:PROFILE_QUERY_WIDTH], *r.as_tuple()[1:]) for r in rows]
+    print(f"\nQuery profile (top {limit} by {order}; p95 is a histogram bucket bound)")
+    print_table(shown, QueryProfile, empty_message="No queries were run.")
+    slow = slow_queries()
+    if slow:
+        print(f"{len(slow)} calls slower than {query_stats_collector.slow_ms:g} ms, latest: "
+              f"{slow[-1]['query'][:PROFILE_QUERY_WIDTH]} ({slow[-1]['ms']} ms)")
+    return rows
+
+
+if __name__ == "__main__":
+    # Importing the modules registers their statements.
+    import balances, customers_crud, dashboard, materials_crud, rollup, sales_crud, suppliers_crud  # noqa: F401
+    import queries      # the registry the modules filled (this file runs as __main__)
+    for name, sql in sorted(queries.statements().items()):
+        print(f"{name:<32} {_SPACES.sub(' ', sql).strip()[:100]}")
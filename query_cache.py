@@ -0,0 +1,119 @@
+"""
+In-process read cache with per-table TTLs and write invalidation.
+
+Every entry records the tables it was read from. It expires after the shortest TTL of
+those tables, or as soon as a writer calls invalidate() on one of them. All writers in
+the CRUD modules invalidate the tables they change after committing. Writes from other
+processes are only picked up when the TTL runs out.
+
+    from query_cache import cached
+    df = cached("materials:all", ["materials"], lambda: load_materials_df())
+"""
+import threading
+import time
+
+TABLE_TTLS = {
+    "materials": 30,
+    "customers": 300,
+    "suppliers": 300,
+    "sales": 15,
+}
+DEFAULT_TTL = 60
+
+
+class QueryCache:
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(TABLE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self._entries = {}      # key -> (expires_at, tables, value)
+        self._versions = {}     # table -> number of invalidations so far
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "expired": 0}
+
+    def ttl_for(self, tables):
+        return min((self.ttls.get(t, self.default_ttl) for t in tables), default=self.default_ttl)
+
+    def _lookup(self, key, tables):
+        """Returns (hit, value, table versions at lookup time)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._stats["hits"] += 1
+                return True, entry[2], None
+            if entry:
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return False, None, tuple(self._versions.get(t, 0) for t in tables)
+
+    def _store(self, key, tables, versions, value, ttl):
+        with self._lock:
+            # Don't store a value if one of its tables was written while it was loading.
+            if versions == tuple(self._versions.get(t, 0) for t in tables):
+                expires = time.monotonic() + (ttl if ttl is not None else self.ttl_for(tables))
+                self._entries[key] = (expires, tables, value)
+
+    def get_or_load(self, key, tables, loader, ttl=None):
+        tables = tuple(tables)
+        hit, value, versions = self._lookup(key, tables)
+        if hit:
+            return value
+        value = loader()
+        self._store(key, tables, versions, value, ttl)
+        return value
+
+    async def get_or_load_async(self, key, tables, loader, ttl=None):
+        """get_or_load() for an async loader (a coroutine function)."""
+        tables = tuple(tables)
+        hit, value, versions = self._lookup(key, tables)
+        if hit:
+            return value
+        value = await loader()
+        self._store(key, tables, versions, value, ttl)
+        return value
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [key for key, (_, entry_tables, _) in self._entries.items()
+                     if any(t in entry_tables for t in tables)]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+
+    def version(self, table):
+        """Counter bumped on every invalidation of `table` (handy for ETags)."""
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+cache = QueryCache()
+
+
+def cached(key, tables, loader, ttl=None):
+    return cache.get_or_load(key, tables, loader, ttl)
+
+
+async def cached_async(key, tables, loader, ttl=None):
+    return await cache.get_or_load_async(key, tables, loader, ttl)
+
+
+def invalidate(*tables):
+    cache.invalidate(*tables)
+
+
+def cache_stats():
+    return cache.stats()
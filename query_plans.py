@@ -0,0 +1,138 @@
+"""
+EXPLAIN-based guard for the hot queries.
+
+Each entry in HOT_QUERIES is run through EXPLAIN. A query "regresses" when the
+plan reads one of the listed tables with a full table scan (type=ALL) while no
+index is even considered for it (possible_keys is NULL), i.e. the supporting
+index was dropped or the query no longer matches it. Full scans the optimizer
+picks on tiny tables despite a usable index are not reported.
+
+On the SQLite backend EXPLAIN QUERY PLAN is used instead: a regression is a
+"SCAN <table>" step that uses no index at all.
+
+    python query_plans.py
+"""
+import re
+from datetime import date, timedelta
+
+import db_connect
+from db_connect import create_connection
+
+_since = date.today() - timedelta(days=30)
+
+# (name, sql, params, tables that must be read through an index)
+HOT_QUERIES = [
+    ("sales_by_day (raw tail)",
+     "SELECT sale_date, IFNULL(SUM(total),0) FROM sales WHERE sale_date >= %s GROUP BY sale_date",
+     (_since,), ["sales"]),
+    ("revenue_period (raw tail)",
+     "SELECT IFNULL(SUM(total),0), IFNULL(SUM(amount_paid),0), IFNULL(SUM(amount_due),0) "
+     "FROM sales WHERE sale_date >= %s AND sale_date <= %s",
+     (_since, date.today()), ["sales"]),
+    ("unpaid dues",
+     "SELECT customer_id, IFNULL(SUM(amount_due),0) FROM sales WHERE amount_due > 0 GROUP BY customer_id",
+     (), ["sales"]),
+    ("low stock",
+     "SELECT item_name, quantity_in_stock, unit_type, supplier_id FROM materials "
+     "WHERE quantity_in_stock <= %s ORDER BY quantity_in_stock, item_name",
+     (20,), ["materials"]),
+    ("material name prefix search",
+     "SELECT id, item_name FROM materials WHERE item_name LIKE %s",
+     ("Cem%",), ["materials"]),
+    ("customer sales join",
+     "SELECT s.order_no, s.total FROM sales s JOIN customers c ON s.customer_id = c.customer_id "
+     "WHERE c.customer_id = %s",
+     (1,), ["sales"]),
+    ("item sales join",
+     "SELECT s.order_no, s.quantity FROM sales s JOIN materials m ON s.item_id = m.id WHERE m.id = %s",
+     (1,), ["sales"]),
+    ("sales keyset page",
+     "SELECT order_no FROM sales WHERE sale_date < %s OR (sale_date = %s AND order_no < %s) "
+     "ORDER BY sale_date DESC, order_no DESC LIMIT %s",
+     (_since, _since, 1000, 51), ["sales"]),
+    ("rollup by day",
+     "SELECT day, IFNULL(SUM(revenue),0) FROM sales_daily_rollup WHERE day >= %s GROUP BY day",
+     (_since,), ["sales_daily_rollup"]),
+    ("payments of a sale",
+     "SELECT payment_id, paid_amount FROM payments WHERE order_no = %s ORDER BY payment_id",
+     (1,), ["payments"]),
+    ("who owes us",
+     "SELECT customer_id, outstanding FROM customer_balances WHERE outstanding > 0 "
+     "ORDER BY outstanding DESC LIMIT %s",
+     (10,), ["customer_balances"]),
+    ("demand folded into forecasts",
+     "SELECT item_id, sale_date, SUM(quantity) FROM sales WHERE sale_date >= %s GROUP BY item_id, sale_date",
+     (date.today() - timedelta(days=3),), ["sales"]),
+    ("stock history of an item",
+     "SELECT movement_id, quantity_change, reason FROM stock_movements WHERE item_id = %s "
+     "ORDER BY movement_id DESC LIMIT %s",
+     (1, 50), ["stock_movements"]),
+    ("open purchase orders",
+     "SELECT po_no, supplier_id FROM purchase_orders WHERE status IN ('Open', 'Partial') ORDER BY po_no DESC LIMIT %s",
+     (50,), ["purchase_orders"]),
+]
+
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?!ON\b|WHERE\b|JOIN\b|GROUP\b|ORDER\b|LIMIT\b)(\w+))?", re.I)
+
+
+def explain(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    return cursor.fetchall()
+
+
+def table_aliases(sql):
+    """{alias or table name: table name} for the tables in FROM / JOIN clauses."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def sqlite_full_scans(cursor, sql, params, tables):
+    """(table, plan row) for every SCAN step of an SQLite plan that reads one of `tables` without an index."""
+    aliases = table_aliases(sql)
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    scans = []
+    for row in cursor.fetchall():
+        match = re.match(r"SCAN (\w+)", row["detail"])
+        if match and "INDEX" not in row["detail"]:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in tables:
+                scans.append((table, row))
+    return scans
+
+
+def check_query_plans(queries=HOT_QUERIES):
+    """
+    Returns a list of regressions: (query name, table, plan row).
+    An empty list means every hot query can use an index.
+    """
+    regressions = []
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor(dictionary=True)
+            for name, sql, params, tables in queries:
+                if db_connect.db_backend == "sqlite":
+                    regressions.extend((name, table, row) for table, row in sqlite_full_scans(cursor, sql, params, tables))
+                    continue
+                for row in explain(cursor, sql, params):
+                    if row.get("table") in tables and row.get("type") == "ALL" and not row.get("possible_keys"):
+                        regressions.append((name, row.get("table"), row))
+    finally:
+        if conn:
+            conn.close()
+    return regressions
+
+
+if __name__ == "__main__":
+    problems = check_query_plans()
+    for name, table, row in problems:
+        print(f"FULL SCAN: {name} reads {table} without an index: {row}")
+    if problems:
+        raise SystemExit(1)
+    print(f"All {len(HOT_QUERIES)} hot queries can use an index.")
@@ -0,0 +1,170 @@
+"""
+Row types returned by the CRUD and analytics functions.
+
+Each record is a small __slots__ object with named fields. Records also behave like
+the tuples the functions used to return (row[0], `name, qty = row`, row == (...)),
+so positional callers keep working. Formatting lives in render.py.
+
+    rows, token = list_materials_page()
+    rows[0].item_name, rows[0].quantity_in_stock
+"""
+
+
+class Record:
+    __slots__ = ()
+    HEADERS = ()        # column titles for tables, same order as __slots__
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_rows(cls, rows):
+        return [cls(*row) for row in rows]
+
+    def as_tuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __getitem__(self, index):
+        return self.as_tuple()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+        if isinstance(other, tuple):
+            return self.as_tuple() == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Customer(Record):
+    __slots__ = ("customer_id", "customer_name", "phone", "address")
+    HEADERS = ("ID", "Name", "Phone", "Address")
+
+
+class Supplier(Record):
+    __slots__ = ("supplier_id", "supplier_name", "phone", "address")
+    HEADERS = ("ID", "Name", "Phone", "Address")
+
+
+class Material(Record):
+    __slots__ = ("id", "item_name", "price_per_unit", "unit_type", "quantity_in_stock")
+    HEADERS = ("ID", "Name", "Price", "Unit", "Quantity")
+
+
+class Sale(Record):
+    __slots__ = ("order_no", "customer_name", "item_name", "quantity", "sale_date", "total",
+                 "payment_method", "amount_paid", "amount_due", "payment_status")
+    HEADERS = ("OrderNo", "Customer", "Item", "Qty", "Date", "Total", "Payment", "Paid", "Due", "Status")
+
+
+class LowStockItem(Record):
+    __slots__ = ("item_name", "quantity_in_stock", "unit_type", "supplier_id")
+    HEADERS = ("Item", "In Stock", "Unit", "Supplier ID")
+
+
+class DailyRevenue(Record):
+    __slots__ = ("day", "revenue")
+    HEADERS = ("Day", "Revenue")
+
+
+class PeriodTotals(Record):
+    __slots__ = ("revenue", "paid", "due")
+    HEADERS = ("Revenue", "Paid", "Due")
+
+
+class CustomerRevenue(Record):
+    __slots__ = ("customer_name", "revenue")
+    HEADERS = ("Customer", "Revenue")
+
+
+class ItemSales(Record):
+    __slots__ = ("item_name", "total_sold")
+    HEADERS = ("Item", "Total Sold")
+
+
+class CustomerBalance(Record):
+    __slots__ = ("customer_id", "customer_name", "outstanding", "open_sales")
+    HEADERS = ("ID", "Customer", "Outstanding", "Unpaid Sales")
+
+
+class Payment(Record):
+    __slots__ = ("payment_id", "order_no", "payment_date", "payment_method", "paid_amount")
+    HEADERS = ("ID", "OrderNo", "Date", "Method", "Amount")
+
+
+class CustomerAging(Record):
+    __slots__ = ("customer_id", "customer_name", "days_0_30", "days_31_60", "days_61_90", "days_over_90", "total")
+    HEADERS = ("ID", "Customer", "0-30", "31-60", "61-90", "90+", "Total")
+
+
+class AgingTotals(Record):
+    __slots__ = ("days_0_30", "days_31_60", "days_61_90", "days_over_90", "total")
+    HEADERS = ("0-30", "31-60", "61-90", "90+", "Total")
+
+
+class StockAlert(Record):
+    __slots__ = ("item_id", "item_name", "quantity", "threshold", "supplier_id", "raised_at")
+    HEADERS = ("Item ID", "Item", "Stock", "Threshold", "Supplier", "Raised At")
+
+
+class ReorderPoint(Record):
+    __slots__ = ("item_id", "item_name", "supplier_name", "lead_time_days", "in_stock", "daily_demand",
+                 "demand_sd", "reorder_point", "order_quantity", "days_left")
+    HEADERS = ("ID", "Item", "Supplier", "Lead Days", "In Stock", "Daily Demand", "Demand SD",
+               "Reorder Point", "Order Qty", "Days Left")
+
+
+class StockMovement(Record):
+    __slots__ = ("movement_id", "item_id", "moved_at", "quantity_change", "reason", "ref_no")
+    HEADERS = ("ID", "Item ID", "At", "Change", "Reason", "Ref")
+
+
+class StockLevel(Record):
+    __slots__ = ("item_id", "item_name", "quantity")
+    HEADERS = ("Item ID", "Item", "Quantity")
+
+
+class StockMismatch(Record):
+    __slots__ = ("item_id", "item_name", "journal_quantity", "stock_quantity", "difference")
+    HEADERS = ("Item ID", "Item", "Journal", "In Stock", "Difference")
+
+
+class PurchaseOrder(Record):
+    __slots__ = ("po_no", "supplier_id", "supplier_name", "ordered_on", "expected_on", "status", "last_received_on")
+    HEADERS = ("PO", "Supplier ID", "Supplier", "Ordered", "Expected", "Status", "Last Receipt")
+
+
+class PurchaseOrderLine(Record):
+    __slots__ = ("line_no", "item_id", "item_name", "quantity_ordered", "quantity_received", "unit_price")
+    HEADERS = ("Line", "Item ID", "Item", "Ordered", "Received", "Unit Price")
+
+
+class SupplierStats(Record):
+    __slots__ = ("supplier_id", "supplier_name", "orders", "avg_lead_days", "fill_rate", "complete_rate")
+    HEADERS = ("ID", "Supplier", "Orders", "Avg Lead Days", "Fill Rate", "Complete Orders")
+
+
+class QueryProfile(Record):
+    __slots__ = ("query", "calls", "rows", "errors", "total_ms", "avg_ms", "p95_ms", "max_ms")
+    HEADERS = ("Query", "Calls", "Rows", "Errors", "Total ms", "Avg ms", "p95 ms", "Max ms")
+
+
+class BenchmarkResult(Record):
+    __slots__ = ("name", "rounds", "p50_ms", "p95_ms", "p99_ms", "max_ms", "queries", "baseline_p50_ms", "change")
+    HEADERS = ("Benchmark", "Rounds", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Queries/Call", "Baseline p50", "Change")
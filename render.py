@@ -0,0 +1,174 @@
+"""
+Renderers for the records returned by the CRUD and analytics functions (see records.py).
+
+The data functions run the query once and return records; the CLI prints them with
+print_table(), the Streamlit app shows to_dataframe(), and exports use write_csv().
+
+Reports that can run to millions of rows are streamed instead: write_report() takes
+any iterable of records (typically a generator over an unbuffered cursor, see
+db_connect.iter_rows) and writes CSV, NDJSON or a fixed-width table as the rows
+arrive, holding at most TABLE_SAMPLE_ROWS of them at a time.
+"""
+import csv
+import json
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+from itertools import chain, islice
+from tabulate import tabulate
+
+STREAM_FORMATS = ("table", "csv", "ndjson")
+TABLE_SAMPLE_ROWS = 200     # rows read ahead to size the fixed-width columns
+FLUSH_EVERY = 1000          # rows between explicit flushes of the output
+
+
+def table(records, record_type, tablefmt="grid", floatfmt="g"):
+    """Records as a text table with record_type's column titles (floatfmt=".2f" for amounts)."""
+    return tabulate([r.as_tuple() for r in records], headers=record_type.HEADERS, tablefmt=tablefmt,
+                    floatfmt=floatfmt)
+
+
+def print_table(records, record_type, empty_message=None, floatfmt="g"):
+    """Prints the records as a grid table, or `empty_message` (if given) when there are none."""
+    if not records and empty_message:
+        print(empty_message)
+    else:
+        print(table(records, record_type, floatfmt=floatfmt))
+
+
+def to_dicts(records):
+    return [r.as_dict() for r in records]
+
+
+def to_dataframe(records, record_type, titles=True):
+    """pandas DataFrame of the records; columns are the titles (or the field names with titles=False)."""
+    import pandas as pd
+    columns = record_type.HEADERS if titles else record_type.__slots__
+    return pd.DataFrame([r.as_tuple() for r in records], columns=list(columns))
+
+
+def write_csv(path, records, record_type):
+    """Writes the records (any iterable, consumed as it goes) to `path` with the field names as the header row."""
+    with open(path, mode="w", newline="", encoding="utf-8") as f:
+        stream_csv(records, record_type, f)
+    return path
+
+
+def _flushing(records, out):
+    """Yields the records, flushing `out` after the first one and every FLUSH_EVERY after that."""
+    for count, record in enumerate(records):
+        yield record
+        if count % FLUSH_EVERY == 0:
+            out.flush()
+
+
+def stream_csv(records, record_type, out):
+    """Writes a header row and one CSV line per record; returns the number of records."""
+    writer = csv.writer(out)
+    writer.writerow(record_type.__slots__)
+    count = 0
+    for r in _flushing(records, out):
+        writer.writerow(r.as_tuple())
+        count += 1
+    return count
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def stream_ndjson(records, record_type, out):
+    """Writes one JSON object per line, keyed by field name; returns the number of records."""
+    count = 0
+    for r in _flushing(records, out):
+        out.write(json.dumps(r.as_dict(), default=_json_value) + "\n")
+        count += 1
+    return count
+
+
+def _cell(value, floatfmt):
+    if value is None:
+        return ""
+    if isinstance(value, (float, Decimal)):
+        return format(value, floatfmt)
+    return str(value)
+
+
+def stream_table(records, record_type, out, empty_message=None, floatfmt="g", sample=TABLE_SAMPLE_ROWS):
+    """
+    Writes a fixed-width text table without reading all rows first: the column widths
+    come from the titles and the first `sample` records, and longer values later on
+    simply widen their row. Numbers are right-aligned. Returns the number of records.
+    """
+    records = iter(records)
+    head = list(islice(records, sample))
+    if not head and empty_message:
+        out.write(empty_message + "\n")
+        return 0
+    titles = [str(t) for t in record_type.HEADERS]
+    widths = [len(t) for t in titles]
+    numeric = [True] * len(titles)
+    for r in head:
+        for i, value in enumerate(r.as_tuple()):
+            widths[i] = max(widths[i], len(_cell(value, floatfmt)))
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float, Decimal))):
+                numeric[i] = False
+
+    def line(cells):
+        return "  ".join(c.rjust(w) if num else c.ljust(w)
+                         for c, w, num in zip(cells, widths, numeric)).rstrip() + "\n"
+
+    out.write(line(titles))
+    out.write("  ".join("-" * w for w in widths) + "\n")
+    count = 0
+    for r in _flushing(chain(head, records), out):
+        out.write(line([_cell(value, floatfmt) for value in r.as_tuple()]))
+        count += 1
+    return count
+
+
+def write_report(records, record_type, fmt="table", out=None, empty_message=None, floatfmt="g"):
+    """
+    Streams the records to `out` (default stdout) as "table", "csv" or "ndjson" and
+    returns the number written. `empty_message` replaces an empty table.
+    If the reader goes away (e.g. `| head`) the records are closed and None is returned.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"fmt must be one of {STREAM_FORMATS}")
+    out = out or sys.stdout
+    try:
+        if fmt == "csv":
+            count = stream_csv(records, record_type, out)
+        elif fmt == "ndjson":
+            count = stream_ndjson(records, record_type, out)
+        else:
+            count = stream_table(records, record_type, out, empty_message, floatfmt)
+        out.flush()
+        return count
+    except BrokenPipeError:
+        if hasattr(records, "close"):
+            records.close()             # hands the generator's connection back to the pool
+        if out is sys.stdout:
+            # Nothing reads stdout any more; keep the flush at exit from failing again.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return None
+
+
+def print_pages(fetch_page, record_type, page_size):
+    """Prints every page of a keyset listing (fetch_page(token, page_size)) as its own table."""
+    from pagination import PageFetchError, iter_pages
+    printed = False
+    try:
+        for page in iter_pages(fetch_page, page_size):
+            print_table(page, record_type)
+            printed = True
+    except PageFetchError as e:
+        print(f"Error: {e}")
+        return
+    if not printed:
+        print_table([], record_type)
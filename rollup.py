@@ -0,0 +1,290 @@
+from datetime import date, timedelta
+from db_connect import create_connection
+from queries import register
+from query_cache import invalidate
+
+# sales_daily_rollup holds one row per (day, item_id, customer_id) with the summed sales
+# of that day. rollup_state.covered_from is the first day from which the rollup is complete;
+# every writer (add_sale, add_sales_bulk, place_order, payments) keeps it current from then on.
+# Readers answer the covered part of a date range from the rollup and only the older,
+# uncovered part from the raw sales table.
+
+ROLLUP_UPSERT_SQL = register("rollup.upsert", """
+    INSERT INTO sales_daily_rollup
+        (day, item_id, customer_id, sale_count, quantity, revenue, amount_paid, amount_due)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        sale_count = sale_count + VALUES(sale_count),
+        quantity = quantity + VALUES(quantity),
+        revenue = revenue + VALUES(revenue),
+        amount_paid = amount_paid + VALUES(amount_paid),
+        amount_due = amount_due + VALUES(amount_due)
+""")
+
+
+# Read queries as ((rollup sql, date column), (raw sales sql, date column)) pairs;
+# {where} receives the date filter of the part of the range each one answers.
+DAILY_REVENUE_SQL = (
+    ("SELECT day, IFNULL(SUM(revenue),0) FROM sales_daily_rollup {where} GROUP BY day ORDER BY day DESC", "day"),
+    ("SELECT sale_date, IFNULL(SUM(total),0) FROM sales {where} GROUP BY sale_date ORDER BY sale_date DESC",
+     "sale_date"),
+)
+PERIOD_TOTALS_SQL = (
+    ("""SELECT IFNULL(SUM(revenue),0), IFNULL(SUM(amount_paid),0), IFNULL(SUM(amount_due),0)
+        FROM sales_daily_rollup {where}""", "day"),
+    ("""SELECT IFNULL(SUM(total),0), IFNULL(SUM(amount_paid),0), IFNULL(SUM(amount_due),0)
+        FROM sales {where}""", "sale_date"),
+)
+TOP_ITEMS_SQL = (
+    ("""SELECT m.item_name, SUM(r.quantity) as total_sold
+        FROM sales_daily_rollup r JOIN materials m ON r.item_id = m.id
+        {where} GROUP BY m.item_name""", "r.day"),
+    ("""SELECT m.item_name, SUM(s.quantity) as total_sold
+        FROM sales s JOIN materials m ON s.item_id = m.id
+        {where} GROUP BY m.item_name""", "s.sale_date"),
+)
+TOP_CUSTOMERS_SQL = (
+    ("""SELECT c.customer_name, IFNULL(SUM(r.revenue),0) as revenue
+        FROM sales_daily_rollup r JOIN customers c ON r.customer_id = c.customer_id
+        {where} GROUP BY c.customer_name""", "r.day"),
+    ("""SELECT c.customer_name, IFNULL(SUM(s.total),0) as revenue
+        FROM sales s JOIN customers c ON s.customer_id = c.customer_id
+        {where} GROUP BY c.customer_name""", "s.sale_date"),
+)
+COVERAGE_SQL = register("rollup.coverage", "SELECT covered_from FROM rollup_state WHERE id = 1")
+
+
+def rollup_rows(sales):
+    """
+    Pre-aggregates sale value tuples (as written with sales_crud.SALE_INSERT_SQL:
+    customer_id, item_id, quantity, sale_date, total, payment_method, amount_paid,
+    amount_due, payment_status) into ROLLUP_UPSERT_SQL rows, sorted by key so that
+    concurrent writers lock rollup rows in the same order.
+    """
+    totals = {}
+    for customer_id, item_id, quantity, sale_date, total, _, paid, due, _ in sales:
+        key = (sale_date, item_id or 0, customer_id or 0)
+        t = totals.setdefault(key, [0, 0, 0, 0, 0])
+        t[0] += 1
+        t[1] += quantity
+        t[2] += total
+        t[3] += paid
+        t[4] += due
+    return [key + tuple(t) for key, t in sorted(totals.items())]
+
+
+def record_sales(cursor, sales):
+    """Adds sales to the rollup inside the caller's transaction (see rollup_rows)."""
+    rows = rollup_rows(sales)
+    if rows:
+        cursor.executemany(ROLLUP_UPSERT_SQL, rows)
+
+
+def payment_rows(payments):
+    """
+    ROLLUP_UPSERT_SQL rows for payments against existing sales, given as
+    (sale_date, item_id, customer_id, amount): the amount moves from amount_due to
+    amount_paid on the sale's own rollup row; counts and revenue are unchanged.
+    """
+    totals = {}
+    for sale_date, item_id, customer_id, amount in payments:
+        key = (sale_date, item_id or 0, customer_id or 0)
+        totals[key] = totals.get(key, 0) + amount
+    return [key + (0, 0, 0, round(amount, 2), -round(amount, 2)) for key, amount in sorted(totals.items())]
+
+
+def record_payments(cursor, payments):
+    """Moves paid amounts from due to paid in the rollup inside the caller's transaction."""
+    rows = payment_rows(payments)
+    if rows:
+        cursor.executemany(ROLLUP_UPSERT_SQL, rows)
+
+
+def coverage_start(cursor):
+    """First day the rollup is complete from, or None if it has never been built."""
+    cursor.execute(COVERAGE_SQL)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def split_bounds(covered, start=None, end=None):
+    """
+    Splits the inclusive day range [start, end] (None = open ended) at the rollup
+    coverage into (raw_range, rollup_range); either part is None when empty.
+    """
+    if covered is None or (end is not None and end < covered):
+        return (start, end), None
+    if start is not None and start >= covered:
+        return None, (start, end)
+    return (start, covered - timedelta(days=1)), (covered, end)
+
+
+def split_range(cursor, start=None, end=None):
+    return split_bounds(coverage_start(cursor), start, end)
+
+
+def _range_filter(column, bounds):
+    start, end = bounds
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{column} >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append(f"{column} <= %s")
+        params.append(end)
+    return clauses, params
+
+
+def _where(clauses):
+    return ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+
+def range_queries(covered, queries, start=None, end=None):
+    """
+    Returns [(sql, params), ...] for the non-empty parts of [start, end]: the rollup
+    query for the covered part, the raw query for the part before it.
+    Shared by the sync readers below and async_crud.
+    """
+    raw, rolled = split_bounds(covered, start, end)
+    parts = []
+    for (sql, column), bounds in zip(queries, (rolled, raw)):
+        if bounds:
+            clauses, params = _range_filter(column, bounds)
+            parts.append((sql.format(where=_where(clauses)), tuple(params)))
+    return parts
+
+
+def add_totals(parts):
+    """Sums the (revenue, paid, due) rows of each part."""
+    totals = [0, 0, 0]
+    for row in parts:
+        totals = [a + b for a, b in zip(totals, row)]
+    return tuple(totals)
+
+
+def merge_ranked(parts, limit):
+    """Merges (name, value) rows from several parts and returns the top `limit`."""
+    merged = {}
+    for rows in parts:
+        for name, value in rows:
+            merged[name] = merged.get(name, 0) + value
+    return sorted(merged.items(), key=lambda r: r[1], reverse=True)[:limit]
+
+
+def iter_daily_revenue(cursor, covered, start=None, end=None, batch_size=1000):
+    """
+    (day, revenue) rows newest first, yielded as they are fetched. The rollup part covers
+    the days after the raw part and each part is ordered by the database, so nothing is
+    sorted or collected here. `cursor` may be unbuffered.
+    """
+    for sql, params in range_queries(covered, DAILY_REVENUE_SQL, start, end):
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def daily_revenue(cursor, start=None, end=None):
+    """[(day, revenue), ...] newest first."""
+    return list(iter_daily_revenue(cursor, coverage_start(cursor), start, end))
+
+
+def period_totals(cursor, start=None, end=None):
+    """(revenue, amount_paid, amount_due) summed over [start, end]."""
+    parts = []
+    for sql, params in range_queries(coverage_start(cursor), PERIOD_TOTALS_SQL, start, end):
+        cursor.execute(sql, params)
+        parts.append(cursor.fetchone())
+    return add_totals(parts)
+
+
+def _ranked(cursor, queries, start, end, limit):
+    """
+    Runs a GROUP BY name query against each part of the range and merges the results.
+    With a single part the LIMIT goes to the database; with two, every group is merged first.
+    """
+    parts = range_queries(coverage_start(cursor), queries, start, end)
+    if len(parts) == 1:
+        sql, params = parts[0]
+        cursor.execute(sql + " ORDER BY 2 DESC LIMIT %s", params + (limit,))
+        return cursor.fetchall()
+    results = []
+    for sql, params in parts:
+        cursor.execute(sql, params)
+        results.append(cursor.fetchall())
+    return merge_ranked(results, limit)
+
+
+def top_items(cursor, start=None, end=None, limit=5):
+    """[(item_name, total_sold), ...] by quantity."""
+    return _ranked(cursor, TOP_ITEMS_SQL, start, end, limit)
+
+
+def top_customers(cursor, start=None, end=None, limit=5):
+    """[(customer_name, revenue), ...] by revenue."""
+    return _ranked(cursor, TOP_CUSTOMERS_SQL, start, end, limit)
+
+
+def rebuild_rollup(since=None):
+    """
+    Recomputes the rollup from the raw sales table for every day from `since`
+    (default: the first sale) up to today, in one transaction, and marks it covered.
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            if since is None:
+                cursor.execute("SELECT MIN(sale_date) FROM sales")
+                since = cursor.fetchone()[0] or date.today()
+            cursor.execute("DELETE FROM sales_daily_rollup WHERE day >= %s", (since,))
+            cursor.execute("""
+                INSERT INTO sales_daily_rollup
+                    (day, item_id, customer_id, sale_count, quantity, revenue, amount_paid, amount_due)
+                SELECT sale_date, IFNULL(item_id,0), IFNULL(customer_id,0), COUNT(*),
+                       IFNULL(SUM(quantity),0), IFNULL(SUM(total),0),
+                       IFNULL(SUM(amount_paid),0), IFNULL(SUM(amount_due),0)
+                FROM sales
+                WHERE sale_date >= %s
+                GROUP BY sale_date, IFNULL(item_id,0), IFNULL(customer_id,0)
+            """, (since,))
+            rows = cursor.rowcount
+            covered = coverage_start(cursor)
+            covered = since if covered is None else min(covered, since)
+            cursor.execute("REPLACE INTO rollup_state (id, covered_from) VALUES (1, %s)", (covered,))
+            conn.commit()
+            invalidate("sales")
+            print(f"Rollup rebuilt from {since}: {rows} rows. Covered from {covered}.")
+            return covered
+    except Exception as e:
+        print(f"Error in rebuild_rollup: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def rollup_status():
+    """Prints the rollup coverage and size."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            covered = coverage_start(cursor)
+            cursor.execute("SELECT COUNT(*), MIN(day), MAX(day) FROM sales_daily_rollup")
+            count, first, last = cursor.fetchone()
+            if covered is None:
+                print("Rollup not built yet; analytics read the raw sales table. Run: python analytics_cli.py rollup-rebuild")
+            else:
+                print(f"Rollup covers {covered} onwards ({count} rows, days {first} .. {last}).")
+            return covered
+    except Exception as e:
+        print(f"Error in rollup_status: {e}")
+    finally:
+        if conn:
+            conn.close()
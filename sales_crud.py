@@ -1,140 +1,318 @@
-from db_connect import create_connection
+import time
+from db_connect import MAX_TX_RETRIES, STREAM_BATCH_SIZE, create_connection, is_retryable, iter_rows
+from materials_crud import STOCK_FOR_UPDATE_SQL
+from queries import register
+from query_cache import invalidate
+from bulk_ops import DEFAULT_CHUNK_SIZE, run_chunked
+import balances
+import columnar
+import rollup
+import stock_alerts
+import stock_journal
 from datetime import date
-from tabulate import tabulate
+from pagination import DEFAULT_PAGE_SIZE, decode_token, page_result
+from records import ItemSales, Sale
+from render import write_report
 
+SALE_INSERT_SQL = register("sales.insert", '''
+    INSERT INTO sales (customer_id, item_id, quantity, sale_date, total,
+                       payment_method, amount_paid, amount_due, payment_status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+''')
+STOCK_DECREMENT_SQL = register("materials.decrement_stock",
+                               "UPDATE materials SET quantity_in_stock = quantity_in_stock - %s WHERE id = %s")
+SALES_LISTING_SQL = '''
+        SELECT s.order_no, c.customer_name, m.item_name, s.quantity, s.sale_date, s.total,
+               s.payment_method, s.amount_paid, s.amount_due, s.payment_status
+        FROM sales s
+        JOIN customers c ON s.customer_id = c.customer_id
+        JOIN materials m ON s.item_id = m.id
+        {where}
+        ORDER BY s.sale_date DESC, s.order_no DESC
+'''
+SALES_PAGE_SQL = SALES_LISTING_SQL + "        LIMIT %s\n"
+SALES_ALL_SQL = register("sales.all", SALES_LISTING_SQL.format(where=""))
+SALES_FIRST_PAGE_SQL = register("sales.first_page", SALES_PAGE_SQL.format(where=""))
+SALES_NEXT_PAGE_SQL = register("sales.next_page", SALES_PAGE_SQL.format(
+    where="WHERE s.sale_date < %s OR (s.sale_date = %s AND s.order_no < %s)"
+))
+SALE_FIELDS = ("customer_id", "item_id", "quantity", "total", "payment_method",
+               "amount_paid", "amount_due", "payment_status", "sale_date")
 
-def add_sale(customer_id, item_id, quantity, total, payment_method="Cash", amount_paid=None, amount_due=None, payment_status="Pending"):
-    print(f"add_sale CALLED: customer_id={customer_id}, item_id={item_id}, quantity={quantity}, total={total}")
 
-    # 1. Early ID and quantity checks
+def validate_sale(customer_id, item_id, quantity, total, amount_paid=None, amount_due=None):
+    """
+    Checks IDs, quantity and amounts of a sale.
+    Returns (amount_paid, amount_due, error) with the paid/due defaults filled in;
+    error is None when the sale is valid.
+    """
     if not isinstance(customer_id, int) or customer_id <= 0:
-        print("Error: Invalid customer ID.")
-        return
+        return amount_paid, amount_due, "Invalid customer ID."
     if not isinstance(item_id, int) or item_id <= 0:
-        print("Error: Invalid item ID.")
-        return
+        return amount_paid, amount_due, "Invalid item ID."
     if not isinstance(quantity, int) or quantity <= 0:
-        print("Error: Quantity must be a positive integer.")
-        return
+        return amount_paid, amount_due, "Quantity must be a positive integer."
     if total is None or total < 0:
-        print("Error: Total cannot be negative or None.")
-        return
+        return amount_paid, amount_due, "Total cannot be negative or None."
 
-    # 2. Set defaults first
+    # Set defaults first, then check for negative values
     if amount_paid is None:
         amount_paid = total
     if amount_due is None:
         amount_due = total - amount_paid
-
-    # 3. Then check for negative values
     if amount_paid < 0 or amount_due < 0:
-        print("Error: Financial values cannot be negative.")
-        return
+        return amount_paid, amount_due, "Financial values cannot be negative."
+    return amount_paid, amount_due, None
 
-    # 4. DB logic with step-by-step prints
-    conn = None
-    try:
-        conn = create_connection()
-        if conn:
-            cursor = conn.cursor()
 
-            print("[DEBUG] Querying stock for item_id:", item_id)
-            cursor.execute("SELECT quantity_in_stock FROM materials WHERE id = %s", (item_id,))
+def add_sale(customer_id, item_id, quantity, total, payment_method="Cash", amount_paid=None, amount_due=None, payment_status="Pending"):
+    """
+    Records one sale and decrements stock in a single transaction.
+    The material row is locked with SELECT ... FOR UPDATE, so two clerks selling the
+    last units of an item are serialised instead of both passing the stock check.
+    Deadlocks and lock wait timeouts are retried up to MAX_TX_RETRIES times.
+    Returns the new order_no, or None if the sale was rejected.
+    """
+    amount_paid, amount_due, error = validate_sale(customer_id, item_id, quantity, total, amount_paid, amount_due)
+    if error:
+        print(f"Error: {error}")
+        return None
+
+    for attempt in range(1, MAX_TX_RETRIES + 1):
+        conn = None
+        try:
+            conn = create_connection()
+            if not conn:
+                return None
+            cursor = conn.cursor()
+            cursor.execute(STOCK_FOR_UPDATE_SQL, (item_id,))
             result = cursor.fetchone()
-            print("[DEBUG] Material row for stock:", result)
             if not result:
                 print(f"Error: Material with ID {item_id} not found.")
-                return
+                return None
             current_stock = result[0]
-            print(f"[DEBUG] Stock before sale: {current_stock}")
             if current_stock < quantity:
                 print(f"Error: Not enough stock. Only {current_stock} units available.")
-                return
-
-            # Insert the sale
-            sql = '''
-                INSERT INTO sales (customer_id, item_id, quantity, sale_date, total,
-                                   payment_method, amount_paid, amount_due, payment_status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            '''
-            values = (customer_id, item_id, quantity, date.today(), total,
-                      payment_method, amount_paid, amount_due, payment_status)
-            print("[DEBUG] Inserting sale:", values)
-            cursor.execute(sql, values)
-
-            # Update material stock
-            print(f"[DEBUG] Decrementing stock by {quantity} for item_id {item_id}")
+                return None
+
+            cursor.execute(STOCK_DECREMENT_SQL, (quantity, item_id))
+            sale = (customer_id, item_id, quantity, date.today(), total,
+                    payment_method, amount_paid, amount_due, payment_status)
+            cursor.execute(SALE_INSERT_SQL, sale)
+            order_no = cursor.lastrowid
+            rollup.record_sales(cursor, [sale])
+            balances.record_sales(cursor, [sale])
+            stock_journal.record_movements(cursor, [(item_id, -quantity, "sale", order_no)])
+            conn.commit()
+            break
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            if is_retryable(e) and attempt < MAX_TX_RETRIES:
+                time.sleep(0.05 * attempt)
+                continue
+            print(f"Database error during add_sale: {e}")
+            print("Transaction rolled back due to error.")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    # The sale is committed: nothing below may roll it back, retry it or report it as failed.
+    try:
+        invalidate("sales", "materials", "customer_balances")
+        stock_alerts.stock_changed(item_id, current_stock, current_stock - quantity)
+    except Exception as e:
+        print(f"Warning: sale {order_no} was recorded, but updating caches/alerts failed: {e}")
+    print(f"Sale recorded for customer ID {customer_id} and stock updated.")
+    return order_no
+
+
+def add_sales_bulk(sales, chunk_size=DEFAULT_CHUNK_SIZE, update_stock=True):
+    """
+    Records many sales, one transaction per chunk.
+
+    Each row is (customer_id, item_id, quantity, total[, payment_method, amount_paid,
+    amount_due, payment_status[, sale_date]]) or a dict with the add_sale argument names
+    (plus an optional sale_date). With update_stock=True the chunk's materials rows are
+    locked in id order, rows that would overdraw stock are rejected, and the stock
+    decrement and the sales insert each go out as a single executemany. Pass
+    update_stock=False to load historical sales without touching current stock.
+    Afterwards the stock of the items sold is re-read once and passed to stock_alerts.
+
+    Returns {"inserted": n, "errors": [(row_index, message), ...]}.
+    """
+    def validate(row):
+        fields = dict(payment_method="Cash", amount_paid=None, amount_due=None,
+                      payment_status="Pending", sale_date=None)
+        fields.update(row if isinstance(row, dict) else zip(SALE_FIELDS, row))
+        amount_paid, amount_due, error = validate_sale(
+            fields["customer_id"], fields["item_id"], fields["quantity"], fields["total"],
+            fields["amount_paid"], fields["amount_due"]
+        )
+        values = (fields["customer_id"], fields["item_id"], fields["quantity"], fields["sale_date"] or date.today(),
+                  fields["total"], fields["payment_method"], amount_paid, amount_due, fields["payment_status"])
+        return values, error
+
+    def write(cursor, good):
+        rejected = []
+        if update_stock:
+            item_ids = sorted({values[1] for _, values in good})
+            placeholders = ", ".join(["%s"] * len(item_ids))
             cursor.execute(
-                "UPDATE materials SET quantity_in_stock = quantity_in_stock - %s WHERE id = %s",
-                (quantity, item_id)
+                f"SELECT id, quantity_in_stock FROM materials WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE",
+                tuple(item_ids)
             )
-            conn.commit()
+            remaining = dict(cursor.fetchall())
+            for item_id, quantity in remaining.items():
+                stock_before.setdefault(item_id, quantity)
+            used = {}
+            accepted = []
+            for index, values in good:
+                item_id, quantity = values[1], values[2]
+                if item_id not in remaining:
+                    rejected.append((index, f"Material with ID {item_id} not found."))
+                elif remaining[item_id] < quantity:
+                    rejected.append((index, f"Not enough stock. Only {remaining[item_id]} units available."))
+                else:
+                    remaining[item_id] -= quantity
+                    used[item_id] = used.get(item_id, 0) + quantity
+                    accepted.append((index, values))
+            good = accepted
+            if used:
+                cursor.executemany(STOCK_DECREMENT_SQL,
+                                   [(quantity, item_id) for item_id, quantity in sorted(used.items())])
+                stock_journal.record_movements(cursor, [(item_id, -quantity, "sale")
+                                                        for item_id, quantity in sorted(used.items())])
+        if good:
+            sales_rows = [values for _, values in good]
+            cursor.executemany(SALE_INSERT_SQL, sales_rows)
+            rollup.record_sales(cursor, sales_rows)
+            balances.record_sales(cursor, sales_rows)
+        return rejected
 
-            cursor.execute("SELECT quantity_in_stock FROM materials WHERE id=%s", (item_id,))
-            new_stock = cursor.fetchone()[0]
-            print(f"Sale recorded for customer ID {customer_id} and stock updated.")
-            print(f"[DEBUG] Stock after sale: {new_stock}")
+    stock_before = {}
+    result = run_chunked("add_sales_bulk", sales, validate, write, chunk_size,
+                         tables=("sales", "materials", "customer_balances"))
+    if stock_before:
+        stock_alerts.stock_changes(_stock_after(stock_before))
+    return result
 
-    except Exception as e:
-        print(f"Database error during add_sale: {e}")
+
+def _stock_after(stock_before):
+    """(item_id, before, current stock) for the items in stock_before ([] on error)."""
+    conn = None
+    try:
+        conn = create_connection()
         if conn:
-            conn.rollback()
-            print("Transaction rolled back due to error.")
+            cursor = conn.cursor()
+            item_ids = sorted(stock_before)
+            placeholders = ", ".join(["%s"] * len(item_ids))
+            cursor.execute(f"SELECT id, quantity_in_stock FROM materials WHERE id IN ({placeholders})",
+                           tuple(item_ids))
+            return [(item_id, stock_before[item_id], quantity) for item_id, quantity in cursor.fetchall()]
+    except Exception as e:
+        print(f"Database error during add_sales_bulk: {e}")
     finally:
         if conn:
             conn.close()
+    return []
 
 
+SALES_HEADERS = list(Sale.HEADERS)
 
 
+def sales_page_query(token=None, page_size=DEFAULT_PAGE_SIZE):
+    """(sql, params) for one page of sales, newest first (sale_date, order_no descending)."""
+    if not token:
+        return SALES_FIRST_PAGE_SQL, (page_size + 1,)
+    last_date, last_order_no = decode_token(token)
+    return SALES_NEXT_PAGE_SQL, (last_date, last_date, last_order_no, page_size + 1)
 
-def list_sales():
+
+def sales_page_key(row):
+    return [row[4], row[0]]
+
+
+def list_sales_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of sales, newest first (sale_date, order_no descending), as (Sale records, next_token).
+    Pass next_token back to get the following page; it is None on the last page.
+    Returns None on a database error (not an empty last page).
+    """
     conn = None
     try:
+        sql, params = sales_page_query(token, page_size)
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT s.order_no, c.customer_name, m.item_name, s.quantity, s.sale_date, s.total,
-                       s.payment_method, s.amount_paid, s.amount_due, s.payment_status
-                FROM sales s
-                JOIN customers c ON s.customer_id = c.customer_id
-                JOIN materials m ON s.item_id = m.id
-            """)
-            rows = cursor.fetchall()
-            headers = ["OrderNo", "Customer", "Item", "Qty", "Date", "Total", "Payment", "Paid", "Due", "Status"]
-            print(tabulate(rows, headers=headers, tablefmt="grid"))
+            cursor.execute(sql, params)
+            return page_result(Sale.from_rows(cursor.fetchall()), page_size, key=sales_page_key)
     except Exception as e:
-        print(f"Database error during list_sales: {e}")
+        print(f"Database error during list_sales_page: {e}")
     finally:
         if conn:
             conn.close()
+    return None
+
+
+def iter_sales(batch_size=STREAM_BATCH_SIZE):
+    """Every sale, newest first, as a generator of Sale records read batch_size rows at a time."""
+    for row in iter_rows(SALES_ALL_SQL, batch_size=batch_size):
+        yield Sale(*row)
 
 
-def popular_items():
+def list_sales(fmt="table", out=None):
+    """
+    Streams all sales, newest first, to `out` (default stdout) as a fixed-width table,
+    CSV or NDJSON (see render.write_report). Returns the number of sales written, or
+    None on a database error.
+    """
+    try:
+        return write_report(iter_sales(), Sale, fmt, out, empty_message="No sales recorded.", floatfmt=".2f")
+    except Exception as e:
+        print(f"Database error during list_sales: {e}")
+        return None
+
+
+def export_sales(path, fmt="csv"):
+    """Streams all sales to the file `path` as CSV or NDJSON; returns the number written (None on error)."""
+    try:
+        with open(path, mode="w", newline="", encoding="utf-8") as f:
+            count = write_report(iter_sales(), Sale, fmt, f)
+        print(f"{count} sales exported to {path}")
+        return count
+    except Exception as e:
+        print(f"Error during export_sales: {e}")
+        return None
+
+
+def get_popular_items(limit=5):
+    """Best-selling items by quantity as ItemSales records (None on error)."""
     conn = None
     try:
+        if columnar.enabled():
+            return ItemSales.from_rows(columnar.get_store().top_items(limit=limit))
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT m.item_name, SUM(s.quantity) as total_sold
-                FROM sales s JOIN materials m ON s.item_id = m.id
-                GROUP BY m.item_name
-                ORDER BY total_sold DESC
-                LIMIT 5
-            """)
-            rows = cursor.fetchall()
-            print("Top-Selling Items:")
-            for item, sold in rows:
-                print(f"{item}: {sold} units")
+            return ItemSales.from_rows(rollup.top_items(cursor, limit=limit))
     except Exception as e:
-        print(f"Database error during popular_items: {e}")
+        print(f"Database error during get_popular_items: {e}")
     finally:
         if conn:
             conn.close()
 
 
+def popular_items(limit=5):
+    rows = get_popular_items(limit)
+    if rows is not None:
+        print("Top-Selling Items:")
+        for item in rows:
+            print(f"{item.item_name}: {item.total_sold} units")
+    return rows
+
+
 if __name__ == "__main__":
     # Test with valid customer and item IDs
     add_sale(
@@ -0,0 +1,316 @@
+"""
+Name search for materials, customers and suppliers.
+
+LIKE '%name%' cannot use an index, so every search scans the whole table. Instead each
+searchable table gets an in-process trigram index over its name column:
+
+- built from the database the first time the table is searched (or by build_indexes()
+  at startup),
+- kept current by the CRUD writers: add/update/delete update single entries, bulk
+  inserts mark the index stale so it is rebuilt on the next search,
+- ranked fuzzy matching per word: words containing the query word come first, then
+  words sharing enough trigrams with it ("cemnt" finds "Cement").
+
+Writes from other processes are not seen until refresh_index() is called.
+
+The "fulltext" backend sends the search to MySQL instead (MATCH ... AGAINST over the
+ngram FULLTEXT indexes from migrations/mysql/0005_fulltext_search.sql):
+
+    search_index.set_backend("fulltext")
+"""
+import re
+import threading
+from collections import Counter
+import db_connect
+from db_connect import create_connection
+
+# table -> (id column, name column)
+SEARCH_TABLES = {
+    "materials": ("id", "item_name"),
+    "customers": ("customer_id", "customer_name"),
+    "suppliers": ("supplier_id", "supplier_name"),
+}
+BACKENDS = ("trigram", "fulltext")
+DEFAULT_LIMIT = 20
+MIN_SIMILARITY = 0.3
+
+_backend = "trigram"
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+def trigrams(text):
+    """Trigrams of every word, padded so that word starts and ends count too."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Word-level trigram index.
+
+    Names are split into words. Fuzzy matching runs against the vocabulary of distinct
+    words (small, even for a big catalogue), and each word maps to the rows containing
+    it. Row lists are kept sorted (shortest name first), so a popular word such as
+    "cement" costs a slice, not a pass over every matching row.
+    """
+
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._names = {}        # id -> original name
+        self._row_words = {}    # id -> set of words
+        self._rank_key = {}     # id -> sort key used to order equally scored rows
+        self._words = {}        # word -> set of ids
+        self._sorted = {}       # word -> ids sorted by rank key (built on demand)
+        self._word_grams = {}   # word -> trigram set
+        self._postings = {}     # trigram -> set of words
+        self.stale = False
+        for row_id, name in rows:
+            self._add(row_id, name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _add(self, row_id, name):
+        normalized = normalize(name)
+        words = set(normalized.split())
+        self._names[row_id] = name
+        self._row_words[row_id] = words
+        self._rank_key[row_id] = (len(normalized), normalized, row_id)
+        for word in words:
+            ids = self._words.get(word)
+            if ids is None:
+                ids = self._words[word] = set()
+                grams = trigrams(word)
+                self._word_grams[word] = grams
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(word)
+            ids.add(row_id)
+            self._sorted.pop(word, None)
+
+    def _remove(self, row_id):
+        self._names.pop(row_id, None)
+        self._rank_key.pop(row_id, None)
+        for word in self._row_words.pop(row_id, ()):
+            ids = self._words[word]
+            ids.discard(row_id)
+            self._sorted.pop(word, None)
+            if not ids:
+                del self._words[word]
+                for gram in self._word_grams.pop(word):
+                    self._postings[gram].discard(word)
+                    if not self._postings[gram]:
+                        del self._postings[gram]
+
+    def add(self, row_id, name):
+        """Adds a row, or replaces its name if it is already indexed."""
+        with self._lock:
+            self._remove(row_id)
+            self._add(row_id, name)
+
+    def remove(self, row_id):
+        with self._lock:
+            self._remove(row_id)
+
+    def _matching_words(self, needle, min_similarity):
+        """Vocabulary words matching one query word -> score (1 + similarity if it contains the needle)."""
+        grams = trigrams(needle)
+        if len(needle) < 3:
+            # Too short for trigrams to say much: scan the vocabulary instead.
+            candidates = {word: 0 for word in self._words if needle in word}
+        else:
+            candidates = Counter()
+            for gram in grams:
+                candidates.update(self._postings.get(gram, ()))
+        scores = {}
+        for word, shared in candidates.items():
+            similarity = shared / (len(grams) + len(self._word_grams[word]) - shared) if shared else 0.0
+            if needle in word:
+                scores[word] = 1.0 + similarity
+            elif similarity >= min_similarity:
+                scores[word] = similarity
+        return scores
+
+    def _ranked_ids(self, word):
+        ranked = self._sorted.get(word)
+        if ranked is None:
+            ranked = self._sorted[word] = sorted(self._words[word], key=self._rank_key.__getitem__)
+        return ranked
+
+    def search(self, query, limit=DEFAULT_LIMIT, min_similarity=MIN_SIMILARITY):
+        """
+        Returns up to `limit` (id, name, score) tuples, best first.
+
+        Every query word has to match a word of the name, either as a substring
+        (score 1 + similarity) or with a trigram similarity (shared / union) of at
+        least min_similarity. A row scores the average of its best match per query
+        word; ties go to the shorter name.
+        """
+        needles = normalize(query).split()
+        if not needles:
+            return []
+        with self._lock:
+            per_needle = [self._matching_words(needle, min_similarity) for needle in needles]
+            if not all(per_needle):
+                return []
+
+            if len(per_needle) == 1:
+                # Walk the words best first and take their pre-sorted rows until the page is full.
+                results, seen = [], set()
+                ranked_words = sorted(per_needle[0].items(), key=lambda item: -item[1])
+                for position, (word, score) in enumerate(ranked_words):
+                    for row_id in self._ranked_ids(word)[:limit + len(seen)]:
+                        if row_id not in seen:
+                            seen.add(row_id)
+                            results.append((row_id, self._names[row_id], score))
+                    next_score = ranked_words[position + 1][1] if position + 1 < len(ranked_words) else None
+                    if len(results) >= limit and next_score != score:
+                        break
+                results.sort(key=lambda r: (-r[2], self._rank_key[r[0]]))
+                return results[:limit]
+
+            candidates = None
+            for scores in per_needle:
+                rows = set().union(*(self._words[word] for word in scores))
+                candidates = rows if candidates is None else candidates & rows
+            results = []
+            for row_id in candidates:
+                words = self._row_words[row_id]
+                total = sum(max(scores.get(word, 0.0) for word in words) for scores in per_needle)
+                results.append((row_id, self._names[row_id], total / len(per_needle)))
+        results.sort(key=lambda r: (-r[2], self._rank_key[r[0]]))
+        return results[:limit]
+
+
+def _load_index(table):
+    id_col, name_col = SEARCH_TABLES[table]
+    conn = create_connection()
+    if not conn:
+        raise RuntimeError("No database connection available.")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {id_col}, {name_col} FROM {table}")
+        return TrigramIndex(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+def get_index(table):
+    """The trigram index for `table`, (re)built from the database if missing or stale."""
+    index = _indexes.get(table)
+    if index is None or index.stale:
+        with _indexes_lock:
+            index = _indexes.get(table)
+            if index is None or index.stale:
+                index = _load_index(table)
+                _indexes[table] = index
+    return index
+
+
+def ready_index(table):
+    """The trigram index for `table` if it is built and current, else None (no database access)."""
+    index = _indexes.get(table)
+    return index if index is not None and not index.stale else None
+
+
+def build_indexes(tables=SEARCH_TABLES):
+    """Builds every index up front (e.g. at application start) so the first search is fast."""
+    for table in tables:
+        refresh_index(table)
+
+
+def refresh_index(table):
+    with _indexes_lock:
+        _indexes[table] = _load_index(table)
+    return _indexes[table]
+
+
+def index_row(table, row_id, name):
+    """Called by writers after committing an insert or a rename."""
+    index = _indexes.get(table)
+    if index is not None:
+        index.add(row_id, name)
+
+
+def remove_row(table, row_id):
+    """Called by writers after committing a delete."""
+    index = _indexes.get(table)
+    if index is not None:
+        index.remove(row_id)
+
+
+def mark_stale(*tables):
+    """Called after bulk writes: the index is rebuilt on the next search."""
+    for table in tables:
+        index = _indexes.get(table)
+        if index is not None:
+            index.stale = True
+
+
+def set_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend: {name} (expected one of {', '.join(BACKENDS)})")
+    if name == "fulltext" and db_connect.db_backend != "mysql":
+        raise ValueError("The fulltext search backend needs MySQL FULLTEXT indexes.")
+    _backend = name
+
+
+def _fulltext_search(table, query, limit):
+    id_col, name_col = SEARCH_TABLES[table]
+    conn = create_connection()
+    if not conn:
+        raise RuntimeError("No database connection available.")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {id_col}, {name_col}, MATCH({name_col}) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score "
+            f"FROM {table} WHERE MATCH({name_col}) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+            f"ORDER BY score DESC LIMIT %s",
+            (query, query, limit)
+        )
+        return [(row_id, name, float(score)) for row_id, name, score in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def uses_index():
+    return _backend == "trigram"
+
+
+def search(table, query, limit=DEFAULT_LIMIT):
+    """Ranked (id, name, score) matches for `query` in `table`, using the configured backend."""
+    if table not in SEARCH_TABLES:
+        raise ValueError(f"{table} is not searchable.")
+    if _backend == "fulltext":
+        return _fulltext_search(table, query, limit)
+    return get_index(table).search(query, limit)
+
+
+def ranked_rows_query(table, columns, matches):
+    """(sql, params) reading the full rows of the matched ids."""
+    id_col = SEARCH_TABLES[table][0]
+    placeholders = ", ".join(["%s"] * len(matches))
+    return (f"SELECT {columns} FROM {table} WHERE {id_col} IN ({placeholders})",
+            tuple(row_id for row_id, _, _ in matches))
+
+
+def in_rank_order(rows, matches):
+    """Orders rows (id first) like `matches`, dropping ids that were deleted meanwhile."""
+    by_id = {row[0]: row for row in rows}
+    return [by_id[row_id] for row_id, _, _ in matches if row_id in by_id]
+
+
+def fetch_ranked(cursor, table, columns, matches):
+    """Reads full rows for the matched ids and returns them in ranking order."""
+    if not matches:
+        return []
+    cursor.execute(*ranked_rows_query(table, columns, matches))
+    return in_rank_order(cursor.fetchall(), matches)
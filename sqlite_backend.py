@@ -0,0 +1,244 @@
+"""
+Embedded SQLite storage backend.
+
+Lets every CRUD, analytics and dashboard function run without a MySQL server:
+db_connect opens connections through connect() when the backend is "sqlite". The
+connection and cursor wrappers accept the same calls the code makes on
+mysql.connector objects, and the statements are translated on the fly:
+
+    %s placeholders                  -> ?
+    ... FOR UPDATE                   -> BEGIN IMMEDIATE (write lock for the transaction)
+    ON DUPLICATE KEY UPDATE VALUES(c) -> ON CONFLICT DO UPDATE SET ... excluded.c
+    GREATEST / LEAST                 -> MAX / MIN
+    TRUNCATE TABLE t                 -> DELETE FROM t (and reset its AUTOINCREMENT)
+    SET FOREIGN_KEY_CHECKS=n         -> PRAGMA foreign_keys
+
+Files are opened in WAL mode (readers never block the writer). sqlite3 keeps a per
+connection cache of prepared statements, and translations are cached as well, so a
+hot statement is parsed once per connection. path=":memory:" gives an in-memory
+database shared by all pooled connections of the process. It uses SQLite's shared
+cache, whose table locks fail at once instead of waiting, so it suits single-threaded
+scripts; anything concurrent (the test suite included) should use a file.
+"""
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+STATEMENT_CACHE_SIZE = 512
+BUSY_TIMEOUT_MS = 10000
+
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.I)
+_UPSERT = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.I)
+_TRUNCATE = re.compile(r"^\s*TRUNCATE\s+(?:TABLE\s+)?(\w+)\s*$", re.I)
+_FK_CHECKS = re.compile(r"^\s*SET\s+FOREIGN_KEY_CHECKS\s*=\s*([01])\s*$", re.I)
+_GREATEST = re.compile(r"\bGREATEST\s*\(", re.I)
+_LEAST = re.compile(r"\bLEAST\s*\(", re.I)
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Anchor connections keep shared in-memory databases alive while the pool recycles its connections.
+_memory_anchors = {}
+
+
+@lru_cache(maxsize=1024)
+def translate(sql):
+    """MySQL statement -> (tuple of SQLite statements, needs write lock)."""
+    match = _TRUNCATE.match(sql)
+    if match:
+        table = match.group(1)
+        return (f"DELETE FROM {table}", f"DELETE FROM sqlite_sequence WHERE name = '{table}'"), False
+    match = _FK_CHECKS.match(sql)
+    if match:
+        return (f"PRAGMA foreign_keys = {'ON' if match.group(1) == '1' else 'OFF'}",), False
+
+    lock = bool(_FOR_UPDATE.search(sql))
+    if lock:
+        sql = _FOR_UPDATE.sub("", sql)
+    upsert = _UPSERT.search(sql)
+    if upsert:
+        head, tail = sql[:upsert.start()], sql[upsert.end():]
+        sql = head + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", tail)
+    sql = _GREATEST.sub("MAX(", sql)
+    sql = _LEAST.sub("MIN(", sql)
+    sql = sql.replace("%s", "?").replace("%%", "%")
+    return (sql,), lock
+
+
+def _convert(value):
+    # Aggregates over DATE columns (MIN(sale_date), ...) lose the declared type; hand them back as dates like MySQL.
+    if isinstance(value, str) and len(value) == 10 and _ISO_DATE.match(value):
+        return date.fromisoformat(value)
+    return value
+
+
+class SQLiteCursor:
+    """
+    DB-API cursor with mysql.connector's behaviour where the code relies on it:
+    results are fetched eagerly (like buffered=True), dictionary=True rows are dicts,
+    and lastrowid after an executemany INSERT is the id of the first inserted row.
+    With buffered=False rows are read from SQLite as they are fetched, so a large
+    result is never held in memory at once.
+    """
+
+    def __init__(self, conn, dictionary=False, buffered=True):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self._dictionary = dictionary
+        self._buffered = buffered
+        self._names = None
+        self._rows = []
+        self._pos = 0
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def _row(self, row):
+        row = tuple(_convert(v) for v in row)
+        return dict(zip(self._names, row)) if self._dictionary else row
+
+    def _buffer(self):
+        self.description = self._cursor.description
+        self._names = [d[0] for d in self.description] if self.description else None
+        if not self._buffered:
+            self._rows, self._pos = None, 0
+            return
+        rows = []
+        if self.description:
+            rows = [self._row(row) for row in self._cursor.fetchall()]
+            self.rowcount = len(rows)       # like a buffered mysql.connector cursor
+        self._rows, self._pos = rows, 0
+
+    def _lock_if_needed(self, lock):
+        if lock and not self._conn.raw.in_transaction:
+            self._cursor.execute("BEGIN IMMEDIATE")
+
+    def execute(self, sql, params=()):
+        statements, lock = translate(sql)
+        self._lock_if_needed(lock)
+        for statement in statements:
+            self._cursor.execute(statement, params if statement is statements[0] else ())
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        self._buffer()
+
+    def executemany(self, sql, seq_of_params):
+        statements, lock = translate(sql)
+        self._lock_if_needed(lock)
+        self._cursor.executemany(statements[0], seq_of_params)
+        self.rowcount = self._cursor.rowcount
+        if self.rowcount > 0 and statements[0].lstrip()[:6].upper() == "INSERT":
+            last = self._conn.raw.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self.lastrowid = last - self.rowcount + 1
+        self._rows, self._pos, self.description = [], 0, None
+
+    def fetchone(self):
+        if self._rows is None:
+            row = self._cursor.fetchone()
+            return None if row is None else self._row(row)
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self, size=1):
+        if self._rows is None:
+            return [self._row(row) for row in self._cursor.fetchmany(size)]
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        if self._rows is None:
+            return [self._row(row) for row in self._cursor.fetchall()]
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """The subset of the mysql.connector connection API used by the pool and the CRUD modules."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, dictionary=False, buffered=True, **_):
+        return SQLiteCursor(self, dictionary=dictionary, buffered=buffered)
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        self.raw.execute("SELECT 1").fetchone()
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self.raw.close()
+
+
+def _open(target, uri=False):
+    raw = sqlite3.connect(
+        target,
+        uri=uri,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,        # pooled connections move between threads, one at a time
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    raw.execute("PRAGMA foreign_keys = ON")
+    raw.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    return raw
+
+
+def connect(path="building_materials.db", **_):
+    """Opens a connection to the SQLite database at `path` (":memory:" = shared in-memory database)."""
+    if path == ":memory:":
+        target = f"file:bmm-memory-{os.getpid()}?mode=memory&cache=shared"
+        if target not in _memory_anchors:
+            _memory_anchors[target] = _open(target, uri=True)
+        return SQLiteConnection(_open(target, uri=True))
+
+    raw = _open(path)
+    raw.execute("PRAGMA journal_mode = WAL")
+    raw.execute("PRAGMA synchronous = NORMAL")
+    return SQLiteConnection(raw)
+
+
+def drop_memory_databases():
+    """Closes the anchors, so the next connect(":memory:") starts from an empty database."""
+    while _memory_anchors:
+        _, anchor = _memory_anchors.popitem()
+        anchor.close()
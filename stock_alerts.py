@@ -0,0 +1,443 @@
+"""
+Event-driven low-stock alerts.
+
+Writers that change stock (add_sale, add_sales_bulk, place_order, update_material,
+receive_stock, receive_goods and the async add_sale) report each change with
+stock_changed(item_id, before, after) once they have committed. An alert is raised when
+the quantity crosses the item's threshold on the way down (before > threshold >= after),
+so nothing polls the materials table.
+
+Thresholds come from stock_thresholds (per item, held in memory) and fall back to
+DEFAULT_THRESHOLD. A restock seen here that lifts an item above its threshold re-arms
+it: its next crossing alerts at once. Otherwise an item alerts at most once per
+cool-down, which also covers restocks this process never saw (another process, a
+manual UPDATE). Raised alerts are logged in stock_alerts.
+
+Detection and delivery run on one background thread, so a slow webhook or mail server
+never holds up a sale. Channels are pluggable (anything with send(alert)):
+
+    import stock_alerts
+    stock_alerts.set_threshold(3, 50)                     # alert when item 3 drops to 50 or below
+    stock_alerts.set_channels([stock_alerts.FileChannel("alerts.jsonl"),
+                               stock_alerts.WebhookChannel("http://localhost:9000/hook")])
+
+or BMM_ALERT_CHANNELS="file:alerts.jsonl,webhook:http://localhost:9000/hook,smtp:localhost:1025"
+(default "stdout"; empty turns alerting off).
+"""
+import abc
+import argparse
+import atexit
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from email.message import EmailMessage
+
+from db_connect import create_connection
+from query_cache import cache, invalidate
+from records import StockAlert
+from render import print_table
+
+DEFAULT_THRESHOLD = 20          # same default as show_low_stock
+DEFAULT_COOLDOWN = 3600         # seconds between two alerts for one item
+THRESHOLDS_TTL = 60             # seconds before thresholds set by other processes are picked up
+
+THRESHOLDS_SQL = "SELECT item_id, threshold, cooldown_seconds FROM stock_thresholds"
+THRESHOLD_UPSERT_SQL = """
+    INSERT INTO stock_thresholds (item_id, threshold, cooldown_seconds)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE threshold = VALUES(threshold), cooldown_seconds = VALUES(cooldown_seconds)
+"""
+LAST_ALERT_SQL = "SELECT MAX(raised_at) FROM stock_alerts WHERE item_id = %s"
+ALERT_INSERT_SQL = """
+    INSERT INTO stock_alerts (item_id, quantity, threshold, raised_at)
+    VALUES (%s, %s, %s, %s)
+"""
+ITEM_SQL = "SELECT item_name, supplier_id FROM materials WHERE id = %s"
+RECENT_ALERTS_SQL = """
+    SELECT a.item_id, m.item_name, a.quantity, a.threshold, m.supplier_id, a.raised_at
+    FROM stock_alerts a LEFT JOIN materials m ON a.item_id = m.id
+    ORDER BY a.alert_id DESC
+    LIMIT %s
+"""
+
+
+# Channels
+
+class Channel(abc.ABC):
+    """Delivers one StockAlert. send() runs on the dispatcher thread and may block."""
+    name = "channel"
+
+    @abc.abstractmethod
+    def send(self, alert):
+        """Delivers `alert`. An exception is logged and counted as a failure; other channels still get it."""
+
+
+def message(alert):
+    return (f"Low stock: {alert.item_name or f'item {alert.item_id}'} is down to {alert.quantity} "
+            f"(threshold {alert.threshold})")
+
+
+def alert_json(alert):
+    values = alert.as_dict()
+    values["raised_at"] = alert.raised_at.isoformat(timespec="seconds")
+    return json.dumps(values)
+
+
+class StdoutChannel(Channel):
+    name = "stdout"
+
+    def send(self, alert):
+        print(message(alert))
+
+
+class FileChannel(Channel):
+    """Appends one JSON object per alert to `path`."""
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, alert):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(alert_json(alert) + "\n")
+
+
+class WebhookChannel(Channel):
+    """POSTs the alert as JSON to `url`."""
+    name = "webhook"
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        request = urllib.request.Request(self.url, data=alert_json(alert).encode("utf-8"), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SmtpChannel(Channel):
+    """
+    Mails the alert through an SMTP server; the default is a local stand-in such as
+    `python -m aiosmtpd -n -l localhost:1025`.
+    """
+    name = "smtp"
+
+    def __init__(self, host="localhost", port=1025, sender="stock-alerts@localhost",
+                 recipients=("stores@localhost",), timeout=5):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.timeout = timeout
+
+    def send(self, alert):
+        mail = EmailMessage()
+        mail["Subject"] = message(alert)
+        mail["From"] = self.sender
+        mail["To"] = ", ".join(self.recipients)
+        mail.set_content(alert_json(alert))
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(mail)
+
+
+class CallbackChannel(Channel):
+    """Calls fn(alert); for tests, benchmarks and in-process consumers."""
+    name = "callback"
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def send(self, alert):
+        self.fn(alert)
+
+
+def channel_from_spec(spec):
+    """stdout | file:<path> | webhook:<url> | smtp[:host[:port]] -> Channel."""
+    kind, _, arg = spec.strip().partition(":")
+    if kind == "stdout":
+        return StdoutChannel()
+    if kind == "file" and arg:
+        return FileChannel(arg)
+    if kind == "webhook" and arg:
+        return WebhookChannel(arg)
+    if kind == "smtp":
+        host, _, port = arg.partition(":")
+        return SmtpChannel(host or "localhost", int(port or 1025))
+    raise ValueError(f"Unknown alert channel: {spec!r}")
+
+
+def channels_from_spec(spec):
+    return [channel_from_spec(part) for part in spec.split(",") if part.strip()]
+
+
+# Thresholds
+
+class Thresholds:
+    """Per-item (threshold, cooldown) from stock_thresholds, reloaded after set_threshold() or THRESHOLDS_TTL."""
+
+    def __init__(self):
+        self._items = None
+        self._loaded_at = 0.0
+        self._version = None
+
+    def _load(self):
+        conn = create_connection()
+        if not conn:
+            raise RuntimeError("No database connection available.")
+        try:
+            cursor = conn.cursor()
+            cursor.execute(THRESHOLDS_SQL)
+            items = {item_id: (threshold, cooldown) for item_id, threshold, cooldown in cursor.fetchall()}
+            conn.commit()
+        finally:
+            conn.close()
+        return items
+
+    def get(self, item_id):
+        version = cache.version("stock_thresholds")
+        if (self._items is None or version != self._version
+                or time.monotonic() - self._loaded_at > THRESHOLDS_TTL):
+            self._items = self._load()
+            self._version = version
+            self._loaded_at = time.monotonic()
+        threshold, cooldown = self._items.get(item_id, (DEFAULT_THRESHOLD, None))
+        return threshold, DEFAULT_COOLDOWN if cooldown is None else cooldown
+
+
+# Engine
+
+class AlertEngine:
+    """
+    Queue of stock changes plus the thread that turns threshold crossings into alerts.
+    stock_changed() only appends to the queue, so writers pay no database or network cost.
+    """
+
+    def __init__(self, channels=None):
+        self.channels = list(channels or [])
+        self.thresholds = Thresholds()
+        self._queue = queue.Queue()
+        self._last_alert = {}           # item_id -> monotonic time of the last alert here
+        self._rearmed = set()           # items restocked above their threshold since that alert
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {"changes": 0, "alerts": 0, "suppressed": 0, "failures": 0}
+
+    def stock_changed(self, item_id, before, after):
+        if not self.channels or before is None or after is None or after == before:
+            return
+        self._ensure_thread()
+        self._queue.put((item_id, before, after, time.perf_counter()))
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="stock-alerts", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            change = self._queue.get()
+            try:
+                self.process(*change)
+            except Exception as e:
+                print(f"Error in stock alerts: {e}")
+            finally:
+                self._queue.task_done()
+
+    def process(self, item_id, before, after, changed_at=None):
+        """
+        Raises and delivers an alert if the change crossed the item's threshold on the way
+        down; a rise above the threshold re-arms the item instead. Returns the alert or None.
+        """
+        self.stats["changes"] += 1
+        threshold, cooldown = self.thresholds.get(item_id)
+        if after > threshold:
+            if after > before:
+                self._rearmed.add(item_id)
+            return None
+        if not before > threshold:
+            return None
+        now = time.monotonic()
+        rearmed = item_id in self._rearmed
+        last = self._last_alert.get(item_id)
+        if not rearmed and last is not None and now - last < cooldown:
+            self.stats["suppressed"] += 1
+            return None
+        alert = self._raise(item_id, after, threshold, 0 if rearmed else cooldown)
+        if alert is None:
+            self.stats["suppressed"] += 1
+            return None
+        self._last_alert[item_id] = now
+        self._rearmed.discard(item_id)
+        self.stats["alerts"] += 1
+        for channel in self.channels:
+            try:
+                channel.send(alert)
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"Stock alert for item {item_id} not delivered via {channel.name}: {e}")
+        return alert
+
+    def _raise(self, item_id, quantity, threshold, cooldown):
+        """Logs the alert unless another process alerted for the item within the cool-down."""
+        conn = create_connection()
+        if not conn:
+            raise RuntimeError("No database connection available.")
+        try:
+            cursor = conn.cursor()
+            raised_at = datetime.now().replace(microsecond=0)
+            cursor.execute(LAST_ALERT_SQL, (item_id,))
+            last = cursor.fetchone()[0]
+            if isinstance(last, str):
+                last = datetime.fromisoformat(last)
+            if last is not None and (raised_at - last).total_seconds() < cooldown:
+                conn.commit()
+                return None
+            cursor.execute(ITEM_SQL, (item_id,))
+            item_name, supplier_id = cursor.fetchone() or (None, None)
+            cursor.execute(ALERT_INSERT_SQL, (item_id, quantity, threshold, raised_at))
+            conn.commit()
+        finally:
+            conn.close()
+        invalidate("stock_alerts")
+        return StockAlert(item_id, item_name, quantity, threshold, supplier_id, raised_at)
+
+    def flush(self, timeout=5.0):
+        """Waits until every queued change has been processed (or `timeout` seconds). Returns True if drained."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+
+_engine = AlertEngine(channels_from_spec(os.environ.get("BMM_ALERT_CHANNELS", "stdout")))
+atexit.register(_engine.flush, 2.0)
+
+
+def get_engine():
+    return _engine
+
+
+def set_channels(channels):
+    """Replaces the delivery channels; an empty list turns alerting off."""
+    _engine.channels = list(channels)
+
+
+def add_channel(channel):
+    _engine.channels.append(channel)
+
+
+def stock_changed(item_id, before, after):
+    """Called by stock writers after commit; returns at once, detection runs on the alert thread."""
+    _engine.stock_changed(item_id, before, after)
+
+
+def stock_changes(changes):
+    """stock_changed() for each (item_id, before, after)."""
+    for item_id, before, after in changes:
+        _engine.stock_changed(item_id, before, after)
+
+
+def flush(timeout=5.0):
+    return _engine.flush(timeout)
+
+
+def set_threshold(item_id, threshold, cooldown=None):
+    """Sets the item's alert threshold (and cool-down in seconds; None = DEFAULT_COOLDOWN)."""
+    if not isinstance(threshold, int) or threshold < 0:
+        print("Threshold must be a non-negative integer.")
+        return False
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(THRESHOLD_UPSERT_SQL, (item_id, threshold, cooldown))
+            conn.commit()
+            invalidate("stock_thresholds")
+            print(f"Low-stock threshold for item {item_id} set to {threshold}.")
+            return True
+    except Exception as e:
+        print(f"Database error during set_threshold: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return False
+
+
+def remove_threshold(item_id):
+    """The item goes back to DEFAULT_THRESHOLD."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM stock_thresholds WHERE item_id = %s", (item_id,))
+            conn.commit()
+            invalidate("stock_thresholds")
+            return True
+    except Exception as e:
+        print(f"Database error during remove_threshold: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return False
+
+
+def recent_alerts(limit=20):
+    """The latest raised alerts, newest first, as StockAlert records ([] on error)."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(RECENT_ALERTS_SQL, (limit,))
+            return StockAlert.from_rows(cursor.fetchall())
+    except Exception as e:
+        print(f"Database error during recent_alerts: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p1 = sub.add_parser("set", help="Set an item's low-stock threshold")
+    p1.add_argument("item_id", type=int)
+    p1.add_argument("threshold", type=int)
+    p1.add_argument("--cooldown", type=int, help=f"Seconds between alerts (default {DEFAULT_COOLDOWN})")
+
+    p2 = sub.add_parser("unset", help="Back to the default threshold")
+    p2.add_argument("item_id", type=int)
+
+    p3 = sub.add_parser("recent", help="Latest alerts")
+    p3.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.cmd == "set":
+        set_threshold(args.item_id, args.threshold, args.cooldown)
+    elif args.cmd == "unset":
+        remove_threshold(args.item_id)
+    elif args.cmd == "recent":
+        print_table(recent_alerts(args.limit), StockAlert, empty_message="No alerts raised yet.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Stock movement journal and point-in-time inventory.
+
+Every writer that changes materials.quantity_in_stock appends a row to stock_movements
+in the same transaction: sales (add_sale, add_sales_bulk, place_order), receipts,
+adjustments (update_material, a new material's opening stock) and deletes. The journal
+is never updated, so it explains how every item got to its current stock.
+
+Snapshots hold every item's stock as of a movement id. They are compacted forward:
+a new snapshot is the previous one plus the movements since. Taking one locks the
+materials rows, so it is a scheduled job (`python stock_journal.py snapshot --if-due`
+from cron) and never part of a read. Stock at a past moment is then the latest snapshot
+before it plus a short replay.
+
+    python stock_journal.py at 2025-06-01              # stock of every item at the end of that day
+    python stock_journal.py history 3 --limit 20
+    python stock_journal.py receive 3 500 --ref 17     # goods in
+    python stock_journal.py snapshot --if-due          # nightly, from cron
+    python stock_journal.py reconcile [--fix]          # journal vs materials.quantity_in_stock
+"""
+import argparse
+from datetime import date, datetime, time, timedelta
+
+from db_connect import create_connection
+from query_cache import invalidate
+import stock_alerts
+from records import StockLevel, StockMismatch, StockMovement
+from render import print_table
+
+REASONS = ("opening", "sale", "receipt", "adjustment", "delete")
+SNAPSHOT_INTERVAL = timedelta(days=1)
+
+MOVEMENT_INSERT_SQL = """
+    INSERT INTO stock_movements (item_id, moved_at, quantity_change, reason, ref_no)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+HISTORY_SQL = """
+    SELECT movement_id, item_id, moved_at, quantity_change, reason, ref_no
+    FROM stock_movements WHERE item_id = %s
+    ORDER BY movement_id DESC LIMIT %s
+"""
+LOCK_MATERIALS_SQL = "SELECT id FROM materials ORDER BY id FOR UPDATE"
+LAST_MOVEMENT_SQL = "SELECT MAX(movement_id) FROM stock_movements"
+LATEST_SNAPSHOT_SQL = """
+    SELECT snapshot_id, taken_at, last_movement_id FROM stock_snapshots
+    WHERE taken_at <= %s ORDER BY taken_at DESC, snapshot_id DESC LIMIT 1
+"""
+# Every movement up to a moment is at or below the next snapshot's last_movement_id.
+NEXT_SNAPSHOT_SQL = "SELECT MIN(last_movement_id) FROM stock_snapshots WHERE taken_at > %s"
+SNAPSHOT_ITEMS_SQL = "SELECT item_id, quantity FROM stock_snapshot_items WHERE snapshot_id = %s"
+REPLAY_SQL = """
+    SELECT item_id, SUM(quantity_change) FROM stock_movements
+    WHERE movement_id > %s AND movement_id <= %s AND moved_at <= %s
+    GROUP BY item_id
+"""
+SNAPSHOT_INSERT_SQL = "INSERT INTO stock_snapshots (taken_at, last_movement_id) VALUES (%s, %s)"
+SNAPSHOT_ITEM_INSERT_SQL = "INSERT INTO stock_snapshot_items (snapshot_id, item_id, quantity) VALUES (%s, %s, %s)"
+STOCK_SQL = "SELECT id, item_name, quantity_in_stock FROM materials"
+
+_snapshot_checked_on = None
+
+
+def now():
+    return datetime.now().replace(microsecond=0)
+
+
+def _moment(value):
+    """A datetime for as-of arguments; a date (or YYYY-MM-DD) means the end of that day."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0)
+    return datetime.combine(value, time(23, 59, 59))
+
+
+def movement_rows(movements):
+    """MOVEMENT_INSERT_SQL rows for (item_id, quantity_change, reason[, ref_no]); zero changes are skipped."""
+    moved_at = now()
+    return [(m[0], moved_at, m[1], m[2], m[3] if len(m) > 3 else None) for m in movements if m[1]]
+
+
+def record_movements(cursor, movements):
+    """Appends (item_id, quantity_change, reason[, ref_no]) movements in the caller's transaction."""
+    rows = movement_rows(movements)
+    if rows:
+        cursor.executemany(MOVEMENT_INSERT_SQL, rows)
+
+
+def record_openings(cursor, first_id, quantities):
+    """
+    Journals the opening stock of the materials one multi-row INSERT just created:
+    `first_id` is its lastrowid and the ids are consecutive, one per quantity.
+    """
+    record_movements(cursor, [(first_id + i, quantity, "opening") for i, quantity in enumerate(quantities)])
+
+
+def journal_stock(cursor, as_of=None):
+    """
+    {item_id: quantity} according to the journal at `as_of` (default: now): the latest
+    snapshot taken by then plus the movements after it, up to the next snapshot.
+    """
+    as_of = _moment(as_of) if as_of is not None else now()
+    cursor.execute(LATEST_SNAPSHOT_SQL, (as_of,))
+    snapshot = cursor.fetchone()
+    stock, after = {}, 0
+    if snapshot:
+        cursor.execute(SNAPSHOT_ITEMS_SQL, (snapshot[0],))
+        stock = dict(cursor.fetchall())
+        after = snapshot[2]
+    cursor.execute(NEXT_SNAPSHOT_SQL, (as_of,))
+    upto = cursor.fetchone()[0]
+    if upto is None:
+        cursor.execute(LAST_MOVEMENT_SQL)
+        upto = cursor.fetchone()[0] or 0
+    cursor.execute(REPLAY_SQL, (after, upto, as_of))
+    for item_id, change in cursor.fetchall():
+        stock[item_id] = stock.get(item_id, 0) + int(change)
+    return stock
+
+
+def take_snapshot(cursor):
+    """
+    Stores the journal's current stock of every item as a new snapshot (the caller commits).
+    The materials rows are locked first, so no stock change is half-way through meanwhile.
+    Returns the snapshot id.
+    """
+    cursor.execute(LOCK_MATERIALS_SQL)
+    cursor.fetchall()
+    taken_at = now()
+    stock = journal_stock(cursor, taken_at)
+    cursor.execute(LAST_MOVEMENT_SQL)
+    last = cursor.fetchone()[0] or 0
+    cursor.execute(SNAPSHOT_INSERT_SQL, (taken_at, last))
+    snapshot_id = cursor.lastrowid
+    cursor.executemany(SNAPSHOT_ITEM_INSERT_SQL,
+                       [(snapshot_id, item_id, quantity) for item_id, quantity in sorted(stock.items()) if quantity])
+    return snapshot_id
+
+
+def snapshot_if_due():
+    """
+    Takes a snapshot if the latest is older than SNAPSHOT_INTERVAL; checked once a day per
+    process. Meant for the scheduled job: it locks every materials row while it runs.
+    """
+    global _snapshot_checked_on
+    today = date.today()
+    if _snapshot_checked_on == today:
+        return None
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(LATEST_SNAPSHOT_SQL, (now(),))
+            latest = cursor.fetchone()
+            taken = None
+            if latest is not None:
+                taken = _moment(latest[1]) if isinstance(latest[1], str) else latest[1]
+            snapshot_id = None
+            if taken is None or now() - taken >= SNAPSHOT_INTERVAL:
+                snapshot_id = take_snapshot(cursor)
+            conn.commit()
+            _snapshot_checked_on = today
+            return snapshot_id
+    except Exception as e:
+        print(f"Error in snapshot_if_due: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def _levels(cursor, stock):
+    cursor.execute("SELECT id, item_name FROM materials")
+    names = dict(cursor.fetchall())
+    return [StockLevel(item_id, names.get(item_id), quantity)
+            for item_id, quantity in sorted(stock.items()) if quantity or item_id in names]
+
+
+def get_stock_at(as_of, item_id=None):
+    """
+    Stock of every item (or one) at `as_of` (datetime, or a date = end of that day), as
+    StockLevel records; deleted items show their name as None. None on error.
+    Read-only: it never takes a snapshot itself.
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            stock = journal_stock(cursor, as_of)
+            if item_id is not None:
+                stock = {item_id: stock.get(item_id, 0)}
+            return _levels(cursor, stock)
+    except Exception as e:
+        print(f"Error in get_stock_at: {e}")
+    finally:
+        if conn:
+            conn.close()
+
+
+def get_movements(item_id, limit=50):
+    """The item's latest movements, newest first, as StockMovement records ([] on error)."""
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(HISTORY_SQL, (item_id, limit))
+            return StockMovement.from_rows(cursor.fetchall())
+    except Exception as e:
+        print(f"Database error during get_movements: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return []
+
+
+def receive_stock(item_id, quantity, ref_no=None):
+    """Adds received goods to stock and journals them as a receipt. Returns True if recorded."""
+    if not isinstance(quantity, int) or quantity <= 0:
+        print("Error: Received quantity must be a positive integer.")
+        return False
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT quantity_in_stock FROM materials WHERE id = %s FOR UPDATE", (item_id,))
+            row = cursor.fetchone()
+            if row is None:
+                print(f"Error: Material with ID {item_id} not found.")
+                return False
+            cursor.execute("UPDATE materials SET quantity_in_stock = quantity_in_stock + %s WHERE id = %s",
+                           (quantity, item_id))
+            record_movements(cursor, [(item_id, quantity, "receipt", ref_no)])
+            conn.commit()
+            invalidate("materials")
+            stock_alerts.stock_changed(item_id, row[0], row[0] + quantity)
+            print(f"Received {quantity} units of material ID {item_id}.")
+            return True
+    except Exception as e:
+        print(f"Database error during receive_stock: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return False
+
+
+def reconcile(fix=False):
+    """
+    Compares the journal with materials.quantity_in_stock for every item and returns the
+    differences as StockMismatch records ([] = they agree, None on error). With fix=True
+    an adjustment movement is journaled for each, taking materials as the truth.
+    """
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute(LOCK_MATERIALS_SQL)
+            cursor.fetchall()
+            journal = journal_stock(cursor)
+            cursor.execute(STOCK_SQL)
+            actual = {item_id: (name, quantity or 0) for item_id, name, quantity in cursor.fetchall()}
+            mismatches = []
+            for item_id in sorted(set(journal) | set(actual)):
+                name, quantity = actual.get(item_id, (None, 0))
+                journaled = journal.get(item_id, 0)
+                if journaled != quantity:
+                    mismatches.append(StockMismatch(item_id, name, journaled, quantity, quantity - journaled))
+            if fix and mismatches:
+                record_movements(cursor, [(m.item_id, m.difference, "adjustment") for m in mismatches])
+            conn.commit()
+            return mismatches
+    except Exception as e:
+        print(f"Error in reconcile: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p1 = sub.add_parser("at", help="Stock at a past date (end of day) or YYYY-MM-DDTHH:MM:SS")
+    p1.add_argument("as_of")
+    p1.add_argument("--item", type=int)
+
+    p2 = sub.add_parser("history", help="Movements of one item, newest first")
+    p2.add_argument("item_id", type=int)
+    p2.add_argument("--limit", type=int, default=50)
+
+    p3 = sub.add_parser("receive", help="Goods received into stock")
+    p3.add_argument("item_id", type=int)
+    p3.add_argument("quantity", type=int)
+    p3.add_argument("--ref", type=int, help="Purchase order number")
+
+    p5 = sub.add_parser("snapshot", help="Take a snapshot now")
+    p5.add_argument("--if-due", action="store_true",
+                    help=f"Only if the latest snapshot is older than {SNAPSHOT_INTERVAL} (for cron)")
+
+    p4 = sub.add_parser("reconcile", help="Check the journal against materials.quantity_in_stock")
+    p4.add_argument("--fix", action="store_true", help="Journal adjustments for the differences")
+
+    args = parser.parse_args()
+    if args.cmd == "at":
+        rows = get_stock_at(args.as_of, args.item)
+        if rows is not None:
+            print_table(rows, StockLevel, empty_message="No stock recorded by then.")
+    elif args.cmd == "history":
+        print_table(get_movements(args.item_id, args.limit), StockMovement, empty_message="No movements.")
+    elif args.cmd == "receive":
+        receive_stock(args.item_id, args.quantity, args.ref)
+    elif args.cmd == "snapshot" and args.if_due:
+        snapshot_id = snapshot_if_due()
+        print(f"Snapshot {snapshot_id} taken." if snapshot_id else "No snapshot due.")
+    elif args.cmd == "snapshot":
+        conn = create_connection()
+        try:
+            snapshot_id = take_snapshot(conn.cursor())
+            conn.commit()
+            print(f"Snapshot {snapshot_id} taken.")
+        finally:
+            conn.close()
+    elif args.cmd == "reconcile":
+        mismatches = reconcile(args.fix)
+        if mismatches is not None:
+            print_table(mismatches, StockMismatch, empty_message="Journal and stock agree.")
+            if mismatches and args.fix:
+                print(f"Journaled {len(mismatches)} adjustments.")
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,48 @@
 from db_connect import create_connection
-import re
-from tabulate import tabulate
+from queries import register
+from query_cache import invalidate
+from bulk_ops import DEFAULT_CHUNK_SIZE, insert_many, run_chunked
+from customers_crud import PHONE_PATTERN
+from pagination import DEFAULT_PAGE_SIZE, decode_token, page_result
+from records import Supplier
+from render import print_pages, print_table
+import search_index
+
+SUPPLIERS_PAGE_SQL = register("suppliers.page", (
+    "SELECT supplier_id, supplier_name, phone, address FROM suppliers "
+    "WHERE supplier_id > %s ORDER BY supplier_id LIMIT %s"
+))
+SUPPLIER_INSERT_SQL = register(
+    "suppliers.insert", "INSERT INTO suppliers (supplier_name, phone, address) VALUES (%s, %s, %s)"
+)
+SUPPLIER_EXISTS_SQL = register("suppliers.exists", "SELECT 1 FROM suppliers WHERE supplier_id=%s")
+SET_LEAD_TIME_SQL = register("suppliers.set_lead_time",
+                             "UPDATE suppliers SET lead_time_days=%s WHERE supplier_id=%s")
+SUPPLIER_DELETE_SQL = register("suppliers.delete", "DELETE FROM suppliers WHERE supplier_id=%s")
+
+def validate_supplier(name, phone):
+    """Returns an error message for an invalid name/phone, or None if both are fine."""
+    if not name or not name.strip():
+        return "Supplier name cannot be empty."
+    if not isinstance(phone, str) or not PHONE_PATTERN.match(phone):
+        return "Phone number must be exactly 10 digits."
+    return None
+
 
 def add_supplier(name, phone, address):
-    if not name.strip():
-        print("Error: Supplier name cannot be empty.")
-        return
-    if not re.match(r"^\d{10}$", phone):
-        print("Error: Phone number must be exactly 10 digits.")
+    error = validate_supplier(name, phone)
+    if error:
+        print(f"Error: {error}")
         return
     conn = None
     try:
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO suppliers (supplier_name, phone, address) VALUES (%s, %s, %s)",
-                (name, phone, address)
-            )
+            cursor.execute(SUPPLIER_INSERT_SQL, (name, phone, address))
             conn.commit()
+            invalidate("suppliers")
+            search_index.index_row("suppliers", cursor.lastrowid, name)
             print(f"Supplier added: {name}")
     except Exception as e:
         print(f"Database error during add_supplier: {e}")
@@ -28,47 +52,84 @@ def add_supplier(name, phone, address):
         if conn:
             conn.close()
 
-def list_suppliers():
+def add_suppliers_bulk(suppliers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Inserts many suppliers using executemany, one transaction per chunk.
+    Each row is (name, phone, address) or a dict with those keys.
+    Returns {"inserted": n, "errors": [(row_index, message), ...]}.
+    """
+    def validate(row):
+        if isinstance(row, dict):
+            name, phone, address = row["name"], row["phone"], row.get("address")
+        else:
+            name, phone, address = row
+        error = validate_supplier(name, phone)
+        return (name, phone, address), error
+
+    result = run_chunked(
+        "add_suppliers_bulk",
+        suppliers,
+        validate,
+        insert_many(SUPPLIER_INSERT_SQL),
+        chunk_size,
+        tables=("suppliers",),
+    )
+    if result["inserted"]:
+        search_index.mark_stale("suppliers")
+    return result
+
+def list_suppliers_page(token=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    One page of suppliers ordered by supplier_id, as (Supplier records, next_token).
+    Pass next_token back to get the following page; it is None on the last page.
+    Returns None on a database error (not an empty last page).
+    """
     conn = None
     try:
+        after = decode_token(token)[0] if token else 0
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT supplier_id, supplier_name, phone, address FROM suppliers")
-            rows = cursor.fetchall()
-            print("ID | Name          | Phone       | Address")
-            print("----------------------------------------------")
-            for row in rows:
-                print(row)
+            cursor.execute(SUPPLIERS_PAGE_SQL, (after, page_size + 1))
+            return page_result(Supplier.from_rows(cursor.fetchall()), page_size,
+                               key=lambda row: [row.supplier_id])
     except Exception as e:
-        print(f"Database error during list_suppliers: {e}")
+        print(f"Database error during list_suppliers_page: {e}")
     finally:
         if conn:
             conn.close()
+    return None
+
+def list_suppliers(page_size=DEFAULT_PAGE_SIZE):
+    """Prints all suppliers, one page-sized table at a time."""
+    print_pages(list_suppliers_page, Supplier, page_size)
 
-def search_supplier(name):
+def find_suppliers(name, limit=search_index.DEFAULT_LIMIT):
+    """Suppliers whose name matches `name`, best match first (typos tolerated), as Supplier records."""
     conn = None
     try:
+        matches = search_index.search("suppliers", name, limit)
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "SELECT supplier_id, supplier_name, phone, address FROM suppliers WHERE supplier_name LIKE %s",
-                (f"%{name}%",)
+            return Supplier.from_rows(
+                search_index.fetch_ranked(cursor, "suppliers", "supplier_id, supplier_name, phone, address", matches)
             )
-            rows = cursor.fetchall()
-            if rows:
-                print(tabulate(rows, headers=["ID", "Name", "Phone", "Address"], tablefmt="grid"))
-            else:
-                print(f"No suppliers found matching: {name}")
     except Exception as e:
-        print(f"Database error during search_supplier: {e}")
+        print(f"Database error during find_suppliers: {e}")
     finally:
         if conn:
             conn.close()
+    return []
+
+def search_supplier(name, limit=search_index.DEFAULT_LIMIT):
+    """Prints and returns the suppliers found by find_suppliers()."""
+    rows = find_suppliers(name, limit)
+    print_table(rows, Supplier, empty_message=f"No suppliers found matching: {name}")
+    return rows
 
 def update_supplier(supplier_id, name=None, phone=None, address=None):
-    if phone is not None and not re.match(r"^\d{10}$", phone):
+    if phone is not None and not PHONE_PATTERN.match(phone):
         print("Error: Phone number must be exactly 10 digits.")
         return
     if name is not None and not name.strip():
@@ -99,6 +160,9 @@ def update_supplier(supplier_id, name=None, phone=None, address=None):
             values.append(supplier_id)
             cursor.execute(sql, tuple(values))
             conn.commit()
+            invalidate("suppliers")
+            if name:
+                search_index.index_row("suppliers", supplier_id, name)
             print(f"Supplier {supplier_id} updated.")
     except Exception as e:
         print(f"Database error during update_supplier: {e}")
@@ -108,14 +172,45 @@ def update_supplier(supplier_id, name=None, phone=None, address=None):
         if conn:
             conn.close()
 
+def set_lead_time(supplier_id, days):
+    """Sets the supplier's delivery lead time in days (None = forecast.DEFAULT_LEAD_TIME). Returns True if set."""
+    if days is not None and (not isinstance(days, int) or days <= 0):
+        print("Error: Lead time must be a positive number of days.")
+        return False
+    conn = None
+    try:
+        conn = create_connection()
+        if conn:
+            cursor = conn.cursor()
+            # Not rowcount: MySQL counts changed rows, so re-setting the same lead time would look like "not found".
+            cursor.execute(SUPPLIER_EXISTS_SQL, (supplier_id,))
+            if cursor.fetchone() is None:
+                print(f"Supplier {supplier_id} not found.")
+                return False
+            cursor.execute(SET_LEAD_TIME_SQL, (days, supplier_id))
+            conn.commit()
+            invalidate("suppliers")
+            print(f"Lead time of supplier {supplier_id} set to {days} days.")
+            return True
+    except Exception as e:
+        print(f"Database error during set_lead_time: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn:
+            conn.close()
+    return False
+
 def delete_supplier(supplier_id):
     conn = None
     try:
         conn = create_connection()
         if conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM suppliers WHERE supplier_id=%s", (supplier_id,))
+            cursor.execute(SUPPLIER_DELETE_SQL, (supplier_id,))
             conn.commit()
+            invalidate("suppliers")
+            search_index.remove_row("suppliers", supplier_id)
             print(f"Supplier {supplier_id} deleted.")
     except Exception as e:
         print(f"Database error during delete_supplier: {e}")
@@ -0,0 +1,271 @@
+"""
+Deterministic synthetic shop data for benchmarks and demos.
+
+generate() builds suppliers, customers, materials and the sales of `years` years
+ending on `end`. The same seed and arguments always give the same rows. The data is
+skewed the way a building-materials shop is:
+
+- item popularity and customer activity follow Zipf-like weights: a few fast movers
+  and a few large contractors account for most of the sales;
+- daily volume grows over the years, dips in the monsoon months and on Sundays;
+- quantities depend on the kind of material (bricks by the thousand, paint by the litre);
+- about one sale in six is on credit, and most old credit sales have been paid since.
+
+load() writes a generated shop through the bulk APIs, so the rollup, balances and the
+stock journal are kept up to date exactly as in production. It then rebuilds the daily
+rollup over the loaded history.
+
+    python synthetic_data.py --customers 2000 --materials 300 --sales 300000 --years 3
+"""
+import argparse
+import bisect
+import contextlib
+import io
+import itertools
+import math
+import random
+import time
+from datetime import date, timedelta
+
+from customers_crud import add_customers_bulk
+from db_connect import create_connection
+from materials_crud import add_materials_bulk
+from rollup import rebuild_rollup
+from sales_crud import add_sales_bulk
+from suppliers_crud import add_suppliers_bulk
+
+SCALES = {
+    "tiny": dict(suppliers=5, customers=50, materials=40, sales=2000, years=1),
+    "small": dict(suppliers=20, customers=500, materials=150, sales=30000, years=2),
+    "shop": dict(suppliers=40, customers=2000, materials=300, sales=300000, years=3),
+    "large": dict(suppliers=80, customers=20000, materials=1500, sales=2000000, years=5),
+}
+DEFAULT_SEED = 42
+ITEM_SKEW = 1.1         # Zipf exponent of item popularity
+CUSTOMER_SKEW = 0.9     # Zipf exponent of customer activity
+YEARLY_GROWTH = 0.15
+# Relative sales volume per month (Jan..Dec): slow through the monsoon, busy before Diwali.
+MONTH_SEASON = (1.0, 1.05, 1.1, 1.0, 0.95, 0.8, 0.6, 0.6, 0.75, 1.1, 1.2, 1.05)
+WEEKDAY_SEASON = (1.0, 1.0, 1.0, 1.0, 1.05, 1.15, 0.4)      # Monday..Sunday
+PAYMENT_METHODS = (("Cash", 45), ("UPI", 30), ("Card", 10), ("Credit", 15))
+
+# (kind, unit, price range per unit, typical quantity, quantity spread, sizes)
+CATEGORIES = (
+    ("Cement", "bag", (340, 460), 20, 0.9, ("OPC 43", "OPC 53", "PPC")),
+    ("Sand", "quintal", (40, 90), 15, 0.8, ("River", "M-Sand", "Plaster")),
+    ("Brick", "piece", (6, 12), 1500, 0.8, ("Red", "Fly Ash", "Wire Cut")),
+    ("Steel Rod", "kg", (55, 80), 120, 1.0, ("8mm", "10mm", "12mm", "16mm")),
+    ("Tile", "box", (450, 1800), 12, 0.9, ("2x2", "1x1", "4x2")),
+    ("Paint", "litre", (180, 650), 10, 0.8, ("1L", "4L", "20L")),
+    ("Pipe", "piece", (90, 900), 8, 0.9, ("1 inch", "2 inch", "4 inch")),
+    ("Gravel", "quintal", (50, 110), 20, 0.8, ("10mm", "20mm", "40mm")),
+    ("Plywood", "sheet", (900, 3200), 6, 0.7, ("12mm", "18mm", "19mm")),
+    ("Wire", "coil", (1200, 4500), 2, 0.6, ("1 sqmm", "1.5 sqmm", "2.5 sqmm")),
+)
+BRANDS = ("Apex", "Shree", "Tata", "Jindal", "Kajaria", "Asian", "Birla", "Ambuja", "Astral",
+          "Supreme", "UltraTech", "Finolex", "Somany", "Berger", "Greenply")
+FIRST_NAMES = ("Amit", "Priya", "Rahul", "Sunita", "Vikram", "Neha", "Arjun", "Kavita", "Rohit",
+               "Anjali", "Suresh", "Pooja", "Manoj", "Deepa", "Ravi", "Meena", "Sanjay", "Geeta")
+LAST_NAMES = ("Kumar", "Singh", "Sharma", "Verma", "Gupta", "Yadav", "Patel", "Jain", "Mishra",
+              "Agarwal", "Chauhan", "Reddy", "Nair", "Mehta", "Joshi", "Malhotra")
+FIRM_WORDS = ("Traders", "Builders", "Constructions", "Enterprises", "Infra", "Developers",
+              "Hardware", "Suppliers", "Agencies", "Depot")
+CITIES = ("Delhi", "Noida", "Gurgaon", "Faridabad", "Ghaziabad", "Meerut", "Sonipat", "Rohtak")
+
+
+def zipf_weights(count, skew, rng):
+    """Cumulative Zipf weights over `count` ids in a shuffled rank order."""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** skew for rank in ranks))
+
+
+def _phone(rng, taken):
+    while True:
+        phone = str(rng.randrange(6_000_000_000, 9_999_999_999))
+        if phone not in taken:
+            taken.add(phone)
+            return phone
+
+
+def make_suppliers(count, rng, phones):
+    names = set()
+    rows = []
+    while len(rows) < count:
+        name = f"{rng.choice(LAST_NAMES)} {rng.choice(FIRM_WORDS)}"
+        if name in names:
+            name = f"{name} {rng.choice(CITIES)} {len(rows)}"
+        names.add(name)
+        rows.append((name, _phone(rng, phones), rng.choice(CITIES)))
+    return rows
+
+
+def make_customers(count, rng, phones):
+    rows = []
+    for n in range(count):
+        if n % 5 == 4:      # every fifth customer is a contractor firm
+            name = f"{rng.choice(LAST_NAMES)} {rng.choice(FIRM_WORDS)}"
+        else:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        rows.append((name, _phone(rng, phones), rng.choice(CITIES)))
+    return rows
+
+
+def make_materials(count, supplier_count, rng):
+    """(item_name, price_per_unit, unit_type, quantity, supplier_id offset) and the category of each."""
+    rows, categories = [], []
+    for n in range(count):
+        category = CATEGORIES[n % len(CATEGORIES)]
+        kind, unit, (low, high), typical, _, sizes = category
+        name = f"{rng.choice(BRANDS)} {kind} {rng.choice(sizes)}"
+        if n >= len(CATEGORIES) * len(BRANDS):
+            name = f"{name} #{n}"
+        price = round(rng.uniform(low, high), 2)
+        stock = int(typical * rng.uniform(40, 120))
+        supplier = rng.randrange(supplier_count) if supplier_count else None
+        rows.append((name, price, unit, stock, supplier))
+        categories.append(category)
+    return rows, categories
+
+
+def sale_days(start, end):
+    """Every day in [start, end] with its relative sales volume."""
+    days, weights = [], []
+    day = start
+    while day <= end:
+        trend = (1 + YEARLY_GROWTH) ** ((day - start).days / 365)
+        days.append(day)
+        weights.append(trend * MONTH_SEASON[day.month - 1] * WEEKDAY_SEASON[day.weekday()])
+        day += timedelta(days=1)
+    return days, list(itertools.accumulate(weights))
+
+
+def make_sales(count, customer_count, materials, categories, start, end, rng):
+    """Sales as add_sales_bulk rows (with 0-based customer/item offsets), oldest first."""
+    days, day_weights = sale_days(start, end)
+    items = zipf_weights(len(materials), ITEM_SKEW, rng)
+    customers = zipf_weights(customer_count, CUSTOMER_SKEW, rng)
+    methods = [m for m, _ in PAYMENT_METHODS]
+    method_weights = list(itertools.accumulate(w for _, w in PAYMENT_METHODS))
+    picked_days = sorted(rng.choices(range(len(days)), cum_weights=day_weights, k=count))
+
+    def pick(cumulative):
+        return bisect.bisect_left(cumulative, rng.random() * cumulative[-1])
+
+    sales = []
+    for day_index in picked_days:
+        sale_date = days[day_index]
+        item = pick(items)
+        customer = pick(customers)
+        _, _, _, typical, spread, _ = categories[item]
+        quantity = max(1, int(round(rng.lognormvariate(math.log(typical), spread))))
+        price = materials[item][1]
+        total = round(quantity * price * rng.choice((1, 1, 1, 0.98, 0.95)), 2)
+        method = methods[pick(method_weights)]
+        paid, due, status = total, 0.0, "Paid"
+        age = (end - sale_date).days
+        if method == "Credit" and not (age > 90 and rng.random() < 0.85):
+            paid = round(total * rng.choice((0, 0, 0.25, 0.5)), 2)
+            due = round(total - paid, 2)
+            status = "Partial" if paid else "Pending"
+        sales.append((customer, item, quantity, total, method, paid, due, status, sale_date))
+    return sales
+
+
+def generate(suppliers=20, customers=500, materials=150, sales=30000, years=2, end=None, seed=DEFAULT_SEED):
+    """
+    A synthetic shop as {"suppliers", "customers", "materials", "sales"} row lists.
+    Foreign keys in materials and sales are 0-based offsets into the other lists
+    (load() turns them into ids). Deterministic for a given seed and arguments.
+    """
+    if min(customers, materials) < 1 or suppliers < 0 or sales < 0 or years <= 0:
+        raise ValueError("Need at least one customer and one material, and a positive number of years")
+    end = end or date.today()
+    start = end - timedelta(days=int(round(365 * years)) - 1)
+    rng = random.Random(seed)
+    phones = set()
+    supplier_rows = make_suppliers(suppliers, rng, phones)
+    customer_rows = make_customers(customers, rng, phones)
+    material_rows, categories = make_materials(materials, suppliers, rng)
+    sale_rows = make_sales(sales, customers, material_rows, categories, start, end, rng)
+    return {
+        "suppliers": supplier_rows,
+        "customers": customer_rows,
+        "materials": material_rows,
+        "sales": sale_rows,
+        "start": start,
+        "end": end,
+    }
+
+
+def _max_ids():
+    conn = create_connection()
+    if not conn:
+        raise RuntimeError("No database connection available.")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT (SELECT IFNULL(MAX(supplier_id), 0) FROM suppliers), "
+                       "(SELECT IFNULL(MAX(customer_id), 0) FROM customers), "
+                       "(SELECT IFNULL(MAX(id), 0) FROM materials)")
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def _check(label, result, expected):
+    if result["inserted"] != expected:
+        raise RuntimeError(f"{label}: {result['inserted']} of {expected} rows inserted, "
+                           f"first errors: {result['errors'][:3]}")
+
+
+def load(shop, chunk_size=5000, quiet=True):
+    """
+    Writes a generated shop to the database and returns {table: rows} plus the
+    load time. Rows are appended to whatever is already there. The ids are read
+    from the current maxima, so nothing else may write to these tables while the
+    shop is loading.
+    """
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        supplier_base, customer_base, material_base = _max_ids()
+        _check("suppliers", add_suppliers_bulk(shop["suppliers"], chunk_size), len(shop["suppliers"]))
+        _check("customers", add_customers_bulk(shop["customers"], chunk_size), len(shop["customers"]))
+        materials = [(name, price, unit, stock, None if supplier is None else supplier_base + supplier + 1)
+                     for name, price, unit, stock, supplier in shop["materials"]]
+        _check("materials", add_materials_bulk(materials, chunk_size), len(materials))
+        sales = [(customer_base + row[0] + 1, material_base + row[1] + 1) + row[2:] for row in shop["sales"]]
+        for chunk_start in range(0, len(sales), chunk_size * 10):
+            part = sales[chunk_start:chunk_start + chunk_size * 10]
+            _check("sales", add_sales_bulk(part, chunk_size, update_stock=False), len(part))
+        if sales:
+            rebuild_rollup(shop["start"])
+    return {
+        "suppliers": len(shop["suppliers"]),
+        "customers": len(shop["customers"]),
+        "materials": len(materials),
+        "sales": len(sales),
+        "load_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=SCALES, help="Preset sizes (overridden by the options below)")
+    parser.add_argument("--suppliers", type=int)
+    parser.add_argument("--customers", type=int)
+    parser.add_argument("--materials", type=int)
+    parser.add_argument("--sales", type=int)
+    parser.add_argument("--years", type=float)
+    parser.add_argument("--end", help="Last sale day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale or "small"])
+    sizes.update({k: v for k, v in vars(args).items() if k in sizes and v is not None})
+    end = date.fromisoformat(args.end) if args.end else None
+    shop = generate(end=end, seed=args.seed, **sizes)
+    print(f"Loading {sizes} ({shop['start']} .. {shop['end']}) ...")
+    print(load(shop))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import asyncio
+import async_db
+
+
+class FakePool:
+    """Stands in for an aiomysql pool, remembering the event loop it was opened on."""
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+        self.size, self.freesize, self.maxsize = 1, 1, 20
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        assert asyncio.get_running_loop() is self.loop, "attached to a different loop"
+
+
+class FakeAiomysql:
+    def __init__(self):
+        self.pools = []
+
+    async def create_pool(self, **_):
+        await asyncio.sleep(0)          # let concurrent callers race for the pool
+        pool = FakePool()
+        self.pools.append(pool)
+        return pool
+
+
+def test_every_event_loop_gets_its_own_pool(monkeypatch):
+    fake = FakeAiomysql()
+    monkeypatch.setattr(async_db, "aiomysql", fake)
+    monkeypatch.setattr(async_db, "_pools", type(async_db._pools)())
+    monkeypatch.setattr(async_db, "_pool_locks", type(async_db._pool_locks)())
+    monkeypatch.setitem(async_db.async_pool_config, "driver", "aiomysql")
+
+    async def run(close):
+        first, second = await asyncio.gather(async_db.get_async_pool(), async_db.get_async_pool())
+        assert first is second and first.loop is asyncio.get_running_loop()
+        assert async_db.async_pool_stats()["size"] == 1
+        if close:
+            await async_db.close_async_pool()
+        return first
+
+    first = asyncio.run(run(close=True))
+    second = asyncio.run(run(close=False))      # a new loop, e.g. the next asyncio.run()
+    third = asyncio.run(run(close=True))
+    assert fake.pools == [first, second, third]
+    assert first.closed and not second.closed and third.closed
+    assert async_db.async_pool_stats()["size"] == 0     # no running loop, no pool
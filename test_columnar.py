@@ -0,0 +1,38 @@
+from datetime import date
+
+from columnar import SalesColumns
+
+SALES = [
+    # order_no, sale_date, item_id, customer_id, quantity, total, amount_paid, amount_due, payment_method
+    (1, date(2025, 1, 1), 1, 1, 2, 100.0, 100.0, 0.0, "Cash"),
+    (2, date(2025, 1, 1), 2, 2, 5, 50.0, 20.0, 30.0, "UPI"),
+    (3, date(2025, 1, 2), 1, 2, 1, 50.0, 0.0, 50.0, "UPI"),
+    (4, date(2025, 1, 3), 2, None, 4, 40.0, 40.0, 0.0, "Cash"),
+]
+
+
+def make_store():
+    store = SalesColumns(live=False)
+    store.set_names([(1, "Cement"), (2, "Sand")], [(1, "Amit"), (2, "Priya")])
+    store.append(SALES[:2])
+    store.append(SALES[2:])     # tailing appends in order_no order
+    return store
+
+
+def test_matches_sql_shaped_results():
+    store = make_store()
+    assert store.daily_revenue() == [(date(2025, 1, 3), 40.0), (date(2025, 1, 2), 50.0), (date(2025, 1, 1), 150.0)]
+    assert store.period_totals(date(2025, 1, 1), date(2025, 1, 2)) == (200.0, 120.0, 80.0)
+    assert store.top_items() == [("Sand", 9), ("Cement", 3)]
+    # Sales without a customer are left out, like the JOIN in rollup.top_customers.
+    assert store.top_customers() == [("Amit", 100.0), ("Priya", 100.0)]
+
+
+def test_slicing_by_item_customer_payment_and_date():
+    store = make_store()
+    assert store.group("payment_method", "amount_due") == [("UPI", 80.0), ("Cash", 0.0)]
+    assert store.group("day", "count", customer_id=2) == [(date(2025, 1, 1), 1), (date(2025, 1, 2), 1)]
+    assert store.period_totals(item_id=[2], payment_method="Cash") == (40.0, 40.0, 0.0)
+    frame = store.frame(start=date(2025, 1, 2))
+    assert list(frame["order_no"]) == [3, 4]
+    assert list(frame["customer_name"].fillna("-")) == ["Priya", "-"]
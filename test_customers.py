@@ -1,8 +1,12 @@
+import io
+import json
 import pytest
-from customers_crud import add_customer, list_customers, update_customer, delete_customer
+from customers_crud import add_customer, add_customers_bulk, list_customers, update_customer, delete_customer
 from suppliers_crud import add_supplier, list_suppliers, update_supplier, delete_supplier
 from materials_crud import add_material, update_material, delete_material, show_low_stock
-from sales_crud import add_sale, list_sales
+from sales_crud import add_sale, add_sales_bulk, export_sales, list_sales
+from orders import place_order
+from rollup import rebuild_rollup, period_totals, daily_revenue
 from db_connect import create_connection
 
 def ensure_test_data(db_conn):
@@ -11,6 +15,23 @@ def ensure_test_data(db_conn):
         # Wipe out all test data before anything else
         cursor.execute("SET FOREIGN_KEY_CHECKS=0")
         cursor.execute("TRUNCATE TABLE sales")
+        cursor.execute("TRUNCATE TABLE sales_daily_rollup")
+        cursor.execute("TRUNCATE TABLE rollup_state")
+        cursor.execute("TRUNCATE TABLE payments")
+        cursor.execute("TRUNCATE TABLE customer_balances")
+        cursor.execute("TRUNCATE TABLE balance_totals")
+        cursor.execute("TRUNCATE TABLE receivables_daily")
+        cursor.execute("TRUNCATE TABLE stock_thresholds")
+        cursor.execute("TRUNCATE TABLE stock_alerts")
+        cursor.execute("TRUNCATE TABLE demand_forecasts")
+        cursor.execute("TRUNCATE TABLE forecast_state")
+        cursor.execute("TRUNCATE TABLE forecast_gaps")
+        cursor.execute("TRUNCATE TABLE stock_movements")
+        cursor.execute("TRUNCATE TABLE stock_snapshots")
+        cursor.execute("TRUNCATE TABLE stock_snapshot_items")
+        cursor.execute("TRUNCATE TABLE purchase_orders")
+        cursor.execute("TRUNCATE TABLE purchase_order_lines")
+        cursor.execute("TRUNCATE TABLE supplier_stats")
         cursor.execute("TRUNCATE TABLE materials")
         cursor.execute("TRUNCATE TABLE customers")
         cursor.execute("TRUNCATE TABLE suppliers")
@@ -30,6 +51,10 @@ def ensure_test_data(db_conn):
             INSERT INTO materials (id, item_name, price_per_unit, unit_type, quantity_in_stock, supplier_id)
             VALUES (1, 'Test Material', 50.0, 'pcs', 100, 1)
         """)
+        cursor.execute("""
+            INSERT INTO stock_movements (item_id, moved_at, quantity_change, reason)
+            VALUES (1, '2000-01-01 00:00:00', 100, 'opening')
+        """)
         db_conn.commit()
     finally:
         cursor.close()
@@ -290,3 +315,687 @@ def test_list_sales_output(db_conn, capsys):
     captured = capsys.readouterr()
     assert "Customer" in captured.out
     assert "Qty" in captured.out
+
+def test_sales_stream_as_csv_and_ndjson(db_conn, tmp_path):
+    ensure_test_data(db_conn)
+    order_no = add_sale(customer_id=1, item_id=1, quantity=1, total=50)
+    out = io.StringIO()
+    count = list_sales("csv", out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith("order_no,customer_name") and len(lines) == count + 1
+    assert lines[1].startswith(f"{order_no},")          # newest first
+    path = tmp_path / "sales.ndjson"
+    assert export_sales(path, "ndjson") == count
+    assert json.loads(path.read_text().splitlines()[0])["order_no"] == order_no
+
+def test_add_customers_bulk_reports_row_errors(db_conn):
+    result = add_customers_bulk([
+        ("Bulk One", "9000000001", "Pune"),
+        ("Bulk Bad Phone", "12ab", "Pune"),
+        {"name": "Bulk Two", "phone": "9000000002", "address": "Agra"},
+        (42, "9000000003", "Pune"),                 # not a string: .strip() raises AttributeError
+        ("Bulk Three", "9000000004", "Agra"),       # in a later chunk
+    ], chunk_size=2)
+    assert result["inserted"] == 3
+    assert [index for index, _ in result["errors"]] == [1, 3]
+    assert result["errors"][0] == (1, "Phone number must be exactly 10 digits.")
+    assert result["errors"][1][1].startswith("Malformed row: AttributeError")
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT COUNT(*) FROM customers WHERE customer_name LIKE %s", ("Bulk %",))
+    assert cursor.fetchone()[0] == 3
+    cursor.close()
+
+def test_add_sales_bulk_rejects_overdraw(db_conn):
+    ensure_test_data(db_conn)
+    result = add_sales_bulk([
+        (1, 1, 60, 3000.0),
+        (1, 1, 60, 3000.0),   # only 40 left after the first row
+        (1, 1, 40, 2000.0, "UPI", 1000.0, 1000.0, "Partial"),
+    ])
+    assert result["inserted"] == 2
+    assert [index for index, _ in result["errors"]] == [1]
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT quantity_in_stock FROM materials WHERE id=%s", (1,))
+    assert cursor.fetchone()[0] == 0
+    cursor.close()
+
+def test_add_sale_returns_order_no(db_conn):
+    ensure_test_data(db_conn)
+    order_no = add_sale(customer_id=1, item_id=1, quantity=2, total=100.0)
+    assert order_no is not None
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT quantity FROM sales WHERE order_no=%s", (order_no,))
+    assert cursor.fetchone()[0] == 2
+    cursor.close()
+
+def test_failing_side_effects_never_undo_or_repeat_a_committed_sale(db_conn, monkeypatch):
+    ensure_test_data(db_conn)
+    import sqlite3
+    import stock_alerts
+
+    def fail(*_):
+        err = sqlite3.OperationalError("database is locked")
+        err.sqlite_errorcode = 5        # retryable, so a retry would duplicate the sale
+        raise err
+
+    monkeypatch.setattr(stock_alerts, "stock_changed", fail)
+    monkeypatch.setattr(stock_alerts, "stock_changes", fail)
+    order_no = add_sale(customer_id=1, item_id=1, quantity=3, total=150.0)
+    order_nos = place_order(1, [(1, 4, 200.0)])
+    assert order_no is not None and len(order_nos) == 1
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT COUNT(*), SUM(quantity) FROM sales")
+    assert tuple(cursor.fetchone()) == (2, 7)
+    cursor.execute("SELECT quantity_in_stock FROM materials WHERE id = 1")
+    assert cursor.fetchone()[0] == 93
+    cursor.close()
+
+def test_async_add_sale_failing_side_effects_keep_the_committed_sale(db_conn, monkeypatch):
+    import asyncio
+    import sqlite3
+    import async_crud
+    import stock_alerts
+    ensure_test_data(db_conn)
+
+    def fail(*_):
+        err = sqlite3.OperationalError("database is locked")
+        err.sqlite_errorcode = 5        # retryable, so a retry would duplicate the sale
+        raise err
+
+    monkeypatch.setattr(stock_alerts, "stock_changed", fail)
+    order_no = asyncio.run(async_crud.add_sale(customer_id=1, item_id=1, quantity=3, total=150.0))
+    assert order_no is not None
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT COUNT(*), SUM(quantity) FROM sales")
+    assert tuple(cursor.fetchone()) == (1, 3)
+    cursor.execute("SELECT quantity_in_stock FROM materials WHERE id = 1")
+    assert cursor.fetchone()[0] == 97
+    cursor.close()
+
+def test_async_updates_report_missing_rows(db_conn):
+    import asyncio
+    import async_crud
+    ensure_test_data(db_conn)
+
+    async def run():
+        return [
+            await async_crud.update_customer(1, address="New Address"),
+            await async_crud.update_customer(1, address="New Address"),     # unchanged is still found
+            await async_crud.update_customer(999, address="Nowhere"),
+            await async_crud.update_supplier(999, name="Ghost"),
+            await async_crud.update_material(1, price=55.0),
+            await async_crud.update_material(999, price=55.0),
+            await async_crud.update_material(1, quantity=80),
+            await async_crud.update_material(999, quantity=80),
+        ]
+
+    assert asyncio.run(run()) == [True, True, False, False, True, False, True, False]
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT price_per_unit, quantity_in_stock FROM materials WHERE id = 1")
+    assert tuple(float(v) for v in cursor.fetchone()) == (55.0, 80.0)
+    cursor.execute("SELECT item_id, quantity_change FROM stock_movements WHERE reason = 'adjustment'")
+    assert [tuple(row) for row in cursor.fetchall()] == [(1, -20)]
+    cursor.close()
+
+def test_async_crud_round_trip_on_the_thread_driver(db_conn, monkeypatch):
+    import asyncio
+    import async_crud
+    import async_db
+    ensure_test_data(db_conn)
+    monkeypatch.setitem(async_db.async_pool_config, "driver", "threads")
+
+    async def run():
+        ids = [await async_crud.add_customer(f"Async Customer {n}", f"90000000{n:02d}", "Async Street")
+               for n in range(5)]
+        assert await async_crud.add_customer("Bad Phone", "123", "x") is None
+        pages, token = [], None
+        while True:
+            rows, token = await async_crud.list_customers_page(token, page_size=2)
+            pages.append([row.customer_id for row in rows])
+            if token is None:
+                break
+        assert pages == [[1, ids[0]], ids[1:3], ids[3:5]]
+        assert await async_crud.list_customers_page("not-a-token") is None
+
+        [found] = await async_crud.search_customer("Async Customer 3")
+        assert found.customer_id == ids[3]
+        assert await async_crud.delete_customer(ids[4])
+        assert not await async_crud.delete_customer(ids[4])
+
+        material_id = await async_crud.add_material("Async Bricks", 8.0, "pcs", 40, 1)
+        order_no = await async_crud.add_sale(1, material_id, 5, 40.0, amount_paid=10.0)
+        assert await async_crud.add_sale(1, material_id, 50, 400.0) is None     # short of stock
+        sales, token = await async_crud.list_sales_page()
+        assert [sale.order_no for sale in sales] == [order_no] and token is None
+        summary, balance = await asyncio.gather(async_crud.get_dashboard(), async_crud.customer_balance(1))
+        return summary, balance
+
+    summary, balance = asyncio.run(run())
+    assert (summary.customers, summary.materials, float(summary.total_revenue)) == (5, 2, 40.0)
+    assert float(balance.outstanding) == 30.0
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT quantity_in_stock FROM materials WHERE item_name = 'Async Bricks'")
+    assert cursor.fetchone()[0] == 35
+    cursor.close()
+
+def test_catalogue_versions_follow_every_writer_and_deletes_in_use_are_refused(db_conn):
+    import asyncio
+    import async_crud
+    ensure_test_data(db_conn)
+    versions = lambda: asyncio.run(async_crud.table_versions(["customers", "materials"]))  # noqa: E731
+    before = versions()
+    assert [(table, count) for table, count, _ in before] == [("customers", 1), ("materials", 1)]
+    cursor = db_conn.cursor(buffered=True)
+    # A write from another process: nothing in this one is invalidated.
+    cursor.execute("UPDATE customers SET address = 'Moved' WHERE customer_id = 1")
+    db_conn.commit()
+    after = versions()
+    assert after[0] != before[0] and after[1] == before[1]
+    assert add_sale(customer_id=1, item_id=1, quantity=1, total=50.0)
+    assert versions()[1] != after[1]                    # the stock went down
+    cursor.close()
+
+    with pytest.raises(async_crud.RowInUseError):
+        asyncio.run(async_crud.delete_customer(1))      # it has a sale
+    with pytest.raises(async_crud.RowInUseError):
+        asyncio.run(async_crud.delete_material(1))
+    assert asyncio.run(async_crud.delete_customer(999)) is False
+    assert asyncio.run(async_crud.table_versions(["sales"])) is None
+
+def test_api_revalidation_missing_rows_and_paging(db_conn):
+    pytest.importorskip("httpx")
+    testclient = pytest.importorskip("fastapi.testclient")
+    import api_server
+    ensure_test_data(db_conn)
+    with testclient.TestClient(api_server.app) as client:
+        first = client.get("/customers")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert client.get("/customers", headers={"If-None-Match": etag}).status_code == 304
+
+        cursor = db_conn.cursor(buffered=True)
+        cursor.execute("UPDATE customers SET address = 'Moved' WHERE customer_id = 1")   # another process
+        db_conn.commit()
+        cursor.close()
+        fresh = client.get("/customers", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200 and fresh.headers["etag"] != etag
+        assert fresh.json()["items"][0]["address"] == "Moved"
+
+        assert client.patch("/customers/999", json={"address": "x"}).status_code == 404
+        assert client.patch("/suppliers/999", json={"name": "x"}).status_code == 404
+        assert client.patch("/materials/999", json={"price": 1.0}).status_code == 404
+        assert client.delete("/customers/999").status_code == 404
+        assert client.post("/customers", json={"name": "Bad", "phone": "123"}).status_code == 422
+        assert client.post("/sales", json={"customer_id": 1, "item_id": 1, "quantity": 1,
+                                           "total": 50.0}).status_code == 201
+        assert client.delete("/customers/1").status_code == 409          # it has a sale
+
+        for n in range(4):
+            assert client.post("/customers", json={"name": f"Paged {n}", "phone": f"90000001{n:02d}"}).status_code == 201
+        ids, token = [], None
+        while True:
+            page = client.get("/customers", params={"page_size": 2, **({"token": token} if token else {})}).json()
+            ids += [row["customer_id"] for row in page["items"]]
+            token = page["next_token"]
+            if token is None:
+                break
+        assert len(ids) == 5 and ids == sorted(ids)
+        assert client.get("/customers", params={"page_size": 0}).status_code == 400
+        assert client.get("/customers", params={"token": "not-a-token"}).status_code == 400
+
+def test_catalogue_import_updates_known_items_and_adds_repeated_new_ones_once(db_conn, tmp_path):
+    from data_import import import_file
+    ensure_test_data(db_conn)
+    path = tmp_path / "price_list.csv"
+    path.write_text(
+        "item_name,price_per_unit,unit_type,quantity,supplier_name\n"
+        "test material,55,pcs,,Test Supplier\n"          # known (names match case-insensitively)
+        "River Sand,10,bag,5,Test Supplier\n"
+        "River Sand,12,bag,5,test supplier\n"            # repeated new name: one row, last price
+        "Gravel,cheap,bag,1,Test Supplier\n"
+        "Cement,20,bag,1,Nobody Ltd\n"
+    )
+    stats = import_file("catalogue", str(path), batch_size=10)
+    assert (stats["rows_read"], stats["written"], stats["rejected"]) == (5, 2, 2)
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT item_name, price_per_unit, supplier_id FROM materials ORDER BY id")
+    assert [(n, float(p), s) for n, p, s in cursor.fetchall()] == [("Test Material", 55.0, 1), ("River Sand", 12.0, 1)]
+    cursor.close()
+    with open(str(path) + ".rejects.csv", encoding="utf-8") as f:
+        rejected = [line.split(",")[0] for line in f.read().splitlines()[1:]]
+    assert rejected == ["4", "5"]
+    assert not (tmp_path / "price_list.csv.checkpoint.json").exists()
+
+def test_sales_import_resumes_without_repeating_rows_or_rejects(db_conn, tmp_path, monkeypatch):
+    import data_import
+    ensure_test_data(db_conn)
+    path = tmp_path / "ledger.csv"
+    path.write_text(
+        "customer_name,item_name,quantity,total,sale_date\n"
+        "Test Customer,Test Material,1,50,2024-01-01\n"
+        "Test Customer,Test Material,lots,50,2024-01-01\n"    # rejected
+        "Test Customer,Test Material,2,100,2024-01-02\n"      # end of batch 1 (committed)
+        "Test Customer,Test Material,3,150,2024-01-03\n"
+        "Somebody Else,Test Material,1,50,2024-01-03\n"      # rejected, after the checkpoint
+        "Test Customer,Test Material,4,200,2024-01-04\n"      # end of batch 2 (crashes)
+        "Test Customer,Nothing,1,50,2024-01-05\n"            # rejected
+    )
+    real_add_sales_bulk = data_import.add_sales_bulk
+    calls = []
+
+    def crash_on_second_batch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return real_add_sales_bulk(*args, **kwargs)
+
+    monkeypatch.setattr(data_import, "add_sales_bulk", crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        data_import.import_file("sales", str(path), batch_size=2)
+    monkeypatch.setattr(data_import, "add_sales_bulk", real_add_sales_bulk)
+    stats = data_import.import_file("sales", str(path), batch_size=2)
+    assert (stats["rows_read"], stats["written"], stats["rejected"]) == (4, 2, 2)
+
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT quantity FROM sales ORDER BY order_no")
+    assert [row[0] for row in cursor.fetchall()] == [1, 2, 3, 4]
+    cursor.close()
+    with open(str(path) + ".rejects.csv", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "row_number,error,row"
+    assert [line.split(",")[0] for line in lines[1:]] == ["2", "5", "7"]
+    assert not (tmp_path / "ledger.csv.checkpoint.json").exists()
+
+def test_listing_reports_a_failed_page_instead_of_stopping_short(db_conn, monkeypatch, capsys):
+    import customers_crud
+    ensure_test_data(db_conn)
+    for n in range(3):
+        add_customer(f"Listed {n}", f"91000000{n:02d}", "x")
+    real_connect = customers_crud.create_connection
+    calls = []
+
+    def fail_second_page():
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("server has gone away")
+        return real_connect()
+
+    monkeypatch.setattr(customers_crud, "create_connection", fail_second_page)
+    capsys.readouterr()
+    list_customers(page_size=2)
+    out = capsys.readouterr().out
+    assert "Listed 0" in out and "Listed 2" not in out
+    assert "Error: A page could not be read; the listing is incomplete." in out
+    monkeypatch.setattr(customers_crud, "create_connection", lambda: 1 / 0)
+    assert customers_crud.list_customers_page() is None
+
+def test_place_order_is_all_or_nothing(db_conn):
+    ensure_test_data(db_conn)
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("""
+        INSERT INTO materials (id, item_name, price_per_unit, unit_type, quantity_in_stock, supplier_id)
+        VALUES (2, 'Second Material', 10.0, 'pcs', 5, 1)
+    """)
+    db_conn.commit()
+
+    assert place_order(1, [(1, 10, 500.0), (2, 6, 60.0)]) is None  # item 2 is short
+    order_nos = place_order(1, [(1, 10, 500.0), (2, 5, 50.0)], amount_paid=520.0)
+    assert len(order_nos) == 2
+
+    cursor.execute("SELECT id, quantity_in_stock FROM materials ORDER BY id")
+    assert [tuple(row) for row in cursor.fetchall()] == [(1, 90), (2, 0)]
+    cursor.execute("SELECT item_id, amount_paid, amount_due, payment_status FROM sales ORDER BY order_no")
+    rows = [(r[0], float(r[1]), float(r[2]), r[3]) for r in cursor.fetchall()]
+    assert rows == [(1, 500.0, 0.0, "Paid"), (2, 20.0, 30.0, "Partial")]
+    cursor.close()
+
+def test_rollup_tracks_sales_after_rebuild(db_conn):
+    ensure_test_data(db_conn)
+    add_sale(customer_id=1, item_id=1, quantity=2, total=100.0, amount_paid=60.0)
+    rebuild_rollup()
+    add_sale(customer_id=1, item_id=1, quantity=1, total=50.0)  # maintained incrementally
+    cursor = db_conn.cursor(buffered=True)
+    revenue, paid, due = period_totals(cursor)
+    assert (float(revenue), float(paid), float(due)) == (150.0, 110.0, 40.0)
+    assert [float(r[1]) for r in daily_revenue(cursor)] == [150.0]
+    cursor.close()
+
+def test_dashboard_summary_matches_sequential(db_conn):
+    from dashboard import get_dashboard
+    ensure_test_data(db_conn)
+    add_sale(customer_id=1, item_id=1, quantity=4, total=200.0, amount_paid=150.0)
+    parallel = get_dashboard(low_stock_threshold=100)
+    sequential = get_dashboard(low_stock_threshold=100, parallel=False)
+    assert parallel.as_dict() == sequential.as_dict()
+    assert (parallel.customers, parallel.materials, parallel.low_stock_count) == (1, 1, 1)
+    assert float(parallel.total_revenue) == 200.0
+    assert float(parallel.total_unpaid) == 50.0
+    assert [(name, int(qty)) for name, qty in parallel.top_items] == [("Test Material", 4)]
+
+def test_columnar_store_tails_new_sales(db_conn):
+    from datetime import date
+    from columnar import SalesColumns
+    ensure_test_data(db_conn)
+    add_sale(customer_id=1, item_id=1, quantity=2, total=100.0, amount_paid=60.0)
+    store = SalesColumns()
+    assert store.period_totals() == (100.0, 60.0, 40.0)
+    add_sale(customer_id=1, item_id=1, quantity=1, total=50.0)  # picked up by tailing order_no
+    assert store.period_totals() == (150.0, 110.0, 40.0)
+    assert store.top_customers() == [("Test Customer", 150.0)]
+    assert store.top_items() == [("Test Material", 3)]
+
+    # Sales commit out of order_no order: top + 2 commits while top + 1 is still open.
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT MAX(order_no) FROM sales")
+    top = cursor.fetchone()[0]
+    insert = """INSERT INTO sales (order_no, customer_id, item_id, quantity, sale_date, total,
+                                   payment_method, amount_paid, amount_due, payment_status)
+                VALUES (%s, 1, 1, %s, %s, %s, 'Cash', %s, 0, 'Paid')"""
+    cursor.execute(insert, (top + 2, 4, date.today(), 200.0, 200.0))
+    db_conn.commit()
+    assert store.refresh(force=True)
+    assert store.period_totals() == (350.0, 310.0, 40.0)
+    cursor.execute(insert, (top + 1, 1, date.today(), 25.0, 25.0))
+    db_conn.commit()
+    assert store.refresh(force=True)
+    assert store.period_totals() == (375.0, 335.0, 40.0)       # the late sale is loaded, once
+    assert store.refresh(force=True)
+    assert store.period_totals() == (375.0, 335.0, 40.0)
+    assert list(store.columns()["order_no"][-3:]) == [top, top + 1, top + 2]
+    store.mark_dirty([top + 1])
+    cursor.execute("UPDATE sales SET amount_paid = 20, amount_due = 5 WHERE order_no = %s", (top + 1,))
+    db_conn.commit()
+    store.refresh()
+    assert store.period_totals() == (375.0, 330.0, 45.0)
+    cursor.close()
+
+def test_payments_update_sale_rollup_and_balances(db_conn, monkeypatch):
+    import columnar
+    from balances import get_customer_balance, get_top_debtors, get_total_unpaid
+    from payments import list_payments, record_payment, record_payments
+    ensure_test_data(db_conn)
+    store = columnar.SalesColumns()
+    monkeypatch.setattr(columnar, "_store", store)
+    rebuild_rollup()
+    first = add_sale(customer_id=1, item_id=1, quantity=2, total=100.0, amount_paid=40.0)
+    second = add_sale(customer_id=1, item_id=1, quantity=1, total=50.0, amount_paid=0.0)
+    assert get_total_unpaid() == 110.0
+    assert store.period_totals() == (150.0, 40.0, 110.0)
+
+    result = record_payments([
+        (first, 20.0, "UPI"),
+        {"order_no": first, "amount": 50.0},        # only 40 left after the first payment
+        (first, 40.0),
+        (second, 10.0),
+        (999, 5.0),
+    ])
+    assert result["inserted"] == 3
+    assert [index for index, _ in result["errors"]] == [1, 4]
+    assert record_payment(second, 40.0)
+
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT amount_paid, amount_due, payment_status FROM sales ORDER BY order_no")
+    assert [(float(p), float(d), s) for p, d, s in cursor.fetchall()] == [(100.0, 0.0, "Paid"), (50.0, 0.0, "Paid")]
+    assert tuple(float(v) for v in period_totals(cursor)) == (150.0, 150.0, 0.0)
+    cursor.close()
+    assert [float(p.paid_amount) for p in list_payments(first)] == [20.0, 40.0]
+    assert get_total_unpaid() == 0
+    assert get_customer_balance(1).open_sales == 0
+    assert get_top_debtors() == []
+    assert store.period_totals() == (150.0, 150.0, 0.0)     # paid/due re-read for the paid sales
+
+def test_receivables_aging_buckets_and_compaction(db_conn, monkeypatch):
+    import balances
+    from datetime import date, timedelta
+    from analytics import get_aging_totals, get_receivables_aging
+    from payments import record_payments
+    ensure_test_data(db_conn)
+    today = date.today()
+    add_sales_bulk([
+        {"customer_id": 1, "item_id": 1, "quantity": 1, "total": 100.0, "amount_paid": 0.0, "sale_date": today - timedelta(days=5)},
+        {"customer_id": 1, "item_id": 1, "quantity": 1, "total": 200.0, "amount_paid": 0.0, "sale_date": today - timedelta(days=45)},
+        {"customer_id": 1, "item_id": 1, "quantity": 1, "total": 300.0, "amount_paid": 0.0, "sale_date": today - timedelta(days=75)},
+        {"customer_id": 1, "item_id": 1, "quantity": 1, "total": 400.0, "amount_paid": 0.0, "sale_date": today - timedelta(days=120)},
+        {"customer_id": 1, "item_id": 1, "quantity": 1, "total": 500.0, "amount_paid": 0.0, "sale_date": today - timedelta(days=200)},
+    ], update_stock=False)
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT order_no, total FROM sales ORDER BY order_no")
+    order_nos = {float(total): order_no for order_no, total in cursor.fetchall()}
+    record_payments([(order_nos[200.0], 200.0), (order_nos[400.0], 150.0)])
+
+    assert tuple(get_aging_totals()) == (100.0, 0.0, 300.0, 750.0, 1150.0)
+    cursor.execute("SELECT COUNT(*) FROM receivables_daily")
+    assert cursor.fetchone()[0] == 4               # readers never write
+    assert balances.compact_daily() == 2
+    cursor.execute("SELECT COUNT(*) FROM receivables_daily")
+    assert cursor.fetchone()[0] == 3               # the 120- and 200-day dues folded into one row
+    assert tuple(get_aging_totals()) == (100.0, 0.0, 300.0, 750.0, 1150.0)
+    assert balances.compact_receivables(cursor) == 0
+    db_conn.commit()
+    record_payments([(order_nos[500.0], 50.0)])    # paying a folded sale still nets out in 90+
+    [row] = get_receivables_aging()
+    assert (row.customer_name, row.days_0_30, row.days_61_90, row.days_over_90, row.total) == \
+        ("Test Customer", 100.0, 300.0, 700.0, 1100.0)
+    cursor.execute("SELECT COUNT(*) FROM receivables_daily")
+    assert cursor.fetchone()[0] == 4               # 5-day, 75-day, folded, and the payment after folding
+    cursor.close()
+
+def test_stock_alerts_fire_on_crossing_with_cooldown(db_conn, monkeypatch):
+    import stock_alerts
+    ensure_test_data(db_conn)
+    alerts = []
+    with pytest.raises(TypeError):
+        stock_alerts.Channel()                     # abstract: a channel must implement send()
+    monkeypatch.setattr(stock_alerts, "_engine", stock_alerts.AlertEngine([stock_alerts.CallbackChannel(alerts.append)]))
+    assert stock_alerts.set_threshold(1, 50)
+
+    add_sale(1, 1, 40, 2000.0)                     # 100 -> 60: above the threshold
+    add_sale(1, 1, 15, 750.0)                      # 60 -> 45: crossed
+    add_sale(1, 1, 5, 250.0)                       # 45 -> 40: already below, no new alert
+    assert stock_alerts.flush()
+    assert [(a.item_name, a.quantity, a.threshold) for a in alerts] == [("Test Material", 45, 50)]
+
+    update_material(1, quantity=80)                # restock above the threshold re-arms the item,
+    add_sales_bulk([(1, 1, 35, 1750.0)])           # so 80 -> 45 alerts inside the cool-down
+    assert stock_alerts.flush()
+    assert [a.quantity for a in alerts] == [45, 45]
+
+    cursor = db_conn.cursor(buffered=True)         # a restock this process never saw...
+    cursor.execute("UPDATE materials SET quantity_in_stock = 80 WHERE id = 1")
+    db_conn.commit()
+    cursor.close()
+    add_sale(1, 1, 35, 1750.0)                     # ...leaves the cool-down in charge
+    assert stock_alerts.flush()
+    assert len(alerts) == 2
+
+    assert stock_alerts.set_threshold(1, 50, cooldown=0)
+    update_material(1, quantity=70)
+    update_material(1, quantity=10)                # a stock count can cross the threshold too
+    assert stock_alerts.flush()
+    assert [a.quantity for a in alerts] == [45, 45, 10]
+    assert [a.quantity for a in stock_alerts.recent_alerts()] == [10, 45, 45]
+
+def test_reorder_points_and_incremental_forecasts(db_conn):
+    from datetime import date, timedelta
+    from forecast import get_reorder_points, get_reorder_suggestions, refresh_forecasts
+    from suppliers_crud import set_lead_time
+    ensure_test_data(db_conn)
+    today = date.today()
+    add_sales_bulk([(1, 1, 10, 500.0, "Cash", 500.0, 0.0, "Paid", today - timedelta(days=d)) for d in range(3)],
+                   update_stock=False)
+
+    [point] = get_reorder_points(method="sma", window=3)
+    assert (point.daily_demand, point.demand_sd, point.lead_time_days) == (10.0, 0.0, 7)
+    assert (point.reorder_point, point.order_quantity) == (70, 0)           # 100 in stock
+    assert set_lead_time(1, 10)
+    assert set_lead_time(1, 10)                    # unchanged is still found
+    assert not set_lead_time(999, 10)
+    [point] = get_reorder_suggestions(method="sma", window=3)
+    assert (point.reorder_point, point.order_quantity) == (100, 300)        # 100 + 30 days - 100 in stock
+
+    [first] = get_reorder_points()                 # ewma: folds all sales so far
+    assert first.daily_demand == 10.0              # bias-corrected over the 3 days with sales
+    add_sale(1, 1, 5, 250.0)                       # same day again: the day's square is corrected
+    add_sales_bulk([(1, 1, 2, 100.0, "Cash", 100.0, 0.0, "Paid", today - timedelta(days=10))], update_stock=False)
+    [incremental] = get_reorder_points()
+    assert refresh_forecasts() == 0
+    assert refresh_forecasts(rebuild=True) == 1
+    [rebuilt] = get_reorder_points()
+    assert incremental.daily_demand == rebuilt.daily_demand
+    assert incremental.demand_sd == rebuilt.demand_sd
+
+    # Sales commit out of order_no order: top + 2 commits while top + 1 is still open.
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT MAX(order_no) FROM sales")
+    top = cursor.fetchone()[0]
+    insert = """INSERT INTO sales (order_no, customer_id, item_id, quantity, sale_date, total,
+                                   payment_method, amount_paid, amount_due, payment_status)
+                VALUES (%s, 1, 1, %s, %s, %s, 'Cash', %s, 0, 'Paid')"""
+    cursor.execute(insert, (top + 2, 7, today, 350.0, 350.0))
+    db_conn.commit()
+    assert refresh_forecasts() == 1
+    cursor.execute(insert, (top + 1, 4, today - timedelta(days=1), 200.0, 200.0))
+    db_conn.commit()
+    assert refresh_forecasts() == 1                # the late sale is folded in, once
+    assert refresh_forecasts() == 0
+    cursor.execute("SELECT COUNT(*) FROM forecast_gaps")
+    assert cursor.fetchone()[0] == 0
+    cursor.close()
+    [incremental] = get_reorder_points()
+    assert refresh_forecasts(rebuild=True) == 1
+    [rebuilt] = get_reorder_points()
+    assert (incremental.daily_demand, incremental.demand_sd) == (rebuilt.daily_demand, rebuilt.demand_sd)
+
+def test_bulk_materials_journal_only_their_own_openings(db_conn, monkeypatch):
+    import materials_crud
+    import stock_journal
+    from bulk_ops import insert_many
+    ensure_test_data(db_conn)
+
+    def racing_insert_many(sql):
+        insert = insert_many(sql)
+
+        def write(cursor, good):
+            # Another clerk's add_material lands just before the bulk INSERT.
+            cursor.execute(materials_crud.MATERIAL_INSERT_SQL, ("Racing Sand", 100.0, "quintal", 7, 1))
+            stock_journal.record_movements(cursor, [(cursor.lastrowid, 7, "opening")])
+            return insert(cursor, good)
+        return write
+
+    monkeypatch.setattr(materials_crud, "insert_many", racing_insert_many)
+    result = materials_crud.add_materials_bulk([("Bulk Tiles", 60.0, "box", 30, 1), ("Bulk Glue", 9.0, "tin", 12, 1)])
+    assert result["inserted"] == 2
+    assert stock_journal.reconcile() == []
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("""
+        SELECT m.item_name, COUNT(*), SUM(j.quantity_change) FROM stock_movements j
+        JOIN materials m ON m.id = j.item_id WHERE j.reason = 'opening' AND m.item_name <> 'Test Material'
+        GROUP BY m.item_name ORDER BY m.item_name
+    """)
+    assert [tuple(row) for row in cursor.fetchall()] == [("Bulk Glue", 1, 12), ("Bulk Tiles", 1, 30),
+                                                         ("Racing Sand", 1, 7)]
+    result = materials_crud.update_prices_bulk([(1, 55.0), (1, -1.0)])
+    assert (result["updated"], [index for index, _ in result["errors"]]) == (1, [1])
+    cursor.execute("SELECT price_per_unit FROM materials WHERE id = 1")
+    assert float(cursor.fetchone()[0]) == 55.0
+    cursor.close()
+
+def test_stock_journal_replays_history_and_reconciles(db_conn, monkeypatch):
+    import stock_journal
+    from datetime import date, datetime, timedelta
+    ensure_test_data(db_conn)
+    monkeypatch.setattr(stock_journal, "_snapshot_checked_on", None)
+
+    order_no = add_sale(1, 1, 10, 500.0)                               # 90
+    update_material(1, quantity=95)                                    # +5
+    assert stock_journal.receive_stock(1, 20, ref_no=7)                # 115
+    place_order(1, [(1, 5, 250.0)])                                    # 110
+    add_sales_bulk([(1, 1, 3, 150.0), (1, 1, 3, 150.0)])               # 104
+    add_material("Sand", 115.0, "quintal", 50, 1)
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT id FROM materials WHERE item_name = 'Sand'")
+    sand = cursor.fetchone()[0]
+    delete_material(sand)
+
+    assert stock_journal.reconcile() == []
+    assert [(m.quantity_change, m.reason) for m in stock_journal.get_movements(1)] == \
+        [(-6, "sale"), (-5, "sale"), (20, "receipt"), (5, "adjustment"), (-10, "sale"), (100, "opening")]
+    assert stock_journal.get_movements(1)[-2].ref_no == order_no
+    assert [m.reason for m in stock_journal.get_movements(sand)] == ["delete", "opening"]
+
+    # Backdate the first sale: the end of yesterday saw the opening stock minus that sale.
+    cursor.execute("UPDATE stock_movements SET moved_at = %s WHERE ref_no = %s",
+                   (datetime.now().replace(microsecond=0) - timedelta(days=1), order_no))
+    db_conn.commit()
+    assert stock_journal.get_stock_at(date.today() - timedelta(days=1)) == [(1, "Test Material", 90)]
+    assert stock_journal.get_stock_at(date(2000, 1, 1), item_id=1) == [(1, "Test Material", 100)]
+    assert stock_journal.get_stock_at(date(1999, 12, 31)) == []
+    cursor.execute("SELECT COUNT(*) FROM stock_snapshots")
+    assert cursor.fetchone()[0] == 0                                   # reads never take one
+    assert stock_journal.snapshot_if_due() is not None                 # the nightly job
+    assert stock_journal.snapshot_if_due() is None
+    assert stock_journal.get_stock_at(date.today() - timedelta(days=1)) == [(1, "Test Material", 90)]
+    assert stock_journal.get_stock_at(datetime.now()) == [(1, "Test Material", 104)]
+
+    cursor.execute("UPDATE materials SET quantity_in_stock = 100 WHERE id = 1")   # behind the journal's back
+    db_conn.commit()
+    cursor.close()
+    [mismatch] = stock_journal.reconcile(fix=True)
+    assert (mismatch.journal_quantity, mismatch.stock_quantity, mismatch.difference) == (104, 100, -4)
+    assert stock_journal.reconcile() == []
+
+def test_purchase_order_receipts_update_stock_and_supplier_stats(db_conn):
+    import stock_journal
+    from datetime import date, timedelta
+    from forecast import get_reorder_points
+    from purchase_orders import (close_purchase_order, create_purchase_order, get_order_lines,
+                                 get_supplier_stats, rebuild_supplier_stats, receive_goods)
+    ensure_test_data(db_conn)
+    add_material("Sand", 115.0, "quintal", 10, 1)
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT id FROM materials WHERE item_name = 'Sand'")
+    sand = cursor.fetchone()[0]
+    ten_days_ago = date.today() - timedelta(days=10)
+
+    assert create_purchase_order(2, [(1, 5)]) is None                       # unknown supplier
+    first = create_purchase_order(1, [(1, 50, 48.0), (sand, 30), (1, 20)], ordered_on=ten_days_ago)
+    assert receive_goods(first, [(1, 60), (sand, 10)]) == 70               # item 1 fills line 1, then line 3
+    assert receive_goods(first, [(sand, 25)]) is None                      # only 20 outstanding
+    assert [line.quantity_received for line in get_order_lines(first)] == [50, 10, 10]
+    assert receive_goods(first) == 30                                      # the rest
+
+    second = create_purchase_order(1, [(sand, 100)], ordered_on=date.today() - timedelta(days=4))
+    assert receive_goods(second, [(sand, 40)]) == 40
+    assert close_purchase_order(second)
+
+    cursor.execute("SELECT id, quantity_in_stock FROM materials ORDER BY id")
+    assert cursor.fetchall() == [(1, 170), (sand, 80)]
+    cursor.close()
+    assert stock_journal.reconcile() == []
+    [stats] = get_supplier_stats()
+    assert (stats.orders, stats.avg_lead_days, stats.fill_rate, stats.complete_rate) == (2, 7.0, 0.7, 0.5)
+    assert rebuild_supplier_stats() == 1
+    assert get_supplier_stats() == [stats]
+    assert get_reorder_points(method="sma")[0].lead_time_days == 7          # observed, no lead_time_days set
+
+def test_failing_side_effects_never_report_a_booked_delivery_as_failed(db_conn, monkeypatch):
+    import purchase_orders
+    import stock_alerts
+    ensure_test_data(db_conn)
+
+    def fail(*_):
+        raise RuntimeError("alert channel down")
+
+    first = purchase_orders.create_purchase_order(1, [(1, 10)])
+    second = purchase_orders.create_purchase_order(1, [(1, 10)])
+    monkeypatch.setattr(stock_alerts, "stock_changes", fail)
+    monkeypatch.setattr(purchase_orders, "invalidate", fail)
+    assert purchase_orders.receive_goods(first) == 10
+    assert purchase_orders.receive_goods(second, [(1, 4)]) == 4
+    assert purchase_orders.close_purchase_order(second)
+    cursor = db_conn.cursor(buffered=True)
+    cursor.execute("SELECT status FROM purchase_orders ORDER BY po_no")
+    assert [row[0] for row in cursor.fetchall()] == ["Received", "Closed"]
+    cursor.execute("SELECT quantity_in_stock FROM materials WHERE id = 1")
+    assert cursor.fetchone()[0] == 114
+    cursor.close()
@@ -0,0 +1,154 @@
+import threading
+import pytest
+import db_connect
+from db_connect import ConnectionPool, PoolTimeoutError, iter_rows
+
+
+class FakeConnection:
+    """Stands in for a mysql.connector connection so the pool can be tested without a server."""
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.closed = False
+        self.unread_result = False
+        self.result = []
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise RuntimeError("server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+    def consume_results(self):
+        self.result, self.unread_result = [], False
+
+    def cursor(self, prepared=False, **_):
+        return FakeCursor(prepared, self)
+
+
+class FakeCursor:
+    """Unbuffered like mysql.connector's: the connection refuses new statements until the rows are read."""
+    def __init__(self, prepared, conn=None):
+        self.prepared = prepared
+        self.closed = False
+        self.conn = conn
+        self.rowcount = -1
+
+    def execute(self, sql, params=()):
+        if self.conn.unread_result:
+            raise RuntimeError("Unread result found")
+        self.conn.result, self.conn.unread_result = list(range(10)), True
+
+    def fetchmany(self, size=1):
+        rows, self.conn.result = self.conn.result[:size], self.conn.result[size:]
+        self.conn.unread_result = bool(rows)
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(size=2, **kwargs):
+    opened = []
+
+    def connect():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(pool_size=size, connect=connect, **kwargs), opened
+
+
+def test_connections_are_reused():
+    pool, opened = make_pool()
+    for _ in range(5):
+        conn = pool.acquire()
+        conn.close()
+    assert len(opened) == 1
+    stats = pool.stats()
+    assert stats["checkouts"] == 5
+    assert stats["created"] == 1
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+
+
+def test_release_rolls_back_open_transaction():
+    pool, opened = make_pool()
+    conn = pool.acquire()
+    opened[0].in_transaction = True
+    conn.close()
+    assert opened[0].rollbacks == 1
+    conn.close()  # closing twice must not release the slot twice
+    assert pool.stats()["in_use"] == 0
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(size=1, checkout_timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+    pool.acquire().close()
+
+
+def test_dead_idle_connection_is_replaced():
+    pool, opened = make_pool(ping_after=0)
+    conn = pool.acquire()
+    conn.close()
+    opened[0].alive = False
+    conn = pool.acquire()
+    assert conn._raw is not opened[0]
+    assert opened[0].closed
+    assert pool.stats()["reconnects"] == 1
+    conn.close()
+
+
+def test_waiting_checkout_gets_released_connection():
+    pool, opened = make_pool(size=1, checkout_timeout=2)
+    held = pool.acquire()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.acquire()))
+    t.start()
+    held.close()
+    t.join()
+    assert len(got) == 1 and len(opened) == 1
+    assert pool.stats()["wait_max"] > 0
+    got[0].close()
+
+
+def test_prepared_cursors_are_kept_per_connection_and_capped():
+    pool, opened = make_pool(ping_after=0, prepared_per_connection=2)
+    raw = pool.acquire()._raw
+    first = pool.prepared_cursor(raw, "SELECT 1")
+    assert first.prepared and pool.prepared_cursor(raw, "SELECT 1") is first
+    pool.prepared_cursor(raw, "SELECT 2")
+    pool.prepared_cursor(raw, "SELECT 3")
+    assert first.closed     # the oldest statement made room for the third
+    assert pool.stats()["prepared"] == 3
+    opened[0].alive = False
+    pool.release(raw)
+    pool.acquire().close()  # the dead connection is replaced and its statements dropped
+    assert pool._prepared == {}
+
+
+def test_abandoned_stream_leaves_the_connection_usable(monkeypatch):
+    pool, opened = make_pool(size=1)
+    monkeypatch.setattr(db_connect, "get_pool", lambda: pool)
+    rows = iter_rows("SELECT n FROM numbers", batch_size=3)
+    assert [next(rows) for _ in range(4)] == [0, 1, 2, 3]
+    rows.close()                    # the consumer stopped halfway
+    assert pool.stats()["in_use"] == 0
+    assert list(iter_rows("SELECT n FROM numbers", batch_size=3)) == list(range(10))
+    assert len(opened) == 1 and pool.stats()["discarded"] == 0
+
+    conn = pool.acquire()           # a plain checkout returned with rows unread
+    conn.cursor().execute("SELECT n FROM numbers")
+    conn.close()
+    assert list(iter_rows("SELECT n FROM numbers")) == list(range(10))
@@ -0,0 +1,38 @@
+from datetime import date
+import pytest
+from pagination import PageFetchError, decode_token, encode_token, iter_pages, page_result
+
+
+def test_token_round_trip_keeps_dates():
+    token = encode_token([date(2024, 5, 1), 42])
+    assert decode_token(token) == [date(2024, 5, 1), 42]
+
+
+def test_bad_token_is_rejected():
+    with pytest.raises(ValueError):
+        decode_token("not a token!")
+
+
+def test_page_result_trims_extra_row():
+    rows, token = page_result([(1,), (2,), (3,)], 2, key=lambda row: [row[0]])
+    assert rows == [(1,), (2,)] and decode_token(token) == [2]
+    assert page_result([(1,)], 2, key=lambda row: [row[0]]) == ([(1,)], None)
+
+
+def test_iter_pages_walks_every_row():
+    data = list(range(1, 8))
+
+    def fetch(token, size):
+        after = decode_token(token)[0] if token else 0
+        rows = [n for n in data if n > after][:size + 1]
+        return page_result(rows, size, key=lambda n: [n])
+
+    assert [n for page in iter_pages(fetch, 3) for n in page] == data
+
+
+def test_iter_pages_raises_when_a_page_fails():
+    pages = iter([([1, 2], encode_token([2])), None])
+    walked = iter_pages(lambda token, size: next(pages), 2)
+    assert next(walked) == [1, 2]
+    with pytest.raises(PageFetchError):
+        next(walked)
@@ -0,0 +1,61 @@
+import json
+import sqlite3
+
+import pytest
+
+import queries
+from queries import InstrumentedCursor, QueryStats, fingerprint, register
+
+
+def test_register_returns_sql_and_rejects_a_second_meaning():
+    sql = register("test.register", "SELECT 1")
+    assert sql == "SELECT 1" and queries.name_of(sql) == "test.register"
+    assert register("test.register", "SELECT 1") == "SELECT 1"
+    with pytest.raises(ValueError):
+        register("test.register", "SELECT 2")
+
+
+def test_fingerprint_folds_in_lists_and_whitespace():
+    assert fingerprint("SELECT id\n  FROM materials WHERE id IN (%s, %s,%s)") == \
+        "SELECT id FROM materials WHERE id IN (%s, ...)"
+
+
+def test_histogram_percentiles_and_slow_log(tmp_path):
+    log = tmp_path / "slow.jsonl"
+    stats = QueryStats(slow_ms=50, slow_log=str(log))
+    for _ in range(98):
+        stats.record("q", 0.0008, rows=2)       # 0.8 ms
+    stats.record("q", 0.03)                     # 30 ms
+    stats.record("q", 0.2, error=True)          # 200 ms, slow
+    entry = stats.stats()["q"]
+    assert (entry["calls"], entry["rows"], entry["errors"]) == (100, 196, 1)
+    assert (entry["p50_ms"], entry["p99_ms"], entry["max_ms"]) == (1, 50, 200)
+    assert entry["histogram"]["1"] == 98
+    assert [e["query"] for e in stats.slow_queries()] == ["q"]
+    assert json.loads(log.read_text())["ms"] == 200
+
+
+def test_registered_statement_runs_on_the_prepared_cursor():
+    raw = sqlite3.connect(":memory:")
+    raw.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+    raw.executemany("INSERT INTO t (name) VALUES (?)", [("a",), ("b",)])
+    sql = register("test.names", "SELECT id, name FROM t ORDER BY id")
+    prepared = raw.cursor()
+    queries.reset_query_stats()
+
+    cursor = InstrumentedCursor(raw.cursor(), lambda s: prepared, dictionary=True)
+    cursor.execute(sql)
+    assert cursor.fetchone() == {"id": 1, "name": "a"}
+    assert cursor.fetchall() == [{"id": 2, "name": "b"}] and cursor.rowcount == 2
+    cursor.execute("SELECT name FROM t WHERE id IN (?, ?)", (1, 2))      # unregistered: plain cursor
+    assert sorted(cursor.fetchall()) == [("a",), ("b",)]
+    stats = queries.query_stats()
+    assert stats["test.names"]["calls"] == 1 and stats["test.names"]["rows"] == 2
+    assert "SELECT name FROM t WHERE id IN (?, ?)" in stats
+
+
+def test_pooled_cursors_file_calls_under_the_registered_name():
+    from materials_crud import get_low_stock
+    queries.reset_query_stats()
+    get_low_stock(10 ** 9)
+    assert [p.query for p in queries.top_queries()] == ["materials.low_stock"]
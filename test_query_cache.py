@@ -0,0 +1,41 @@
+import time
+from query_cache import QueryCache
+
+
+def test_hit_after_first_load():
+    cache = QueryCache()
+    calls = []
+    load = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_load("k", ["materials"], load) == 1
+    assert cache.get_or_load("k", ["materials"], load) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_invalidate_drops_entries_of_that_table_only():
+    cache = QueryCache()
+    cache.get_or_load("materials", ["materials"], lambda: "m")
+    cache.get_or_load("sales", ["sales", "materials"], lambda: "s")
+    cache.get_or_load("customers", ["customers"], lambda: "c")
+    cache.invalidate("materials")
+    assert cache.stats()["entries"] == 1
+    assert cache.get_or_load("customers", ["customers"], lambda: "new") == "c"
+    assert cache.get_or_load("sales", ["sales"], lambda: "new") == "new"
+
+
+def test_entry_expires_after_shortest_table_ttl():
+    cache = QueryCache(ttls={"sales": 0.01, "customers": 60})
+    cache.get_or_load("k", ["customers", "sales"], lambda: "old")
+    time.sleep(0.02)
+    assert cache.get_or_load("k", ["customers"], lambda: "new") == "new"
+    assert cache.stats()["expired"] == 1
+
+
+def test_write_during_load_is_not_cached():
+    cache = QueryCache()
+
+    def load():
+        cache.invalidate("materials")  # a writer commits while we read
+        return "stale"
+
+    assert cache.get_or_load("k", ["materials"], load) == "stale"
+    assert cache.get_or_load("k", ["materials"], lambda: "fresh") == "fresh"
@@ -0,0 +1,14 @@
+from query_plans import HOT_QUERIES, check_query_plans
+
+
+def test_hot_queries_do_not_full_scan():
+    # Run `python migrate.py` first; a failure here means an index from
+    # migrations/<backend>/0003_hot_query_indexes.sql is missing or a hot query stopped matching it.
+    regressions = check_query_plans()
+    assert regressions == [], [f"{name}: full scan on {table}" for name, table, _ in regressions]
+
+
+def test_every_hot_query_names_a_table():
+    for name, sql, params, tables in HOT_QUERIES:
+        assert tables, name
+        assert sql.count("%s") == len(params), name
@@ -0,0 +1,65 @@
+import io
+import json
+from datetime import date
+
+from records import DailyRevenue, Material
+from render import stream_table, table, to_dataframe, to_dicts, write_csv, write_report
+
+ROWS = [(1, "Cement", 390.0, "quintal", 100), (2, "Sand", 45.5, "ton", 8)]
+
+
+def test_records_behave_like_the_old_tuples():
+    cement, sand = Material.from_rows(ROWS)
+    assert cement.item_name == "Cement" and sand.quantity_in_stock == 8
+    assert cement[0] == 1 and tuple(sand) == ROWS[1] and sand == ROWS[1]
+    item_id, name, *_ = cement
+    assert (item_id, name) == (1, "Cement")
+
+
+def test_records_have_no_instance_dict():
+    row = DailyRevenue(date(2025, 1, 2), 10.0)
+    assert not hasattr(row, "__dict__")
+    assert to_dicts([row]) == [{"day": date(2025, 1, 2), "revenue": 10.0}]
+
+
+def test_renderers_share_one_result(tmp_path):
+    rows = Material.from_rows(ROWS)
+    assert "Cement" in table(rows, Material)
+    assert list(to_dataframe(rows, Material).columns) == list(Material.HEADERS)
+    path = write_csv(tmp_path / "materials.csv", rows, Material)
+    assert path.read_text().splitlines() == [
+        "id,item_name,price_per_unit,unit_type,quantity_in_stock",
+        "1,Cement,390.0,quintal,100",
+        "2,Sand,45.5,ton,8",
+    ]
+
+
+def test_write_report_streams_every_format():
+    rows = Material.from_rows(ROWS)
+    out = io.StringIO()
+    assert write_report(iter(rows), Material, "ndjson", out) == 2
+    assert json.loads(out.getvalue().splitlines()[1]) == dict(zip(Material.__slots__, ROWS[1]))
+    out = io.StringIO()
+    write_report(rows, Material, "csv", out)
+    assert out.getvalue().splitlines()[1] == "1,Cement,390.0,quintal,100"
+    out = io.StringIO()
+    write_report(rows, Material, "table", out)
+    header, rule, cement, sand = out.getvalue().splitlines()
+    assert header.split() == list(Material.HEADERS) and set(rule) == {"-", " "}
+    assert cement.index("390") + len("390") == sand.index("45.5") + len("45.5")    # numbers right-aligned
+    assert cement.index("quintal") == sand.index("ton")                          # text left-aligned
+    out = io.StringIO()
+    assert write_report([], DailyRevenue, "table", out, empty_message="Nothing.") == 0
+    assert out.getvalue() == "Nothing.\n"
+
+
+def test_table_rows_are_written_before_the_input_is_exhausted():
+    out = io.StringIO()
+
+    def rows():
+        for day in range(1, 29):
+            if day == 20:
+                assert "2025-02-01" in out.getvalue()
+            yield DailyRevenue(date(2025, 2, day), float(day))
+
+    assert stream_table(rows(), DailyRevenue, out, sample=5) == 28
@@ -0,0 +1,37 @@
+from search_index import TrigramIndex, trigrams
+
+NAMES = [(1, "Cement"), (2, "White Cement"), (3, "Sand"), (4, "Steel Rod"), (5, "Red Brick")]
+
+
+def test_trigrams_are_padded_per_word():
+    assert trigrams("Sand") == {"  s", " sa", "san", "and", "nd "}
+
+
+def test_substring_matches_rank_first():
+    results = TrigramIndex(NAMES).search("cem")
+    assert [row_id for row_id, _, _ in results] == [1, 2]
+
+
+def test_typos_still_match():
+    results = TrigramIndex(NAMES).search("cemnt")
+    assert results and results[0][1] == "Cement"
+    assert TrigramIndex(NAMES).search("stel")[0][1] == "Steel Rod"
+
+
+def test_unrelated_query_finds_nothing():
+    assert TrigramIndex(NAMES).search("plywood") == []
+
+
+def test_add_rename_and_remove():
+    index = TrigramIndex(NAMES)
+    index.add(6, "Granite")
+    index.add(3, "River Sand")
+    index.remove(5)
+    assert index.search("granite")[0][0] == 6
+    assert index.search("river")[0][0] == 3
+    assert index.search("brick") == []
+    assert len(index) == 5
+
+
+def test_short_queries_use_substring_scan():
+    assert [row_id for row_id, _, _ in TrigramIndex(NAMES).search("ri")] == [5]
@@ -0,0 +1,57 @@
+import sqlite3
+from datetime import date
+
+from db_connect import is_retryable
+from sqlite_backend import SQLiteConnection, translate
+
+
+def memory_connection():
+    raw = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+    raw.execute("CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, day DATE, n INTEGER, UNIQUE (day))")
+    return SQLiteConnection(raw)
+
+
+def test_translate_rewrites_mysql_syntax():
+    assert translate("SELECT * FROM t WHERE id = %s FOR UPDATE") == (("SELECT * FROM t WHERE id = ?",), True)
+    (sql,), lock = translate("INSERT INTO t (day, n) VALUES (%s, %s) ON DUPLICATE KEY UPDATE n = n + VALUES(n)")
+    assert sql == "INSERT INTO t (day, n) VALUES (?, ?) ON CONFLICT DO UPDATE SET n = n + excluded.n"
+    assert not lock
+    assert translate("TRUNCATE TABLE t")[0][0] == "DELETE FROM t"
+
+
+def test_upsert_and_dates_round_trip():
+    conn = memory_connection()
+    cursor = conn.cursor(dictionary=True)
+    upsert = "INSERT INTO t (day, n) VALUES (%s, %s) ON DUPLICATE KEY UPDATE n = n + VALUES(n)"
+    cursor.execute(upsert, (date(2025, 1, 2), 3))
+    cursor.execute(upsert, (date(2025, 1, 2), 4))
+    cursor.execute("SELECT day, n, MIN(day) AS first_day FROM t")
+    assert cursor.fetchone() == {"day": date(2025, 1, 2), "n": 7, "first_day": date(2025, 1, 2)}
+
+
+def test_executemany_lastrowid_is_first_inserted_id():
+    conn = memory_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO t (day, n) VALUES (%s, %s)", (date(2025, 1, 1), 1))
+    cursor.executemany("INSERT INTO t (day, n) VALUES (%s, %s)", [(date(2025, 1, d), d) for d in (2, 3, 4)])
+    assert (cursor.lastrowid, cursor.rowcount) == (2, 3)
+
+
+def test_unbuffered_cursor_reads_rows_as_they_are_fetched():
+    conn = memory_connection()
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO t (day, n) VALUES (%s, %s)", [(date(2025, 1, d), d) for d in range(1, 6)])
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute("SELECT day, n FROM t ORDER BY n")
+    assert cursor._rows is None and cursor.rowcount == -1
+    assert cursor.fetchmany(2) == [{"day": date(2025, 1, 1), "n": 1}, {"day": date(2025, 1, 2), "n": 2}]
+    assert cursor.fetchone()["n"] == 3
+    assert [row["n"] for row in cursor.fetchall()] == [4, 5]
+    assert cursor.fetchmany(2) == []
+
+
+def test_lock_errors_are_retryable():
+    err = sqlite3.OperationalError("database is locked")
+    err.sqlite_errorcode = 5
+    assert is_retryable(err)
+    assert not is_retryable(sqlite3.IntegrityError("UNIQUE constraint failed"))
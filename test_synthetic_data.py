@@ -0,0 +1,32 @@
+from collections import Counter
+from datetime import date
+
+from synthetic_data import generate
+
+END = date(2025, 6, 30)
+
+
+def test_same_seed_gives_the_same_shop():
+    assert generate(sales=500, end=END, seed=7) == generate(sales=500, end=END, seed=7)
+    assert generate(sales=500, end=END, seed=7)["sales"] != generate(sales=500, end=END, seed=8)["sales"]
+
+
+def test_sales_are_skewed_and_inside_the_period():
+    shop = generate(customers=200, materials=100, sales=20000, years=2, end=END)
+    sales = shop["sales"]
+    assert shop["start"] <= sales[0][8] and sales[-1][8] == max(s[8] for s in sales) <= END
+    top_items = sum(n for _, n in Counter(s[1] for s in sales).most_common(10))
+    assert top_items / len(sales) > 0.4     # 10% of the items make up well over 40% of the sales
+    assert len({s[4] for s in sales}) == 4
+    credit_due = [s for s in sales if s[6] > 0]
+    assert credit_due and all(s[4] == "Credit" and abs(s[5] + s[6] - s[3]) < 0.02 for s in credit_due)
+    assert len({c[1] for c in shop["customers"] + shop["suppliers"]}) == 220      # phones are unique
+
+
+def test_compare_flags_slower_p50():
+    from bench_suite import compare
+    summary = dict(rounds=10, p95_ms=2, p99_ms=2, max_ms=2, queries_per_call=1)
+    results = {"a": dict(summary, p50_ms=15), "b": dict(summary, p50_ms=0.3), "c": dict(summary, p50_ms=1)}
+    rows, regressions = compare(results, {"a": {"p50_ms": 10}, "b": {"p50_ms": 0.1}}, tolerance=0.25, min_delta_ms=0.5)
+    assert regressions == ["a"]     # b tripled, but by 0.2 ms only
+    assert [r.change for r in rows] == ["+50%", "+200%", None]